@@ -8,24 +8,165 @@
 
     B{Entropy Command Line Client}.
 
+    Static manifest of the available commands. Command modules are
+    imported only when the command is dispatched, so that the help
+    output and shell completion do not pay for them. When adding
+    a command, add it here too. Command modules not listed here,
+    like the ones shipped by third parties, are loaded on demand
+    by load_unlisted_commands().
+
 """
 import os
 import sys
 
-_cur_file = sys.modules[__name__].__file__
-_cur_dir = os.path.dirname(_cur_file)
-_excluded_mods = ["descriptor"]
-for py_file in os.listdir(_cur_dir):
-    if not py_file.endswith(".py"):
-        continue
-    if py_file.startswith("_"):
-        continue
-    # strip .py
-    _mod = "solo.commands." + py_file[:-3]
-    if _mod in _excluded_mods:
-        continue
-    try:
-        __import__(_mod)
-    except ValueError:
-        # garbage
-        continue
+from entropy.i18n import _
+
+from solo.commands.descriptor import SoloCommandDescriptor, \
+    SoloLazyCommandDescriptor
+
+_COMMANDS = [
+    SoloLazyCommandDescriptor(
+        "solo.commands.cache", "SoloCache", "cache",
+        _("manage Entropy Library Cache")),
+    SoloLazyCommandDescriptor(
+        "solo.commands.cleanup", "SoloCleanup", "cleanup",
+        _("remove downloaded packages and clean temp. directories")),
+    SoloLazyCommandDescriptor(
+        "solo.commands.conf", "SoloConf", "conf",
+        _("manage package file updates")),
+    SoloLazyCommandDescriptor(
+        "solo.commands.config", "SoloConfig", "config",
+        _("configure installed packages")),
+    SoloLazyCommandDescriptor(
+        "solo.commands.deptest", "SoloDeptest", "deptest",
+        _("look for unsatisfied dependencies"),
+        aliases = ["dt"]),
+    SoloLazyCommandDescriptor(
+        "solo.commands.download", "SoloDownload", "download",
+        _("download packages, essentially"),
+        aliases = ["fetch"]),
+    SoloLazyCommandDescriptor(
+        "solo.commands.help", "SoloHelp", "help",
+        _("this help"),
+        aliases = ["-h", "--help"], catch_all = True),
+    SoloLazyCommandDescriptor(
+        "solo.commands.hop", "SoloHop", "hop",
+        _("upgrade the System to a new branch")),
+    SoloLazyCommandDescriptor(
+        "solo.commands.install", "SoloInstall", "install",
+        _("install or update packages or package files"),
+        aliases = ["i"]),
+    SoloLazyCommandDescriptor(
+        "solo.commands.libtest", "SoloLibtest", "libtest",
+        _("look for missing libraries"),
+        aliases = ["lt"]),
+    SoloLazyCommandDescriptor(
+        "solo.commands.mask", "SoloMask", "mask",
+        _("mask one or more packages")),
+    SoloLazyCommandDescriptor(
+        "solo.commands.mask", "SoloUnmask", "unmask",
+        _("unmask one or more packages")),
+    SoloLazyCommandDescriptor(
+        "solo.commands.match", "SoloMatch", "match",
+        _("match packages in repositories"),
+        aliases = ["m"]),
+    SoloLazyCommandDescriptor(
+        "solo.commands.moo", "SoloMoo", "moo",
+        _("moo at user"),
+        hidden = True),
+    SoloLazyCommandDescriptor(
+        "solo.commands.moo", "SoloLxnay", "lxnay",
+        _("bow to lxnay"),
+        hidden = True),
+    SoloLazyCommandDescriptor(
+        "solo.commands.notice", "SoloNotice", "notice",
+        _("repository notice board reader")),
+    SoloLazyCommandDescriptor(
+        "solo.commands.pkg", "SoloPkg", "pkg",
+        _("execute advanced tasks on packages"),
+        aliases = ["smart"]),
+    SoloLazyCommandDescriptor(
+        "solo.commands.preservedlibs", "SoloPreservedLibs", "preservedlibs",
+        _("Tools to manage the preserved libraries on the system"),
+        aliases = ["pl"]),
+    SoloLazyCommandDescriptor(
+        "solo.commands.query", "SoloQuery", "query",
+        _("repository query tools"),
+        aliases = ["q"]),
+    SoloLazyCommandDescriptor(
+        "solo.commands.remove", "SoloRemove", "remove",
+        _("remove packages from system"),
+        aliases = ["rm"]),
+    SoloLazyCommandDescriptor(
+        "solo.commands.repo", "SoloRepo", "repo",
+        _("manage repositories")),
+    SoloLazyCommandDescriptor(
+        "solo.commands.rescue", "SoloRescue", "rescue",
+        _("tools to rescue the running system")),
+    SoloLazyCommandDescriptor(
+        "solo.commands.search", "SoloSearch", "search",
+        _("search packages in repositories"),
+        aliases = ["s"]),
+    SoloLazyCommandDescriptor(
+        "solo.commands.security", "SoloSecurity", "security",
+        _("system security tools"),
+        aliases = ["sec"]),
+    SoloLazyCommandDescriptor(
+        "solo.commands.source", "SoloSource", "source",
+        _("download packages source code"),
+        aliases = ["src"]),
+    SoloLazyCommandDescriptor(
+        "solo.commands.status", "SoloStatus", "status",
+        _("show Repositories status"),
+        aliases = ["st", "--info"]),
+    SoloLazyCommandDescriptor(
+        "solo.commands.ugc", "SoloUgc", "ugc",
+        _("manage User Generated Content")),
+    SoloLazyCommandDescriptor(
+        "solo.commands.unused", "SoloUnused", "unusedpackages",
+        _("show unused packages (pay attention)"),
+        aliases = ["unused"]),
+    SoloLazyCommandDescriptor(
+        "solo.commands.update", "SoloUpdate", "update",
+        _("update repositories"),
+        aliases = ["up"]),
+    SoloLazyCommandDescriptor(
+        "solo.commands.upgrade", "SoloUpgrade", "upgrade",
+        _("upgrade the system"),
+        aliases = ["u"]),
+    SoloLazyCommandDescriptor(
+        "solo.commands.version", "SoloVersion", "version",
+        _("show equo version"),
+        aliases = ["--version"]),
+    SoloLazyCommandDescriptor(
+        "solo.commands.yell", "SoloYell", "yell",
+        _("yell at user"),
+        hidden = True),
+]
+
+for _descriptor in _COMMANDS:
+    SoloCommandDescriptor.register(_descriptor)
+
+
+def load_unlisted_commands():
+    """
+    Import the command modules that are not in the static manifest,
+    so that they register their SoloCommandDescriptor objects.
+    """
+    listed_mods = set([x.get_module() for x in _COMMANDS])
+    excluded_mods = ["solo.commands.command", "solo.commands.descriptor"]
+    cur_dir = os.path.dirname(sys.modules[__name__].__file__)
+    for py_file in sorted(os.listdir(cur_dir)):
+        if not py_file.endswith(".py"):
+            continue
+        if py_file.startswith("_"):
+            continue
+        # strip .py
+        mod = "solo.commands." + py_file[:-3]
+        if mod in listed_mods or mod in excluded_mods:
+            continue
+        try:
+            __import__(mod)
+        except ValueError:
+            # garbage
+            continue
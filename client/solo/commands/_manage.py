@@ -529,14 +529,16 @@ class SoloManage(SoloCommand):
         return run_queue, removal_queue
 
     def _download_packages(self, entropy_client, package_matches,
-                           downdata, multifetch=1):
+                           downdata, multifetch=None):
         """
         Download packages from mirrors, essentially.
+        multifetch is the number of packages downloaded in parallel,
+        None means the client.conf multifetch value.
         """
         # read multifetch parameter from config if needed.
         client_settings = entropy_client.ClientSettings()
         misc_settings = client_settings['misc']
-        if multifetch <= 1:
+        if multifetch is None:
             multifetch = misc_settings.get('multifetch', 1)
 
         action_factory = entropy_client.PackageActionFactory()
@@ -20,7 +20,6 @@ from entropy.locks import EntropyResourcesLock
 from entropy.output import darkgreen, teal, purple, print_error, \
     print_generic, bold, brown
 from entropy.exceptions import PermissionDenied
-from entropy.client.interfaces import Client
 from entropy.core.settings.base import SystemSettings
 
 import entropy.tools
@@ -316,12 +315,14 @@ class SoloCommand(object):
         Return the Entropy Client object.
         This method is not thread safe.
         """
+        from entropy.client.interfaces import Client
         return Client(*args, **kwargs)
 
     def _entropy_class(self):
         """
         Return the Entropy Client class object.
         """
+        from entropy.client.interfaces import Client
         return Client
 
     def _entropy_bashcomp(self):
@@ -332,6 +333,7 @@ class SoloCommand(object):
         Entropy object loaded by _entropy() at the cost
         of less consistency checks.
         """
+        from entropy.client.interfaces import Client
         return Client(indexing=False, repo_validation=False)
 
     def _entropy_ws(self, entropy_client, repository_id, tx_cb=False):
@@ -212,7 +212,7 @@ Test system integrity by checking installed packages dependencies.
             self._pretend, self._ask,
             False, self._quiet, False,
             False, False, False, False, False,
-            False, 1, sorted(found_deps))
+            False, None, sorted(found_deps))
         return exit_st
 
 
@@ -10,6 +10,8 @@
     Solo Command descriptor class.
 
 """
+import sys
+
 
 class SoloCommandDescriptor(object):
     """
@@ -23,11 +25,18 @@ class SoloCommandDescriptor(object):
     @staticmethod
     def register(descriptor):
         """
-        Register an SoloCommandDescriptor object
+        Register an SoloCommandDescriptor object. A previously registered
+        object with the same name (for instance, the SoloLazyCommandDescriptor
+        used before the command module is imported) is replaced.
         """
-        SoloCommandDescriptor.SOLO_COMMANDS.append(descriptor)
-        SoloCommandDescriptor.SOLO_COMMANDS_MAP[descriptor.get_name()] = \
-            descriptor
+        name = descriptor.get_name()
+        old_descriptor = SoloCommandDescriptor.SOLO_COMMANDS_MAP.get(name)
+        if old_descriptor is not None:
+            idx = SoloCommandDescriptor.SOLO_COMMANDS.index(old_descriptor)
+            SoloCommandDescriptor.SOLO_COMMANDS[idx] = descriptor
+        else:
+            SoloCommandDescriptor.SOLO_COMMANDS.append(descriptor)
+        SoloCommandDescriptor.SOLO_COMMANDS_MAP[name] = descriptor
 
     @staticmethod
     def obtain():
@@ -71,3 +80,95 @@ class SoloCommandDescriptor(object):
         Get SoloCommand description
         """
         return self._description
+
+    def get_aliases(self):
+        """
+        Get SoloCommand aliases
+        """
+        return self._klass.ALIASES
+
+    def is_catch_all(self):
+        """
+        Return whether SoloCommand is the catch-all command
+        """
+        return self._klass.CATCH_ALL
+
+    def is_hidden(self):
+        """
+        Return whether SoloCommand is hidden from the help output
+        """
+        return self._klass.HIDDEN
+
+
+class SoloLazyCommandDescriptor(SoloCommandDescriptor):
+    """
+    SoloCommandDescriptor object whose SoloCommand class is imported only
+    when get_class() is called. The command name, aliases and flags
+    are provided by the static command manifest, so that the help
+    output and shell completion do not import the command modules.
+    Once imported, the command module registers its own
+    SoloCommandDescriptor object, replacing this one.
+    """
+
+    def __init__(self, module, class_name, name, description,
+                 aliases = None, catch_all = False, hidden = False):
+        """
+        Object constructor.
+
+        @param module: name of the module containing the SoloCommand class
+        @type module: string
+        @param class_name: name of the SoloCommand class
+        @type class_name: string
+        @param name: SoloCommand name (its NAME attribute)
+        @type name: string
+        @param description: SoloCommand description
+        @type description: string
+        @keyword aliases: value of the SoloCommand ALIASES attribute
+        @type aliases: list
+        @keyword catch_all: value of the SoloCommand CATCH_ALL attribute
+        @type catch_all: bool
+        @keyword hidden: value of the SoloCommand HIDDEN attribute
+        @type hidden: bool
+        """
+        SoloCommandDescriptor.__init__(self, None, name, description)
+        self._module = module
+        self._class_name = class_name
+        if aliases is None:
+            aliases = []
+        self._aliases = aliases
+        self._catch_all = catch_all
+        self._hidden = hidden
+
+    def get_module(self):
+        """
+        Get the name of the module containing the SoloCommand class
+        """
+        return self._module
+
+    def get_class(self):
+        """
+        Overridden from SoloCommandDescriptor
+        """
+        if self._klass is None:
+            __import__(self._module)
+            self._klass = getattr(
+                sys.modules[self._module], self._class_name)
+        return self._klass
+
+    def get_aliases(self):
+        """
+        Overridden from SoloCommandDescriptor
+        """
+        return self._aliases
+
+    def is_catch_all(self):
+        """
+        Overridden from SoloCommandDescriptor
+        """
+        return self._catch_all
+
+    def is_hidden(self):
+        """
+        Overridden from SoloCommandDescriptor
+        """
+        return self._hidden
@@ -122,7 +122,7 @@ Download packages, essentially.
 
         parser.add_argument(
             "--multifetch",
-            type=int, default=1,
+            type=int, default=None,
             choices=[1, 2, 3, 4, 5, 6, 7, 8, 9, 10],
             help=_("download multiple packages in parallel (max 10)"))
         _commands["--multifetch"] = {}
@@ -48,7 +48,7 @@ class SoloHelp(SoloCommand):
                 # do not add self
                 continue
             outcome.append(name)
-            aliases = descriptor.get_class().ALIASES
+            aliases = descriptor.get_aliases()
             outcome.extend(aliases)
 
         def _startswith(string):
@@ -80,9 +80,9 @@ class SoloHelp(SoloCommand):
         descriptors.sort(key = lambda x: x.get_name())
         group = parser.add_argument_group("command", "available commands")
         for descriptor in descriptors:
-            if descriptor.get_class().HIDDEN:
+            if descriptor.is_hidden():
                 continue
-            aliases = descriptor.get_class().ALIASES
+            aliases = descriptor.get_aliases()
             aliases_str = ", ".join([teal(x) for x in aliases])
             if aliases_str:
                 aliases_str = " [%s]" % (aliases_str,)
@@ -21,6 +21,7 @@ from entropy.output import brown, purple, darkred, red, \
     blue, darkblue, darkgreen, bold
 from entropy.client.interfaces.package.actions.action import PackageAction
 
+import entropy.dep
 import entropy.tools
 
 from solo.utils import enlightenatom
@@ -150,7 +151,7 @@ Install or update packages or package files.
 
         parser.add_argument(
             "--multifetch",
-            type=int, default=1,
+            type=int, default=None,
             choices=[1, 2, 3, 4, 5, 6, 7, 8, 9, 10],
             help=_("download multiple packages in parallel (max 10)"))
         _commands["--multifetch"] = {}
@@ -511,7 +512,9 @@ Install or update packages or package files.
                         onlydeps, relaxed, multifetch, packages,
                         package_matches=None):
         """
-        Solo Install action implementation.
+        Solo Install action implementation. multifetch is the number of
+        packages downloaded in parallel, None means the client.conf
+        multifetch value (callers must not pass 1 for that).
         """
         inst_repo = entropy_client.installed_repository()
         action_factory = entropy_client.PackageActionFactory()
@@ -565,18 +568,24 @@ Install or update packages or package files.
             if exit_st != 0:
                 return 1, False
 
+        misc_settings = entropy_client.ClientSettings()['misc']
+        pipeline_window = misc_settings['install_pipeline']
+        if fetch:
+            pipeline_window = 0
+
         ugc_thread = None
         down_data = {}
-        exit_st = self._download_packages(
-            entropy_client, run_queue, down_data, multifetch)
-        if exit_st == 0:
-            ugc_thread = ParallelTask(
-                self._signal_ugc, entropy_client, down_data)
-            ugc_thread.name = "UgcThread"
-            ugc_thread.start()
-
-        elif exit_st != 0:
-            return 1, False
+        if not pipeline_window:
+            exit_st = self._download_packages(
+                entropy_client, run_queue, down_data, multifetch)
+            if exit_st == 0:
+                ugc_thread = ParallelTask(
+                    self._signal_ugc, entropy_client, down_data)
+                ugc_thread.name = "UgcThread"
+                ugc_thread.start()
+
+            elif exit_st != 0:
+                return 1, False
 
         # is --fetch on? then quit.
         if fetch:
@@ -593,6 +602,42 @@ Install or update packages or package files.
         package_set = set(packages)
         total = len(run_queue)
 
+        metaopts_map = {}
+        for pkg_match in run_queue:
+
+            metaopts = {
+                'removeconfig': config_files,
+            }
+
+            if onlydeps:
+                metaopts['install_source'] = \
+                    etpConst['install_sources']['automatic_dependency']
+            elif pkg_match in package_set:
+                metaopts['install_source'] = \
+                    etpConst['install_sources']['user']
+            else:
+                metaopts['install_source'] = \
+                    etpConst['install_sources']['automatic_dependency']
+
+            metaopts_map[pkg_match] = metaopts
+
+        pipeline = None
+        if pipeline_window:
+            if multifetch is None:
+                multifetch = misc_settings.get('multifetch', 1)
+            for package_id, repository_id in run_queue:
+                atom = entropy_client.open_repository(
+                    repository_id).retrieveAtom(package_id)
+                if atom:
+                    obj = down_data.setdefault(repository_id, set())
+                    obj.add(entropy.dep.dep_getkey(atom))
+
+            pipeline = action_factory.get_install_pipeline(
+                run_queue, opts_map=metaopts_map,
+                window=pipeline_window,
+                unpack=misc_settings['install_pipeline_unpack'],
+                multifetch=multifetch)
+
         notif_acquired = False
         try:
             # this is a best effort, we will not sleep if the lock
@@ -606,21 +651,10 @@ Install or update packages or package files.
             # state.
             notif_acquired = notification_lock.try_acquire_shared()
 
-            for count, pkg_match in enumerate(run_queue, 1):
-
-                metaopts = {
-                    'removeconfig': config_files,
-                }
+            if pipeline is not None:
+                pipeline.start()
 
-                if onlydeps:
-                    metaopts['install_source'] = \
-                        etpConst['install_sources']['automatic_dependency']
-                elif pkg_match in package_set:
-                    metaopts['install_source'] = \
-                        etpConst['install_sources']['user']
-                else:
-                    metaopts['install_source'] = \
-                        etpConst['install_sources']['automatic_dependency']
+            for count, pkg_match in enumerate(run_queue, 1):
 
                 package_id, repository_id = pkg_match
                 atom = entropy_client.open_repository(
@@ -628,9 +662,16 @@ Install or update packages or package files.
 
                 pkg = None
                 try:
-                    pkg = action_factory.get(
-                        action_factory.INSTALL_ACTION,
-                        pkg_match, opts=metaopts)
+                    if pipeline is not None:
+                        pkg, exit_st = pipeline.next()
+                        if exit_st != 0:
+                            # show config updates of the packages
+                            # installed so far
+                            return 1, count > 1
+                    else:
+                        pkg = action_factory.get(
+                            action_factory.INSTALL_ACTION,
+                            pkg_match, opts=metaopts_map[pkg_match])
 
                     xterm_header = "equo (%s) :: %d of %d ::" % (
                         _("install"), count, total)
@@ -653,9 +694,18 @@ Install or update packages or package files.
                         pkg.finalize()
 
         finally:
+            if pipeline is not None:
+                pipeline.stop()
             if notif_acquired:
                 notification_lock.release()
 
+        if pipeline is not None:
+            # all the packages have been downloaded
+            ugc_thread = ParallelTask(
+                self._signal_ugc, entropy_client, down_data)
+            ugc_thread.name = "UgcThread"
+            ugc_thread.start()
+
         if ugc_thread is not None:
             ugc_thread.join()
 
@@ -239,7 +239,7 @@ Test system integrity by looking for missing libraries.
                 entropy_client, True, True,
                 pretend, ask, False, quiet, False,
                 False, False, False, False, False,
-                False, 1, [],
+                False, None, [],
                 package_matches=package_matches)
 
         return exit_st
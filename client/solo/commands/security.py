@@ -510,7 +510,7 @@ System security tools.
                     entropy_client, True, True,
                     pretend, ask, False, quiet, False,
                     False, False, fetch, False, False,
-                    False, 1, [], package_matches=list(valid_matches))
+                    False, None, [], package_matches=list(valid_matches))
 
         if not quiet:
             entropy_client.output(
@@ -633,9 +633,7 @@ System security tools.
         inst_repo = entropy_client.installed_repository()
         with inst_repo.shared():
 
-            affected_deps = set()
-            for advisory_id in sec.list():
-                affected_deps.update(sec.affected_id(advisory_id))
+            affected_deps = sec.affected_all()
 
             valid_matches = set()
             for atom in affected_deps:
@@ -661,7 +659,7 @@ System security tools.
             entropy_client, True, True,
             pretend, ask, False, quiet, False,
             False, False, fetch, False, False,
-            False, 1, [], package_matches=list(valid_matches))
+            False, None, [], package_matches=list(valid_matches))
         return exit_st
 
 
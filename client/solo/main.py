@@ -25,6 +25,7 @@ from entropy.exceptions import SystemDatabaseError, OnlineMirrorError, \
 
 import entropy.tools
 
+from solo.commands import load_unlisted_commands
 from solo.commands.descriptor import SoloCommandDescriptor
 from solo.utils import read_client_release
 
@@ -259,16 +260,20 @@ def main():
 
     install_exception_handler()
 
-    descriptors = SoloCommandDescriptor.obtain()
-    args_map = {}
-    catch_all = None
-    for descriptor in descriptors:
-        klass = descriptor.get_class()
-        if klass.CATCH_ALL:
-            catch_all = klass
-        args_map[klass.NAME] = klass
-        for alias in klass.ALIASES:
-            args_map[alias] = klass
+    # command classes are loaded only when dispatched,
+    # see the solo.commands package
+    def _build_args_map():
+        args_map = {}
+        catch_all = None
+        for descriptor in SoloCommandDescriptor.obtain():
+            if descriptor.is_catch_all():
+                catch_all = descriptor
+            args_map[descriptor.get_name()] = descriptor
+            for alias in descriptor.get_aliases():
+                args_map[alias] = descriptor
+        return args_map, catch_all
+
+    args_map, catch_all = _build_args_map()
 
     args = sys.argv[1:]
     # convert args to unicode, to avoid passing
@@ -299,12 +304,19 @@ def main():
         last_arg = args[-1]
         cmd = args[0]
         args = args[1:]
-    cmd_class = args_map.get(cmd)
-    yell_class = args_map.get("yell")
-
-    if cmd_class is None:
-        cmd_class = catch_all
-
+    cmd_descriptor = args_map.get(cmd)
+    if cmd_descriptor is None or cmd_descriptor.is_catch_all():
+        # the command (or the help output) may need the commands
+        # not listed in the static manifest
+        load_unlisted_commands()
+        args_map, catch_all = _build_args_map()
+        cmd_descriptor = args_map.get(cmd)
+    yell_descriptor = args_map.get("yell")
+
+    if cmd_descriptor is None:
+        cmd_descriptor = catch_all
+
+    cmd_class = cmd_descriptor.get_class()
     cmd_obj = cmd_class(args)
     if is_bashcomp:
         try:
@@ -316,10 +328,10 @@ def main():
     # non-root users not allowed
     allowed = True
     if os.getuid() != 0 and \
-            cmd_class is not catch_all and \
+            cmd_descriptor is not catch_all and \
             not cmd_class.ALLOW_UNPRIVILEGED and \
             "--help" not in args:
-            cmd_class = catch_all
+            cmd_class = catch_all.get_class()
             allowed = False
 
     if allowed:
@@ -332,11 +344,12 @@ def main():
         exit_st = func(*func_args)
         if exit_st == -10:
             # syntax error, yell at user
+            yell_class = yell_descriptor.get_class()
             func, func_args = yell_class(args).parse()
             func(*func_args)
             raise SystemExit(10)
         else:
-            yell_class.reset()
+            yell_descriptor.get_class().reset()
         raise SystemExit(exit_st)
 
     else:
@@ -23,7 +23,7 @@ import tempfile
 
 from entropy.const import etpConst, const_debug_write, \
     const_debug_enabled, const_pid_exists, const_setup_perms, \
-    const_mkdtemp
+    const_setup_file, const_mkdtemp
 from entropy.core import Singleton
 from entropy.misc import TimeScheduled, ParallelTask, Lifo
 import time
@@ -296,6 +296,7 @@ class EntropyCacher(Singleton):
         buffer overloads.
         """
         self.__cacher(run_until_empty = True, sync = True)
+        EntropyCacheStore.flush_all()
 
     def discard(self):
         """
@@ -305,6 +306,24 @@ class EntropyCacher(Singleton):
         """
         self.__cache_buffer.clear()
         self.__stashing_cache.clear()
+        EntropyCacheStore.close_all()
+
+    def store(self, cache_dir = None):
+        """
+        Return the EntropyCacheStore object bound to the given cache
+        directory. Differently from push() and pop(), which store every
+        cache item in its own file, EntropyCacheStore keeps all its items
+        inside a single indexed file and should be used for small and
+        frequently accessed objects.
+
+        @keyword cache_dir: alternative cache directory
+        @type cache_dir: string
+        @return: an EntropyCacheStore instance
+        @rtype: EntropyCacheStore
+        """
+        if cache_dir is None:
+            cache_dir = self.current_directory()
+        return EntropyCacheStore.instance(cache_dir)
 
     def save(self, key, data, cache_dir = None):
         """
@@ -414,6 +433,7 @@ class EntropyCacher(Singleton):
         """
         if cache_dir is None:
             cache_dir = cls.current_directory()
+        EntropyCacheStore.instance(cache_dir).invalidate(cache_item)
         dump_path = os.path.join(cache_dir, cache_item)
 
         dump_dir = os.path.dirname(dump_path)
@@ -433,6 +453,446 @@ class EntropyCacher(Singleton):
                 pass
 
 
+class EntropyCacheStore(object):
+
+    """
+    Single-file, indexed on-disk cache store. Objects are grouped into
+    namespaces, each namespace is bound to a checksum (usually the
+    repository checksum): whenever the checksum changes, the whole
+    namespace is invalidated at once. Writes are buffered in memory and
+    committed to disk in batches, while reads are served from memory
+    whenever possible. The amount of stored entries is bounded, the
+    oldest entries are evicted first.
+    Instances should be obtained through EntropyCacher.store().
+
+    Sample code:
+
+    >>> from entropy.cache import EntropyCacher
+    >>> store = EntropyCacher().store()
+    >>> store.set("match/db/repo", "my_key", "checksum", [1, 2, 3])
+    >>> store.get("match/db/repo", "my_key", "checksum")
+    [1, 2, 3]
+    >>> store.get("match/db/repo", "my_key", "another_checksum")
+    None
+    >>> store.flush()
+
+    """
+
+    # Name of the store file inside the cache directory
+    FILE_NAME = "__cache_store__.db"
+
+    # Max number of entries kept on disk, oldest are evicted first
+    MAX_ENTRIES = 150000
+
+    # Max number of serialized entries kept in RAM
+    MAX_MEMORY_ENTRIES = 25000
+
+    # Number of buffered writes triggering a flush to disk
+    WRITE_BATCH_SIZE = 500
+
+    _STORES = {}
+    _STORES_LOCK = threading.Lock()
+
+    @classmethod
+    def instance(cls, cache_dir):
+        """
+        Return the EntropyCacheStore instance bound to the given cache
+        directory, creating it if needed.
+
+        @param cache_dir: cache directory
+        @type cache_dir: string
+        @return: an EntropyCacheStore instance
+        @rtype: EntropyCacheStore
+        """
+        with cls._STORES_LOCK:
+            store = cls._STORES.get(cache_dir)
+            if store is None:
+                store = cls(cache_dir)
+                cls._STORES[cache_dir] = store
+            return store
+
+    @classmethod
+    def flush_all(cls):
+        """
+        Flush all the buffered writes of all the instantiated stores.
+        """
+        with cls._STORES_LOCK:
+            stores = list(cls._STORES.values())
+        for store in stores:
+            store.flush()
+
+    @classmethod
+    def close_all(cls):
+        """
+        Discard all the buffered writes and close all the instantiated
+        stores. Stores will be transparently reopened on the next access.
+        """
+        with cls._STORES_LOCK:
+            stores = list(cls._STORES.values())
+        for store in stores:
+            store.close()
+
+    def __init__(self, cache_dir):
+        object.__init__(self)
+        self._cache_dir = cache_dir
+        self._path = os.path.join(cache_dir, EntropyCacheStore.FILE_NAME)
+        self._lock = threading.RLock()
+        self._conn = None
+        self._broken = False
+        self._memory = {}
+        self._pending = {}
+        self._checksums = {}
+
+    def _connection(self):
+        """
+        Return the SQLite connection object, opening the store file
+        if needed. Return None if the store is unusable (for example,
+        because of missing privileges).
+        """
+        if self._conn is not None:
+            return self._conn
+        if self._broken:
+            return None
+
+        from sqlite3 import dbapi2
+        try:
+            if not os.path.isdir(self._cache_dir):
+                os.makedirs(self._cache_dir, 0o775)
+                const_setup_perms(self._cache_dir, etpConst['entropygid'])
+            new_file = not os.path.isfile(self._path)
+            conn = dbapi2.connect(self._path, timeout = 30.0,
+                check_same_thread = False)
+            conn.text_factory = str
+            conn.execute("PRAGMA synchronous = OFF")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS namespaces (
+                    namespace VARCHAR PRIMARY KEY,
+                    checksum VARCHAR
+                );
+                CREATE TABLE IF NOT EXISTS entries (
+                    namespace VARCHAR,
+                    key VARCHAR,
+                    checksum VARCHAR,
+                    data BLOB,
+                    PRIMARY KEY (namespace, key)
+                );
+            """)
+            conn.commit()
+            if new_file:
+                const_setup_file(self._path, etpConst['entropygid'], 0o664)
+        except (dbapi2.Error, OSError, IOError) as err:
+            if const_debug_enabled():
+                const_debug_write(__name__,
+                    "EntropyCacheStore: cannot open %s: %s" % (
+                        self._path, repr(err),))
+            self._broken = True
+            return None
+
+        self._conn = conn
+        return conn
+
+    def _namespace_checksum(self, namespace):
+        """
+        Return the checksum currently bound to the given namespace.
+        """
+        if namespace in self._checksums:
+            return self._checksums[namespace]
+
+        checksum = None
+        conn = self._connection()
+        if conn is not None:
+            from sqlite3 import dbapi2
+            try:
+                cur = conn.execute("""
+                SELECT checksum FROM namespaces WHERE namespace = ?
+                """, (namespace,))
+                row = cur.fetchone()
+                if row is not None:
+                    checksum = row[0]
+            except dbapi2.Error:
+                pass
+        self._checksums[namespace] = checksum
+        return checksum
+
+    def _drop_namespace(self, namespace, checksum):
+        """
+        Drop all the in-memory and buffered data of namespace and bind
+        it to the new checksum. On-disk data is removed on the next
+        flush().
+        """
+        for mem_dict in (self._memory, self._pending):
+            for ns_key in list(mem_dict.keys()):
+                if ns_key[0] == namespace:
+                    del mem_dict[ns_key]
+        self._checksums[namespace] = checksum
+        self._pending[(namespace, None)] = checksum
+
+    def get(self, namespace, key, checksum):
+        """
+        Return the object stored under the given namespace and key, if
+        namespace is still bound to checksum.
+
+        @param namespace: cache namespace
+        @type namespace: string
+        @param key: cache item identifier
+        @type key: string
+        @param checksum: checksum the namespace must be bound to
+        @type checksum: string
+        @return: the cached object or None
+        @rtype: any picklable object or None
+        """
+        with self._lock:
+            if self._namespace_checksum(namespace) != checksum:
+                return None
+
+            ns_key = (namespace, key)
+            data = self._pending.get(ns_key)
+            if data is not None:
+                data = data[1]
+            else:
+                data = self._memory.get(ns_key)
+
+            if data is None:
+                conn = self._connection()
+                if conn is None:
+                    return None
+                from sqlite3 import dbapi2
+                try:
+                    cur = conn.execute("""
+                    SELECT data FROM entries
+                    WHERE namespace = ? AND key = ? AND checksum = ?
+                    """, (namespace, key, checksum))
+                    row = cur.fetchone()
+                except dbapi2.Error:
+                    row = None
+                if row is None:
+                    return None
+                data = bytes(row[0])
+                if len(self._memory) >= EntropyCacheStore.MAX_MEMORY_ENTRIES:
+                    self._memory.clear()
+                self._memory[ns_key] = data
+
+        try:
+            return entropy.dump.unserialize_string(data)
+        except (ValueError, EOFError, IOError, OSError,
+                TypeError, AttributeError, ImportError,
+                entropy.dump.pickle.UnpicklingError):
+            return None
+
+    def get_many(self, namespace, keys, checksum):
+        """
+        Return the objects stored under the given namespace and keys, if
+        namespace is still bound to checksum. Entries not in memory are
+        read from disk with a few set-based queries.
+
+        @param namespace: cache namespace
+        @type namespace: string
+        @param keys: list of cache item identifiers
+        @type keys: list
+        @param checksum: checksum the namespace must be bound to
+        @type checksum: string
+        @return: dictionary composed by key => cached object, missing
+            entries are not part of it
+        @rtype: dict
+        """
+        raw = {}
+        with self._lock:
+            if self._namespace_checksum(namespace) != checksum:
+                return {}
+
+            missing = []
+            for key in keys:
+                ns_key = (namespace, key)
+                data = self._pending.get(ns_key)
+                if data is not None:
+                    raw[key] = data[1]
+                    continue
+                data = self._memory.get(ns_key)
+                if data is not None:
+                    raw[key] = data
+                    continue
+                missing.append(key)
+
+            conn = None
+            if missing:
+                conn = self._connection()
+            if conn is not None:
+                from sqlite3 import dbapi2
+                chunk_size = 256
+                for idx in range(0, len(missing), chunk_size):
+                    chunk = missing[idx:idx + chunk_size]
+                    try:
+                        cur = conn.execute("""
+                        SELECT key, data FROM entries
+                        WHERE namespace = ? AND checksum = ? AND key IN (%s)
+                        """ % (", ".join(["?"] * len(chunk)),),
+                        [namespace, checksum] + chunk)
+                        rows = cur.fetchall()
+                    except dbapi2.Error:
+                        break
+                    for key, data in rows:
+                        data = bytes(data)
+                        if len(self._memory) >= \
+                                EntropyCacheStore.MAX_MEMORY_ENTRIES:
+                            self._memory.clear()
+                        self._memory[(namespace, key)] = data
+                        raw[key] = data
+
+        objs = {}
+        for key, data in raw.items():
+            try:
+                objs[key] = entropy.dump.unserialize_string(data)
+            except (ValueError, EOFError, IOError, OSError,
+                    TypeError, AttributeError, ImportError,
+                    entropy.dump.pickle.UnpicklingError):
+                continue
+        return objs
+
+    def set(self, namespace, key, checksum, obj):
+        """
+        Store an object under the given namespace and key. If the
+        namespace is bound to a different checksum, all its entries are
+        invalidated first.
+
+        @param namespace: cache namespace
+        @type namespace: string
+        @param key: cache item identifier
+        @type key: string
+        @param checksum: checksum the namespace is bound to
+        @type checksum: string
+        @param obj: object to store
+        @type obj: any picklable object
+        """
+        try:
+            data = entropy.dump.serialize_string(obj)
+        except (TypeError, AttributeError,
+                entropy.dump.pickle.PicklingError):
+            return
+
+        with self._lock:
+            if self._namespace_checksum(namespace) != checksum:
+                self._drop_namespace(namespace, checksum)
+            ns_key = (namespace, key)
+            self._pending[ns_key] = (checksum, data)
+            self._memory.pop(ns_key, None)
+            flush = len(self._pending) >= EntropyCacheStore.WRITE_BATCH_SIZE
+
+        if flush:
+            self.flush()
+
+    def invalidate(self, namespace_prefix):
+        """
+        Remove all the entries whose namespace starts with the given
+        prefix.
+
+        @param namespace_prefix: namespace prefix
+        @type namespace_prefix: string
+        """
+        with self._lock:
+            for mem_dict in (self._memory, self._pending, self._checksums):
+                for ns_key in list(mem_dict.keys()):
+                    if isinstance(ns_key, tuple):
+                        namespace = ns_key[0]
+                    else:
+                        namespace = ns_key
+                    if namespace.startswith(namespace_prefix):
+                        del mem_dict[ns_key]
+
+            if not os.path.isfile(self._path):
+                return
+            conn = self._connection()
+            if conn is None:
+                return
+            from sqlite3 import dbapi2
+            like_str = namespace_prefix.replace(
+                "\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            try:
+                conn.execute("""
+                DELETE FROM entries WHERE namespace LIKE ? ESCAPE '\\'
+                """, (like_str,))
+                conn.execute("""
+                DELETE FROM namespaces WHERE namespace LIKE ? ESCAPE '\\'
+                """, (like_str,))
+                conn.commit()
+            except dbapi2.Error:
+                pass
+
+    def flush(self):
+        """
+        Write all the buffered entries to disk in one transaction and
+        evict the oldest entries if the store grew too much.
+        """
+        with self._lock:
+            if not self._pending:
+                return
+            conn = self._connection()
+            if conn is None:
+                self._pending.clear()
+                return
+
+            pending = self._pending
+            self._pending = {}
+
+            from sqlite3 import dbapi2
+            try:
+                entries = []
+                for (namespace, key), data in pending.items():
+                    if key is not None:
+                        checksum, data = data
+                        entries.append(
+                            (namespace, key, checksum, dbapi2.Binary(data)))
+                        continue
+                    # namespace (re)binding marker, data is the checksum
+                    conn.execute("""
+                    DELETE FROM entries WHERE namespace = ?
+                    """, (namespace,))
+                    conn.execute("""
+                    INSERT OR REPLACE INTO namespaces VALUES (?, ?)
+                    """, (namespace, data))
+
+                conn.executemany("""
+                INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)
+                """, entries)
+
+                cur = conn.execute("SELECT COUNT(*) FROM entries")
+                count = cur.fetchone()[0]
+                if count > EntropyCacheStore.MAX_ENTRIES:
+                    # rowids grow monotonically, INSERT OR REPLACE
+                    # assigns a new one, so these are the oldest entries.
+                    conn.execute("""
+                    DELETE FROM entries WHERE rowid IN (
+                        SELECT rowid FROM entries ORDER BY rowid LIMIT ?)
+                    """, (count - EntropyCacheStore.MAX_ENTRIES,))
+                conn.commit()
+            except dbapi2.Error as err:
+                if const_debug_enabled():
+                    const_debug_write(__name__,
+                        "EntropyCacheStore.flush: %s" % (repr(err),))
+                try:
+                    conn.rollback()
+                except dbapi2.Error:
+                    pass
+                # namespace bindings are no longer reliable
+                self._checksums.clear()
+                self._memory.clear()
+
+    def close(self):
+        """
+        Discard all the buffered writes and close the store file.
+        """
+        with self._lock:
+            self._pending.clear()
+            self._memory.clear()
+            self._checksums.clear()
+            self._broken = False
+            if self._conn is not None:
+                try:
+                    self._conn.close()
+                except Exception:
+                    pass
+                self._conn = None
+
+
 class MtimePingus(object):
 
     """
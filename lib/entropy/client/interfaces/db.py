@@ -9,19 +9,23 @@
     B{Entropy Package Manager Client EntropyRepository plugin code}.
 
 """
+import array
 import codecs
 import errno
 import os
 import shutil
-import subprocess
 import sys
 import threading
 import time
+try:
+    from Queue import Queue, Empty, Full
+except ImportError:
+    from queue import Queue, Empty, Full
 
 from entropy.const import const_debug_write, const_setup_perms, etpConst, \
     const_set_nice_level, const_setup_file, const_convert_to_unicode, \
     const_debug_enabled, const_mkdtemp, const_mkstemp, const_file_readable, \
-    const_file_writable
+    const_file_writable, const_is_python3
 from entropy.output import blue, darkred, red, darkgreen, purple, teal, brown, \
     bold, TextInterface
 from entropy.dump import dumpobj, loadobj
@@ -174,7 +178,7 @@ class AvailablePackagesRepositoryUpdater(object):
         self._supported_download_items = (
             "db", "dbck", "dblight", "ck", "cklight", "compck",
             "lock", "dbdump", "dbdumplight", "dbdumplightck", "dbdumpck",
-            "meta_file", "meta_file_gpg", "notice_board"
+            "meta_file", "meta_file_gpg", "notice_board", "deltas"
         )
         self._developer_repo = \
             self._settings['repositories']['developer_repo']
@@ -303,6 +307,10 @@ class AvailablePackagesRepositoryUpdater(object):
         return upd_rc
 
     def __eapi2_inject_downloaded_dump(self, dumpfile, dbfile, cmethod):
+        """
+        Import the downloaded compressed dump into dbfile, decompressing
+        it on the fly.
+        """
 
         # load the dump into database
         mytxt = "%s %s, %s %s" % (
@@ -319,16 +327,23 @@ class AvailablePackagesRepositoryUpdater(object):
         )
         dbconn = self._entropy.open_generic_repository(dbfile,
             xcache = False, indexing_override = False)
-        rc = dbconn.importRepository(dumpfile, dbfile)
-        dbconn.close()
+        try:
+            dump_f = cmethod[0](dumpfile, "rb")
+        except (IOError, OSError) as err:
+            const_debug_write(__name__,
+                "__eapi2_inject_downloaded_dump: error: %s" % (err,))
+            dbconn.close()
+            return 1
+        try:
+            rc = dbconn.importRepository(dump_f, dbfile)
+        finally:
+            dump_f.close()
+            dbconn.close()
         return rc
 
     def __get_repo_eapi(self):
 
         eapi_env = os.getenv("FORCE_EAPI")
-        sqlite3_access = os.path.lexists("/usr/bin/sqlite3")
-        sqlite3_rc = subprocess.call("/usr/bin/sqlite3 -version > /dev/null",
-            shell = True)
         try:
             eapi_env_clear = int(eapi_env)
             if eapi_env_clear not in self._supported_apis:
@@ -340,11 +355,8 @@ class AvailablePackagesRepositoryUpdater(object):
         eapi_avail = self.__check_webserv_availability()
         if eapi_avail:
             repo_eapi = 3
-        else:
-            if not sqlite3_access or entropy.tools.islive():
-                repo_eapi = 1
-            elif sqlite3_rc != 0:
-                repo_eapi = 1
+        elif entropy.tools.islive():
+            repo_eapi = 1
 
         # if differential update is disabled and FORCE_EAPI is not overriding
         # we cannot use EAPI=3
@@ -429,10 +441,16 @@ class AvailablePackagesRepositoryUpdater(object):
 
             if uri_revision != -1:
 
+                cformat = self._negotiate_database_format(repo_uri,
+                    uri_meta['dbcformat'],
+                    http_basic_user = basic_user,
+                    http_basic_pwd = basic_pwd,
+                    https_validate_cert = https_validate_cert)
+
                 mytxt = "%s: %s [%s]" % (
                     darkgreen(_("Selected URL")),
                     teal(uri_meta['uri']),
-                    brown(uri_meta['dbcformat']),)
+                    brown(cformat),)
                 self._entropy.output(
                     mytxt,
                     importance = 1,
@@ -442,7 +460,6 @@ class AvailablePackagesRepositoryUpdater(object):
 
                 revision = uri_revision
                 uri = repo_uri
-                cformat = uri_meta['dbcformat']
                 break
 
         if uri is not None:
@@ -500,7 +517,12 @@ class AvailablePackagesRepositoryUpdater(object):
                     "%s" % (url,),
                     importance = 1, level = "warning", header = "\t",
                     )
-                return revision, url, default_cformat
+                cformat = self._negotiate_database_format(url,
+                    default_cformat,
+                    http_basic_user = basic_user,
+                    http_basic_pwd = basic_pwd,
+                    https_validate_cert = https_validate_cert)
+                return revision, url, cformat
 
         self._entropy.output(
             "%s" % (
@@ -907,6 +929,7 @@ class AvailablePackagesRepositoryUpdater(object):
         meta_file_gpg = etpConst['etpdatabasemetafilesfile'] + \
             etpConst['etpgpgextension']
         md5_ext = etpConst['packagesmd5fileext']
+        deltas_file = etpConst['etpdatabasedeltasfile']
         ec_cm2 = None
         ec_cm3 = None
         ec_cm4 = None
@@ -982,6 +1005,10 @@ class AvailablePackagesRepositoryUpdater(object):
                 "%s/%s" % (uri, meta_file_gpg,),
                 "%s/%s" % (repo_dbpath, meta_file_gpg,),
             ),
+            'deltas': (
+                "%s/%s" % (uri, deltas_file,),
+                "%s/%s" % (repo_dbpath, deltas_file,),
+            ),
         }
 
         url, path = mymap.get(item)
@@ -994,6 +1021,18 @@ class AvailablePackagesRepositoryUpdater(object):
     def _download_item(self, uri, item, cmethod = None,
                        disallow_redirect = True, get_signature = False):
 
+        url, filepath = self._construct_paths(
+            uri, item, cmethod, get_signature = get_signature)
+        return self._download_file(url, filepath,
+            disallow_redirect = disallow_redirect)
+
+    def _download_file(self, url, filepath, disallow_redirect = True):
+        """
+        Download the given repository file URL to filepath.
+
+        @return: True, if the download succeeded
+        @rtype: bool
+        """
         my_repos = self._settings['repositories']
         avail_data = my_repos['available']
         repo_data = avail_data[self._repository_id]
@@ -1002,9 +1041,6 @@ class AvailablePackagesRepositoryUpdater(object):
         basic_pwd = repo_data.get('password')
         https_validate_cert = not repo_data.get('https_validate_cert') == "false"
 
-        url, filepath = self._construct_paths(
-            uri, item, cmethod, get_signature = get_signature)
-
         # See bug #3495, download the file to
         # a temporary location and then move it
         # if we are successful
@@ -1600,6 +1636,205 @@ class AvailablePackagesRepositoryUpdater(object):
 
         return gpg_rc
 
+    def _delta_database_sync(self, uri, revision):
+        """
+        Update the local repository database to the given remote revision
+        by applying the chain of revision-to-revision deltas published on
+        the mirror, starting from the local repository revision.
+        The deltas are applied to a copy of the repository, which replaces
+        the current one only if the whole chain has been applied and
+        verified. Return False if the delta chain is not available or
+        broken, in which case the repository must be downloaded in full.
+
+        @param uri: repository mirror URI
+        @type uri: string
+        @param revision: remote repository revision
+        @type revision: int
+        @return: True, if the repository has been updated
+        @rtype: bool
+        """
+        local_revision = AvailablePackagesRepository.revision(
+            self._repository_id)
+        if local_revision == -1 or local_revision >= revision:
+            return False
+
+        garbage, deltas_path = self._construct_paths(uri, "deltas", None)
+        try:
+            if not self._download_item(uri, "deltas", disallow_redirect = True):
+                return False
+            deltas = entropy.tools.read_repository_deltas(deltas_path)
+        finally:
+            try:
+                os.remove(deltas_path)
+            except OSError:
+                pass
+
+        deltas_map = dict((x[0], x) for x in deltas)
+        chain = []
+        current = local_revision
+        while current != revision:
+            delta = deltas_map.get(current)
+            if delta is None or delta[1] <= current:
+                const_debug_write(__name__,
+                    "_delta_database_sync: chain broken at %s" % (current,))
+                return False
+            chain.append(delta)
+            current = delta[1]
+
+        repo_data = self._settings['repositories']['available'][
+            self._repository_id]
+        dbfile = os.path.join(repo_data['dbpath'],
+            etpConst['etpdatabasefile'])
+        delta_dbfile = dbfile + ".delta"
+        status = False
+        try:
+            shutil.copy2(dbfile, delta_dbfile)
+            repo_db = self._entropy.open_generic_repository(delta_dbfile,
+                xcache = False, indexing_override = False)
+            try:
+                for count, delta in enumerate(chain, 1):
+                    status = self.__apply_repository_delta(
+                        repo_db, uri, delta, (count, len(chain)))
+                    if not status:
+                        break
+            except (DatabaseError, IntegrityError, OperationalError,):
+                entropy.tools.print_traceback()
+                status = False
+            finally:
+                repo_db.close()
+
+            if status:
+                os.rename(delta_dbfile, dbfile)
+        except (OSError, IOError, shutil.Error) as err:
+            const_debug_write(__name__,
+                "_delta_database_sync: error: %s" % (err,))
+            status = False
+        finally:
+            try:
+                os.remove(delta_dbfile)
+            except OSError:
+                pass
+
+        if not status:
+            self._entropy.output(
+                "%s: %s" % (
+                    blue(_("Repository deltas")),
+                    darkred(_("cannot be applied, downloading "
+                              "the whole repository")),
+                ),
+                importance = 0,
+                level = "info",
+                header = blue("  # "),
+            )
+        return status
+
+    def __apply_repository_delta(self, repo_db, uri, delta, count):
+        """
+        Download the given repository delta and apply it to repo_db,
+        then verify the result against the checksum shipped with it.
+        """
+        from_rev, to_rev, delta_name, delta_md5 = delta
+
+        mytxt = "%s %s %s" % (
+            red(_("Downloading repository delta")),
+            darkgreen(delta_name),
+            red("..."),
+        )
+        self._entropy.output(
+            mytxt, importance = 0, level = "info",
+            header = "\t", back = True, count = count
+        )
+
+        tmp_dir = const_mkdtemp(prefix="entropy.client._apply_delta")
+        delta_path = os.path.join(tmp_dir, delta_name)
+        try:
+            downloaded = self._download_file(
+                "%s/%s" % (uri, delta_name,), delta_path)
+            if not downloaded:
+                return False
+            if not entropy.tools.compare_md5(delta_path, delta_md5):
+                const_debug_write(__name__,
+                    "__apply_repository_delta: bad md5 for %s" % (
+                        delta_name,))
+                return False
+            if not entropy.tools.universal_uncompress(delta_path, tmp_dir):
+                return False
+
+            meta = {'removed': []}
+            meta_path = os.path.join(tmp_dir,
+                etpConst['etpdatabasedeltametafile'])
+            enc = etpConst['conf_encoding']
+            for line in entropy.tools.generic_file_content_parser(
+                    meta_path, encoding = enc):
+                key, value = (line.split(None, 1) + [""])[:2]
+                if key == "removed":
+                    try:
+                        meta['removed'].append(int(value))
+                    except ValueError:
+                        return False
+                else:
+                    meta[key] = value
+            if meta.get('from') != str(from_rev) or \
+                    meta.get('to') != str(to_rev):
+                return False
+
+            delta_repo = self._entropy.open_generic_repository(
+                os.path.join(tmp_dir, etpConst['etpdatabasefile']),
+                xcache = False, read_only = True, indexing_override = False)
+            try:
+                added_ids = delta_repo.listAllPackageIds()
+                for package_id in meta['removed']:
+                    repo_db.removePackage(package_id)
+
+                for package_id in added_ids:
+                    pkg_data = delta_repo.getPackageData(package_id,
+                        get_content = False, content_insert_formatted = True,
+                        get_changelog = False, get_content_safety = False)
+                    if repo_db.isPackageIdAvailable(package_id):
+                        repo_db.removePackage(package_id)
+                    repo_db.addPackage(pkg_data,
+                        revision = pkg_data['revision'],
+                        package_id = package_id, formatted_content = True)
+
+                repo_db.setRepositoryUpdatesDigest(self._repository_id,
+                    delta_repo.retrieveRepositoryUpdatesDigest(
+                        self._repository_id))
+                repo_db.bumpTreeUpdatesActions(
+                    delta_repo.listAllTreeUpdatesActions())
+                repo_db.clearPackageSets()
+                repo_db.insertPackageSets(delta_repo.retrievePackageSets())
+            finally:
+                delta_repo.close()
+
+            repo_db.commit()
+            repo_db.clearCache()
+            checksum = repo_db.checksum(do_order = True,
+                strict = False, include_signatures = True)
+            if checksum != meta.get('checksum'):
+                self._entropy.output(
+                    "%s: %s" % (
+                        blue(_("Repository checksum doesn't match remote")),
+                        darkgreen(delta_name),
+                    ),
+                    importance = 0, level = "info", header = "\t",
+                )
+                return False
+
+            self._entropy.output(
+                "%s %s: %s %s, %s %s" % (
+                    darkgreen(_("Applied repository delta")),
+                    blue(delta_name),
+                    bold(str(len(added_ids))), _("added"),
+                    bold(str(len(meta['removed']))), _("removed"),
+                ),
+                importance = 0, level = "info", header = "\t",
+                count = count
+            )
+            return True
+
+        finally:
+            shutil.rmtree(tmp_dir, True)
+
     def _webservice_database_sync(self):
         """
         Update the local repository database through the webservice
@@ -1613,6 +1848,9 @@ class AvailablePackagesRepositoryUpdater(object):
             return self.__handle_webserv_database_sync(repo_db)
         except (DatabaseError, IntegrityError, OperationalError,
             AttributeError,):
+            if repo_db is not None:
+                # do not commit a partially synced repository
+                repo_db.rollback()
             return False
         finally:
             if repo_db is not None:
@@ -1621,6 +1859,64 @@ class AvailablePackagesRepositoryUpdater(object):
 
         return False
 
+    def __webserv_fetch_segments(self, webserv, segments, max_threads):
+        """
+        Fetch the metadata of the given package identifier segments
+        through the Web Service, using up to max_threads parallel requests.
+        This is a generator yielding (segment, metadata, error) tuples,
+        in completion order. Fetched segments are queued in a bounded
+        queue, so at most max_threads of them are waiting to be consumed.
+        """
+        segments_q = Queue()
+        for segment in segments:
+            segments_q.put(segment)
+        results_q = Queue(max_threads)
+        stop = threading.Event()
+
+        def _fetch():
+            while not stop.is_set():
+                try:
+                    segment = segments_q.get_nowait()
+                except Empty:
+                    return
+
+                pkg_meta, error = None, None
+                try:
+                    pkg_meta = webserv.get_packages_metadata(segment)
+                except Exception as err:
+                    error = err
+
+                while not stop.is_set():
+                    try:
+                        results_q.put((segment, pkg_meta, error),
+                                      timeout = 1.0)
+                        break
+                    except Full:
+                        continue
+
+        threads = []
+        for _idx in range(min(max_threads, len(segments))):
+            th = ParallelTask(_fetch)
+            th.name = "WebServiceFetchSegments"
+            th.daemon = True
+            th.start()
+            threads.append(th)
+
+        try:
+            for _idx in range(len(segments)):
+                while True:
+                    # use a timeout, to keep KeyboardInterrupt working
+                    try:
+                        item = results_q.get(timeout = 1.0)
+                        break
+                    except Empty:
+                        continue
+                yield item
+        finally:
+            stop.set()
+            for th in threads:
+                th.join()
+
     def __handle_webserv_database_sync(self, mydbconn):
 
         try:
@@ -1660,127 +1956,6 @@ class AvailablePackagesRepositoryUpdater(object):
             )
             return False
 
-        count = 0
-        chunk_size = RepositoryWebService.MAXIMUM_PACKAGE_REQUEST_SIZE
-        added_segments = []
-        mytmp = []
-
-        for package_id in added_ids:
-            count += 1
-            mytmp.append(package_id)
-            if count % chunk_size == 0:
-                added_segments.append(mytmp[:])
-                del mytmp[:]
-        if mytmp:
-            added_segments.append(mytmp[:])
-
-        def _do_fetch(fetch_sts_map, segment, count, maxcount):
-            try:
-                try:
-                    pkg_meta = webserv.get_packages_metadata(segment)
-                except WebService.WebServiceException as err:
-                    const_debug_write(__name__,
-                        "__handle_webserv_database_sync: error: %s" % (err,))
-                    mytxt = "%s: %s" % (
-                        blue(_("Web Service communication error")),
-                        err,
-                    )
-                    self._entropy.output(
-                        mytxt, importance = 1, level = "info",
-                        header = "\t", count = (count, maxcount,)
-                    )
-                    fetch_sts_map['error'] = True
-                    return
-                except KeyboardInterrupt:
-                    const_debug_write(__name__,
-                        "__handle_webserv_database_sync: keyboard interrupt")
-                    fetch_sts_map['error'] = True
-                    return
-
-                if not pkg_meta:
-                    const_debug_write(__name__,
-                        "__handle_webserv_database_sync: empty data: %s" % (
-                            pkg_meta,))
-                    self._entropy.output(
-                        _("Web Service data error"), importance = 1,
-                        level = "info", header = "\t",
-                        count = (count, maxcount,)
-                    )
-                    fetch_sts_map['error'] = True
-                    return
-
-                try:
-                    for package_id, pkg_data in pkg_meta.items():
-                        dumpobj(
-                            "%s%s" % (self.WEBSERV_CACHE_ID, package_id,),
-                            pkg_data,
-                            ignore_exceptions = False
-                        )
-                except (IOError, EOFError, OSError,) as e:
-                    mytxt = "%s: %s: %s." % (
-                        blue(_("Local status")),
-                        darkred("Error storing data"),
-                        e,
-                    )
-                    self._entropy.output(
-                        mytxt, importance = 1, level = "info",
-                        header = "\t", count = (count, maxcount,)
-                    )
-                    fetch_sts_map['error'] = True
-                    return
-
-                return
-            finally:
-                fetch_sts_map['sem'].release()
-
-        # do not exagerate or you're going to need a way to block
-        # further requests as long as some threads are still running
-        # to avoid timeout errors
-        max_threads = 4
-        fetch_sts_map = {
-            'sem': threading.Semaphore(max_threads),
-            'error': False,
-        }
-
-        # fetch and store
-        count = 0
-        maxcount = len(added_segments)
-        product = self._settings['repositories']['product']
-        segment = None
-        threads = []
-        for segment in added_segments:
-            count += 1
-            mytxt = "%s %s" % (blue(_("Fetching segments")), "...",)
-            self._entropy.output(
-                mytxt, importance = 0, level = "info",
-                header = "\t", back = True, count = (count, maxcount,)
-            )
-            fetch_sts_map['sem'].acquire()
-            if len(threads) >= max_threads:
-                const_debug_write(__name__,
-                    purple("joining all the parallel threads"))
-                # give them the chance to complete
-                # since long delays on socket could cause timeouts
-                for th in threads:
-                    th.join()
-                const_debug_write(__name__, purple("parallel threads joined"))
-                del threads[:]
-            if fetch_sts_map['error']:
-                return None
-            th = ParallelTask(_do_fetch, fetch_sts_map, segment, count,
-                maxcount)
-            th.daemon = True
-            th.start()
-            threads.append(th)
-
-        for th in threads:
-            th.join()
-
-        if fetch_sts_map['error']:
-            return None
-
-        del added_segments
-
         # get repository metadata
         repo_metadata = self.__get_webserv_repository_metadata()
         # this gives us the "checksum" data too
@@ -1814,6 +1989,7 @@ class AvailablePackagesRepositoryUpdater(object):
                 level = "info",
                 header = blue("  # "),
             )
+            mydbconn.rollback()
             return None
 
         # update package sets
@@ -1831,46 +2007,101 @@ class AvailablePackagesRepositoryUpdater(object):
                 level = "info",
                 header = blue("  # "),
             )
+            mydbconn.rollback()
             return None
 
-        # now that we have all stored, add
-        for package_id in added_ids:
-            mydata = self._cacher.pop("%s%s" % (self.WEBSERV_CACHE_ID,
-                package_id,))
-            if mydata is None:
-                mytxt = "%s: %s" % (
-                    blue(_("Fetch error on segment while adding")),
-                    darkred(str(segment)),
-                )
+        chunk_size = RepositoryWebService.MAXIMUM_PACKAGE_REQUEST_SIZE
+        added_segments = [added_ids[x:x + chunk_size] for x in \
+                              range(0, len(added_ids), chunk_size)]
+
+        # fetch and add packages as soon as segments arrive, this way
+        # at most max_threads segments are kept in memory.
+        # do not exagerate or you're going to need a way to block
+        # further requests as long as some threads are still running
+        # to avoid timeout errors
+        max_threads = 4
+        count = 0
+        maxcount = len(added_segments)
+        fetcher = self.__webserv_fetch_segments(
+            webserv, added_segments, max_threads)
+        try:
+            for segment, pkg_meta, error in fetcher:
+                count += 1
+                mytxt = "%s %s" % (blue(_("Fetching segments")), "...",)
                 self._entropy.output(
-                    mytxt, importance = 1, level = "warning",
-                    header = "  "
+                    mytxt, importance = 0, level = "info",
+                    header = "\t", back = True, count = (count, maxcount,)
                 )
-                return False
 
-            mytxt = "%s %s" % (
-                darkgreen("++"),
-                teal(mydata['atom']),
-            )
-            self._entropy.output(
-                mytxt, importance = 0, level = "info",
-                header = "  ")
-            try:
-                mydbconn.addPackage(
-                    mydata, revision = mydata['revision'],
-                    package_id = package_id,
-                    formatted_content = True
-                )
-            except (Error,) as err:
-                if const_debug_enabled():
-                    entropy.tools.print_traceback()
-                self._entropy.output("%s: %s" % (
-                    blue(_("repository error while adding packages")),
-                    err,),
-                    importance = 1, level = "warning",
-                    header = "  "
-                )
-                return False
+                if error is not None:
+                    const_debug_write(__name__,
+                        "__handle_webserv_database_sync: error: %s" % (
+                            error,))
+                    mytxt = "%s: %s" % (
+                        blue(_("Web Service communication error")),
+                        error,
+                    )
+                    self._entropy.output(
+                        mytxt, importance = 1, level = "info",
+                        header = "\t", count = (count, maxcount,)
+                    )
+                    mydbconn.rollback()
+                    return None
+
+                if not pkg_meta:
+                    const_debug_write(__name__,
+                        "__handle_webserv_database_sync: empty data: %s" % (
+                            pkg_meta,))
+                    self._entropy.output(
+                        _("Web Service data error"), importance = 1,
+                        level = "info", header = "\t",
+                        count = (count, maxcount,)
+                    )
+                    mydbconn.rollback()
+                    return None
+
+                for package_id in segment:
+                    mydata = pkg_meta.pop(package_id, None)
+                    if mydata is None:
+                        mytxt = "%s: %s" % (
+                            blue(_("Fetch error on segment while adding")),
+                            darkred(str(segment)),
+                        )
+                        self._entropy.output(
+                            mytxt, importance = 1, level = "warning",
+                            header = "  "
+                        )
+                        mydbconn.rollback()
+                        return False
+
+                    mytxt = "%s %s" % (
+                        darkgreen("++"),
+                        teal(mydata['atom']),
+                    )
+                    self._entropy.output(
+                        mytxt, importance = 0, level = "info",
+                        header = "  ")
+                    try:
+                        mydbconn.addPackage(
+                            mydata, revision = mydata['revision'],
+                            package_id = package_id,
+                            formatted_content = True
+                        )
+                    except (Error,) as err:
+                        if const_debug_enabled():
+                            entropy.tools.print_traceback()
+                        self._entropy.output("%s: %s" % (
+                            blue(_("repository error while adding packages")),
+                            err,),
+                            importance = 1, level = "warning",
+                            header = "  "
+                        )
+                        mydbconn.rollback()
+                        return False
+        finally:
+            fetcher.close()
+
+        del added_segments
 
         # now remove
         # preload atoms names to improve speed during removePackage
@@ -1892,6 +2123,7 @@ class AvailablePackagesRepositoryUpdater(object):
                     importance = 1, level = "warning",
                     header = "  "
                 )
+                mydbconn.rollback()
                 return False
 
         mydbconn.commit()
@@ -1969,21 +2201,18 @@ class AvailablePackagesRepositoryUpdater(object):
         # otherwise, fallback to previous EAPI
         self._repo_eapi -= 1
 
-    def _remote_revision(self, uri, http_basic_user = None,
-                         http_basic_pwd = None,
-                         https_validate_cert = True):
+    def _remote_file_lines(self, url, http_basic_user = None,
+                           http_basic_pwd = None,
+                           https_validate_cert = True):
         """
-        Return the remote repository revision by downloading
-        the revision file from the given uri.
+        Download the (small) text file at the given url and return its
+        stripped lines, or None if it cannot be fetched.
         """
-        sep = const_convert_to_unicode("/")
-        url = uri + sep + etpConst['etpdatabaserevisionfile']
-
         tmp_fd, tmp_path = None, None
-        rev = "-1"
+        lines = None
         try:
             tmp_fd, tmp_path = const_mkstemp(
-                prefix = "AvailableEntropyRepository.remote_revision")
+                prefix = "AvailableEntropyRepository.remote_file_lines")
             fetcher = self._entropy._url_fetcher(
                 url, tmp_path, resume = False,
                 http_basic_user = http_basic_user,
@@ -1992,7 +2221,7 @@ class AvailablePackagesRepositoryUpdater(object):
             fetch_rc = fetcher.download()
             if fetch_rc not in self.FETCH_ERRORS:
                 with codecs.open(tmp_path, "r") as tmp_f:
-                    rev = tmp_f.readline().strip()
+                    lines = [x.strip() for x in tmp_f.readlines()]
         except (IOError, OSError):
             # ignore any errors, especially read ones
             pass
@@ -2008,6 +2237,26 @@ class AvailablePackagesRepositoryUpdater(object):
                 except OSError:
                     pass
 
+        return lines
+
+    def _remote_revision(self, uri, http_basic_user = None,
+                         http_basic_pwd = None,
+                         https_validate_cert = True):
+        """
+        Return the remote repository revision by downloading
+        the revision file from the given uri.
+        """
+        sep = const_convert_to_unicode("/")
+        url = uri + sep + etpConst['etpdatabaserevisionfile']
+
+        lines = self._remote_file_lines(url,
+            http_basic_user = http_basic_user,
+            http_basic_pwd = http_basic_pwd,
+            https_validate_cert = https_validate_cert)
+        rev = "-1"
+        if lines:
+            rev = lines[0]
+
         # try to convert rev into integer now
         try:
             rev = int(rev)
@@ -2017,6 +2266,35 @@ class AvailablePackagesRepositoryUpdater(object):
 
         return rev
 
+    def _negotiate_database_format(self, uri, cformat,
+                                   http_basic_user = None,
+                                   http_basic_pwd = None,
+                                   https_validate_cert = True):
+        """
+        Return the compressed repository format to download from uri.
+        The given cformat is kept if the repository publishes it, or if
+        it does not publish its formats list at all (older servers).
+        Otherwise, the first published format supported locally is used.
+        """
+        sep = const_convert_to_unicode("/")
+        url = uri + sep + etpConst['etpdatabaseformatsfile']
+
+        formats = self._remote_file_lines(url,
+            http_basic_user = http_basic_user,
+            http_basic_pwd = http_basic_pwd,
+            https_validate_cert = https_validate_cert)
+        if not formats or cformat in formats:
+            return cformat
+
+        supported_formats = etpConst['etpdatabasesupportedcformats']
+        for remote_format in formats:
+            if remote_format in supported_formats:
+                const_debug_write(__name__,
+                    "_negotiate_database_format: %s, using %s over %s" % (
+                        uri, remote_format, cformat))
+                return remote_format
+        return cformat
+
     def update(self):
 
         # disallow unprivileged update
@@ -2073,13 +2351,12 @@ class AvailablePackagesRepositoryUpdater(object):
         repo_data = avail_data[self._repository_id]
 
         # some variables
-        dumpfile = os.path.join(repo_data['dbpath'],
-            etpConst['etpdatabasedumplight'])
         dbfile = os.path.join(repo_data['dbpath'],
             etpConst['etpdatabasefile'])
         dbfile_old = dbfile+".sync"
         cmethod = etpConst['etpdatabasecompressclasses'].get(
             cformat)
+        delta_synced = False
 
         while True:
 
@@ -2088,6 +2365,15 @@ class AvailablePackagesRepositoryUpdater(object):
             db_checksum_down_status = False
             if self._repo_eapi < 3:
 
+                # deltas do not carry the content metadata required by
+                # developer repositories
+                if self._differential_update and not self.__force and \
+                        not self._developer_repo and \
+                        const_file_writable(dbfile):
+                    delta_synced = self._delta_database_sync(uri, revision)
+                    if delta_synced:
+                        break
+
                 down_status, sig_down_status, downloaded_db_item = \
                     self.__database_download(uri, cmethod)
                 if not down_status:
@@ -2154,7 +2440,7 @@ class AvailablePackagesRepositoryUpdater(object):
 
         # Now we can unpack
         files_to_remove = []
-        if self._repo_eapi in (1, 2,):
+        if self._repo_eapi in (1, 2,) and not delta_synced:
 
             # if do_db_update_transfer == False and not None
             if (do_db_update_transfer is not None) and not \
@@ -2168,13 +2454,18 @@ class AvailablePackagesRepositoryUpdater(object):
                         __name__, "rename failed: %s" % (err,))
                     do_db_update_transfer = False
 
-            unpack_status, unpacked_item = \
-                self._downloaded_database_unpack(uri, cmethod)
+            if self._repo_eapi == 2:
+                # the compressed dump is streamed straight into
+                # the repository, no need to unpack it
+                unpacked_item = "dbdumplight"
+            else:
+                unpack_status, unpacked_item = \
+                    self._downloaded_database_unpack(uri, cmethod)
 
-            if not unpack_status:
-                # delete all
-                self.__remove_repository_files()
-                return EntropyRepositoryBase.REPOSITORY_GENERIC_ERROR
+                if not unpack_status:
+                    # delete all
+                    self.__remove_repository_files()
+                    return EntropyRepositoryBase.REPOSITORY_GENERIC_ERROR
 
             unpack_url, unpack_path = self._construct_paths(
                 uri, unpacked_item, cmethod)
@@ -2189,16 +2480,12 @@ class AvailablePackagesRepositoryUpdater(object):
                 os.remove(dbfile)
 
             if self._repo_eapi == 2:
-                rc = self.__eapi2_inject_downloaded_dump(dumpfile,
+                rc = self.__eapi2_inject_downloaded_dump(unpack_path,
                     dbfile, cmethod)
 
             if do_db_update_transfer:
                 self.__eapi1_eapi2_databases_alignment(dbfile, dbfile_old)
 
-            if self._repo_eapi == 2:
-                # remove the dump
-                files_to_remove.append(dumpfile)
-
         if rc != 0:
             # delete all
             self.__remove_repository_files()
@@ -2272,6 +2559,7 @@ class MaskableRepository(EntropyRepositoryBase):
 
     _real_client_settings = None
     _real_client_settings_lock = threading.Lock()
+    _mask_filter_bitmap_lock = threading.Lock()
 
     def __init__(self, *args, **kwargs):
         super(MaskableRepository, self).__init__(*args, **kwargs)
@@ -2298,26 +2586,6 @@ class MaskableRepository(EntropyRepositoryBase):
         from entropy.client.interfaces import Client
         return Client()._settings_client_plugin
 
-    def _mask_filter_fetch_cache(self, package_id):
-        if self._caching:
-            return loadobj(
-                "MaskableRepositoryFilter/%s_%s/%s" % (
-                    self.name,
-                    self.atomMatchCacheKey(),
-                    package_id,
-                    )
-                )
-
-    def _mask_filter_store_cache(self, package_id, value):
-        if self._caching:
-            dumpobj(
-                "MaskableRepositoryFilter/%s_%s/%s" % (
-                    self.name,
-                    self.atomMatchCacheKey(),
-                    package_id,
-                    ),
-                value)
-
     def _maskFilter_live(self, package_id):
 
         ref = self._settings['pkg_masking_reference']
@@ -2332,8 +2600,11 @@ class MaskableRepository(EntropyRepositoryBase):
 
             return package_id, ref['user_live_unmask']
 
-    def _maskFilter_user_package_mask(self, package_id, live):
-
+    def _maskFilter_user_package_mask_ids(self):
+        """
+        Return the set of package identifiers masked by user
+        (package.mask).
+        """
         with self._settings['mask']:
             # thread-safe in here
             cache_obj = self._settings['mask'].get()
@@ -2360,6 +2631,12 @@ class MaskableRepository(EntropyRepositoryBase):
 
             cache_obj[self.name] = user_package_mask_ids
 
+        return user_package_mask_ids
+
+    def _maskFilter_user_package_mask(self, package_id, live):
+
+        user_package_mask_ids = self._maskFilter_user_package_mask_ids()
+
         if package_id in user_package_mask_ids:
             # sorry, masked
             ref = self._settings['pkg_masking_reference']
@@ -2374,8 +2651,11 @@ class MaskableRepository(EntropyRepositoryBase):
 
             return -1, myr
 
-    def _maskFilter_user_package_unmask(self, package_id, live):
-
+    def _maskFilter_user_package_unmask_ids(self):
+        """
+        Return the set of package identifiers unmasked by user
+        (package.unmask).
+        """
         with self._settings['unmask']:
             # thread-safe in here
             cache_obj = self._settings['unmask'].get()
@@ -2401,6 +2681,12 @@ class MaskableRepository(EntropyRepositoryBase):
 
             cache_obj[self.name] = user_package_unmask_ids
 
+        return user_package_unmask_ids
+
+    def _maskFilter_user_package_unmask(self, package_id, live):
+
+        user_package_unmask_ids = self._maskFilter_user_package_unmask_ids()
+
         if package_id in user_package_unmask_ids:
 
             ref = self._settings['pkg_masking_reference']
@@ -2415,58 +2701,81 @@ class MaskableRepository(EntropyRepositoryBase):
 
             return package_id, myr
 
-    def _maskFilter_packages_db_mask(self, package_id, live):
-
-        # check if repository packages.db.mask needs it masked
+    def _maskFilter_packages_db_mask_ids(self):
+        """
+        Return the set of package identifiers masked by the repository
+        packages.db.mask file, or None if there is no such file.
+        """
         repos_mask = {}
         clset = self._client_settings
         if clset:
             repos_mask = clset['repositories']['mask']
 
         repomask = repos_mask.get(self.name)
-        if isinstance(repomask, (list, set, frozenset)):
+        if not isinstance(repomask, (list, set, frozenset)):
+            return None
 
-            # first, seek into generic masking, all branches
-            # (below) avoid issues with repository names
-            mask_repo_id = "%s_ids@@:of:%s" % (self.name, self.name,)
-            repomask_ids = repos_mask.get(mask_repo_id)
+        # first, seek into generic masking, all branches
+        # (below) avoid issues with repository names
+        mask_repo_id = "%s_ids@@:of:%s" % (self.name, self.name,)
+        repomask_ids = repos_mask.get(mask_repo_id)
 
-            if not isinstance(repomask_ids, set):
-                repomask_ids = set()
-                for atom in repomask:
-                    matches, r = self.atomMatch(atom, multiMatch = True,
-                        maskFilter = False)
-                    if r != 0:
-                        continue
-                    repomask_ids |= set(matches)
-                repos_mask[mask_repo_id] = repomask_ids
+        if not isinstance(repomask_ids, set):
+            repomask_ids = set()
+            for atom in repomask:
+                matches, r = self.atomMatch(atom, multiMatch = True,
+                    maskFilter = False)
+                if r != 0:
+                    continue
+                repomask_ids |= set(matches)
+            repos_mask[mask_repo_id] = repomask_ids
 
-            if package_id in repomask_ids:
+        return repomask_ids
 
-                ref = self._settings['pkg_masking_reference']
-                myr = ref['repository_packages_db_mask']
+    def _maskFilter_packages_db_mask(self, package_id, live):
 
-                try:
-                    validator_cache = clset['masking_validation']['cache']
-                    validator_cache[(package_id, self.name, live)] = \
-                        -1, myr
-                except KeyError: # system settings client plugin not found
-                    pass
+        # check if repository packages.db.mask needs it masked
+        repomask_ids = self._maskFilter_packages_db_mask_ids()
+        if repomask_ids is None:
+            return
+
+        if package_id in repomask_ids:
+
+            ref = self._settings['pkg_masking_reference']
+            myr = ref['repository_packages_db_mask']
+
+            try:
+                clset = self._client_settings
+                validator_cache = clset['masking_validation']['cache']
+                validator_cache[(package_id, self.name, live)] = \
+                    -1, myr
+            except KeyError: # system settings client plugin not found
+                pass
+
+            return -1, myr
 
-                return -1, myr
+    def _maskFilter_package_license_masked(self, licenses):
+        """
+        Return whether the given license string is masked by user
+        (license.mask).
+        """
+        lic_mask = self._settings['license_mask']
+        for mylicense in licenses.strip().split():
+            if mylicense in lic_mask:
+                return True
+        return False
 
-    def _maskFilter_package_license_mask(self, package_id, live):
+    def _maskFilter_package_license_mask(self, package_id, live,
+                                         licenses = None):
 
         if not self._settings['license_mask']:
             return
 
-        mylicenses = self.retrieveLicense(package_id)
-        mylicenses = mylicenses.strip().split()
-        lic_mask = self._settings['license_mask']
-        for mylicense in mylicenses:
+        mylicenses = licenses
+        if mylicenses is None:
+            mylicenses = self.retrieveLicense(package_id)
 
-            if mylicense not in lic_mask:
-                continue
+        if self._maskFilter_package_license_masked(mylicenses):
 
             ref = self._settings['pkg_masking_reference']
             myr = ref['user_license_mask']
@@ -2479,32 +2788,17 @@ class MaskableRepository(EntropyRepositoryBase):
 
             return -1, myr
 
-    def _maskFilter_keyword_mask(self, package_id, live):
-
-        # WORKAROUND for buggy entries
-        # ** is fine then
-        # TODO: remove this before 31-12-2011
-        mykeywords = self.retrieveKeywords(package_id)
-        if mykeywords == set([""]):
-            mykeywords = set(['**'])
-
-        mask_ref = self._settings['pkg_masking_reference']
-
+    def _maskFilter_keyword_mask_reason(self, package_id, mykeywords):
+        """
+        Return the pkg_masking_reference key stating why the given package,
+        having the given keywords, is visible, or None if it is keyword
+        masked.
+        """
         # firstly, check if package keywords are in etpConst['keywords']
         # (universal keywords have been merged from package.keywords)
         same_keywords = etpConst['keywords'] & mykeywords
         if same_keywords:
-            myr = mask_ref['system_keyword']
-            try:
-                clset = self._client_settings
-                validator_cache = clset['masking_validation']['cache']
-                validator_cache[(package_id, self.name, live)] = \
-                    package_id, myr
-
-            except KeyError: # system settings client plugin not found
-                pass
-
-            return package_id, myr
+            return 'system_keyword'
 
         # if we get here, it means we didn't find mykeywords
         # in etpConst['keywords']
@@ -2523,16 +2817,7 @@ class MaskableRepository(EntropyRepositoryBase):
 
             if "*" in keyword_data:
                 # all packages in this repo with keyword "keyword" are ok
-                myr = mask_ref['user_repo_package_keywords_all']
-                try:
-                    clset = self._client_settings
-                    validator_cache = clset['masking_validation']['cache']
-                    validator_cache[(package_id, self.name, live)] = \
-                        package_id, myr
-                except KeyError: # system settings client plugin not found
-                    pass
-
-                return package_id, myr
+                return 'user_repo_package_keywords_all'
 
             kwd_key = "%s_ids" % (keyword,)
             keyword_data_ids = keyword_repo[self.name].get(kwd_key)
@@ -2549,22 +2834,13 @@ class MaskableRepository(EntropyRepositoryBase):
                 keyword_repo[self.name][kwd_key] = keyword_data_ids
 
             if package_id in keyword_data_ids:
-
-                myr = mask_ref['user_repo_package_keywords']
-                try:
-                    clset = self._client_settings
-                    validator_cache = clset['masking_validation']['cache']
-                    validator_cache[(package_id, self.name, live)] = \
-                        package_id, myr
-                except KeyError: # system settings client plugin not found
-                    pass
-                return package_id, myr
+                return 'user_repo_package_keywords'
 
         keyword_pkg = self._settings['keywords']['packages']
 
         # if we get here, it means we didn't find a match in repositories
         # so we scan packages, last chance
-        for keyword in keyword_pkg.keys():
+        for keyword in list(keyword_pkg.keys()):
             # use .keys() because keyword_pkg gets modified during iteration
 
             # first of all check if keyword is in mykeywords
@@ -2591,18 +2867,8 @@ class MaskableRepository(EntropyRepositoryBase):
                 keyword_pkg[self.name+kwd_key] = keyword_data_ids
 
             if package_id in keyword_data_ids:
-
                 # valid!
-                myr = mask_ref['user_package_keywords']
-                try:
-                    clset = self._client_settings
-                    validator_cache = clset['masking_validation']['cache']
-                    validator_cache[(package_id, self.name, live)] = \
-                        package_id, myr
-                except KeyError: # system settings client plugin not found
-                    pass
-
-                return package_id, myr
+                return 'user_package_keywords'
 
 
         ## if we get here, it means that pkg it keyword masked
@@ -2626,11 +2892,7 @@ class MaskableRepository(EntropyRepositoryBase):
         same_keywords = repo_keywords.get('universal') & mykeywords
         if same_keywords:
             # universal keyword matches!
-            myr = mask_ref['repository_packages_db_keywords']
-            validator_cache = clset['masking_validation']['cache']
-            validator_cache[(package_id, self.name, live)] = \
-                package_id, myr
-            return package_id, myr
+            return 'repository_packages_db_keywords'
 
         ## if we get here, it means that even universal masking failed
         ## and we need to look at per-package settings
@@ -2663,16 +2925,211 @@ class MaskableRepository(EntropyRepositoryBase):
             same_keywords = pkg_keywords & etpConst['keywords']
         if same_keywords:
             # found! this pkg is not masked, yay!
-            myr = mask_ref['repository_packages_db_keywords']
+            return 'repository_packages_db_keywords'
+
+    def _maskFilter_keyword_mask(self, package_id, live, keywords = None):
+
+        # WORKAROUND for buggy entries
+        # ** is fine then
+        # TODO: remove this before 31-12-2011
+        mykeywords = keywords
+        if mykeywords is None:
+            mykeywords = self.retrieveKeywords(package_id)
+        if mykeywords == set([""]):
+            mykeywords = set(['**'])
+
+        reason = self._maskFilter_keyword_mask_reason(package_id, mykeywords)
+        if reason is None:
+            return
+
+        myr = self._settings['pkg_masking_reference'][reason]
+        try:
+            clset = self._client_settings
             validator_cache = clset['masking_validation']['cache']
             validator_cache[(package_id, self.name, live)] = \
                 package_id, myr
-            return package_id, myr
+        except (KeyError, TypeError): # client plugin not found
+            pass
+
+        return package_id, myr
+
+    def _mask_filter_bitmap_key(self):
+        """
+        Return the cache key of the mask filter bitmap.
+        """
+        return "MaskableRepositoryFilterBitmap/%s_%s_%s" % (
+            self.name,
+            self.atomMatchCacheKey(),
+            self.checksum(),
+            )
+
+    def _mask_filter_evaluate_all(self):
+        """
+        Evaluate the package masking of all the packages in the repository
+        in one pass. Live masking is not considered.
+
+        Return an array indexed by package identifier. Each element is
+        the masking reason id + 1, negated if the package is masked,
+        or 0 if there is no such package.
+
+        @return: the mask filter bitmap
+        @rtype: array.array
+        """
+        ref = self._settings['pkg_masking_reference']
+        package_ids = self.listAllPackageIds()
+        bitmap = array.array('b', [0]) * (max(package_ids or [0]) + 1)
+
+        # one atomMatch() per mask rule
+        mask_ids = self._maskFilter_user_package_mask_ids()
+        unmask_ids = self._maskFilter_user_package_unmask_ids()
+        db_mask_ids = self._maskFilter_packages_db_mask_ids()
+        if db_mask_ids is None:
+            db_mask_ids = frozenset()
+
+        # set-based queries for licenses and keywords
+        licenses = {}
+        if self._settings['license_mask']:
+            licenses = self.retrieveLicenseMany(package_ids)
+        keywords = self.retrieveKeywordsMany(package_ids)
+
+        for package_id in package_ids:
+            if package_id in mask_ids:
+                bitmap[package_id] = -(ref['user_package_mask'] + 1)
+                continue
+            if package_id in unmask_ids:
+                bitmap[package_id] = ref['user_package_unmask'] + 1
+                continue
+            if package_id in db_mask_ids:
+                bitmap[package_id] = -(ref['repository_packages_db_mask'] + 1)
+                continue
+            pkg_licenses = licenses.get(package_id)
+            if pkg_licenses is not None:
+                if self._maskFilter_package_license_masked(pkg_licenses):
+                    bitmap[package_id] = -(ref['user_license_mask'] + 1)
+                    continue
+
+            mykeywords = keywords.get(package_id, frozenset())
+            if mykeywords == set([""]):
+                mykeywords = set(['**'])
+            reason = self._maskFilter_keyword_mask_reason(
+                package_id, mykeywords)
+            if reason is not None:
+                bitmap[package_id] = ref[reason] + 1
+            else:
+                bitmap[package_id] = -(ref['completely_masked'] + 1)
+
+        return bitmap
+
+    def _mask_filter_bitmap(self):
+        """
+        Return the mask filter bitmap (see _mask_filter_evaluate_all()),
+        loading it from the on-disk cache or building it if needed.
+        Return None if not available.
+        """
+        if not self._caching:
+            return None
+
+        match_cache_key = self.atomMatchCacheKey()
+        cached = self._getLiveCache("MaskFilterBitmap")
+        if cached is not None:
+            key, bitmap = cached
+            if key == match_cache_key:
+                return bitmap
+
+        with self._mask_filter_bitmap_lock:
+            cached = self._getLiveCache("MaskFilterBitmap")
+            if cached is not None:
+                key, bitmap = cached
+                if key == match_cache_key:
+                    return bitmap
+
+            bitmap = None
+            cache_key = self._mask_filter_bitmap_key()
+            data = loadobj(cache_key)
+            if isinstance(data, bytes):
+                bitmap = array.array('b', data)
+            else:
+                bitmap = self._mask_filter_evaluate_all()
+                if const_is_python3():
+                    data = bitmap.tobytes()
+                else:
+                    data = bitmap.tostring()
+                dumpobj(cache_key, data)
+
+            self._setLiveCache("MaskFilterBitmap", (match_cache_key, bitmap))
+            return bitmap
+
+    def _mask_filter_bitmap_lookup(self, package_id):
+        """
+        Return the mask filter verdict of the given package from the mask
+        filter bitmap, or None if not available.
+        """
+        bitmap = self._mask_filter_bitmap()
+        if bitmap is None:
+            return None
+        try:
+            value = bitmap[package_id]
+        except IndexError:
+            return None
+        if value > 0:
+            return package_id, value - 1
+        if value < 0:
+            return -1, -value - 1
+        return None
 
     def maskFilter(self, package_id, live = True):
         """
         Reimplemented from EntropyRepositoryBase
         """
+        return self._maskFilter(package_id, live)
+
+    def maskFilterMany(self, package_ids, live = True):
+        """
+        Reimplemented from EntropyRepositoryBase.
+        Licenses and keywords of the packages not in the validation
+        cache are fetched with set-based queries.
+        """
+        validator_cache = self._client_settings.get(
+            'masking_validation', {}).get('cache', {})
+
+        results = {}
+        pending = []
+        for package_id in package_ids:
+            cached = validator_cache.get((package_id, self.name, live))
+            if cached is not None:
+                results[package_id] = cached
+                continue
+            if live:
+                cached = self._maskFilter_live(package_id)
+                if cached:
+                    results[package_id] = cached
+                    continue
+            cached = self._mask_filter_bitmap_lookup(package_id)
+            if cached is not None:
+                results[package_id] = cached
+            else:
+                pending.append(package_id)
+
+        if pending:
+            licenses = {}
+            if self._settings['license_mask']:
+                licenses = self.retrieveLicenseMany(pending)
+            keywords = self.retrieveKeywordsMany(pending)
+            for package_id in pending:
+                results[package_id] = self._maskFilter(
+                    package_id, live,
+                    licenses = licenses.get(package_id),
+                    keywords = keywords.get(package_id))
+
+        return results
+
+    def _maskFilter(self, package_id, live, licenses = None,
+                    keywords = None):
+        """
+        Evaluate the package masking of the given package identifier.
+        Prefetched license and keywords metadata can be passed through
+        the licenses and keywords arguments.
+        """
         validator_cache = self._client_settings.get(
             'masking_validation', {}).get('cache', {})
 
@@ -2680,8 +3137,13 @@ class MaskableRepository(EntropyRepositoryBase):
         if cached is not None:
             return cached
 
-        # use on-disk cache?
-        cached = self._mask_filter_fetch_cache(package_id)
+        if live:
+            data = self._maskFilter_live(package_id)
+            if data:
+                return data
+
+        # use the precomputed bitmap?
+        cached = self._mask_filter_bitmap_lookup(package_id)
         if cached is not None:
             return cached
 
@@ -2689,40 +3151,31 @@ class MaskableRepository(EntropyRepositoryBase):
         if len(validator_cache) > 100000:
             validator_cache.clear()
 
-        if live:
-            data = self._maskFilter_live(package_id)
-            if data:
-                return data
-
         data = self._maskFilter_user_package_mask(package_id, live)
         if data:
-            self._mask_filter_store_cache(package_id, data)
             return data
 
         data = self._maskFilter_user_package_unmask(package_id, live)
         if data:
-            self._mask_filter_store_cache(package_id, data)
             return data
 
         data = self._maskFilter_packages_db_mask(package_id, live)
         if data:
-            self._mask_filter_store_cache(package_id, data)
             return data
 
-        data = self._maskFilter_package_license_mask(package_id, live)
+        data = self._maskFilter_package_license_mask(package_id, live,
+            licenses = licenses)
         if data:
-            self._mask_filter_store_cache(package_id, data)
             return data
 
-        data = self._maskFilter_keyword_mask(package_id, live)
+        data = self._maskFilter_keyword_mask(package_id, live,
+            keywords = keywords)
         if data:
-            self._mask_filter_store_cache(package_id, data)
             return data
 
         # holy crap, can't validate
         myr = self._settings['pkg_masking_reference']['completely_masked']
         validator_cache[(package_id, self.name, live)] = -1, myr
-        self._mask_filter_store_cache(package_id, data)
         return -1, myr
 
     def atomMatchCacheKey(self):
@@ -2749,6 +3202,13 @@ class AvailablePackagesRepository(CachedRepository, MaskableRepository):
             const_setup_file(self._db, etpConst['entropygid'], 0o644,
                 uid = etpConst['uid'])
 
+    def _reverseDependenciesIndexSupported(self):
+        """
+        Reimplemented from EntropySQLRepository.
+        Reverse dependencies must honour package masking.
+        """
+        return False
+
     @staticmethod
     def update(entropy_client, repository_id, force, gpg):
         """
@@ -2870,3 +3330,21 @@ class GenericRepository(CachedRepository, MaskableRepository):
         if not enabled:
             return package_id, 0
         return MaskableRepository.maskFilter(self, package_id, live = live)
+
+    def maskFilterMany(self, package_ids, live = True):
+        """
+        Reimplemented from MaskableRepository.
+        Honour the "enable_mask_filter" switch, see maskFilter().
+        """
+        enabled = getattr(self, 'enable_mask_filter', False)
+        if not enabled:
+            return dict(((x, (x, 0)) for x in package_ids))
+        return MaskableRepository.maskFilterMany(
+            self, package_ids, live = live)
+
+    def _reverseDependenciesIndexSupported(self):
+        """
+        Reimplemented from EntropySQLRepository.
+        Reverse dependencies must honour package masking, if enabled.
+        """
+        return not getattr(self, 'enable_mask_filter', False)
@@ -12,14 +12,15 @@
 import os
 import collections
 import hashlib
+import threading
 
 from entropy.const import etpConst, const_debug_write, \
     const_isnumber, const_convert_to_rawstring, const_convert_to_unicode, \
-    const_debug_enabled, const_file_readable
+    const_debug_enabled, const_file_readable, const_get_cpus
 from entropy.exceptions import RepositoryError, SystemDatabaseError, \
     DependenciesNotFound, DependenciesNotRemovable, DependenciesCollision
 from entropy.graph import Graph
-from entropy.misc import Lifo
+from entropy.misc import Lifo, ParallelTask
 from entropy.output import bold, darkgreen, darkred, blue, purple, teal, brown
 from entropy.i18n import _
 from entropy.db.exceptions import IntegrityError, OperationalError, \
@@ -184,27 +185,13 @@ class CalculatorsMixin:
 
         cache_key = None
         if self.xcache and use_cache:
-            sha = hashlib.sha1()
-
-            cache_fmt = "a{%s}mr{%s}ms{%s}rh{%s}mf{%s}"
-            cache_fmt += "ar{%s}m{%s}cm{%s}s{%s;%s;%s}"
-            cache_s = cache_fmt % (
-                atom,
-                ";".join(match_repo),
-                match_slot,
-                self.repositories_checksum(),
-                mask_filter,
-                ";".join(sorted(self._settings['repositories']['available'])),
-                self._settings.packages_configuration_hash(),
-                self._settings_client_plugin.packages_configuration_hash(),
-                multi_match,
-                multi_repo,
+            cache_checksum = self.__atom_match_cache_checksum()
+            cache_key = self.__atom_match_cache_key(atom, match_slot,
+                mask_filter, multi_match, multi_repo, match_repo,
                 extended_results)
-            sha.update(const_convert_to_rawstring(cache_s))
 
-            cache_key = "atom_match/atom_match_%s" % (sha.hexdigest(),)
-
-            cached = self._cacher.pop(cache_key)
+            cached = self._cacher.store().get(
+                "atom_match", cache_key, cache_checksum)
             if cached is not None:
                 return cached
 
@@ -270,29 +257,8 @@ class CalculatorsMixin:
                         break
                     break
 
-        dbpkginfo = (-1, 1)
-        if extended_results:
-            dbpkginfo = ((-1, None, None, None), 1)
-
-        if multi_repo and repo_results:
-
-            data = set()
-            for repoid in repo_results:
-                data.add((repo_results[repoid], repoid))
-            dbpkginfo = (data, 0)
-
-        elif len(repo_results) == 1:
-            # one result found
-            repo = list(repo_results.keys())[0]
-            dbpkginfo = (repo_results[repo], repo)
-
-        elif len(repo_results) > 1:
-
-            # we have to decide which version should be taken
-            mypkginfo = self.__handle_multi_repo_matches(repo_results,
-                extended_results, valid_repos)
-            if mypkginfo is not None:
-                dbpkginfo = mypkginfo
+        dbpkginfo = self.__atom_match_select(repo_results, valid_repos,
+            multi_repo, extended_results)
 
         # multimatch support
         if multi_match:
@@ -311,13 +277,8 @@ class CalculatorsMixin:
                             multiMatch = True,
                             extendedResults = extended_results
                         )
-                        if extended_results:
-                            for item in query_data:
-                                _item_d = (item[0], item[2], item[3], item[4])
-                                data.add((_item_d, q_repo))
-                        else:
-                            for x in query_data:
-                                data.add((x, q_repo))
+                        data |= self.__atom_match_multi_data(
+                            query_data, q_repo, extended_results)
                     dbpkginfo = (data, 0)
                 else:
                     dbconn = self.open_repository(dbpkginfo[1])
@@ -328,19 +289,250 @@ class CalculatorsMixin:
                         multiMatch = True,
                         extendedResults = extended_results
                     )
+                    dbpkginfo = (self.__atom_match_multi_data(
+                            query_data, dbpkginfo[1], extended_results), 0)
+
+        if cache_key is not None and self._cacher.is_started():
+            self._cacher.store().set(
+                "atom_match", cache_key, cache_checksum, dbpkginfo)
+
+        return dbpkginfo
+
+    def atom_match_many(self, atoms, match_slot = None, mask_filter = True,
+            multi_match = False, multi_repo = False, match_repo = None,
+            extended_results = False, use_cache = True):
+        """
+        Match a list of atoms (or dependencies) inside all the available
+        repositories. This is the batched version of atom_match(): every
+        repository is queried once for all the atoms, through
+        EntropyRepositoryBase.atomMatchMany().
+
+        @param atoms: list of atoms or dependencies to match
+        @type atoms: list
+        @keyword match_slot: match packages with given slot
+        @type match_slot: string
+        @keyword mask_filter: enable package masking filter
+        @type mask_filter: bool
+        @keyword multi_match: match all the available packages, not just
+            the best one
+        @type multi_match: bool
+        @keyword multi_repo: match packages in all the repositories
+        @type multi_repo: bool
+        @keyword match_repo: list of repository identifiers to match
+            packages into
+        @type match_repo: list
+        @keyword extended_results: return extended results
+        @type extended_results: bool
+        @keyword use_cache: use on-disk cache
+        @type use_cache: bool
+        @return: list of atom_match() results, in the same order of atoms
+        @rtype: list
+        """
+        if match_repo is None:
+            match_repo = tuple()
+
+        cache_checksum = None
+        if self.xcache and use_cache:
+            cache_checksum = self.__atom_match_cache_checksum()
+
+        results = {}
+        cache_keys = {}
+        pending = []
+        seen = set()
+        for atom in atoms:
+            if atom in seen:
+                continue
+            seen.add(atom)
+
+            _atom, repos = entropy.dep.dep_get_match_in_repos(atom)
+            if (repos is not None) or \
+                    atom.endswith(etpConst['entropyordepquestion']):
+                # repositories selected by atom and "or" dependencies
+                # are matched one by one
+                results[atom] = self.atom_match(atom,
+                    match_slot = match_slot, mask_filter = mask_filter,
+                    multi_match = multi_match, multi_repo = multi_repo,
+                    match_repo = match_repo,
+                    extended_results = extended_results,
+                    use_cache = use_cache)
+                continue
+
+            if cache_checksum is not None:
+                cache_keys[self.__atom_match_cache_key(atom, match_slot,
+                    mask_filter, multi_match, multi_repo, match_repo,
+                    extended_results)] = atom
+            pending.append(atom)
+
+        if cache_keys:
+            cached = self._cacher.store().get_many(
+                "atom_match", list(cache_keys.keys()), cache_checksum)
+            for cache_key, dbpkginfo in cached.items():
+                results[cache_keys[cache_key]] = dbpkginfo
+            pending = [x for x in pending if x not in results]
+
+        valid_repos = self._enabled_repos
+        if match_repo and (type(match_repo) in (list, tuple, set)):
+            valid_repos = list(match_repo)
+
+        repo_results = dict(((x, {}) for x in pending))
+        if pending:
+            for repo in valid_repos:
+                try:
+                    dbconn = self.open_repository(repo)
+                except (RepositoryError, SystemDatabaseError):
+                    # ouch, repository not available or corrupted !
+                    continue
+
+                kwargs = {
+                    'matchSlot': match_slot,
+                    'maskFilter': mask_filter,
+                    'extendedResults': extended_results,
+                }
+                try:
+                    try:
+                        matches = dbconn.atomMatchMany(
+                            pending, useCache = use_cache, **kwargs)
+                    except TypeError:
+                        if not use_cache:
+                            raise
+                        matches = dbconn.atomMatchMany(
+                            pending, useCache = False, **kwargs)
+                except (OperationalError, DatabaseError):
+                    # repository fooked, skip!
+                    continue
+
+                for atom, (query_data, query_rc) in zip(pending, matches):
+                    if query_rc != 0:
+                        continue
                     if extended_results:
-                        dbpkginfo = (
-                            set([((x[0], x[2], x[3], x[4]), dbpkginfo[1]) \
-                                     for x in query_data]), 0)
+                        repo_results[atom][repo] = (query_data[0],
+                            query_data[2], query_data[3], query_data[4])
                     else:
-                        dbpkginfo = (
-                            set([(x, dbpkginfo[1]) for x in query_data]), 0)
+                        repo_results[atom][repo] = query_data
+
+        for atom in pending:
+            results[atom] = self.__atom_match_select(repo_results[atom],
+                valid_repos, multi_repo, extended_results)
+
+        # multimatch support, one query per repository
+        if multi_match and pending:
+            repo_atoms = {}
+            multi_data = {}
+            for atom in pending:
+                dbpkginfo = results[atom]
+                if dbpkginfo[1] == 1:
+                    results[atom] = set(), 1
+                    continue
+                multi_data[atom] = set()
+                if multi_repo:
+                    q_repos = set((q_repo for q_id, q_repo in dbpkginfo[0]))
+                else:
+                    q_repos = [dbpkginfo[1]]
+                for q_repo in q_repos:
+                    obj = repo_atoms.setdefault(q_repo, [])
+                    obj.append(atom)
+
+            for q_repo, q_atoms in repo_atoms.items():
+                dbconn = self.open_repository(q_repo)
+                matches = dbconn.atomMatchMany(
+                    q_atoms,
+                    matchSlot = match_slot,
+                    maskFilter = mask_filter,
+                    multiMatch = True,
+                    extendedResults = extended_results
+                )
+                for atom, (query_data, query_rc) in zip(q_atoms, matches):
+                    multi_data[atom] |= self.__atom_match_multi_data(
+                        query_data, q_repo, extended_results)
 
-        if cache_key is not None:
-            self._cacher.push(cache_key, dbpkginfo)
+            for atom, data in multi_data.items():
+                results[atom] = data, 0
+
+        if cache_checksum is not None and self._cacher.is_started():
+            store = self._cacher.store()
+            inverse_keys = dict(((y, x) for x, y in cache_keys.items()))
+            for atom in pending:
+                store.set("atom_match", inverse_keys[atom], cache_checksum,
+                          results[atom])
+
+        return [results[atom] for atom in atoms]
+
+    def __atom_match_cache_checksum(self):
+        """
+        Return the atom_match() cache namespace checksum, invalidating all
+        the cached results at once when repositories or settings change.
+        """
+        sha = hashlib.sha1()
+        cache_fmt = "rh{%s}ar{%s}m{%s}cm{%s}"
+        cache_s = cache_fmt % (
+            self.repositories_checksum(),
+            ";".join(sorted(self._settings['repositories']['available'])),
+            self._settings.packages_configuration_hash(),
+            self._settings_client_plugin.packages_configuration_hash())
+        sha.update(const_convert_to_rawstring(cache_s))
+        return sha.hexdigest()
+
+    def __atom_match_cache_key(self, atom, match_slot, mask_filter,
+                               multi_match, multi_repo, match_repo,
+                               extended_results):
+        """
+        Return the atom_match() cache key for the given arguments.
+        """
+        sha = hashlib.sha1()
+        cache_fmt = "a{%s}mr{%s}ms{%s}mf{%s}s{%s;%s;%s}"
+        cache_s = cache_fmt % (
+            atom,
+            ";".join(match_repo),
+            match_slot,
+            mask_filter,
+            multi_match,
+            multi_repo,
+            extended_results)
+        sha.update(const_convert_to_rawstring(cache_s))
+        return sha.hexdigest()
+
+    def __atom_match_select(self, repo_results, valid_repos, multi_repo,
+                            extended_results):
+        """
+        Pick the atom_match() result among the per-repository matches.
+        """
+        dbpkginfo = (-1, 1)
+        if extended_results:
+            dbpkginfo = ((-1, None, None, None), 1)
+
+        if multi_repo and repo_results:
+
+            data = set()
+            for repoid in repo_results:
+                data.add((repo_results[repoid], repoid))
+            dbpkginfo = (data, 0)
+
+        elif len(repo_results) == 1:
+            # one result found
+            repo = list(repo_results.keys())[0]
+            dbpkginfo = (repo_results[repo], repo)
+
+        elif len(repo_results) > 1:
+
+            # we have to decide which version should be taken
+            mypkginfo = self.__handle_multi_repo_matches(repo_results,
+                extended_results, valid_repos)
+            if mypkginfo is not None:
+                dbpkginfo = mypkginfo
 
         return dbpkginfo
 
+    def __atom_match_multi_data(self, query_data, repository_id,
+                                extended_results):
+        """
+        Turn atomMatch(multiMatch = True) results into a set of package
+        matches.
+        """
+        if extended_results:
+            return set((((x[0], x[2], x[3], x[4]), repository_id) \
+                            for x in query_data))
+        return set(((x, repository_id) for x in query_data))
+
     def atom_search(self, keyword, description = False, repositories = None,
                     use_cache = True):
         """
@@ -435,6 +627,56 @@ class CalculatorsMixin:
 
         return matches
 
+    def search_packages(self, keyword, repositories = None,
+                        description = True, useflags = True, limit = None):
+        """
+        Search packages inside all the available repositories, including the
+        installed packages one, using the repositories full-text search
+        index, when available. Every word in keyword must match, prefixes
+        are accepted.
+        Results are returned as a list of package matches
+        (pkg_id_int, repo_string), best matches first.
+
+        @param keyword: string to search
+        @type keyword: string
+        @keyword repositories: list of repository identifiers to search
+            packages into
+        @type repositories: list
+        @keyword description: if True, also search through package description
+        @type description: bool
+        @keyword useflags: if True, also search through package USE flags
+        @type useflags: bool
+        @keyword limit: maximum number of results, or None
+        @type limit: int
+        @return: list of package matches
+        @rtype: list
+        """
+        if repositories is None:
+            repositories = self.repositories()[:]
+            repositories.insert(0, InstalledPackagesRepository.NAME)
+
+        results = []
+        for repo_idx, repository in enumerate(repositories):
+
+            try:
+                repo = self.open_repository(repository)
+            except (RepositoryError, SystemDatabaseError):
+                # ouch, repository not available or corrupted !
+                continue
+
+            ranked = repo.searchRanked(
+                keyword, description = description,
+                useflags = useflags, limit = limit)
+            results.extend(
+                (rank, repo_idx, pkg_id, repository) for pkg_id, rank \
+                    in ranked)
+
+        results.sort()
+        if limit is not None:
+            results = results[:limit]
+        return [(pkg_id, repository) for _rank, _idx, pkg_id, repository \
+                    in results]
+
     def _resolve_or_dependencies(self, dependencies, selected_matches,
                                  _selected_matches_cache = None):
         """
@@ -704,6 +946,29 @@ class CalculatorsMixin:
                 return True
             return False
 
+        # match the dependencies in batches, installed packages
+        # repository first, then available repositories for the
+        # dependencies that are installed.
+        pending = [x for x in dependencies if (x not in depcache) and \
+                       (not x.startswith("!"))]
+        installed_matches = dict(zip(pending,
+            inst_repo.atomMatchMany(pending, multiMatch = True)))
+        pending = [x for x in pending if installed_matches[x][1] == 0]
+
+        multi_repo = False
+        if match_repo is None:
+            multi_repo = True
+
+        repo_matches = {}
+        repo_multi_matches = {}
+        if pending and (deep_deps or not relaxed_deps):
+            repo_matches = dict(zip(pending,
+                self.atom_match_many(pending, match_repo = match_repo)))
+            if not self.DISABLE_SLOT_INTERSECTION:
+                repo_multi_matches = dict(zip(pending,
+                    self.atom_match_many(pending, match_repo = match_repo,
+                        multi_match = True, multi_repo = multi_repo)))
+
         unsatisfied = set()
         for dependency in dependencies:
 
@@ -739,8 +1004,11 @@ class CalculatorsMixin:
                 push_to_cache(dependency, False)
                 continue
 
-            c_ids, c_rc = inst_repo.atomMatch(dependency,
-                multiMatch = True)
+            installed_match = installed_matches.get(dependency)
+            if installed_match is None:
+                installed_match = inst_repo.atomMatch(dependency,
+                    multiMatch = True)
+            c_ids, c_rc = installed_match
             if c_rc != 0:
 
                 # check if dependency can be matched in available repos and
@@ -826,7 +1094,11 @@ class CalculatorsMixin:
                 if provide_stop:
                     continue
 
-            r_id, r_repo = self.atom_match(dependency, match_repo = match_repo)
+            repo_match = repo_matches.get(dependency)
+            if repo_match is None:
+                repo_match = self.atom_match(dependency,
+                    match_repo = match_repo)
+            r_id, r_repo = repo_match
             if r_id == -1:
                 if const_debug_enabled():
                     const_debug_write(__name__,
@@ -847,15 +1119,14 @@ class CalculatorsMixin:
             # available in repositories.
             # If it is, restrict the dependency scope to the intersection
             # between available SLOTs and installed SLOT.
-            multi_repo = False
-            if match_repo is None:
-                multi_repo = True
-
             available_slots = set()
             if not self.DISABLE_SLOT_INTERSECTION:
-                r_matches, r_rcs = self.atom_match(
-                    dependency, match_repo = match_repo,
-                    multi_match = True, multi_repo = multi_repo)
+                repo_multi_match = repo_multi_matches.get(dependency)
+                if repo_multi_match is None:
+                    repo_multi_match = self.atom_match(
+                        dependency, match_repo = match_repo,
+                        multi_match = True, multi_repo = multi_repo)
+                r_matches, r_rcs = repo_multi_match
                 available_slots |= set(self.open_repository(x[1]).retrieveSlot(
                         x[0]) for x in r_matches)
             if len(available_slots) > 1:
@@ -1290,9 +1561,10 @@ class CalculatorsMixin:
                 "generate_dependency_tree POST dependencies ADDED => %s" % (
                     post_deps,))
 
+        myundeps = list(myundeps)
         deps = set()
-        for unsat_dep in myundeps:
-            match_pkg_id, match_repo_id = self.atom_match(unsat_dep)
+        for unsat_dep, (match_pkg_id, match_repo_id) in zip(
+                myundeps, self.atom_match_many(myundeps)):
             if match_pkg_id == -1:
                 # dependency not found !
                 deps_not_found.add(unsat_dep)
@@ -1303,9 +1575,10 @@ class CalculatorsMixin:
                 # push to stack only if recursive
                 stack.push((match_pkg_id, match_repo_id))
 
+        post_deps = list(post_deps)
         post_deps_matches = set()
-        for post_dep in post_deps:
-            match_pkg_id, match_repo_id = self.atom_match(post_dep)
+        for post_dep, (match_pkg_id, match_repo_id) in zip(
+                post_deps, self.atom_match_many(post_deps)):
             # if post dependency is not found, we can happily ignore the fact
             if match_pkg_id == -1:
                 # not adding to deps_not_found
@@ -3081,11 +3354,8 @@ class CalculatorsMixin:
         if not update:
             return []
 
-        deps = set()
-
         security = self.Security()
-        for advisory_id in security.list():
-            deps.update(security.affected_id(advisory_id))
+        deps = security.affected_all()
 
         sec_updates = []
         inst_repo = self.installed_repository()
@@ -3103,6 +3373,158 @@ class CalculatorsMixin:
 
         return sec_updates
 
+    # minimum number of installed packages evaluated by a single
+    # calculate_updates() worker thread and maximum number of threads.
+    _CALCULATE_UPDATES_MIN_CHUNK = 128
+    _CALCULATE_UPDATES_MAX_JOBS = 8
+
+    def _calculate_updates_worker(self, func, chunk):
+        """
+        Execute func(chunk) inside a calculate_updates() worker thread.
+        Return a (result, exception) tuple, since ParallelTask does not
+        propagate exceptions to the joining thread.
+        """
+        try:
+            return func(chunk), None
+        except Exception as err:
+            return None, err
+
+    def _calculate_package_update(self, package_id, strict_data, c_digest,
+                                  empty, ignore_spm_downgrades, match_repos):
+        """
+        Compare an installed package against the available repositories.
+        This method is called by calculate_updates() from multiple threads
+        at the same time and must not touch the installed packages
+        repository.
+
+        @param package_id: installed package identifier
+        @type package_id: int
+        @param strict_data: installed package getStrictData() output
+        @type strict_data: tuple
+        @param c_digest: installed package digest
+        @type c_digest: string
+        @param empty: see calculate_updates()
+        @type empty: bool
+        @param ignore_spm_downgrades: ignore SPM revision (9999) updates
+        @type ignore_spm_downgrades: bool
+        @param match_repos: ordered list of repositories to match against
+        @type match_repos: tuple
+        @return: None if the package must be skipped, otherwise a
+            (kind, value) tuple, where kind is one of "update" (value is
+            a package match), "fine" (value is the installed package atom),
+            "spm_fine" (value is an (atom, package match) tuple) and
+            "remove" (value is the installed package identifier)
+        @rtype: tuple or None
+        """
+        cl_pkgkey, cl_slot, cl_version, \
+            cl_tag, cl_revision, cl_atom = strict_data
+        use_match_cache = True
+
+        # try to search inside package tag, if it's available,
+        # otherwise, do the usual duties.
+        cl_pkgkey_tag = None
+        if cl_tag:
+            cl_pkgkey_tag = "%s%s%s" % (
+                cl_pkgkey,
+                etpConst['entropytagprefix'],
+                cl_tag)
+
+        while True:
+            try:
+                match = None
+                if cl_pkgkey_tag is not None:
+                    # search with tag first, if nothing
+                    # pops up, fallback
+                    # to usual search?
+                    match = self.atom_match(
+                        cl_pkgkey_tag,
+                        match_slot = cl_slot,
+                        extended_results = True,
+                        use_cache = use_match_cache,
+                        match_repo = match_repos
+                    )
+                    try:
+                        if const_isnumber(match[1]):
+                            match = None
+                    except TypeError:
+                        if not use_match_cache:
+                            raise
+                        use_match_cache = False
+                        continue
+
+                if match is None:
+                    match = self.atom_match(
+                        cl_pkgkey,
+                        match_slot = cl_slot,
+                        extended_results = True,
+                        use_cache = use_match_cache,
+                        match_repo = match_repos
+                    )
+            except OperationalError:
+                # ouch, but don't crash here
+                return None
+            try:
+                m_package_id = match[0][0]
+            except TypeError:
+                if not use_match_cache:
+                    raise
+                use_match_cache = False
+                continue
+            break
+
+        # now compare
+        # version: cl_version
+        # tag: cl_tag
+        # revision: cl_revision
+        if (m_package_id != -1):
+            repoid = match[1]
+            version = match[0][1]
+            tag = match[0][2]
+            revision = match[0][3]
+            if empty:
+                return "update", (m_package_id, repoid)
+            if cl_revision != revision:
+                # different revision
+                if cl_revision == etpConst['spmetprev'] \
+                        and ignore_spm_downgrades:
+                    # no difference, we're ignoring revision 9999
+                    return "spm_fine", (cl_atom, (m_package_id, repoid))
+                else:
+                    return "update", (m_package_id, repoid)
+            elif (cl_version != version):
+                # different versions
+                return "update", (m_package_id, repoid)
+            elif (cl_tag != tag):
+                # different tags
+                return "update", (m_package_id, repoid)
+            else:
+
+                # Note: this is a bugfix to improve branch migration
+                # and really check if pkg has been repackaged
+                # first check branch
+                # If the repo has been manually (user-side)
+                # regenerated, digest == "0". In this case
+                # skip the check.
+                if c_digest != "0":
+                    c_repodb = self.open_repository(repoid)
+                    r_digest = c_repodb.retrieveDigest(m_package_id)
+
+                    if (r_digest != c_digest) and \
+                       (r_digest is not None) \
+                       and (c_digest is not None):
+                        return "update", (m_package_id, repoid)
+
+                # no difference
+                return "fine", cl_atom
+
+        # don't take action if it's just masked
+        maskedresults = self.atom_match(
+            cl_pkgkey, match_slot = cl_slot,
+            mask_filter = False, match_repo = match_repos)
+        if maskedresults[0] == -1:
+            return "remove", package_id
+        return None
+
     @sharedinstlock
     def calculate_updates(self, empty = False, use_cache = True,
         critical_updates = True, quiet = False):
@@ -3192,171 +3614,119 @@ class CalculatorsMixin:
             # client db is broken!
             raise SystemDatabaseError("installed packages repository is broken")
 
-        count = 0
-        total = len(package_ids)
-        last_count = 0
-        remove = collections.deque()
-        fine = collections.deque()
-        spm_fine = collections.deque()
-        update = set()
-
-        while True:
-            try:
-                package_id = package_ids.pop()
-            except IndexError:
-                break
-            count += 1
-
-            if not quiet:
-
-                avg = int(float(count) / total * 100)
-                execute = avg % 10 == 9 and last_count < count
-                if not execute:
-                    execute = (count == total) or (count == 1)
-
-                if execute:
-                    last_count = count
-                    self.output(
-                        _("Calculating updates"),
-                        importance = 0,
-                        level = "info",
-                        back = True,
-                        header = ":: ",
-                        count = (count, total),
-                        percent = True,
-                        footer = " ::"
-                    )
-
+        # collect the installed packages metadata here, the installed
+        # packages repository may live in memory and its connections
+        # cannot be shared with the worker threads
+        installed_packages = []
+        for package_id in package_ids:
             try:
-                cl_pkgkey, cl_slot, cl_version, \
-                    cl_tag, cl_revision, \
-                    cl_atom = self.installed_repository().getStrictData(
-                        package_id)
+                strict_data = self.installed_repository().getStrictData(
+                    package_id)
             except TypeError:
                 # check against broken entries, or removed during iteration
                 continue
-            use_match_cache = True
-            do_continue = False
-
-            # try to search inside package tag, if it's available,
-            # otherwise, do the usual duties.
-            cl_pkgkey_tag = None
-            if cl_tag:
-                cl_pkgkey_tag = "%s%s%s" % (
-                    cl_pkgkey,
-                    etpConst['entropytagprefix'],
-                    cl_tag)
+            if strict_data is None:
+                continue
+            c_digest = self.installed_repository().retrieveDigest(
+                package_id)
+            installed_packages.append((package_id, strict_data, c_digest))
 
-            while True:
-                try:
-                    match = None
-                    if cl_pkgkey_tag is not None:
-                        # search with tag first, if nothing
-                        # pops up, fallback
-                        # to usual search?
-                        match = self.atom_match(
-                            cl_pkgkey_tag,
-                            match_slot = cl_slot,
-                            extended_results = True,
-                            use_cache = use_match_cache,
-                            match_repo = match_repos
-                        )
-                        try:
-                            if const_isnumber(match[1]):
-                                match = None
-                        except TypeError:
-                            if not use_match_cache:
-                                raise
-                            use_match_cache = False
-                            continue
+        total = len(installed_packages)
+        progress = {
+            'count': 0,
+            'last_count': 0,
+            'lock': threading.Lock(),
+        }
 
-                    if match is None:
-                        match = self.atom_match(
-                            cl_pkgkey,
-                            match_slot = cl_slot,
-                            extended_results = True,
-                            use_cache = use_match_cache,
-                            match_repo = match_repos
-                        )
-                except OperationalError:
-                    # ouch, but don't crash here
-                    do_continue = True
-                    break
+        def _calculate(chunk):
+            results = []
+            for package_id, strict_data, c_digest in chunk:
+
+                if not quiet:
+                    with progress['lock']:
+                        progress['count'] += 1
+                        count = progress['count']
+                        avg = int(float(count) / total * 100)
+                        execute = avg % 10 == 9 and \
+                            progress['last_count'] < count
+                        if not execute:
+                            execute = (count == total) or (count == 1)
+
+                        if execute:
+                            progress['last_count'] = count
+                            self.output(
+                                _("Calculating updates"),
+                                importance = 0,
+                                level = "info",
+                                back = True,
+                                header = ":: ",
+                                count = (count, total),
+                                percent = True,
+                                footer = " ::"
+                            )
+
+                results.append(self._calculate_package_update(
+                        package_id, strict_data, c_digest, empty,
+                        ignore_spm_downgrades, match_repos))
+            return results
+
+        jobs = 1
+        if total >= self._CALCULATE_UPDATES_MIN_CHUNK * 2:
+            jobs = min(const_get_cpus(), self._CALCULATE_UPDATES_MAX_JOBS,
+                       total // self._CALCULATE_UPDATES_MIN_CHUNK)
+            for repository_id in match_repos:
                 try:
-                    m_package_id = match[0][0]
-                except TypeError:
-                    if not use_match_cache:
-                        raise
-                    use_match_cache = False
-                    continue
-                break
-
-            if do_continue:
-                continue
-
-            # now compare
-            # version: cl_version
-            # tag: cl_tag
-            # revision: cl_revision
-            if (m_package_id != -1):
-                repoid = match[1]
-                version = match[0][1]
-                tag = match[0][2]
-                revision = match[0][3]
-                if empty:
-                    update.add((m_package_id, repoid))
-                    continue
-                if cl_revision != revision:
-                    # different revision
-                    if cl_revision == etpConst['spmetprev'] \
-                            and ignore_spm_downgrades:
-                        # no difference, we're ignoring revision 9999
-                        fine.append(cl_atom)
-                        spm_fine.append((m_package_id, repoid))
-                        continue
-                    else:
-                        update.add((m_package_id, repoid))
-                        continue
-                elif (cl_version != version):
-                    # different versions
-                    update.add((m_package_id, repoid))
-                    continue
-                elif (cl_tag != tag):
-                    # different tags
-                    update.add((m_package_id, repoid))
+                    repo = self.open_repository(repository_id)
+                except RepositoryError:
                     continue
-                else:
+                # temporary repositories live in memory and their
+                # connections are per-thread.
+                if repo.temporary():
+                    jobs = 1
+                    break
 
-                    # Note: this is a bugfix to improve branch migration
-                    # and really check if pkg has been repackaged
-                    # first check branch
-                    if package_id is not None:
-
-                        c_digest = self.installed_repository().retrieveDigest(
-                            package_id)
-                        # If the repo has been manually (user-side)
-                        # regenerated, digest == "0". In this case
-                        # skip the check.
-                        if c_digest != "0":
-                            c_repodb = self.open_repository(repoid)
-                            r_digest = c_repodb.retrieveDigest(m_package_id)
-
-                            if (r_digest != c_digest) and \
-                               (r_digest is not None) \
-                               and (c_digest is not None):
-                                update.add((m_package_id, repoid))
-                                continue
+        if jobs > 1:
+            # contiguous chunks, results are merged back in order
+            chunk_size = total // jobs + (total % jobs and 1)
+            chunks = [installed_packages[x:x + chunk_size] for x in
+                      range(0, total, chunk_size)]
+            threads = []
+            for chunk in chunks:
+                th = ParallelTask(self._calculate_updates_worker,
+                                  _calculate, chunk)
+                th.daemon = True
+                th.start()
+                threads.append(th)
+
+            results = []
+            for th in threads:
+                th.join()
+                rc, err = th.get_rc()
+                if err is not None:
+                    raise err
+                results.extend(rc)
+        else:
+            results = _calculate(installed_packages)
 
-                    # no difference
-                    fine.append(cl_atom)
-                    continue
+        remove = collections.deque()
+        fine = collections.deque()
+        spm_fine = collections.deque()
+        update = set()
 
-            # don't take action if it's just masked
-            maskedresults = self.atom_match(
-                cl_pkgkey, match_slot = cl_slot,
-                mask_filter = False, match_repo = match_repos)
-            if maskedresults[0] == -1:
-                remove.append(package_id)
+        for outcome in results:
+            if outcome is None:
+                continue
+            kind, value = outcome
+            if kind == "update":
+                update.add(value)
+            elif kind == "fine":
+                fine.append(value)
+            elif kind == "spm_fine":
+                cl_atom, match = value
+                fine.append(cl_atom)
+                spm_fine.append(match)
+            elif kind == "remove":
+                remove.append(value)
 
         # validate remove, do not return installed packages that are
         # still referenced by others as "removable"
@@ -37,8 +37,8 @@ from entropy.exceptions import RepositoryError, SystemDatabaseError, \
 from entropy.db.skel import EntropyRepositoryBase
 from entropy.db.exceptions import Error as EntropyRepositoryError
 from entropy.cache import EntropyCacher
-from entropy.misc import FlockFile
-from entropy.fetchers import UrlFetcher
+from entropy.misc import FlockFile, ParallelTask
+from entropy.fetchers import UrlFetcher, MirrorStatistics
 from entropy.client.interfaces.db import ClientEntropyRepositoryPlugin, \
     InstalledPackagesRepository, AvailablePackagesRepository, GenericRepository
 from entropy.client.mirrors import StatusInterface
@@ -1858,84 +1858,124 @@ class MiscMixin:
 
         return licenses
 
-    def benchmark_mirrors(self, mirrors):
+    def benchmark_mirrors(self, mirrors, max_workers = 5):
         """
-        Execute a throughput-oriented benchmark against the
-        list of given Entropy Packages mirrors. Return a new sorted list.
+        Execute a latency and throughput oriented benchmark against the
+        list of given Entropy Packages mirrors, probing up to max_workers
+        of them at the same time. The results are also recorded into
+        MirrorStatistics. Return a new sorted list (best mirror last).
         """
         # we believe that if a mirror does not respond in 6
         # seconds, then we should give up.
         reasonable_timeout = 6
         mirror_stats = {}
         mirror_cache = set()
-        retries = 1
         mirror_test_file = "MIRROR_TEST"
+        statistics = MirrorStatistics()
+        fetch_errors = (
+            UrlFetcher.TIMEOUT_FETCH_ERROR,
+            UrlFetcher.GENERIC_FETCH_ERROR)
 
+        queue = []
         for mirror in mirrors:
+            url_data = entropy.tools.spliturl(mirror)
+            hostname = url_data.hostname
+            if hostname is None:
+                # mirror string is fucked up
+                continue
+            if hostname in mirror_cache:
+                continue
+            mirror_cache.add(hostname)
+            queue.append((mirror, hostname))
 
+        mytxt = "%s: %s" % (
+            blue(_("Checking speed of mirrors")),
+            purple(str(len(queue))),
+        )
+        self.output(
+            mytxt,
+            importance = 1,
+            level = "info",
+            header = purple(" @@ ")
+        )
+
+        ordered_mirrors = [x for x, _h in queue]
+        queue.reverse()
+        lock = threading.Lock()
+
+        def _benchmark(mirror):
             tmp_fd, tmp_path = const_mkstemp(
                 prefix="entropy.client.methods.reorder_mirrors")
             try:
+                # the outcome is recorded below, only once
+                fetcher = self._url_fetcher(
+                    mirror + "/" + mirror_test_file, tmp_path,
+                    resume = False, show_speed = False,
+                    timeout = reasonable_timeout,
+                    record_statistics = False)
+                rc = fetcher.download()
+            finally:
+                os.close(tmp_fd)
+                os.remove(tmp_path)
 
-                url_data = entropy.tools.spliturl(mirror)
-                hostname = url_data.hostname
-                if hostname is None:
-                    # mirror string is fucked up
-                    continue
-                if hostname in mirror_cache:
-                    continue
-                mirror_cache.add(hostname)
-                mirror_url = mirror + "/" + mirror_test_file
-
-                mytxt = "%s: %s" % (
-                    blue(_("Checking speed of")),
-                    purple(hostname),
-                )
-                self.output(
-                    mytxt,
-                    importance = 1,
-                    level = "info",
-                    header = purple(" @@ "),
-                    back = True
-                )
-
-                download_speeds = []
-                fetch_errors = (
-                    UrlFetcher.TIMEOUT_FETCH_ERROR,
-                    UrlFetcher.GENERIC_FETCH_ERROR)
-                for idx in range(retries):
-                    fetcher = self._url_fetcher(mirror_url, tmp_path,
-                        resume = False, show_speed = False,
-                        timeout = reasonable_timeout)
-                    rc = fetcher.download()
-                    if rc not in fetch_errors:
-                        download_speeds.append(fetcher.get_transfer_rate())
-
-                result_speed = 0.0
-                if download_speeds:
-                    download_speeds.sort(reverse=True)
-                    # take the best
-                    result_speed = download_speeds[0]
-                mirror_stats[mirror] = result_speed
+            if rc in fetch_errors:
+                statistics.record_failure(mirror)
+                return None, 0.0, None
+
+            speed = fetcher.get_transfer_rate()
+            latency = fetcher.get_latency() or 0.0
+            statistics.record(mirror, speed, latency)
+            if speed <= 0:
+                return None, speed, latency
+            exp_time = latency + float(
+                MirrorStatistics.TYPICAL_SIZE) / speed
+            return exp_time, speed, latency
+
+        def _worker():
+            while True:
+                with lock:
+                    if not queue:
+                        return
+                    mirror, hostname = queue.pop()
+
+                exp_time, speed, latency = _benchmark(mirror)
+                if exp_time is None:
+                    # mirror is unreachable, put it at the bottom
+                    exp_time = float("inf")
 
                 mytxt = "%s: %s, %s/sec" % (
                     blue(_("Mirror speed")),
                     purple(hostname),
-                    teal(str(entropy.tools.bytes_into_human(result_speed))),
+                    teal(str(entropy.tools.bytes_into_human(speed))),
                 )
-                self.output(
-                    mytxt,
-                    importance = 1,
-                    level = "info",
-                    header = brown(" @@ ")
-                )
-            finally:
-                os.close(tmp_fd)
-                os.remove(tmp_path)
+                if latency is not None:
+                    mytxt += ", %s: %d ms" % (
+                        blue(_("latency")), int(latency * 1000),)
+                with lock:
+                    mirror_stats[mirror] = exp_time
+                    self.output(
+                        mytxt,
+                        importance = 1,
+                        level = "info",
+                        header = brown(" @@ ")
+                    )
 
-        # calculate new order
-        new_mirrors = sorted(mirror_stats.keys(),
-            key = lambda x: mirror_stats[x])
+        workers = []
+        for _idx in range(min(max(1, max_workers), len(queue))):
+            th = ParallelTask(_worker)
+            th.name = "BenchmarkMirrors"
+            th.daemon = True
+            workers.append(th)
+            th.start()
+        for th in workers:
+            th.join()
+        statistics.save()
+
+        # calculate new order, the fastest mirror is the last one
+        new_mirrors = sorted(
+            ordered_mirrors,
+            key = lambda x: mirror_stats.get(x, float("inf")),
+            reverse = True)
         return new_mirrors
 
     def reorder_mirrors(self, repository_id, dry_run = False):
@@ -2173,7 +2213,8 @@ class MiscMixin:
         @type edb: bool
         @keyword fake: create a fake package (empty)
         @type fake: bool
-        @keyword compression: supported compressions: "gz", "bz2" or "" (no
+        @keyword compression: supported compressions: "gz", "bz2", those
+            listed in etpConst['etpdatabasesupportedcformats'] or "" (no
             compression)
         @type compression: string
         @keyword shiftpath: if package files are stored into an alternative
@@ -2182,8 +2223,8 @@ class MiscMixin:
         @return: path to generated package file or None (if error)
         @rtype: string or None
         """
-        import tarfile
-        if compression not in ("bz2", "", "gz"):
+        supported_compressions = etpConst['etpdatabasesupportedcformats']
+        if compression and compression not in supported_compressions:
             compression = "bz2"
         if shiftpath is None:
             shiftpath = os.path.sep
@@ -2207,7 +2248,8 @@ class MiscMixin:
         if os.path.isfile(pkg_path):
             os.remove(pkg_path)
 
-        tar = tarfile.open(pkg_path, "w:"+compression)
+        tar = entropy.tools.open_tarball(pkg_path, "w",
+            compressor = compression)
 
         if not fake:
 
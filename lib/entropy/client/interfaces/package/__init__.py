@@ -42,6 +42,7 @@ from .actions.install import _PackageInstallAction
 from .actions.multifetch import _PackageMultiFetchAction
 from .actions.remove import _PackageRemoveAction
 from .actions.source import _PackageSourceAction
+from .pipeline import PackageInstallPipeline
 
 
 class PackageActionFactory(object):
@@ -127,6 +128,33 @@ class PackageActionFactory(object):
                 "action does not exist")
         return action_class(self._entropy, package_match, opts = opts)
 
+    def get_install_pipeline(self, package_matches, opts_map = None,
+                             window = 3, unpack = True, multifetch = 1):
+        """
+        Return a PackageInstallPipeline object that fetches and unpacks
+        the given packages in background while they are being installed
+        in order, one by one.
+
+        @param package_matches: ordered list of Entropy package match
+            tuples (package_id, repository_id)
+        @type package_matches: list
+        @keyword opts_map: map of package match -> metadata options to
+            pass to the install PackageAction instances
+        @type opts_map: dict
+        @keyword window: maximum number of packages fetched or unpacked
+            ahead of the one being installed
+        @type window: int
+        @keyword unpack: unpack packages in background
+        @type unpack: bool
+        @keyword multifetch: number of packages downloaded at the same time
+        @type multifetch: int
+        @return: a PackageInstallPipeline instance
+        @rtype: PackageInstallPipeline
+        """
+        return PackageInstallPipeline(
+            self, self._entropy, package_matches, opts_map = opts_map,
+            window = window, unpack = unpack, multifetch = multifetch)
+
 
 class PackageActionFactoryWrapper(PackageActionFactory):
     """
@@ -19,7 +19,8 @@ from entropy.const import etpConst, const_debug_write, const_debug_enabled, \
     const_mkstemp
 from entropy.client.mirrors import StatusInterface
 from entropy.exceptions import InterruptError
-from entropy.fetchers import UrlFetcher
+from entropy.fetchers import UrlFetcher, SegmentedUrlFetcher, \
+    MirrorStatistics
 from entropy.i18n import _
 from entropy.output import red, darkred, blue, purple, darkgreen, brown
 from entropy.security import Repository as RepositorySecurity
@@ -37,6 +38,14 @@ class _PackageFetchAction(PackageAction):
 
     NAME = "fetch"
 
+    # digests of the package files verified by this process, shared by
+    # all the fetch actions so that package files checked more than once
+    # during a transaction (fetch, then install) are read only once.
+    _DIGEST_CACHE = entropy.tools.DigestCache()
+
+    # signature types verified through hashlib
+    _DIGEST_SIGNATURES = ("sha1", "sha256", "sha512")
+
     def __init__(self, entropy_client, package_match, opts = None):
         """
         Object constructor.
@@ -194,8 +203,10 @@ class _PackageFetchAction(PackageAction):
         """
         edelta_local_approved = False
         try:
-            edelta_local_approved = entropy.tools.compare_md5(
-                installed_download_path, installed_checksum)
+            digests = entropy.tools.multi_digest(
+                installed_download_path, ("md5",),
+                cache = self._DIGEST_CACHE)
+            edelta_local_approved = digests['md5'] == str(installed_checksum)
         except (OSError, IOError) as err:
             const_debug_write(
                 __name__, "_approve_edelta_unlocked, error: %s" % (err,))
@@ -538,7 +549,8 @@ class _PackageFetchAction(PackageAction):
 
         def do_get_md5sum(path):
             try:
-                return entropy.tools.md5sum(path)
+                return entropy.tools.multi_digest(
+                    path, ("md5",), cache = self._DIGEST_CACHE)['md5']
             except IOError:
                 return None
             except OSError:
@@ -634,8 +646,113 @@ class _PackageFetchAction(PackageAction):
 
         return 0, data_transfer, resumed
 
+    def _download_package_segmented(self, repository_id, uris, download,
+                                    download_path, checksum, size,
+                                    mirror_status, resume = True):
+        """
+        Download the package file from several mirrors at the same time,
+        if segmented downloads are enabled and the file (whose size in
+        bytes is given by size) is big enough.
+        Return None if the package should be downloaded one mirror at a
+        time instead, otherwise an exit status like _download_package().
+        """
+        threshold = self._entropy.ClientSettings()['misc'][
+            'segmented_download']
+        if not threshold:
+            return None
+
+        if not size or size < threshold * 1024 * 1024:
+            return None
+
+        mirrors = []
+        for uri in uris:
+            if uri in mirrors:
+                continue
+            if not SegmentedUrlFetcher.supports_url(uri):
+                continue
+            if mirror_status.get_failing_mirror_status(uri) >= 30:
+                continue
+            mirrors.append(uri)
+        if len(mirrors) < 2:
+            return None
+        mirrors = mirrors[:SegmentedUrlFetcher.MAX_MIRRORS]
+
+        download_path_dir = os.path.dirname(download_path)
+        try:
+            os.makedirs(download_path_dir, 0o755)
+        except OSError as err:
+            if err.errno != errno.EEXIST:
+                return None
+
+        avail_data = self._settings['repositories']['available']
+        repo_data = avail_data[repository_id]
+        https_validate_cert = not repo_data.get(
+            'https_validate_cert') == "false"
+
+        txt = "%s: %s" % (
+            blue(_("Downloading from")),
+            red(", ".join([self._get_url_name(x) for x in mirrors])),
+        )
+        self._entropy.output(
+            txt,
+            importance = 1,
+            level = "warning",
+            header = red("   ## ")
+        )
+
+        fetch_intf = SegmentedUrlFetcher(
+            [uri + "/" + download for uri in mirrors], download_path,
+            size, resume = resume,
+            abort_check_func = self._meta.get('fetch_abort_function'),
+            http_basic_user = repo_data.get('username'),
+            http_basic_pwd = repo_data.get('password'),
+            https_validate_cert = https_validate_cert)
+        try:
+            fetch_checksum = fetch_intf.download()
+        except (KeyboardInterrupt, InterruptError):
+            return 1
+        except Exception:
+            if const_debug_enabled():
+                entropy.tools.print_traceback()
+            return None
+
+        if fetch_checksum != checksum:
+            error_message = blue("%s: %s") % (
+                _("Error downloading from"),
+                red(", ".join([self._get_url_name(x) for x in mirrors])),
+            )
+            if fetch_checksum not in (UrlFetcher.GENERIC_FETCH_ERROR,
+                                      UrlFetcher.TIMEOUT_FETCH_ERROR):
+                error_message += " - %s." % (_("wrong checksum"),)
+                try:
+                    os.remove(download_path)
+                except OSError:
+                    pass
+            self._entropy.output(
+                error_message,
+                importance = 1,
+                level = "warning",
+                header = red("   ## ")
+            )
+            # fall back to one mirror at a time
+            return None
+
+        txt = "%s: " % (blue(_("Successfully downloaded from")),)
+        txt += red(", ".join([self._get_url_name(x) for x in mirrors]))
+        human_bytes = entropy.tools.bytes_into_human(
+            fetch_intf.get_transfer_rate())
+        txt += " %s %s/%s" % (_("at"), human_bytes, _("second"),)
+        self._entropy.output(
+            txt,
+            importance = 1,
+            level = "info",
+            header = red("   ## ")
+        )
+        return 0
+
     def _download_package(self, package_id, repository_id, download,
-                          download_path, checksum, resume = True):
+                          download_path, checksum, resume = True,
+                          size = None):
 
         avail_data = self._settings['repositories']['available']
         excluded_data = self._settings['repositories']['excluded']
@@ -666,9 +783,20 @@ class _PackageFetchAction(PackageAction):
             else:
                 uris = avail_data[repository_id]['packages'][::-1]
 
+        # try the mirrors that performed better in the past first
+        uris = MirrorStatistics().sort(uris)
+
         remaining = set(uris)
         mirror_status = StatusInterface()
 
+        if size is None:
+            size = repo.retrieveSize(package_id)
+        exit_st = self._download_package_segmented(
+            repository_id, uris, download, download_path, checksum, size,
+            mirror_status, resume = resume)
+        if exit_st is not None:
+            return exit_st
+
         mirrorcount = 0
         for uri in uris:
 
@@ -860,7 +988,7 @@ class _PackageFetchAction(PackageAction):
                 header = darkred("   ## ")
             )
 
-        def _fetch(path, download, checksum):
+        def _fetch(path, download, checksum, size = None):
             txt = "%s: %s" % (
                 blue(_("Downloading")),
                 red(os.path.basename(download)),)
@@ -870,13 +998,17 @@ class _PackageFetchAction(PackageAction):
                 level = "info",
                 header = red("   ## ")
             )
-            return self._download_package(
-                self._package_id,
-                self._repository_id,
-                download,
-                path,
-                checksum
-            )
+            try:
+                return self._download_package(
+                    self._package_id,
+                    self._repository_id,
+                    download,
+                    path,
+                    checksum,
+                    size = size
+                )
+            finally:
+                MirrorStatistics().save()
 
         locks = []
         try:
@@ -940,7 +1072,8 @@ class _PackageFetchAction(PackageAction):
                         download_st = _fetch(
                             download_path,
                             extra_download['download'],
-                            extra_download['md5'])
+                            extra_download['md5'],
+                            size = extra_download['size'])
 
                         if download_st == 0:
                             verify_st = self._match_checksum(
@@ -1045,12 +1178,19 @@ class _PackageFetchAction(PackageAction):
                 )
             return False
 
+        # filled below, reading the package file only once
+        digests = {}
+
+        def digest_comparator(hash_type):
+            def do_compare_digest(pkg_path, hash_val):
+                return digests.get(hash_type) == str(hash_val)
+            return do_compare_digest
+
         signature_vry_map = {
-            'sha1': entropy.tools.compare_sha1,
-            'sha256': entropy.tools.compare_sha256,
-            'sha512': entropy.tools.compare_sha512,
             'gpg': do_compare_gpg,
         }
+        for hash_type in self._DIGEST_SIGNATURES:
+            signature_vry_map[hash_type] = digest_comparator(hash_type)
 
         def do_signatures_validation(signatures):
             # check signatures, if available
@@ -1131,10 +1271,23 @@ class _PackageFetchAction(PackageAction):
             header = red("   ## ")
         )
 
+        # signatures are not verified again if the file has not been
+        # touched since the last successful verification
+        verify_signatures = do_mtime_validation() != 0
+
+        digest_algorithms = ["md5"]
+        if verify_signatures and isinstance(signatures, dict):
+            digest_algorithms.extend(
+                x for x in self._DIGEST_SIGNATURES \
+                    if x in enabled_hashes and signatures.get(x))
+
         download_name = os.path.basename(download_path)
         valid_checksum = False
         try:
-            valid_checksum = entropy.tools.compare_md5(download_path, checksum)
+            digests.update(entropy.tools.multi_digest(
+                download_path, digest_algorithms,
+                cache = self._DIGEST_CACHE))
+            valid_checksum = digests['md5'] == str(checksum)
         except (OSError, IOError) as err:
             valid_checksum = False
             const_debug_write(
@@ -1170,7 +1323,7 @@ class _PackageFetchAction(PackageAction):
 
         # check if package has been already checked
         validated = True
-        if do_mtime_validation() != 0:
+        if verify_signatures:
             validated = do_signatures_validation(signatures) == 0
 
         if not validated:
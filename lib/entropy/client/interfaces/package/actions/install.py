@@ -60,6 +60,11 @@ class _PackageInstallAction(_PackageInstallRemoveAction):
         if self._meta is not None:
             meta = self._meta
             self._meta = None
+            if not meta['started']:
+                # unpacked (or set up) but never installed, the
+                # cleanup phase did not run.
+                unpack_dir = const_convert_to_rawstring(meta['unpackdir'])
+                shutil.rmtree(unpack_dir, True)
             meta.clear()
 
     def _get_remove_package_id_unlocked(self, inst_repo):
@@ -227,9 +232,10 @@ class _PackageInstallAction(_PackageInstallRemoveAction):
         metadata['phases'].append(self._remove_conflicts_phase)
 
         if metadata['merge_from']:
-            metadata['phases'].append(self._merge_phase)
+            metadata['unpack_phase'] = self._merge_phase
         else:
-            metadata['phases'].append(self._unpack_phase)
+            metadata['unpack_phase'] = self._unpack_phase
+        metadata['phases'].append(metadata['unpack_phase'])
 
         metadata['phases'].append(self._setup_package_phase)
         metadata['phases'].append(self._tarball_ownership_fixup_phase)
@@ -242,17 +248,65 @@ class _PackageInstallAction(_PackageInstallRemoveAction):
         # the install trigger
         metadata['__install_trigger__'] = {}
 
+        # set when the SPM setup hook has been executed and when
+        # _run() is called.
+        metadata['setup_hook_done'] = False
+        metadata['started'] = False
+
         self._meta = metadata
 
-    def _run(self):
+    def _setup_hook(self):
         """
-        Execute the action. Return an exit status.
+        Execute the SPM install setup hook, once.
         """
-        self.setup()
+        if self._meta['setup_hook_done']:
+            return 0
 
         spm_class = self._entropy.Spm_class()
         exit_st = spm_class.entropy_install_setup_hook(
             self._entropy, self._meta)
+        if exit_st == 0:
+            self._meta['setup_hook_done'] = True
+        return exit_st
+
+    def unpack(self):
+        """
+        Execute the unpack (or merge from) phase in advance, so that
+        start() will not do it again. This makes possible to unpack
+        a package, even from another thread, while a previous one is
+        being installed. Nothing is written to the terminal, a failure
+        is reported by start() only if it fails again. This method must
+        not be called concurrently with the other methods of this
+        object. Return an exit status.
+        """
+        self.setup()
+
+        exit_st = self._setup_hook()
+        if exit_st != 0:
+            return exit_st
+
+        unpack_phase = self._meta['unpack_phase']
+        if unpack_phase not in self._meta['phases']:
+            # already done
+            return 0
+
+        exit_st = unpack_phase(background = True)
+        if exit_st == 0:
+            self._meta['phases'].remove(unpack_phase)
+        else:
+            # start() will try again from scratch
+            image_dir = const_convert_to_rawstring(self._meta['imagedir'])
+            shutil.rmtree(image_dir, True)
+        return exit_st
+
+    def _run(self):
+        """
+        Execute the action. Return an exit status.
+        """
+        self.setup()
+        self._meta['started'] = True
+
+        exit_st = self._setup_hook()
         if exit_st != 0:
             return exit_st
 
@@ -347,20 +401,23 @@ class _PackageInstallAction(_PackageInstallRemoveAction):
 
         return 0
 
-    def _unpack_package(self, package_path, image_dir, pkg_dbpath):
+    def _unpack_package(self, package_path, image_dir, pkg_dbpath,
+                        quiet = False):
         """
-        Effectively unpack the package tarballs.
+        Effectively unpack the package tarballs. If quiet is True,
+        nothing is written to the terminal, errors are only logged.
         """
-        txt = "%s: %s" % (
-            blue(_("Unpacking")),
-            red(os.path.basename(package_path)),
-        )
-        self._entropy.output(
-            txt,
-            importance = 1,
-            level = "info",
-            header = red("   ## ")
-        )
+        if not quiet:
+            txt = "%s: %s" % (
+                blue(_("Unpacking")),
+                red(os.path.basename(package_path)),
+            )
+            self._entropy.output(
+                txt,
+                importance = 1,
+                level = "info",
+                header = red("   ## ")
+            )
 
         self._entropy.logger.log(
             "[Package]",
@@ -391,12 +448,13 @@ class _PackageInstallAction(_PackageInstallRemoveAction):
                     "Unable to mkdir: %s, error: %s" % (
                         image_dir, repr(err),)
                 )
-                self._entropy.output(
-                    "%s: %s" % (brown(_("Unpack error")), err.errno,),
-                    importance = 1,
-                    level = "error",
-                    header = red("   ## ")
-                )
+                if not quiet:
+                    self._entropy.output(
+                        "%s: %s" % (brown(_("Unpack error")), err.errno,),
+                        importance = 1,
+                        level = "error",
+                        header = red("   ## ")
+                    )
                 return 1
 
         # pkg_dbpath is only non-None for the base package file
@@ -423,12 +481,13 @@ class _PackageInstallAction(_PackageInstallRemoveAction):
                     "[Package]", etpConst['logging']['normal_loglevel_id'],
                     "Unable to dump edb for: " + pkg_dbpath
                 )
-                self._entropy.output(
-                    brown(_("Unable to find Entropy metadata in package")),
-                    importance = 1,
-                    level = "error",
-                    header = red("   ## ")
-                )
+                if not quiet:
+                    self._entropy.output(
+                        brown(_("Unable to find Entropy metadata in package")),
+                        importance = 1,
+                        level = "error",
+                        header = red("   ## ")
+                    )
                 return 1
 
         try:
@@ -443,7 +502,8 @@ class _PackageInstallAction(_PackageInstallRemoveAction):
                 "EOFError on " + package_path + " " + \
                 repr(err)
             )
-            entropy.tools.print_traceback()
+            if not quiet:
+                entropy.tools.print_traceback()
             # try again until unpack_tries goes to 0
             exit_st = 1
         except Exception as err:
@@ -453,7 +513,8 @@ class _PackageInstallAction(_PackageInstallRemoveAction):
                 "Ouch! error while unpacking " + \
                 package_path + " " + repr(err)
             )
-            entropy.tools.print_traceback()
+            if not quiet:
+                entropy.tools.print_traceback()
             # try again until unpack_tries goes to 0
             exit_st = 1
 
@@ -462,12 +523,13 @@ class _PackageInstallAction(_PackageInstallRemoveAction):
                 "[Package]", etpConst['logging']['normal_loglevel_id'],
                 "Unable to unpack: %s" % (package_path,)
             )
-            self._entropy.output(
-                brown(_("Unable to unpack package")),
-                importance = 1,
-                level = "error",
-                header = red("   ## ")
-            )
+            if not quiet:
+                self._entropy.output(
+                    brown(_("Unable to unpack package")),
+                    importance = 1,
+                    level = "error",
+                    header = red("   ## ")
+                )
 
         return exit_st
 
@@ -528,27 +590,30 @@ class _PackageInstallAction(_PackageInstallRemoveAction):
                 os.chown(topath, user, group)
                 shutil.copystat(path, topath)
 
-    def _merge_phase(self):
+    def _merge_phase(self, background = False):
         """
-        Execute the merge (from) phase.
+        Execute the merge (from) phase. If background is True, the
+        phase is run ahead by unpack() and nothing is written to
+        the terminal.
         """
-        xterm_title = "%s %s: %s" % (
-            self._xterm_header,
-            _("Merging"),
-            self._meta['atom'],
-        )
-        self._entropy.set_title(xterm_title)
+        if not background:
+            xterm_title = "%s %s: %s" % (
+                self._xterm_header,
+                _("Merging"),
+                self._meta['atom'],
+            )
+            self._entropy.set_title(xterm_title)
 
-        txt = "%s: %s" % (
-            blue(_("Merging package")),
-            red(self._meta['atom']),
-        )
-        self._entropy.output(
-            txt,
-            importance = 1,
-            level = "info",
-            header = red("   ## ")
-        )
+            txt = "%s: %s" % (
+                blue(_("Merging package")),
+                red(self._meta['atom']),
+            )
+            self._entropy.output(
+                txt,
+                importance = 1,
+                level = "info",
+                header = red("   ## ")
+            )
         self._entropy.logger.log(
             "[Package]",
             etpConst['logging']['normal_loglevel_id'],
@@ -561,18 +626,35 @@ class _PackageInstallAction(_PackageInstallRemoveAction):
         return spm_class.entropy_install_unpack_hook(self._entropy,
             self._meta)
 
-    def _unpack_phase(self):
+    def _unpack_phase(self, background = False):
         """
-        Execute the unpack phase.
+        Execute the unpack phase. If background is True, the phase is
+        run ahead by unpack(): nothing is written to the terminal and
+        the error, if any, is kept in the metadata until start() tries
+        again and fails as well.
         """
-        xterm_title = "%s %s: %s" % (
-            self._xterm_header,
-            _("Unpacking"),
-            self._meta['download'],
-        )
-        self._entropy.set_title(xterm_title)
+        if not background:
+            xterm_title = "%s %s: %s" % (
+                self._xterm_header,
+                _("Unpacking"),
+                self._meta['download'],
+            )
+            self._entropy.set_title(xterm_title)
 
         def _unpack_error(exit_st):
+            if background:
+                self._meta['unpack_error'] = exit_st
+                return
+
+            ahead_exit_st = self._meta.pop('unpack_error', None)
+            if ahead_exit_st is not None:
+                self._entropy.logger.log(
+                    "[Package]",
+                    etpConst['logging']['normal_loglevel_id'],
+                    "Unpacking ahead %s failed as well, error: %s" % (
+                        self._meta['atom'], ahead_exit_st,)
+                )
+
             msg = _("An error occurred while trying to unpack the package")
             errormsg = "%s. %s. %s: %s" % (
                 red(msg),
@@ -606,7 +688,8 @@ class _PackageInstallAction(_PackageInstallRemoveAction):
                 exit_st = self._unpack_package(
                     download_path,
                     self._meta['imagedir'],
-                    self._meta['pkgdbpath'])
+                    self._meta['pkgdbpath'],
+                    quiet = background)
 
                 if exit_st != 0:
                     const_debug_write(
@@ -634,7 +717,8 @@ class _PackageInstallAction(_PackageInstallRemoveAction):
                     exit_st = self._unpack_package(
                         download_path,
                         self._meta['imagedir'],
-                        None)
+                        None,
+                        quiet = background)
 
                     if exit_st != 0:
                         const_debug_write(
@@ -17,7 +17,7 @@ import threading
 from entropy.const import etpConst, const_setup_perms, const_mkstemp
 from entropy.client.mirrors import StatusInterface
 from entropy.exceptions import InterruptError
-from entropy.fetchers import UrlFetcher
+from entropy.fetchers import UrlFetcher, MirrorStatistics
 from entropy.output import blue, darkblue, bold, red, darkred, brown, darkgreen
 from entropy.i18n import _, ngettext
 
@@ -84,7 +84,11 @@ class _PackageMultiFetchAction(_PackageFetchAction):
 
         metadata['matches'] = self._package_matches
 
+        # file sizes are only needed by segmented downloads
+        segmented_download = misc_settings['segmented_download']
+
         download_list = []
+        download_sizes = {}
 
         for package_id, repository_id in self._package_matches:
 
@@ -106,6 +110,8 @@ class _PackageMultiFetchAction(_PackageFetchAction):
 
             obj = (package_id, repository_id, download, digest, signatures)
             download_list.append(obj)
+            if segmented_download:
+                download_sizes[download] = repo.retrieveSize(package_id)
 
             splitdebug = metadata['splitdebug']
             # if splitdebug is enabled, check if it's also enabled
@@ -130,8 +136,11 @@ class _PackageMultiFetchAction(_PackageFetchAction):
 
                 obj = (package_id, repository_id, download, digest, signatures)
                 download_list.append(obj)
+                if segmented_download:
+                    download_sizes[download] = extra_download['size']
 
         metadata['multi_fetch_list'] = download_list
+        metadata['multi_fetch_sizes'] = download_sizes
 
         metadata['phases'] = []
         if metadata['multi_fetch_list']:
@@ -369,7 +378,9 @@ class _PackageMultiFetchAction(_PackageFetchAction):
              installed_download_path) = url_data_map[url_data_map_idx]
 
             try:
-                valid = entropy.tools.compare_md5(dest_path, orig_cksum)
+                digests = entropy.tools.multi_digest(
+                    dest_path, ("md5",), cache = self._DIGEST_CACHE)
+                valid = digests['md5'] == str(orig_cksum)
             except (IOError, OSError):
                 valid = False
 
@@ -526,6 +537,58 @@ class _PackageMultiFetchAction(_PackageFetchAction):
 
         return exit_st, failed_map, fetch_intf.get_transfer_rate()
 
+    def _download_packages_segmented(self, download_list, repo_uris,
+                                     mirror_status):
+        """
+        Download the big package files in download_list from several
+        mirrors at the same time, if segmented downloads are enabled.
+        Return a tuple composed by an exit status (like
+        _download_packages()) and the list of files that still have to
+        be downloaded one mirror at a time.
+        """
+        sizes = self._meta['multi_fetch_sizes']
+        if not sizes:
+            return 0, download_list
+
+        remaining_list = []
+        for item in download_list:
+            pkg_id, repository_id, fname, cksum, signs = item
+
+            size = sizes.get(fname)
+            download_path = self.get_standard_fetch_disk_path(fname)
+
+            lock = None
+            try:
+                lock = self.path_lock(download_path)
+                with lock.exclusive():
+
+                    if self._stat_path(download_path):
+                        verify_st = self._match_checksum(
+                            download_path, repository_id, cksum, signs)
+                        if verify_st == 0:
+                            # already available
+                            continue
+
+                    exit_st = self._download_package_segmented(
+                        repository_id, repo_uris[repository_id], fname,
+                        download_path, cksum, size, mirror_status)
+                    if exit_st is None:
+                        remaining_list.append(item)
+                        continue
+                    if exit_st != 0:
+                        return exit_st, []
+
+                    verify_st = self._match_checksum(
+                        download_path, repository_id, cksum, signs)
+                    if verify_st != 0:
+                        remaining_list.append(item)
+
+            finally:
+                if lock is not None:
+                    lock.close()
+
+        return 0, remaining_list
+
     def _download_packages(self, download_list):
         """
         Internal function. Download packages.
@@ -568,9 +631,21 @@ class _PackageMultiFetchAction(_PackageFetchAction):
             for new_obj in new_ones:
                 obj.insert(0, new_obj)
 
+        # try the mirrors that performed better in the past first
+        statistics = MirrorStatistics()
+        for repository_id, uris in repo_uris.items():
+            repo_uris[repository_id] = statistics.sort(uris)
+
         remaining = repo_uris.copy()
         mirror_status = StatusInterface()
 
+        exit_st, download_list = self._download_packages_segmented(
+            download_list, repo_uris, mirror_status)
+        if exit_st != 0:
+            return exit_st, []
+        if not download_list:
+            return 0, []
+
         def get_best_mirror(repository_id):
             try:
                 return remaining[repository_id][0]
@@ -838,8 +913,11 @@ class _PackageMultiFetchAction(_PackageFetchAction):
             header = red("   ## ")
         )
 
-        exit_st, err_list = self._download_packages(
-            self._meta['multi_fetch_list'])
+        try:
+            exit_st, err_list = self._download_packages(
+                self._meta['multi_fetch_list'])
+        finally:
+            MirrorStatistics().save()
         if exit_st == 0:
             return 0
 
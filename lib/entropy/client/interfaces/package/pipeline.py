@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+"""
+
+    @author: Fabio Erculiani <lxnay@sabayon.org>
+    @contact: lxnay@sabayon.org
+    @copyright: Fabio Erculiani
+    @license: GPL-2
+
+    B{Entropy Package Manager Client Package Install Pipeline}.
+
+"""
+import os
+import threading
+
+from entropy.const import etpConst, const_debug_write
+from entropy.exceptions import InterruptError
+from entropy.misc import ParallelTask
+
+
+class PackageInstallPipeline(object):
+    """
+    Execute the installation of an ordered list of packages as a
+    pipeline of three stages:
+
+    1. fetch: a background thread downloads (and verifies) the packages,
+       at most "window" packages ahead of the one being installed.
+    2. unpack: a background thread unpacks the fetched packages into their
+       image directories, at most "window" packages ahead of the one
+       being installed and as long as there is enough free disk space.
+    3. merge: the caller thread consumes the install actions through
+       next(), in order, and calls start() on them.
+
+    Example code:
+
+    >>> factory = PackageActionFactory(entropy_client)
+    >>> pipeline = factory.get_install_pipeline(package_matches)
+    >>> pipeline.start()
+    >>> try:
+    ...     for package_match in package_matches:
+    ...         pkg, exit_st = pipeline.next()
+    ...         if exit_st != 0:
+    ...             break # fetch error
+    ...         try:
+    ...             exit_st = pkg.start()
+    ...         finally:
+    ...             pkg.finalize()
+    ... finally:
+    ...     pipeline.stop()
+
+    The install actions returned by next() must be used by the caller
+    thread only. next() must not be called while holding the Installed
+    Packages Repository lock in exclusive mode.
+    """
+
+    # minimum free space (in bytes) to keep in the unpack directory
+    # when unpacking packages ahead.
+    RESERVED_SPACE = 256 * 1024 * 1024
+
+    def __init__(self, action_factory, entropy_client, package_matches,
+                 opts_map = None, window = 3, unpack = True,
+                 multifetch = 1):
+        """
+        Object constructor.
+
+        @param action_factory: a PackageActionFactory instance
+        @type action_factory: PackageActionFactory
+        @param entropy_client: a valid Client instance.
+        @type entropy_client: entropy.client.interfaces.Client
+        @param package_matches: ordered list of package matches to install
+        @type package_matches: list
+        @keyword opts_map: map of package match -> install action options
+        @type opts_map: dict
+        @keyword window: maximum number of packages fetched or unpacked
+            ahead of the one being installed
+        @type window: int
+        @keyword unpack: if False, packages are not unpacked in background
+            while others are being installed (for low memory systems)
+        @type unpack: bool
+        @keyword multifetch: number of packages downloaded at the same time
+        @type multifetch: int
+        """
+        self._factory = action_factory
+        self._entropy = entropy_client
+        self._matches = list(package_matches)
+        if opts_map is None:
+            opts_map = {}
+        self._opts_map = opts_map
+        self._window = max(1, window)
+        self._unpack = unpack
+        self._multifetch = max(1, multifetch)
+
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._threads = []
+
+        # index of the next package that next() will return
+        self._merged = 0
+        # number of fetched packages and fetch exit status
+        self._fetched = 0
+        self._fetch_status = 0
+        # install actions created and not yet returned by next()
+        self._actions = {}
+        # index of the next package that the unpack thread will consider
+        self._unpacked = 0
+        # index of the package being unpacked, or None
+        self._unpacking = None
+        # packages unpacked ahead and not yet fully installed
+        self._unpacked_ahead = set()
+
+    def start(self):
+        """
+        Start the fetch and unpack background threads.
+        """
+        fetch_th = ParallelTask(self._fetch_thread)
+        fetch_th.name = "PackageInstallPipelineFetch"
+        fetch_th.daemon = True
+        self._threads.append(fetch_th)
+
+        if self._unpack:
+            unpack_th = ParallelTask(self._unpack_thread)
+            unpack_th.name = "PackageInstallPipelineUnpack"
+            unpack_th.daemon = True
+            self._threads.append(unpack_th)
+
+        for th in self._threads:
+            th.start()
+
+    def stop(self):
+        """
+        Stop the background threads and release the resources of the
+        install actions that have not been returned by next().
+        """
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+        for th in self._threads:
+            th.join()
+        del self._threads[:]
+
+        with self._cond:
+            actions = list(self._actions.values())
+            self._actions.clear()
+        for pkg in actions:
+            pkg.finalize()
+
+    def fetch_status(self):
+        """
+        Return the exit status of the fetch stage, which is meaningful
+        once all the packages have been returned by next().
+        """
+        with self._cond:
+            return self._fetch_status
+
+    def next(self):
+        """
+        Return the install action of the next package in the queue and
+        an exit status. If the exit status is not 0, the package could
+        not be fetched and the installation must be aborted.
+
+        @return: tuple composed by the install action object (or None)
+            and an exit status
+        @rtype: tuple
+        """
+        with self._cond:
+            idx = self._merged
+            if idx >= len(self._matches):
+                raise IndexError("no more packages")
+
+            # make sure that the install actions inside the window exist,
+            # they are created here to keep them out of the other threads
+            self._populate_actions()
+
+            # wait for the fetch stage
+            while self._fetched <= idx and self._fetch_status == 0:
+                self._cond.wait()
+            if self._fetched <= idx:
+                return None, self._fetch_status
+
+            # wait for the package being unpacked, if it is this one
+            while self._unpacking == idx:
+                self._cond.wait()
+
+            # the previous packages have been installed, their images
+            # are gone
+            self._unpacked_ahead.difference_update(
+                [x for x in self._unpacked_ahead if x < idx])
+            pkg = self._actions.pop(idx)
+            self._merged += 1
+            if self._unpacked <= idx:
+                # not unpacked ahead, start() will do that
+                self._unpacked = idx + 1
+            self._populate_actions()
+            self._cond.notify_all()
+            return pkg, 0
+
+    def _populate_actions(self):
+        """
+        Create the install actions for the packages inside the window.
+        Must be called with self._cond acquired.
+        """
+        end = min(len(self._matches), self._merged + self._window + 1)
+        for idx in range(self._merged, end):
+            if idx in self._actions:
+                continue
+            package_match = self._matches[idx]
+            pkg = self._factory.get(
+                self._factory.INSTALL_ACTION, package_match,
+                opts = self._opts_map.get(package_match))
+            pkg.setup()
+            self._actions[idx] = pkg
+        self._cond.notify_all()
+
+    def _abort_check(self):
+        """
+        Fetch abort function, interrupts the downloads on stop().
+        """
+        if self._stopped:
+            raise InterruptError("install pipeline stopped")
+
+    def _fetch_thread(self):
+        """
+        Fetch stage thread body.
+        """
+        total = len(self._matches)
+        idx = 0
+        while idx < total:
+            with self._cond:
+                while not self._stopped and \
+                        idx >= self._merged + self._window:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+
+            matches = self._matches[idx:idx + self._multifetch]
+            opts = {
+                'fetch_abort_function': self._abort_check,
+            }
+            if len(matches) > 1:
+                pkg = self._factory.get(
+                    self._factory.MULTI_FETCH_ACTION, matches, opts = opts)
+            else:
+                pkg = self._factory.get(
+                    self._factory.FETCH_ACTION, matches[0], opts = opts)
+
+            try:
+                exit_st = pkg.start()
+            except Exception as err:
+                const_debug_write(
+                    __name__,
+                    "PackageInstallPipeline fetch error: %s" % (
+                        repr(err),))
+                exit_st = 1
+            finally:
+                pkg.finalize()
+
+            with self._cond:
+                if exit_st != 0:
+                    self._fetch_status = exit_st
+                    self._cond.notify_all()
+                    return
+                idx += len(matches)
+                self._fetched = idx
+                self._cond.notify_all()
+
+    def _has_free_space(self, idx):
+        """
+        Return whether there is enough free space in the unpack directory
+        to unpack the given package ahead. Must be called with
+        self._cond acquired.
+        """
+        package_id, repository_id = self._matches[idx]
+        repo = self._entropy.open_repository(repository_id)
+        size = repo.retrieveOnDiskSize(package_id) or 0
+
+        unpack_dir = etpConst['entropyunpackdir']
+        try:
+            st = os.statvfs(unpack_dir)
+        except (OSError, IOError):
+            return True
+        free = st.f_bavail * st.f_frsize
+        return free > size + self.RESERVED_SPACE
+
+    def _unpack_thread(self):
+        """
+        Unpack stage thread body.
+        """
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopped:
+                        return
+                    idx = self._unpacked
+                    if idx >= len(self._matches):
+                        return
+                    if idx >= self._fetched:
+                        if self._fetch_status != 0:
+                            return
+                    elif idx in self._actions:
+                        if self._has_free_space(idx):
+                            break
+                        if not self._unpacked_ahead:
+                            # nothing to wait for, let start() do it
+                            self._unpacked = idx + 1
+                            continue
+                    self._cond.wait()
+
+                pkg = self._actions[idx]
+                self._unpacking = idx
+
+            try:
+                exit_st = pkg.unpack()
+            except Exception as err:
+                const_debug_write(
+                    __name__,
+                    "PackageInstallPipeline unpack error: %s" % (
+                        repr(err),))
+                exit_st = 1
+
+            with self._cond:
+                self._unpacking = None
+                if exit_st == 0:
+                    self._unpacked_ahead.add(idx)
+                self._unpacked = idx + 1
+                self._cond.notify_all()
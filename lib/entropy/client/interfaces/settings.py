@@ -386,6 +386,9 @@ class ClientSystemSettingsPlugin(SystemSettingsPlugin):
             'splitdebug': etpConst['splitdebug'],
             'splitdebug_dirs': etpConst['splitdebug_dirs'],
             'multifetch': 1,
+            'install_pipeline': 3,
+            'install_pipeline_unpack': True,
+            'segmented_download': 0, # disabled by default
             'collisionprotect': etpConst['collisionprotect'],
             'configprotect': set(),
             'configprotectmask': set(),
@@ -439,6 +442,33 @@ class ClientSystemSettingsPlugin(SystemSettingsPlugin):
                 if bool_setting:
                     data['multifetch'] = 3
 
+        def _install_pipeline(setting):
+            int_setting = entropy.tools.setting_to_int(setting, 0, 20)
+            bool_setting = entropy.tools.setting_to_bool(setting)
+            if int_setting is not None:
+                data['install_pipeline'] = int_setting
+            elif bool_setting is not None:
+                if bool_setting:
+                    data['install_pipeline'] = 3
+                else:
+                    data['install_pipeline'] = 0
+
+        def _install_pipeline_unpack(setting):
+            bool_setting = entropy.tools.setting_to_bool(setting)
+            if bool_setting is not None:
+                data['install_pipeline_unpack'] = bool_setting
+
+        def _segmented_download(setting):
+            int_setting = entropy.tools.setting_to_int(setting, 0, None)
+            bool_setting = entropy.tools.setting_to_bool(setting)
+            if int_setting is not None:
+                data['segmented_download'] = int_setting
+            elif bool_setting is not None:
+                if bool_setting:
+                    data['segmented_download'] = 64
+                else:
+                    data['segmented_download'] = 0
+
         def _gpg(setting):
             bool_setting = entropy.tools.setting_to_bool(setting)
             if bool_setting is not None:
@@ -485,6 +515,9 @@ class ClientSystemSettingsPlugin(SystemSettingsPlugin):
             'packagehashes': _packagehashes,
             'package-hashes': _packagehashes,
             'multifetch': _multifetch,
+            'install-pipeline': _install_pipeline,
+            'install-pipeline-unpack': _install_pipeline_unpack,
+            'segmented-download': _segmented_download,
             'gpg': _gpg,
             'ignore-spm-downgrades': _spm_downgrades,
             'splitdebug': _splitdebug,
@@ -51,6 +51,26 @@ except ImportError:
     import _thread as thread
 from entropy.i18n import _, ENCODING, RAW_ENCODING
 
+# optional compression modules, the xz and zstd formats are
+# only offered when the respective module is available.
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+try:
+    # Python 3.14+
+    from compression import zstd as _zstd
+    _zstd_open = _zstd.ZstdFile
+except ImportError:
+    try:
+        import zstandard as _zstd
+        _zstd_open = getattr(_zstd, "open", None)
+    except ImportError:
+        _zstd_open = None
+
 # Setup debugger hook on SIGUSR1
 def debug_signal(signum, frame):
     import pdb
@@ -337,6 +357,17 @@ def const_default_settings(rootdir):
         'etpdatabaserestrictedfile': default_etp_dbfile+".restricted",
         # the local/remote database revision file
         'etpdatabaserevisionfile': default_etp_dbfile+".revision",
+        # the local/remote index of the available revision-to-revision
+        # repository deltas, one "<from> <to> <file name> <md5>" per line
+        'etpdatabasedeltasfile': default_etp_dbfile+".deltas",
+        # repository delta file name prefix, delta files are named
+        # <prefix>.<from revision>-<to revision>.tar.bz2
+        'etpdatabasedeltafile': default_etp_dbfile+".delta",
+        # delta metadata file, shipped inside every delta file
+        'etpdatabasedeltametafile': default_etp_dbfile+".delta_meta",
+        # server-side packages digests of the last uploaded revision,
+        # used to generate the next delta
+        'etpdatabasedeltastatefile': default_etp_dbfile+".delta_state",
         # missing dependencies black list file
         'etpdatabasemissingdepsblfile': default_etp_dbfile + \
             ".missing_deps_blacklist",
@@ -403,6 +434,31 @@ def const_default_settings(rootdir):
         'etpdatabasedumplighthashfilebz2': default_etp_dbfile+".dumplight.bz2.md5",
         'etpdatabasedumplighthashfilegzip': default_etp_dbfile+".dumplight.gz.md5",
         'etpdatabasedumplight': default_etp_dbfile+".dumplight",
+
+        # Entropy sqlite database files (xz), only used if lzma is available
+        'etpdatabasefilexz': default_etp_dbfile+".xz",
+        'etpdatabasefilexzhash': default_etp_dbfile+".xz.md5",
+        'etpdatabasefilexzlight': default_etp_dbfile+".light.xz",
+        'etpdatabasefilehashxzlight': default_etp_dbfile+".light.xz.md5",
+        'etpdatabasedumpxz': default_etp_dbfile+".dump.xz",
+        'etpdatabasedumphashfilexz': default_etp_dbfile+".dump.xz.md5",
+        'etpdatabasedumplightxz': default_etp_dbfile+".dumplight.xz",
+        'etpdatabasedumplighthashfilexz': \
+            default_etp_dbfile+".dumplight.xz.md5",
+        # Entropy sqlite database files (zstd), only used if zstd is available
+        'etpdatabasefilezstd': default_etp_dbfile+".zst",
+        'etpdatabasefilezstdhash': default_etp_dbfile+".zst.md5",
+        'etpdatabasefilezstdlight': default_etp_dbfile+".light.zst",
+        'etpdatabasefilehashzstdlight': default_etp_dbfile+".light.zst.md5",
+        'etpdatabasedumpzstd': default_etp_dbfile+".dump.zst",
+        'etpdatabasedumphashfilezstd': default_etp_dbfile+".dump.zst.md5",
+        'etpdatabasedumplightzstd': default_etp_dbfile+".dumplight.zst",
+        'etpdatabasedumplighthashfilezstd': \
+            default_etp_dbfile+".dumplight.zst.md5",
+        # list of the compressed database formats published by the
+        # repository, in order of preference, used by clients to
+        # negotiate the format to download
+        'etpdatabaseformatsfile': default_etp_dbfile+".formats",
         # expiration based server-side packages removal
 
         'etpdatabaseexpbasedpkgsrm': default_etp_dbfile+".fatscope",
@@ -465,6 +521,9 @@ def const_default_settings(rootdir):
         'userpackagesetsid': "__user__",
         'cachedumpext': ".dmp",
         'packagesext': ".tbz2",
+        # default package file payload compression (see
+        # etpdatabasesupportedcformats for the supported ones)
+        'packagesfileformat': "bz2",
         # extra download package file extension (mandatory)
         'packagesextraext': ".tar.bz2",
         'packagesdebugext': ".debug.tar.bz2", # .tar.bz2
@@ -695,6 +754,24 @@ def const_default_settings(rootdir):
 
     }
 
+    # optional compression formats
+    cformats = my_const['etpdatabasesupportedcformats']
+    cclasses = my_const['etpdatabasecompressclasses']
+    if lzma is not None:
+        cformats.append("xz")
+        cclasses["xz"] = (lzma.LZMAFile, "unpack_xz",
+            "etpdatabasefilexz", "etpdatabasedumpxz",
+            "etpdatabasedumphashfilexz", "etpdatabasedumplightxz",
+            "etpdatabasedumplighthashfilexz", "etpdatabasefilexzlight",
+            "etpdatabasefilehashxzlight", "etpdatabasefilexzhash",)
+    if _zstd_open is not None:
+        cformats.append("zst")
+        cclasses["zst"] = (_zstd_open, "unpack_zstd",
+            "etpdatabasefilezstd", "etpdatabasedumpzstd",
+            "etpdatabasedumphashfilezstd", "etpdatabasedumplightzstd",
+            "etpdatabasedumplighthashfilezstd", "etpdatabasefilezstdlight",
+            "etpdatabasefilehashzstdlight", "etpdatabasefilezstdhash",)
+
     # set current nice level
     try:
         my_const['current_nice'] = os.nice(0)
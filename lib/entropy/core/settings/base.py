@@ -36,6 +36,7 @@ from entropy.core.settings.plugins.skel import SystemSettingsPlugin
 from entropy.output import nocolor
 from entropy.i18n import _
 
+import entropy.dump
 import entropy.tools
 
 
@@ -475,6 +476,22 @@ class SystemSettings(Singleton, EntropyPluginStore):
 
     """
 
+    # settings whose parsers only read configuration files (without
+    # side effects other than the ones replayed by __load_snapshot()),
+    # their parsed content is kept in the parsed settings snapshot.
+    SNAPSHOT_SETTINGS = frozenset([
+        'keywords', 'unmask', 'mask', 'license_mask', 'license_accept',
+        'system_mask', 'system_package_sets', 'system_dirs',
+        'system_dirs_mask', 'extra_ldpaths', 'splitdebug',
+        'splitdebug_mask', 'system_rev_symlinks', 'broken_syms',
+        'broken_libs_mask', 'broken_links_mask',
+        'mask_d', 'unmask_d', 'license_mask_d', 'license_accept_d',
+        'system_mask_d',
+    ])
+    # bump this when the format of the parsed metadata changes
+    SNAPSHOT_VERSION = 1
+    SNAPSHOT_NAME = "SystemSettingsSnapshot/parsed_settings"
+
     class CachingList(list):
         """
         This object overrides a list, making possible to store
@@ -1120,6 +1137,119 @@ class SystemSettings(Singleton, EntropyPluginStore):
             func = getattr(self, myattr)
             self.__parsables[item] = func
 
+        key = self.__snapshot_key()
+        if not self.__load_snapshot(key):
+            self.__store_snapshot(key)
+
+    def __snapshot_key(self):
+        """
+        Return the key used to validate the parsed settings snapshot,
+        made of the stat() information of all the configuration files
+        read by the SNAPSHOT_SETTINGS parsers.
+
+        @return: the snapshot key
+        @rtype: tuple
+        """
+        paths = []
+        for setting_id in sorted(self.SNAPSHOT_SETTINGS):
+            path = self.__setting_files.get(setting_id)
+            if isinstance(path, dict):
+                paths.extend(sorted(path.values()))
+            elif path is not None:
+                paths.append(path)
+
+            setting_data = self.__setting_dirs.get(setting_id)
+            if setting_data is not None:
+                paths.extend(sorted(x for x, _m in setting_data[1]))
+
+        files = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except (OSError, IOError):
+                files.append((path, None, None, None))
+                continue
+            files.append((path, st.st_mtime, st.st_size, st.st_ino))
+
+        return (self.SNAPSHOT_VERSION, etpConst['conf_encoding'],
+                self.__pkg_comment_tag, tuple(files))
+
+    def __load_snapshot(self, key):
+        """
+        Load the parsed settings snapshot, if still valid, filling the
+        SNAPSHOT_SETTINGS metadata without parsing the configuration
+        files. Must be called after the parsers have been registered.
+
+        @param key: the snapshot key, see __snapshot_key()
+        @type key: tuple
+        @return: True, if the snapshot has been loaded
+        @rtype: bool
+        """
+        snapshot = entropy.dump.loadobj(
+            self.SNAPSHOT_NAME, dump_dir = etpConst['dumpstoragedir'])
+        if not isinstance(snapshot, dict):
+            return False
+        if snapshot.get('key') != key:
+            const_debug_write(__name__, "parsed settings snapshot is stale")
+            return False
+
+        data = snapshot['data']
+        for setting_id, value in data.items():
+            if setting_id not in self.__parsables:
+                continue
+            if isinstance(value, list):
+                value = SystemSettings.CachingList(value)
+            self.__data[setting_id] = value
+
+        keywords = data.get('keywords')
+        if keywords is not None:
+            self.__merge_universal_keywords(keywords['universal'])
+
+        const_debug_write(__name__, "parsed settings snapshot loaded")
+        return True
+
+    def __store_snapshot(self, key):
+        """
+        Parse the SNAPSHOT_SETTINGS metadata and write the parsed
+        settings snapshot. Nothing is done if the snapshot cannot be
+        written, leaving the settings to be lazy loaded.
+
+        @param key: the snapshot key, see __snapshot_key()
+        @type key: tuple
+        """
+        dump_dir = etpConst['dumpstoragedir']
+        if os.path.isdir(dump_dir) and not os.access(dump_dir, os.W_OK):
+            return
+
+        data = {}
+        # keep the parsers order, *_d parsers extend their alter-egos
+        for setting_id in self.__setting_files_order:
+            if setting_id not in self.SNAPSHOT_SETTINGS:
+                continue
+            func = self.__parsables.get(setting_id)
+            if func is None:
+                continue
+            if setting_id not in self.__data:
+                self.__data[setting_id] = func()
+
+        for setting_id in self.__setting_files_order:
+            if setting_id not in self.SNAPSHOT_SETTINGS:
+                continue
+            if setting_id not in self.__data:
+                continue
+            value = self.__data[setting_id]
+            if isinstance(value, list):
+                value = list(value)
+            data[setting_id] = value
+
+        snapshot = {
+            'key': key,
+            'data': data,
+        }
+        entropy.dump.dumpobj(self.SNAPSHOT_NAME, snapshot,
+            dump_dir = dump_dir)
+        const_debug_write(__name__, "parsed settings snapshot written")
+
     def get_setting_files_data(self):
         """
         Return a copy of the internal *files* dictionary.
@@ -1252,15 +1382,22 @@ class SystemSettings(Singleton, EntropyPluginStore):
                         data['packages'][keywordinfo[0]] = set()
                     data['packages'][keywordinfo[0]].add(items[0])
 
-        # merge universal keywords
+        self.__merge_universal_keywords(data['universal'])
+        return data
+
+    def __merge_universal_keywords(self, universal):
+        """
+        Merge the universal keywords read from package.keywords into
+        etpConst['keywords'].
+
+        @param universal: universal keywords
+        @type universal: set
+        """
         etpConst['keywords'].clear()
         etpConst['keywords'].update(etpSys['keywords'])
-        for keyword in data['universal']:
+        for keyword in universal:
             etpConst['keywords'].add(keyword)
 
-        return data
-
-
     def _unmask_parser(self):
         """
         Parser returning package unmasking metadata read from
@@ -799,6 +799,7 @@ class EntropyMySQLRepository(EntropySQLRepository):
         self._clearLiveCache("_doesColumnInTableExist")
         self._setupInitialSettings()
         self._databaseStructureUpdates()
+        self._resetPackagesDigest()
 
         self._clearLiveCache("_doesTableExist")
         self._clearLiveCache("_doesColumnInTableExist")
@@ -3486,6 +3486,18 @@ class EntropyRepositoryBase(TextInterface, EntropyRepositoryPluginStore):
         """
         raise NotImplementedError()
 
+    def retrieveKeywordsMany(self, package_ids):
+        """
+        Return package SPM keyword list for the given package identifiers.
+        The base implementation calls retrieveKeywords() for each of them.
+
+        @param package_ids: list of package indentifiers
+        @type package_ids: iterable
+        @return: dictionary composed by package_id => keywords (frozenset)
+        @rtype: dict
+        """
+        return dict(((x, self.retrieveKeywords(x)) for x in package_ids))
+
     def retrieveProtect(self, package_id):
         """
         Return CONFIG_PROTECT (configuration file protection) string
@@ -3758,6 +3770,18 @@ class EntropyRepositoryBase(TextInterface, EntropyRepositoryPluginStore):
         """
         raise NotImplementedError()
 
+    def retrieveLicenseMany(self, package_ids):
+        """
+        Return "license" metadatum for the given package identifiers.
+        The base implementation calls retrieveLicense() for each of them.
+
+        @param package_ids: list of package indentifiers
+        @type package_ids: iterable
+        @return: dictionary composed by package_id => license string
+        @rtype: dict
+        """
+        return dict(((x, self.retrieveLicense(x)) for x in package_ids))
+
     def retrieveCompileFlags(self, package_id):
         """
         Return Compiler flags during building of package.
@@ -4209,6 +4233,33 @@ class EntropyRepositoryBase(TextInterface, EntropyRepositoryPluginStore):
         """
         raise NotImplementedError()
 
+    def searchRanked(self, keyword, description = True, useflags = True,
+                     limit = None):
+        """
+        Search packages by name, atom (including old-style virtual
+        atoms), description and USE flags, returning them ordered by
+        relevance. The search string is split into words and every
+        word must match the beginning of a word of the metadata, case
+        insensitively. Matches in package names and atoms are more
+        relevant than matches in descriptions and USE flags.
+        Repositories providing a full-text search index use it, the
+        others fall back to substring searches.
+
+        @param keyword: search string
+        @type keyword: string
+        @keyword description: also search through package descriptions
+        @type description: bool
+        @keyword useflags: also search through package USE flags
+        @type useflags: bool
+        @keyword limit: maximum number of results
+        @type limit: int
+        @return: list of tuples of length 2 containing package_id and
+            rank values, best matches (lower rank) first. Ranks of
+            different repositories are roughly comparable.
+        @rtype: list
+        """
+        raise NotImplementedError()
+
     def searchDescription(self, keyword, just_id = False):
         """
         Search packages using given description string as keyword.
@@ -4390,6 +4441,18 @@ class EntropyRepositoryBase(TextInterface, EntropyRepositoryPluginStore):
         """
         raise NotImplementedError()
 
+    def listAllPackageDigests(self):
+        """
+        List the digests of the checksum relevant metadata of all the
+        packages available in repository. A package digest changes
+        whenever the package is modified, so these can be compared
+        across repository revisions to find out the changed packages.
+
+        @return: dict of digests (as integers) keyed by package identifier
+        @rtype: dict
+        """
+        raise NotImplementedError()
+
     def listAllInjectedPackageIds(self):
         """
         List all injected package identifiers available in repository.
@@ -4675,8 +4738,9 @@ class EntropyRepositoryBase(TextInterface, EntropyRepositoryPluginStore):
         """
         Import dump file to this database.
 
-        @param dumpfile: dump file to read
-        @type dumpfile: string
+        @param dumpfile: dump file path or, where supported by the
+            implementation, a (possibly compressed) file object to read from
+        @type dumpfile: string or file object
         @param dbfile: database file path or reference name
         @type dbfile: string
         @keyword data: connection data (dict object)
@@ -4697,10 +4761,17 @@ class EntropyRepositoryBase(TextInterface, EntropyRepositoryPluginStore):
         raise NotImplementedError()
 
     def checksum(self, do_order = False, strict = True,
-                 include_signatures = False, include_dependencies = False):
+                 include_signatures = False, include_dependencies = False,
+                 incremental = True):
         """
         Get Repository metadata checksum, useful for integrity verification.
         Note: result is cached in EntropyRepository.live_cache (dict).
+        Unless do_order is True or incremental is False, implementations
+        may return a cheaper checksum that is maintained incrementally
+        whenever packages are added, removed or modified. Such value is
+        only meant to detect repository changes and cannot be compared
+        with the one returned by another implementation or by the
+        legacy (full) computation.
 
         @keyword do_order: order metadata collection alphabetically
         @type do_order: bool
@@ -4712,6 +4783,9 @@ class EntropyRepositoryBase(TextInterface, EntropyRepositoryPluginStore):
         @keyword include_dependencies: also include package dependencies into
             the returned hash
         @type include_dependencies: bool
+        @keyword incremental: allow the use of the incrementally maintained
+            checksum, if False, the legacy checksum is always computed
+        @type incremental: bool
         @return: repository checksum
         @rtype: string
         """
@@ -5046,6 +5120,121 @@ class EntropyRepositoryBase(TextInterface, EntropyRepositoryPluginStore):
                 if rc == 0:
                     return data, rc
 
+        candidates = self.__atomMatchCandidates(atom, matchSlot, multiMatch)
+        found_ids = candidates[0]
+        if maskFilter and found_ids:
+            def _filter(pkg_id):
+                pkg_id, pkg_reason = self.maskFilter(pkg_id)
+                return pkg_id != -1
+            found_ids = set(filter(_filter, found_ids))
+
+        return self.__atomMatchResults(atom, matchSlot, multiMatch,
+            maskFilter, extendedResults, found_ids, candidates)
+
+    def atomMatchMany(self, atoms, matchSlot = None, multiMatch = False,
+        maskFilter = True, extendedResults = False, useCache = True):
+        """
+        Match a list of atoms (or dependencies) in repository at once.
+        This is the batched version of atomMatch(): cached results are
+        fetched in bulk, candidate packages of all the atoms are looked up
+        first and then masked through a single maskFilterMany() call.
+
+        @param atoms: list of atoms or dependencies to match in repository
+        @type atoms: list
+        @keyword matchSlot: match packages with given slot
+        @type matchSlot: string
+        @keyword multiMatch: match all the available packages, not just the
+            best one
+        @type multiMatch: bool
+        @keyword maskFilter: enable package masking filter
+        @type maskFilter: bool
+        @keyword extendedResults: return extended results
+        @type extendedResults: bool
+        @keyword useCache: use on-disk cache
+        @type useCache: bool
+        @return: list of atomMatch() results, in the same order of atoms
+        @rtype: list
+        """
+        unique_atoms = []
+        seen = set()
+        for atom in atoms:
+            if atom not in seen:
+                seen.add(atom)
+                unique_atoms.append(atom)
+
+        results = {}
+        if useCache:
+            results.update(self.__atomMatchFetchCacheMany(unique_atoms,
+                matchSlot, multiMatch, maskFilter, extendedResults))
+
+        pending = []
+        single = []
+        for atom in unique_atoms:
+            if atom in results:
+                continue
+            if (not atom) or atom.endswith(etpConst['entropyordepquestion']):
+                # "or" dependencies are matched one atom at a time
+                single.append(atom)
+                continue
+            pending.append(atom)
+
+        if pending:
+            self._atomMatchPrefetch()
+
+        candidates = {}
+        package_ids = set()
+        for atom in pending:
+            data = self.__atomMatchCandidates(atom, matchSlot, multiMatch)
+            candidates[atom] = data
+            package_ids.update(data[0])
+
+        masks = {}
+        if maskFilter and package_ids:
+            masks = self.maskFilterMany(package_ids)
+
+        for atom in pending:
+            data = candidates[atom]
+            found_ids = data[0]
+            if maskFilter and found_ids:
+                found_ids = set((x for x in found_ids if masks[x][0] != -1))
+            results[atom] = self.__atomMatchResults(atom, matchSlot,
+                multiMatch, maskFilter, extendedResults, found_ids, data)
+
+        for atom in single:
+            results[atom] = self.atomMatch(atom, matchSlot = matchSlot,
+                multiMatch = multiMatch, maskFilter = maskFilter,
+                extendedResults = extendedResults, useCache = useCache)
+
+        return [results[atom] for atom in atoms]
+
+    def _atomMatchPrefetch(self):
+        """
+        Prepare the repository for a batch of atomMatch() lookups, called
+        by atomMatchMany(). Subclasses can reimplement this to load the
+        metadata used by atomMatch() with a few set-based queries.
+        The base implementation does nothing.
+        """
+
+    def maskFilterMany(self, package_ids, live = True):
+        """
+        Batched version of maskFilter().
+
+        @param package_ids: list of package indentifiers
+        @type package_ids: iterable
+        @keyword live: use live masking feature
+        @type live: bool
+        @return: dictionary composed by package_id => maskFilter() result
+        @rtype: dict
+        """
+        return dict(((x, self.maskFilter(x, live = live)) \
+                         for x in package_ids))
+
+    def __atomMatchCandidates(self, atom, matchSlot, multiMatch):
+        """
+        Parse the given atom and return the package identifiers matching
+        its key, slot, tag and use dependencies (masking excluded), plus
+        the parsed data required by __atomMatchResults().
+        """
         matchTag = entropy.dep.dep_gettag(atom)
         try:
             matchUse = entropy.dep.dep_getusedeps(atom)
@@ -5124,18 +5313,23 @@ class EntropyRepositoryBase(TextInterface, EntropyRepositoryPluginStore):
                 # default_package_ids = None
                 pass
 
-        ### FILTERING
-        # filter slot and tag
+
+        # filter slot, tag and use
         if found_ids:
             found_ids = self.__filterSlotTagUse(found_ids, matchSlot,
                 matchTag, matchUse, direction)
-            if maskFilter:
-                def _filter(pkg_id):
-                    pkg_id, pkg_reason = self.maskFilter(pkg_id)
-                    return pkg_id != -1
-                found_ids = set(filter(_filter, found_ids))
 
-        ### END FILTERING
+        return (found_ids, default_package_ids, direction, matchTag,
+            matchRevision, justname, stripped_atom, pkgversion)
+
+    def __atomMatchResults(self, atom, matchSlot, multiMatch, maskFilter,
+        extendedResults, found_ids, candidates):
+        """
+        Pick the best match (or all of them) among the filtered package
+        identifiers and store the result into the atomMatch() cache.
+        """
+        (_found_ids, default_package_ids, direction, matchTag,
+         matchRevision, justname, stripped_atom, pkgversion) = candidates
 
         dbpkginfo = set()
         if found_ids:
@@ -5509,20 +5703,30 @@ class EntropyRepositoryBase(TextInterface, EntropyRepositoryPluginStore):
 
         return dbpkginfo
 
+    def __atomMatchCacheNamespace(self):
+        return "%s/%s/%s" % (
+            self.__db_match_cache_key,
+            self.name,
+            self.atomMatchCacheKey(),
+            )
+
     def __atomMatchFetchCache(self, *args):
         if self._caching:
             ck_sum = self.checksum(strict = False)
             hash_str = self.__atomMatch_gen_hash_str(args)
-            cached = entropy.dump.loadobj(
-                "%s/%s/%s_%s_%s" % (
-                    self.__db_match_cache_key,
-                    self.name,
-                    self.atomMatchCacheKey(),
-                    ck_sum,
-                    hash_str,
-                    )
-                )
-            return cached
+            return self._cacher.store().get(
+                self.__atomMatchCacheNamespace(), hash_str, ck_sum)
+
+    def __atomMatchFetchCacheMany(self, atoms, *args):
+        if not self._caching:
+            return {}
+        ck_sum = self.checksum(strict = False)
+        keys = {}
+        for atom in atoms:
+            keys[self.__atomMatch_gen_hash_str((atom,) + args)] = atom
+        cached = self._cacher.store().get_many(
+            self.__atomMatchCacheNamespace(), list(keys.keys()), ck_sum)
+        return dict(((keys[x], y) for x, y in cached.items()))
 
     def __atomMatch_gen_hash_str(self, args):
         data_str = repr(args)
@@ -5534,19 +5738,12 @@ class EntropyRepositoryBase(TextInterface, EntropyRepositoryPluginStore):
         return sha1.hexdigest()
 
     def __atomMatchStoreCache(self, *args, **kwargs):
-        if self._caching:
+        if self._caching and self._cacher.is_started():
             ck_sum = self.checksum(strict = False)
             hash_str = self.__atomMatch_gen_hash_str(args)
-            self._cacher.push(
-                "%s/%s/%s_%s_%s" % (
-                    self.__db_match_cache_key,
-                    self.name,
-                    self.atomMatchCacheKey(),
-                    ck_sum,
-                    hash_str,
-                    ),
-                kwargs.get('result'),
-                async = False)
+            self._cacher.store().set(
+                self.__atomMatchCacheNamespace(), hash_str, ck_sum,
+                kwargs.get('result'))
 
     def __filterSlot(self, package_id, slot):
         if slot is None:
@@ -11,6 +11,8 @@
 
 """
 import os
+import re
+import contextlib
 import hashlib
 import itertools
 import time
@@ -20,7 +22,7 @@ from entropy.const import etpConst, const_debug_write, \
     const_debug_enabled, const_isunicode, const_convert_to_unicode, \
     const_get_buffer, const_convert_to_rawstring, const_is_python3, \
     const_get_stringtype
-from entropy.exceptions import SystemDatabaseError, SPMError
+from entropy.exceptions import SystemDatabaseError, SPMError, InvalidAtom
 from entropy.spm.plugins.factory import get_default_instance as get_spm
 from entropy.output import bold, red
 from entropy.misc import ParallelTask
@@ -36,6 +38,11 @@ from entropy.db.exceptions import Warning, Error, InterfaceError, \
     DatabaseError, DataError, OperationalError, IntegrityError, \
     InternalError, ProgrammingError, NotSupportedError
 
+# words matched by searchRanked(), the separators are the same used by
+# the full-text search index tokenizer (anything that is not a letter
+# or a digit).
+_SEARCH_TERMS_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
 
 class SQLConnectionWrapper(object):
 
@@ -590,6 +597,20 @@ class EntropySQLRepository(EntropyRepositoryBase):
                     PRIMARY KEY(setting_name)
                 );
 
+                CREATE TABLE dependencieskeys (
+                    iddependency INTEGER,
+                    name VARCHAR,
+                    PRIMARY KEY(iddependency, name)
+                );
+
+                CREATE TABLE reversedependencies (
+                    iddependency INTEGER,
+                    idpackage INTEGER,
+                    PRIMARY KEY(iddependency, idpackage),
+                    FOREIGN KEY(idpackage)
+                        REFERENCES baseinfo(idpackage) ON DELETE CASCADE
+                );
+
             """
             return data
 
@@ -625,6 +646,7 @@ class EntropySQLRepository(EntropyRepositoryBase):
         self._indexing = indexing
         self._skip_checks = skip_checks
         self._settings_cache = {}
+        self._packages_update_depth = 0
         self.__connection_pool = {}
         self.__connection_pool_mutex = threading.RLock()
         self.__cursor_pool_mutex = threading.RLock()
@@ -1396,9 +1418,15 @@ class EntropySQLRepository(EntropyRepositoryBase):
         Needs to call superclass method.
         """
         try:
-            package_id = self._addPackage(pkg_data, revision = revision,
-                package_id = package_id,
-                formatted_content = formatted_content)
+            digest_ids = []
+            if package_id is not None:
+                digest_ids.append(package_id)
+            with self._packagesUpdate(digest_ids):
+                package_id = self._addPackage(pkg_data, revision = revision,
+                    package_id = package_id,
+                    formatted_content = formatted_content)
+                if package_id not in digest_ids:
+                    digest_ids.append(package_id)
             super(EntropySQLRepository, self).addPackage(
                 pkg_data, revision = revision,
                 package_id = package_id,
@@ -1419,8 +1447,9 @@ class EntropySQLRepository(EntropyRepositoryBase):
                 package_id, from_add_package = from_add_package)
             self.clearCache()
 
-            return self._removePackage(package_id,
-                from_add_package = from_add_package)
+            with self._packagesUpdate((package_id,)):
+                return self._removePackage(package_id,
+                    from_add_package = from_add_package)
         except:
             self._connection().rollback()
             raise
@@ -1560,26 +1589,29 @@ class EntropySQLRepository(EntropyRepositoryBase):
         """
         Reimplemented from EntropyRepositoryBase.
         """
-        self._cursor().execute("""
-        UPDATE extrainfo SET datecreation = ? WHERE idpackage = ?
-        """, (str(date), package_id,))
+        with self._packagesUpdate((package_id,)):
+            self._cursor().execute("""
+            UPDATE extrainfo SET datecreation = ? WHERE idpackage = ?
+            """, (str(date), package_id,))
 
     def setDigest(self, package_id, digest):
         """
         Reimplemented from EntropyRepositoryBase.
         """
-        self._cursor().execute("""
-        UPDATE extrainfo SET digest = ? WHERE idpackage = ?
-        """, (digest, package_id,))
+        with self._packagesUpdate((package_id,)):
+            self._cursor().execute("""
+            UPDATE extrainfo SET digest = ? WHERE idpackage = ?
+            """, (digest, package_id,))
 
     def setSignatures(self, package_id, sha1, sha256, sha512, gpg = None):
         """
         Reimplemented from EntropyRepositoryBase.
         """
-        self._cursor().execute("""
-        UPDATE packagesignatures SET sha1 = ?, sha256 = ?, sha512 = ?,
-        gpg = ? WHERE idpackage = ?
-        """, (sha1, sha256, sha512, gpg, package_id))
+        with self._packagesUpdate((package_id,)):
+            self._cursor().execute("""
+            UPDATE packagesignatures SET sha1 = ?, sha256 = ?, sha512 = ?,
+            gpg = ? WHERE idpackage = ?
+            """, (sha1, sha256, sha512, gpg, package_id))
 
     def setDownloadURL(self, package_id, url):
         """
@@ -1590,17 +1622,19 @@ class EntropySQLRepository(EntropyRepositoryBase):
         @param url: URL prefix to set
         @type url: string
         """
-        self._cursor().execute("""
-        UPDATE extrainfo SET download = ? WHERE idpackage = ?
-        """, (url, package_id,))
+        with self._packagesUpdate((package_id,)):
+            self._cursor().execute("""
+            UPDATE extrainfo SET download = ? WHERE idpackage = ?
+            """, (url, package_id,))
 
     def setCategory(self, package_id, category):
         """
         Reimplemented from EntropyRepositoryBase.
         """
-        self._cursor().execute("""
-        UPDATE baseinfo SET category = ? WHERE idpackage = ?
-        """, (category, package_id,))
+        with self._packagesUpdate((package_id,)):
+            self._cursor().execute("""
+            UPDATE baseinfo SET category = ? WHERE idpackage = ?
+            """, (category, package_id,))
 
     def setCategoryDescription(self, category, description_data):
         """
@@ -1619,50 +1653,64 @@ class EntropySQLRepository(EntropyRepositoryBase):
         """
         Reimplemented from EntropyRepositoryBase.
         """
-        self._cursor().execute("""
-        UPDATE baseinfo SET name = ? WHERE idpackage = ?
-        """, (name, package_id,))
+        with self._packagesUpdate((package_id,)):
+            self._cursor().execute("""
+            UPDATE baseinfo SET name = ? WHERE idpackage = ?
+            """, (name, package_id,))
 
     def setDependency(self, iddependency, dependency):
         """
         Reimplemented from EntropyRepositoryBase.
         """
-        self._cursor().execute("""
-        UPDATE dependenciesreference SET dependency = ?
-        WHERE iddependency = ?
-        """, (dependency, iddependency,))
+        cur = self._cursor().execute("""
+        SELECT idpackage FROM dependencies WHERE iddependency = ?
+        """, (iddependency,))
+        package_ids = self._cur2frozenset(cur)
+
+        with self._packagesUpdate(package_ids):
+            self._cursor().execute("""
+            UPDATE dependenciesreference SET dependency = ?
+            WHERE iddependency = ?
+            """, (dependency, iddependency,))
+
+        if self._isReverseDependenciesIndexed():
+            self._indexDependencies([(iddependency, dependency)])
 
     def setAtom(self, package_id, atom):
         """
         Reimplemented from EntropyRepositoryBase.
         """
-        self._cursor().execute("""
-        UPDATE baseinfo SET atom = ? WHERE idpackage = ?
-        """, (atom, package_id,))
+        with self._packagesUpdate((package_id,)):
+            self._cursor().execute("""
+            UPDATE baseinfo SET atom = ? WHERE idpackage = ?
+            """, (atom, package_id,))
 
     def setSlot(self, package_id, slot):
         """
         Reimplemented from EntropyRepositoryBase.
         """
-        self._cursor().execute("""
-        UPDATE baseinfo SET slot = ? WHERE idpackage = ?
-        """, (slot, package_id,))
+        with self._packagesUpdate((package_id,)):
+            self._cursor().execute("""
+            UPDATE baseinfo SET slot = ? WHERE idpackage = ?
+            """, (slot, package_id,))
 
     def setRevision(self, package_id, revision):
         """
         Reimplemented from EntropyRepositoryBase.
         """
-        self._cursor().execute("""
-        UPDATE baseinfo SET revision = ? WHERE idpackage = ?
-        """, (revision, package_id,))
+        with self._packagesUpdate((package_id,)):
+            self._cursor().execute("""
+            UPDATE baseinfo SET revision = ? WHERE idpackage = ?
+            """, (revision, package_id,))
 
     def removeDependencies(self, package_id):
         """
         Reimplemented from EntropyRepositoryBase.
         """
-        self._cursor().execute("""
-        DELETE FROM dependencies WHERE idpackage = ?
-        """, (package_id,))
+        with self._packagesUpdate((package_id,)):
+            self._cursor().execute("""
+            DELETE FROM dependencies WHERE idpackage = ?
+            """, (package_id,))
 
     def insertDependencies(self, package_id, depdata):
         """
@@ -1688,9 +1736,10 @@ class EntropySQLRepository(EntropyRepositoryBase):
 
             return deps
 
-        self._cursor().executemany("""
-        INSERT INTO dependencies VALUES (?, ?, ?)
-        """, insert_list())
+        with self._packagesUpdate((package_id,)):
+            self._cursor().executemany("""
+            INSERT INTO dependencies VALUES (?, ?, ?)
+            """, insert_list())
 
     def removeConflicts(self, package_id):
         """
@@ -2420,6 +2469,15 @@ class EntropySQLRepository(EntropyRepositoryBase):
         DELETE FROM dependenciesreference
         WHERE iddependency NOT IN (SELECT iddependency FROM dependencies)
         """)
+        if self._isReverseDependenciesIndexed():
+            self._cursor().execute("""
+            DELETE FROM dependencieskeys WHERE iddependency NOT IN
+                (SELECT iddependency FROM dependenciesreference)
+            """)
+            self._cursor().execute("""
+            DELETE FROM reversedependencies WHERE iddependency NOT IN
+                (SELECT iddependency FROM dependenciesreference)
+            """)
 
     def getFakeSpmUid(self):
         """
@@ -3290,6 +3348,25 @@ class EntropySQLRepository(EntropyRepositoryBase):
         keywords.idkeyword = keywordsreference.idkeyword""", (package_id,))
         return self._cur2frozenset(cur)
 
+    def retrieveKeywordsMany(self, package_ids):
+        """
+        Reimplemented from EntropyRepositoryBase.
+        """
+        package_ids = list(package_ids)
+        data = dict(((x, set()) for x in package_ids))
+        chunk_size = 256
+        for index in range(0, len(package_ids), chunk_size):
+            chunk = package_ids[index:index + chunk_size]
+            cur = self._cursor().execute("""
+            SELECT keywords.idpackage, keywordsreference.keywordname
+            FROM keywords, keywordsreference
+            WHERE keywords.idpackage IN (%s) AND
+            keywords.idkeyword = keywordsreference.idkeyword
+            """ % (", ".join(["?"] * len(chunk)),), chunk)
+            for package_id, keyword in cur:
+                data[package_id].add(keyword)
+        return dict(((x, frozenset(y)) for x, y in data.items()))
+
     def retrieveProtect(self, package_id):
         """
         Reimplemented from EntropyRepositoryBase.
@@ -3686,6 +3763,22 @@ class EntropySQLRepository(EntropyRepositoryBase):
         if licname:
             return licname[0]
 
+    def retrieveLicenseMany(self, package_ids):
+        """
+        Reimplemented from EntropyRepositoryBase.
+        """
+        package_ids = list(package_ids)
+        data = dict(((x, None) for x in package_ids))
+        chunk_size = 256
+        for index in range(0, len(package_ids), chunk_size):
+            chunk = package_ids[index:index + chunk_size]
+            cur = self._cursor().execute("""
+            SELECT idpackage, license FROM baseinfo
+            WHERE idpackage IN (%s)
+            """ % (", ".join(["?"] * len(chunk)),), chunk)
+            data.update(cur)
+        return data
+
     def retrieveCompileFlags(self, package_id):
         """
         Reimplemented from EntropyRepositoryBase.
@@ -3703,14 +3796,20 @@ class EntropySQLRepository(EntropyRepositoryBase):
         """
         Reimplemented from EntropyRepositoryBase.
         """
-        cached = self._getLiveCache("reverseDependenciesMetadata")
-        if cached is None:
-            cached = self._generateReverseDependenciesMetadata()
-
-        dep_ids = set((k for k, v in cached.items() if package_id in v))
-        if not dep_ids:
+        if self._useReverseDependenciesIndex():
+            cur = self._cursor().execute("""
+            SELECT iddependency FROM reversedependencies WHERE idpackage = ?
+            """, (package_id,))
+            dep_ids = self._cur2frozenset(cur)
+        else:
+            cached = self._getLiveCache("reverseDependenciesMetadata")
+            if cached is None:
+                cached = self._generateReverseDependenciesMetadata()
+            dep_ids = set((k for k, v in cached.items() if package_id in v))
             # avoid python3.x memleak
             del cached
+
+        if not dep_ids:
             if key_slot:
                 return tuple()
             return frozenset()
@@ -3818,14 +3917,26 @@ class EntropySQLRepository(EntropyRepositoryBase):
                 WHERE dependencies.iddependency IN ( %s )""" % (dep_ids_str,))
                 result = self._cur2frozenset(cur)
 
-        # avoid python3.x memleak
-        del cached
         return result
 
     def retrieveUnusedPackageIds(self):
         """
         Reimplemented from EntropyRepositoryBase.
         """
+        if self._useReverseDependenciesIndex():
+            cur = self._cursor().execute("""
+            SELECT idpackage FROM reversedependencies LIMIT 1
+            """)
+            if cur.fetchone() is None:
+                return tuple()
+            cur = self._cursor().execute("""
+            SELECT idpackage FROM baseinfo
+            WHERE idpackage NOT IN (
+                SELECT idpackage FROM reversedependencies)
+            ORDER BY atom
+            """)
+            return self._cur2tuple(cur)
+
         cached = self._getLiveCache("reverseDependenciesMetadata")
         if cached is None:
             cached = self._generateReverseDependenciesMetadata()
@@ -3833,9 +3944,9 @@ class EntropySQLRepository(EntropyRepositoryBase):
         pkg_ids = set()
         for v in cached.values():
             pkg_ids |= v
+        # avoid python3.x memleak
+        del cached
         if not pkg_ids:
-            # avoid python3.x memleak
-            del cached
             return tuple()
         pkg_ids_str = ', '.join((str(x) for x in pkg_ids))
 
@@ -3844,8 +3955,6 @@ class EntropySQLRepository(EntropyRepositoryBase):
         WHERE idpackage NOT IN ( %s )
         ORDER BY atom
         """ % (pkg_ids_str,))
-        # avoid python3.x memleak
-        del cached
         return self._cur2tuple(cur)
 
     def arePackageIdsAvailable(self, package_ids):
@@ -4419,6 +4528,66 @@ class EntropySQLRepository(EntropyRepositoryBase):
             return self._cur2tuple(cur)
         return tuple(cur)
 
+    def searchRanked(self, keyword, description = True, useflags = True,
+                     limit = None):
+        """
+        Reimplemented from EntropyRepositoryBase.
+        """
+        terms = self._searchTerms(keyword)
+        if not terms:
+            return []
+
+        if self._isSearchIndexed():
+            columns = ["name", "atom"]
+            if description:
+                columns.append("description")
+            if useflags:
+                columns.append("useflags")
+            return self._searchIndexQuery(terms, columns, limit)
+
+        # no full-text search index, LIKE based fallback. All the terms
+        # must match, the rank is given by the best matching field.
+        ranks = None
+        for term in terms:
+            term_ranks = {}
+            for package_id in self.searchPackages(term, just_id = True):
+                name = (self.retrieveName(package_id) or "").lower()
+                if name == term:
+                    rank = -30.0
+                elif name.startswith(term):
+                    rank = -20.0
+                else:
+                    rank = -10.0
+                term_ranks[package_id] = rank
+            if description:
+                for package_id in self.searchDescription(
+                        term, just_id = True):
+                    term_ranks.setdefault(package_id, -5.0)
+            if useflags:
+                for package_id in self.searchUseflag(term, just_id = True):
+                    term_ranks.setdefault(package_id, -2.0)
+
+            if ranks is None:
+                ranks = term_ranks
+            else:
+                ranks = dict((x, ranks[x] + term_ranks[x]) for x in ranks \
+                                 if x in term_ranks)
+            if not ranks:
+                break
+
+        results = sorted(ranks.items(), key = lambda x: (x[1], x[0]))
+        if limit is not None:
+            results = results[:limit]
+        return results
+
+    @staticmethod
+    def _searchTerms(keyword):
+        """
+        Split a search string into the lowercase words matched by
+        searchRanked().
+        """
+        return [x for x in _SEARCH_TERMS_RE.findall(keyword.lower()) if x]
+
     def searchProvidedVirtualPackage(self, keyword):
         """
         Search in old-style Portage PROVIDE metadata.
@@ -4810,9 +4979,10 @@ class EntropySQLRepository(EntropyRepositoryBase):
         """
         Reimplemented from EntropyRepositoryBase.
         """
-        self._cursor().execute("""
-        UPDATE baseinfo SET branch = ?
-        WHERE idpackage = ?""", (tobranch, package_id,))
+        with self._packagesUpdate((package_id,)):
+            self._cursor().execute("""
+            UPDATE baseinfo SET branch = ?
+            WHERE idpackage = ?""", (tobranch, package_id,))
         self.clearCache()
 
     def getSetting(self, setting_name):
@@ -4929,12 +5099,554 @@ class EntropySQLRepository(EntropyRepositoryBase):
         """
         raise NotImplementedError()
 
+    # settings table entry containing the aggregated packages digest,
+    # see _packagesUpdate()
+    _PACKAGES_DIGEST_SETTING = "_packages_digest"
+
+    def _packageDigest(self, package_id):
+        """
+        Return the digest of the checksum relevant metadata of the given
+        package (baseinfo, extrainfo, signatures and dependencies) as
+        integer. Return 0 if the package is not available.
+        """
+        cur = self._cursor().execute("""
+        SELECT * FROM baseinfo WHERE idpackage = ? LIMIT 1
+        """, (package_id,))
+        record = cur.fetchone()
+        if record is None:
+            return 0
+        records = [record]
+
+        cur = self._cursor().execute("""
+        SELECT * FROM extrainfo WHERE idpackage = ? LIMIT 1
+        """, (package_id,))
+        records.append(cur.fetchone())
+
+        cur = self._cursor().execute("""
+        SELECT * FROM packagesignatures WHERE idpackage = ? LIMIT 1
+        """, (package_id,))
+        records.append(cur.fetchone())
+
+        cur = self._cursor().execute("""
+        SELECT dependenciesreference.dependency, dependencies.type
+        FROM dependencies, dependenciesreference
+        WHERE dependencies.idpackage = ? AND
+        dependencies.iddependency = dependenciesreference.iddependency
+        ORDER BY dependenciesreference.dependency, dependencies.type
+        """, (package_id,))
+        records.extend(tuple(x) for x in cur)
+
+        return self._recordsDigest(records)
+
+    def _recordsDigest(self, records):
+        """
+        Return the digest of the given package records as integer.
+        """
+        m = hashlib.sha1()
+        # NOTE: see checksum() about the use of repr() here.
+        if const_is_python3():
+            for record in records:
+                m.update(repr(record).encode("utf-8"))
+        else:
+            for record in records:
+                m.update(repr(record))
+        return int(m.hexdigest(), 16)
+
+    def _computePackagesDigest(self):
+        """
+        Compute the aggregated packages digest from scratch, using
+        one query per table. The aggregation (xor) is independent of
+        the packages order.
+        """
+        digest = 0
+        for package_digest in self.listAllPackageDigests().values():
+            digest ^= package_digest
+        return digest
+
+    def listAllPackageDigests(self):
+        """
+        Reimplemented from EntropyRepositoryBase.
+        """
+        cur = self._cursor().execute("SELECT * FROM extrainfo")
+        extrainfo = dict((x[0], x) for x in cur)
+
+        cur = self._cursor().execute("SELECT * FROM packagesignatures")
+        signatures = dict((x[0], x) for x in cur)
+
+        dependencies = {}
+        cur = self._cursor().execute("""
+        SELECT dependencies.idpackage, dependenciesreference.dependency,
+        dependencies.type
+        FROM dependencies, dependenciesreference
+        WHERE dependencies.iddependency = dependenciesreference.iddependency
+        ORDER BY dependenciesreference.dependency, dependencies.type
+        """)
+        for package_id, dependency, dep_type in cur:
+            obj = dependencies.setdefault(package_id, [])
+            obj.append((dependency, dep_type))
+
+        digests = {}
+        cur = self._cursor().execute("SELECT * FROM baseinfo")
+        for record in cur:
+            package_id = record[0]
+            records = [record, extrainfo.get(package_id),
+                       signatures.get(package_id)]
+            records.extend(dependencies.get(package_id, []))
+            digests[package_id] = self._recordsDigest(records)
+        return digests
+
+    def _getPackagesDigest(self):
+        """
+        Return the aggregated packages digest stored in the settings
+        table or None, if the repository is not tracking it.
+        The settings table is queried directly, without using the
+        settings cache, which is not shared among processes.
+        """
+        try:
+            cur = self._cursor().execute("""
+            SELECT setting_value FROM settings WHERE setting_name = ?
+            LIMIT 1
+            """, (self._PACKAGES_DIGEST_SETTING,))
+            setting = cur.fetchone()
+        except Error:
+            return None
+        if setting is None:
+            return None
+        try:
+            return int(setting[0], 16)
+        except (TypeError, ValueError):
+            return None
+
+    def _setPackagesDigest(self, digest):
+        """
+        Store the aggregated packages digest into the settings table.
+        """
+        self._setSetting(self._PACKAGES_DIGEST_SETTING, "%040x" % (digest,))
+        self._clearLiveCache("checksum_incremental")
+
+    def _resetPackagesDigest(self):
+        """
+        Start tracking the aggregated packages digest of an empty
+        repository.
+        """
+        self._setPackagesDigest(0)
+
+    # settings table entry flagging the reverse dependencies index
+    # as complete, see _buildReverseDependenciesIndex()
+    _REVERSE_DEPENDENCIES_INDEX_SETTING = "_reverse_dependencies_index"
+
+    def _reverseDependenciesIndexSupported(self):
+        """
+        Return whether the reverse dependencies index can be used by this
+        repository. The index stores atomMatch() results computed without
+        applying maskFilter(), subclasses that filter packages must
+        return False.
+        """
+        return True
+
+    def _isReverseDependenciesIndexed(self):
+        """
+        Return whether the reverse dependencies index is complete and must
+        be kept up-to-date. Like the packages digest, the settings table is
+        queried directly.
+        """
+        try:
+            cur = self._cursor().execute("""
+            SELECT setting_value FROM settings WHERE setting_name = ?
+            LIMIT 1
+            """, (self._REVERSE_DEPENDENCIES_INDEX_SETTING,))
+            setting = cur.fetchone()
+        except Error:
+            return False
+        return setting is not None
+
+    def _useReverseDependenciesIndex(self):
+        """
+        Return whether reverse dependencies can be read from the index.
+        The index is never built from here, see
+        _createReverseDependenciesIndex().
+        """
+        if not self._reverseDependenciesIndexSupported():
+            return False
+        return self._isReverseDependenciesIndexed()
+
+    def _createReverseDependenciesIndex(self):
+        """
+        Build the reverse dependencies index and commit it, if supported,
+        writable and not available yet.
+        """
+        if not self._reverseDependenciesIndexSupported():
+            return
+        if self.readonly():
+            return
+        if self._isReverseDependenciesIndexed():
+            return
+        if not self._doesTableExist("reversedependencies"):
+            return
+        self._buildReverseDependenciesIndex()
+        self.commit()
+
+    def _buildReverseDependenciesIndex(self):
+        """
+        Build the reverse dependencies index from scratch and flag it as
+        complete. The index is made of the "dependencieskeys" table,
+        mapping every dependency to the package names it can match, and
+        the "reversedependencies" table, containing the atomMatch() results
+        of every dependency.
+        """
+        self._cursor().execute("DELETE FROM dependencieskeys")
+        self._cursor().execute("DELETE FROM reversedependencies")
+        cur = self._cursor().execute("""
+        SELECT iddependency, dependency FROM dependenciesreference
+        """)
+        self._indexDependencies(list(cur))
+        self._setSetting(self._REVERSE_DEPENDENCIES_INDEX_SETTING, "1")
+
+    def _dependencyNames(self, dependency):
+        """
+        Return the package names the given dependency string can match,
+        parsing it the same way atomMatch() does.
+        """
+        if dependency.endswith(etpConst['entropyordepquestion']):
+            atoms = dependency[:-1].split(etpConst['entropyordepsep'])
+        else:
+            atoms = (dependency,)
+
+        names = set()
+        for atom in atoms:
+            try:
+                scan_atom = entropy.dep.remove_usedeps(atom)
+            except InvalidAtom:
+                scan_atom = atom
+            scan_atom = entropy.dep.remove_tag(scan_atom)
+            scan_atom = entropy.dep.remove_slot(scan_atom)
+            scan_atom = entropy.dep.remove_entropy_revision(scan_atom)
+            if not scan_atom:
+                continue
+
+            scan_cpv = entropy.dep.dep_getcpv(scan_atom)
+            pkgkey = scan_cpv
+            if scan_atom.endswith("*"):
+                pkgkey += "*"
+            if not entropy.dep.isjustname(scan_cpv):
+                if entropy.dep.catpkgsplit(scan_cpv) is None:
+                    continue # badly formatted
+                pkgkey = entropy.dep.dep_getkey(pkgkey)
+            names.add(pkgkey.split("/")[-1])
+        return names
+
+    def _indexDependencies(self, dependencies):
+        """
+        (Re)index the given dependencies into the reverse dependencies
+        index.
+
+        @param dependencies: list of (iddependency, dependency) tuples
+        @type dependencies: list
+        """
+        or_dep = etpConst['entropyordepquestion']
+        for iddependency, dependency in dependencies:
+            self._cursor().execute("""
+            DELETE FROM dependencieskeys WHERE iddependency = ?
+            """, (iddependency,))
+            self._cursor().execute("""
+            DELETE FROM reversedependencies WHERE iddependency = ?
+            """, (iddependency,))
+            if iddependency == -1:
+                continue
+
+            self._cursor().executemany("""
+            INSERT INTO dependencieskeys VALUES (?, ?)
+            """, [(iddependency, x) for x in self._dependencyNames(
+                dependency)])
+
+            if dependency.endswith(or_dep):
+                atoms = dependency[:-1].split(etpConst['entropyordepsep'])
+            else:
+                atoms = (dependency,)
+            package_ids = set()
+            for atom in atoms:
+                # not safe to use cache here, people messing with multiple
+                # instances can make this crash
+                package_id, rc = self.atomMatch(
+                    atom, useCache = False, maskFilter = False)
+                if package_id != -1:
+                    package_ids.add(package_id)
+            self._cursor().executemany("""
+            INSERT INTO reversedependencies VALUES (?, ?)
+            """, [(iddependency, x) for x in package_ids])
+
+    def _packagesNames(self, package_ids):
+        """
+        Return the package names the given packages can be matched with
+        by atomMatch(), including their old-style virtual names.
+        """
+        names = set()
+        for package_id in package_ids:
+            cur = self._cursor().execute("""
+            SELECT name FROM baseinfo WHERE idpackage = ? LIMIT 1
+            """, (package_id,))
+            names.update(self._cur2frozenset(cur))
+            cur = self._cursor().execute("""
+            SELECT atom FROM provide WHERE idpackage = ?
+            """, (package_id,))
+            names.update(x.split("/")[-1] for x in self._cur2frozenset(cur))
+        return names
+
+    def _updateReverseDependenciesIndex(self, names, min_iddependency):
+        """
+        Re-match the dependencies that can match any of the given package
+        names and index the dependencies newer than min_iddependency.
+        """
+        # atomMatch() must see the new metadata
+        self._discardLiveCache()
+
+        names = list(names)
+        dependencies = {}
+        cur = self._cursor().execute("""
+        SELECT iddependency, dependency FROM dependenciesreference
+        WHERE iddependency > ?
+        """, (min_iddependency,))
+        dependencies.update(cur)
+
+        # avoid hitting the maximum number of sql variables
+        chunk_size = 256
+        for index in range(0, len(names), chunk_size):
+            chunk = names[index:index + chunk_size]
+            cur = self._cursor().execute("""
+            SELECT dependenciesreference.iddependency,
+                dependenciesreference.dependency
+            FROM dependenciesreference, dependencieskeys
+            WHERE dependencieskeys.name IN (%s) AND
+            dependencieskeys.iddependency =
+                dependenciesreference.iddependency
+            """ % (", ".join(["?"] * len(chunk)),), chunk)
+            dependencies.update(cur)
+
+        # dependencies keyed by a name wildcard, like "foo*", cannot be
+        # looked up by exact name
+        cur = self._cursor().execute("""
+        SELECT dependenciesreference.iddependency,
+            dependenciesreference.dependency, dependencieskeys.name
+        FROM dependenciesreference, dependencieskeys
+        WHERE dependencieskeys.name LIKE ? AND
+        dependencieskeys.iddependency = dependenciesreference.iddependency
+        """, ("%*",))
+        for iddependency, dependency, key in cur.fetchall():
+            prefix = key[:-1]
+            for name in names:
+                if name.startswith(prefix):
+                    dependencies[iddependency] = dependency
+                    break
+
+        self._indexDependencies(sorted(dependencies.items()))
+
+    # name of the full-text search index table, see _buildSearchIndex()
+    _SEARCH_INDEX_TABLE = "searchindex"
+
+    def _searchIndexSupported(self):
+        """
+        Return whether the full-text search index can be used by this
+        repository. Subclasses providing a full-text search engine must
+        implement _createSearchIndexTable(), _dropSearchIndex() and
+        _searchIndexQuery() and return True.
+        """
+        return False
+
+    def _isSearchIndexed(self):
+        """
+        Return whether the full-text search index is available and must
+        be kept up-to-date.
+        """
+        if not self._searchIndexSupported():
+            return False
+        return self._doesTableExist(self._SEARCH_INDEX_TABLE)
+
+    def _createSearchIndexTable(self):
+        """
+        Create the (empty) full-text search index table, with the "name",
+        "atom", "description" and "useflags" columns, whose row
+        identifiers are package identifiers.
+        Not implemented, subclasses must implement this.
+        """
+        raise NotImplementedError()
+
+    def _dropSearchIndex(self):
+        """
+        Drop the full-text search index.
+        Not implemented, subclasses must implement this.
+        """
+        raise NotImplementedError()
+
+    def _searchIndexQuery(self, terms, columns, limit):
+        """
+        Query the full-text search index.
+        Not implemented, subclasses must implement this.
+
+        @param terms: lowercase words that must be matched as prefixes
+        @type terms: list
+        @param columns: index columns to search into
+        @type columns: list
+        @param limit: maximum number of results, or None
+        @type limit: int
+        @return: list of (package_id, rank) tuples, best matches first
+        @rtype: list
+        """
+        raise NotImplementedError()
+
+    def _buildSearchIndex(self):
+        """
+        Build the full-text search index from scratch.
+        """
+        if self._doesTableExist(self._SEARCH_INDEX_TABLE):
+            self._dropSearchIndex()
+        self._createSearchIndexTable()
+        self._indexSearchPackages(None)
+
+    def _createSearchIndex(self):
+        """
+        Build the full-text search index, if supported and not available.
+        """
+        if not self._searchIndexSupported():
+            return
+        if self._isSearchIndexed():
+            return
+        try:
+            self._buildSearchIndex()
+        except OperationalError as err:
+            const_debug_write(
+                __name__,
+                "_createSearchIndex: cannot build: %s" % (repr(err),))
+
+    def _indexSearchPackages(self, package_ids):
+        """
+        (Re)index the given packages into the full-text search index.
+        Packages that are no longer available are removed from it.
+
+        @param package_ids: package identifiers, or None for all of them
+        @type package_ids: iterable
+        """
+        query = """
+        SELECT baseinfo.idpackage, baseinfo.name, baseinfo.atom,
+            extrainfo.description,
+            (SELECT GROUP_CONCAT(useflagsreference.flagname, ' ')
+                FROM useflags, useflagsreference
+                WHERE useflags.idpackage = baseinfo.idpackage
+                AND useflags.idflag = useflagsreference.idflag),
+            (SELECT GROUP_CONCAT(provide.atom, ' ') FROM provide
+                WHERE provide.idpackage = baseinfo.idpackage)
+        FROM baseinfo LEFT JOIN extrainfo
+            ON extrainfo.idpackage = baseinfo.idpackage
+        """
+        if package_ids is None:
+            cur = self._cursor().execute(query)
+        else:
+            package_ids = list(package_ids)
+            self._cursor().executemany("""
+            DELETE FROM %s WHERE rowid = ?
+            """ % (self._SEARCH_INDEX_TABLE,),
+                [(x,) for x in package_ids])
+            cur = []
+            for package_id in package_ids:
+                cur.extend(self._cursor().execute(
+                    query + " WHERE baseinfo.idpackage = ?",
+                    (package_id,)))
+
+        rows = []
+        for package_id, name, atom, description, useflags, provide in cur:
+            if provide:
+                atom = "%s %s" % (atom, provide)
+            rows.append((package_id, name, atom, description or "",
+                         useflags or ""))
+
+        self._cursor().executemany("""
+        INSERT INTO %s (rowid, name, atom, description, useflags)
+        VALUES (?, ?, ?, ?, ?)
+        """ % (self._SEARCH_INDEX_TABLE,), rows)
+
+    @contextlib.contextmanager
+    def _packagesUpdate(self, package_ids):
+        """
+        Context manager that incrementally updates the aggregated packages
+        digest used by checksum() and the reverse dependencies index when
+        the metadata of the given packages is modified inside the with
+        statement.
+        The contribution of every package is removed before the execution
+        of the block and added back afterwards. If new package identifiers
+        are appended to package_ids (it must be a list then) inside the
+        block, their contribution is added as well. The dependencies that
+        can match the given packages, before and after the execution of
+        the block, are matched again and new dependencies get indexed.
+        Nested calls are no-ops, the outermost context takes care of
+        updating the digest and the index.
+
+        @param package_ids: list of package identifiers being modified
+        @type package_ids: iterable
+        """
+        if self._packages_update_depth:
+            self._packages_update_depth += 1
+            try:
+                yield
+            finally:
+                self._packages_update_depth -= 1
+            return
+
+        digest = None
+        if self._isBaseinfoExtrainfo2010():
+            digest = self._getPackagesDigest()
+            if digest is None:
+                # start tracking it now
+                digest = self._computePackagesDigest()
+            for package_id in package_ids:
+                digest ^= self._packageDigest(package_id)
+
+        names = None
+        if self._isReverseDependenciesIndexed():
+            names = self._packagesNames(package_ids)
+            cur = self._cursor().execute("""
+            SELECT MAX(iddependency) FROM dependenciesreference
+            """)
+            min_iddependency = cur.fetchone()[0] or 0
+
+        self._packages_update_depth += 1
+        try:
+            yield
+        finally:
+            self._packages_update_depth -= 1
+
+        if digest is not None:
+            for package_id in package_ids:
+                digest ^= self._packageDigest(package_id)
+            self._setPackagesDigest(digest)
+
+        if names is not None:
+            names |= self._packagesNames(package_ids)
+            self._updateReverseDependenciesIndex(names, min_iddependency)
+
+        if self._isSearchIndexed():
+            self._indexSearchPackages(package_ids)
+
     def checksum(self, do_order = False, strict = True,
                  include_signatures = False,
-                 include_dependencies = False):
+                 include_dependencies = False,
+                 incremental = True):
         """
         Reimplemented from EntropyRepositoryBase.
         """
+        if incremental and not do_order:
+            cached = self._getLiveCache("checksum_incremental")
+            if cached is not None:
+                return cached
+            # avoid memleak with python3.x
+            del cached
+
+            digest = self._getPackagesDigest()
+            # if the repository is not tracking the digest yet (it will
+            # start doing it on the first write), use the legacy method.
+            if digest is not None:
+                result = "%040x" % (digest,)
+                self._setLiveCache("checksum_incremental", result)
+                return result
+
         cache_key = "checksum_%s_%s_True_%s_%s" % (
             do_order, strict, include_signatures, include_dependencies)
         cached = self._getLiveCache(cache_key)
@@ -5136,6 +5848,10 @@ class EntropySQLRepository(EntropyRepositoryBase):
         """
         Reimplemented from EntropyRepositoryBase.
         """
+        # not SQL indexes, readers fall back to the slow path without them
+        self._createReverseDependenciesIndex()
+        self._createSearchIndex()
+
         if not self._indexing:
             return
 
@@ -20,7 +20,30 @@ try:
 except ImportError:
     import _thread as thread
 import threading
-import subprocess
+import zlib
+
+# errors raised by the optional decompressors when reading a corrupted
+# dump, the modules are resolved like in entropy.const.
+_DUMP_DECOMPRESSION_ERRORS = (zlib.error,)
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+if lzma is not None:
+    _DUMP_DECOMPRESSION_ERRORS += (lzma.LZMAError,)
+try:
+    # Python 3.14+
+    from compression import zstd as _zstd
+except ImportError:
+    try:
+        import zstandard as _zstd
+    except ImportError:
+        _zstd = None
+if _zstd is not None:
+    _DUMP_DECOMPRESSION_ERRORS += (_zstd.ZstdError,)
 
 from entropy.const import etpConst, const_convert_to_unicode, \
     const_get_buffer, const_convert_to_rawstring, const_pid_exists, \
@@ -133,13 +156,17 @@ class EntropySQLiteRepository(EntropySQLRepository):
 
     # bump this every time schema changes and databaseStructureUpdate
     # should be triggered
-    _SCHEMA_REVISION = 6
+    _SCHEMA_REVISION = 7
 
     _INSERT_OR_REPLACE = "INSERT OR REPLACE"
     _INSERT_OR_IGNORE = "INSERT OR IGNORE"
     _UPDATE_OR_REPLACE = "UPDATE OR REPLACE"
     _CACHE_SIZE = 8192
 
+    # amount of dump data executed in a single transaction by
+    # importRepository()
+    _IMPORT_CHUNK_SIZE = 4 * 1024 * 1024
+
     SETTING_KEYS = ("arch", "on_delete_cascade", "schema_revision",
         "_baseinfo_extrainfo_2010")
 
@@ -147,6 +174,7 @@ class EntropySQLiteRepository(EntropySQLRepository):
 
         _mod = None
         _excs = None
+        _fts5 = None
         _lock = threading.Lock()
 
         @staticmethod
@@ -177,6 +205,25 @@ class EntropySQLiteRepository(EntropySQLRepository):
             """
             raise NotImplementedError()
 
+        @staticmethod
+        def fts5():
+            """
+            Return whether the SQLite3 library supports the FTS5
+            full-text search extension.
+            """
+            proxy = EntropySQLiteRepository.SQLiteProxy
+            if proxy._fts5 is None:
+                _mod = proxy.get()
+                conn = _mod.connect(":memory:")
+                try:
+                    conn.execute("CREATE VIRTUAL TABLE fts USING fts5(x)")
+                    proxy._fts5 = True
+                except _mod.Error:
+                    proxy._fts5 = False
+                finally:
+                    conn.close()
+            return proxy._fts5
+
     ModuleProxy = SQLiteProxy
 
     def __init__(self, readOnly = False, dbFile = None, xcache = False,
@@ -723,6 +770,9 @@ class EntropySQLiteRepository(EntropySQLRepository):
         self._setCacheSize(self._CACHE_SIZE)
         self._setDefaultCacheSize(self._CACHE_SIZE)
         self._databaseSchemaUpdates()
+        self._resetPackagesDigest()
+        if self._reverseDependenciesIndexSupported():
+            self._buildReverseDependenciesIndex()
 
         self.commit()
         self._clearLiveCache("_doesTableExist")
@@ -817,9 +867,10 @@ class EntropySQLiteRepository(EntropySQLRepository):
         We must handle _baseinfo_extrainfo_2010 and live cache.
         """
         if self._isBaseinfoExtrainfo2010():
-            self._cursor().execute("""
-            UPDATE baseinfo SET category = (?) WHERE idpackage = (?)
-            """, (category, package_id,))
+            with self._packagesUpdate((package_id,)):
+                self._cursor().execute("""
+                UPDATE baseinfo SET category = (?) WHERE idpackage = (?)
+                """, (category, package_id,))
         else:
             # create new category if it doesn't exist
             catid = self._isCategoryAvailable(category)
@@ -1025,6 +1076,42 @@ class EntropySQLiteRepository(EntropySQLRepository):
         super(EntropySQLiteRepository, self)._cleanupDependencies()
         self._clearLiveCache("retrieveDependencies")
 
+    def _atomMatchPrefetch(self):
+        """
+        Reimplemented from EntropyRepositoryBase.
+        Load the in-memory caches of the baseinfo columns used by
+        atomMatch() with one query, instead of one per column.
+        """
+        if self.directed() or self.cache_policy_none():
+            return
+
+        cache_keys = ("retrieveSlot", "retrieveTag", "retrieveVersion",
+                      "retrieveRevision", "getVersioningData")
+        missing = [x for x in cache_keys if self._getLiveCache(x) is None]
+        if not missing:
+            return
+
+        cur = self._cursor().execute("""
+        SELECT idpackage, slot, version, versiontag, revision FROM baseinfo
+        """)
+        slots, tags, versions, revisions, versioning = {}, {}, {}, {}, {}
+        for pkg_id, slot, ver, tag, rev in cur:
+            slots[pkg_id] = slot
+            tags[pkg_id] = tag
+            versions[pkg_id] = ver
+            revisions[pkg_id] = rev
+            versioning[pkg_id] = (ver, tag, rev)
+
+        caches = {
+            "retrieveSlot": slots,
+            "retrieveTag": tags,
+            "retrieveVersion": versions,
+            "retrieveRevision": revisions,
+            "getVersioningData": versioning,
+        }
+        for key in missing:
+            self._setLiveCache(key, caches[key])
+
     def getVersioningData(self, package_id):
         """
         Reimplemented from EntropySQLRepository.
@@ -2000,6 +2087,10 @@ class EntropySQLiteRepository(EntropySQLRepository):
         if not self._doesColumnInTableExist("preserved_libs", "atom"):
             self._createPreservedLibsAtomColumn()
 
+        # added on Oct. 2026, the index is built by createAllIndexes()
+        if not self._doesTableExist("reversedependencies"):
+            self._createReverseDependenciesTables()
+
         # added on Sept. 2014, keep forever? ;-)
         self._migrateNeededLibs()
 
@@ -2035,27 +2126,130 @@ class EntropySQLiteRepository(EntropySQLRepository):
     def importRepository(dumpfile, db, data = None):
         """
         Reimplemented from EntropyRepositoryBase.
-        @todo: remove /usr/bin/sqlite3 dependency
+        The dump is imported in-process, while it is read, so dumpfile
+        can also be a (compressed) file object, like the ones returned by
+        bz2.BZ2File and gzip.GzipFile. The statements are executed in
+        large batches, each one inside its own transaction, and the
+        indexes are created after the data has been imported.
+        The new database is written to a temporary file, with no journal
+        and no synchronous writes, which atomically replaces db at the end.
         """
         dbfile = os.path.realpath(db)
         tmp_dbfile = dbfile + ".import_repository"
-        dumpfile = os.path.realpath(dumpfile)
         if not entropy.tools.is_valid_path_string(dbfile):
             raise AttributeError("dbfile value is invalid")
-        if not entropy.tools.is_valid_path_string(dumpfile):
-            raise AttributeError("dumpfile value is invalid")
-        with open(dumpfile, "rb") as in_f:
-            try:
-                proc = subprocess.Popen(("/usr/bin/sqlite3", tmp_dbfile,),
-                    bufsize = -1, stdin = in_f)
-            except OSError:
-                # ouch ! wtf!
-                return 1
-            rc = proc.wait()
-            if rc == 0:
-                os.rename(tmp_dbfile, dbfile)
+
+        if hasattr(dumpfile, "read"):
+            dump_f = dumpfile
+        else:
+            dumpfile = os.path.realpath(dumpfile)
+            if not entropy.tools.is_valid_path_string(dumpfile):
+                raise AttributeError("dumpfile value is invalid")
+            dump_f = open(dumpfile, "rb")
+
+        try:
+            os.remove(tmp_dbfile)
+        except OSError as err:
+            if err.errno != errno.ENOENT:
+                raise
+
+        sqlite = EntropySQLiteRepository.SQLiteProxy.get()
+        rc = 1
+        conn = None
+        try:
+            conn = sqlite.connect(tmp_dbfile, isolation_level = None)
+            conn.execute("PRAGMA journal_mode = OFF")
+            conn.execute("PRAGMA synchronous = OFF")
+            conn.execute("PRAGMA cache_size = %d" % (
+                EntropySQLiteRepository._CACHE_SIZE,))
+            EntropySQLiteRepository._importDump(conn, dump_f)
+            conn.close()
+            conn = None
+
+            with open(tmp_dbfile, "rb") as tmp_f:
+                os.fsync(tmp_f.fileno())
+            os.rename(tmp_dbfile, dbfile)
+            rc = 0
+
+        except (sqlite.Error, IOError, EOFError,
+                ValueError) + _DUMP_DECOMPRESSION_ERRORS as err:
+            const_debug_write(__name__,
+                "importRepository: cannot import %s: %s" % (dumpfile, err,))
+
+        finally:
+            if conn is not None:
+                conn.close()
+            if dump_f is not dumpfile:
+                dump_f.close()
+            if rc != 0:
+                try:
+                    os.remove(tmp_dbfile)
+                except OSError:
+                    pass
+
         return rc
 
+    @staticmethod
+    def _importDump(conn, dump_f):
+        """
+        Execute the SQL statements read from the dump file object dump_f,
+        see importRepository().
+        """
+        sqlite = EntropySQLiteRepository.SQLiteProxy.get()
+        chunk_size = EntropySQLiteRepository._IMPORT_CHUNK_SIZE
+        enc = etpConst['conf_encoding']
+
+        def _execute(statements):
+            script = b"".join(statements)
+            try:
+                script = script.decode(enc)
+            except UnicodeDecodeError:
+                script = const_convert_to_unicode(script)
+            conn.executescript(
+                "BEGIN TRANSACTION;\n" + script + "COMMIT;\n")
+
+        if const_is_python3():
+            def _complete(sql):
+                return sqlite.complete_statement(sql.decode(enc, "replace"))
+        else:
+            _complete = sqlite.complete_statement
+
+        deferred = []
+        chunk = []
+        chunk_len = 0
+        statement = None
+        for line in dump_f:
+            if statement is not None:
+                line = statement + line
+            if not line.rstrip().endswith(b";") or not _complete(line):
+                statement = line
+                continue
+            statement = None
+
+            if not line.startswith(b"INSERT"):
+                head = line[:32].lstrip().upper()
+                if head.startswith((b"BEGIN", b"COMMIT", b"END")):
+                    # transactions are handled by _execute()
+                    continue
+                if head.startswith((b"CREATE INDEX", b"CREATE UNIQUE",
+                                    b"CREATE TRIGGER")):
+                    # indexes and triggers, created at the end
+                    deferred.append(line)
+                    continue
+
+            chunk.append(line)
+            chunk_len += len(line)
+            if chunk_len >= chunk_size:
+                _execute(chunk)
+                del chunk[:]
+                chunk_len = 0
+
+        if statement is not None:
+            # truncated statement, make executescript() fail
+            chunk.append(statement)
+        chunk.extend(deferred)
+        _execute(chunk)
+
     def exportRepository(self, dumpfile):
         """
         Reimplemented from EntropyRepositoryBase.
@@ -2082,6 +2276,11 @@ class EntropySQLiteRepository(EntropySQLRepository):
             )
             if name.startswith("sqlite_"):
                 continue
+            if name == self._SEARCH_INDEX_TABLE or name.startswith(
+                    self._SEARCH_INDEX_TABLE + "_"):
+                # full-text search index and its shadow tables,
+                # rebuilt by createAllIndexes()
+                continue
 
             t_cmd = "CREATE TABLE"
             if sql.startswith(t_cmd) and gentle_with_tables:
@@ -2144,7 +2343,8 @@ class EntropySQLiteRepository(EntropySQLRepository):
         return os.path.getmtime(self._db)
 
     def checksum(self, do_order = False, strict = True,
-                 include_signatures = False, include_dependencies = False):
+                 include_signatures = False, include_dependencies = False,
+                 incremental = True):
         """
         Reimplemented from EntropySQLRepository.
         We have to handle _baseinfo_extrainfo_2010.
@@ -2156,7 +2356,9 @@ class EntropySQLiteRepository(EntropySQLRepository):
                          self).checksum(
                 do_order = do_order,
                 strict = strict,
-                include_signatures = include_signatures)
+                include_signatures = include_signatures,
+                include_dependencies = include_dependencies,
+                incremental = incremental)
 
         # backward compatibility
         # !!! keep aligned !!!
@@ -2395,6 +2597,11 @@ class EntropySQLiteRepository(EntropySQLRepository):
             except OperationalError:
                 continue
 
+        if self._isSearchIndexed():
+            # the full-text search index is local data, rebuilt by
+            # createAllIndexes()
+            self._dropSearchIndex()
+
     def createAllIndexes(self):
         """
         Reimplemented from EntropySQLRepository.
@@ -2405,6 +2612,18 @@ class EntropySQLiteRepository(EntropySQLRepository):
             self.__createLicensesIndex()
             self.__createCategoriesIndex()
             self.__createCompileFlagsIndex()
+        self.__createReverseDependenciesIndex()
+
+    def __createReverseDependenciesIndex(self):
+        try:
+            self._cursor().executescript("""
+            CREATE INDEX IF NOT EXISTS dependencieskeysindex_name
+                ON dependencieskeys ( name );
+            CREATE INDEX IF NOT EXISTS reversedependenciesindex_idpackage
+                ON reversedependencies ( idpackage );
+            """)
+        except OperationalError:
+            pass
 
     def __createCompileFlagsIndex(self):
         try:
@@ -2447,6 +2666,54 @@ class EntropySQLiteRepository(EntropySQLRepository):
             ON baseinfo ( idlicense, idcategory );
         """)
 
+    def _searchIndexSupported(self):
+        """
+        Reimplemented from EntropySQLRepository.
+        The full-text search index requires SQLite FTS5.
+        """
+        return self.ModuleProxy.fts5()
+
+    def _createSearchIndexTable(self):
+        """
+        Reimplemented from EntropySQLRepository.
+        """
+        self._cursor().execute("""
+        CREATE VIRTUAL TABLE %s USING fts5(
+            name, atom, description, useflags, prefix = '2 3')
+        """ % (self._SEARCH_INDEX_TABLE,))
+        self._clearLiveCache("_doesTableExist")
+
+    def _dropSearchIndex(self):
+        """
+        Reimplemented from EntropySQLRepository.
+        """
+        self._cursor().execute(
+            "DROP TABLE IF EXISTS %s" % (self._SEARCH_INDEX_TABLE,))
+        self._clearLiveCache("_doesTableExist")
+
+    def _searchIndexQuery(self, terms, columns, limit):
+        """
+        Reimplemented from EntropySQLRepository.
+        Results are ranked using bm25(), matches in the name column weigh
+        more than the ones in atom, useflags and description and exact
+        package name matches come first.
+        """
+        match = "{%s} : (%s)" % (
+            " ".join(columns),
+            " AND ".join(['"%s"*' % (x.replace('"', '""'),) for x in terms]))
+        limit_sql = ""
+        if limit is not None:
+            limit_sql = "LIMIT %d" % (limit,)
+
+        cur = self._cursor().execute("""
+        SELECT rowid, bm25(%s, 10.0, 4.0, 1.0, 2.0)
+            - (LOWER(name) = ?) * 10.0 AS rank FROM %s
+        WHERE %s MATCH ? ORDER BY rank, rowid %s
+        """ % (self._SEARCH_INDEX_TABLE, self._SEARCH_INDEX_TABLE,
+               self._SEARCH_INDEX_TABLE, limit_sql),
+            ("-".join(terms), match))
+        return [tuple(x) for x in cur]
+
     def _migrateNeededLibs(self):
         """
         Migrate from needed and neededreference schema to the
@@ -2768,6 +3035,24 @@ class EntropySQLiteRepository(EntropySQLRepository):
         """)
         self._clearLiveCache("_doesColumnInTableExist")
 
+    def _createReverseDependenciesTables(self):
+        self._cursor().executescript("""
+            CREATE TABLE dependencieskeys (
+                iddependency INTEGER,
+                name VARCHAR,
+                PRIMARY KEY(iddependency, name)
+            );
+            CREATE TABLE reversedependencies (
+                iddependency INTEGER,
+                idpackage INTEGER,
+                PRIMARY KEY(iddependency, idpackage),
+                FOREIGN KEY(idpackage)
+                    REFERENCES baseinfo(idpackage) ON DELETE CASCADE
+            );
+        """)
+        self._clearLiveCache("_doesTableExist")
+        self._clearLiveCache("_doesColumnInTableExist")
+
     def _createPackageDownloadsTable(self):
         self._cursor().executescript("""
             CREATE TABLE packagedownloads (
@@ -11,7 +11,11 @@
     This module contains Entropy package dependency manipulation functions.
 
 """
+import collections
+import functools
 import re
+import threading
+
 from entropy.exceptions import InvalidAtom, EntropyException
 from entropy.const import etpConst, const_cmp
 
@@ -75,29 +79,90 @@ def _pkgsplit(mypkg):
 
     return  (m.group('pn'), m.group('ver'), rev)
 
-def _generic_sorter(inputlist, cmp_func):
+class _LRUCache(object):
+    """
+    Thread-safe, bounded, least recently used mapping.
+    """
 
-    inputs = inputlist[:]
-    if len(inputs) < 2:
-        return inputs
-    max_idx = len(inputs)
+    _MISSING = object()
 
-    while True:
-        changed = False
-        for idx in range(max_idx):
-            second_idx = idx+1
-            if second_idx == max_idx:
-                continue
-            str_a = inputs[idx]
-            str_b = inputs[second_idx]
-            if cmp_func(str_a, str_b) < 0:
-                inputs[idx] = str_b
-                inputs[second_idx] = str_a
-                changed = True
-        if not changed:
-            break
+    def __init__(self, size):
+        self._size = size
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default = None):
+        with self._lock:
+            value = self._data.pop(key, self._MISSING)
+            if value is self._MISSING:
+                return default
+            self._data[key] = value
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            if len(self._data) > self._size:
+                self._data.popitem(last = False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+_PARSED_VERSIONS = _LRUCache(8192)
+_VERSION_KEYS = _LRUCache(8192)
+_INVALID_VERSION = object()
+
+def _parse_version(myver):
+    """
+    Parse a version string through ver_regexp once and return its
+    components, None if the version string is invalid.
+    Results are memoized.
+
+    @param myver: version string
+    @type myver: string
+    @return: (first version part (int), other version parts (tuple of
+        strings), final letter (int or None), suffixes (tuple of
+        (suffix, suffix number string) tuples), revision (int)) tuple
+        or None
+    @rtype: tuple or None
+    """
+    parsed = _PARSED_VERSIONS.get(myver)
+    if parsed is not None:
+        if parsed is _INVALID_VERSION:
+            return None
+        return parsed
+
+    match = None
+    if myver:
+        match = ver_regexp.match(myver)
+    if not match or not match.groups():
+        _PARSED_VERSIONS.set(myver, _INVALID_VERSION)
+        return None
+
+    letter = match.group(5)
+    if letter:
+        letter = ord(letter)
+    else:
+        letter = None
+
+    suffixes = tuple((suffix_regexp.match(x).groups() for x in \
+        match.group(6).split("_")[1:]))
+
+    rev = match.group(10)
+    if rev:
+        rev = int(rev)
+    else:
+        rev = 0
 
-    return inputs
+    vlist = ()
+    if match.group(3):
+        vlist = tuple(match.group(3)[1:].split("."))
+
+    parsed = (int(match.group(2)), vlist, letter, suffixes, rev)
+    _PARSED_VERSIONS.set(myver, parsed)
+    return parsed
 
 def isjustname(mypkg):
     """
@@ -511,38 +576,23 @@ def compare_versions(ver1, ver2):
     """
     if ver1 == ver2:
         return 0
-    match1 = None
-    match2 = None
-    if ver1:
-        match1 = ver_regexp.match(ver1)
-    if ver2:
-        match2 = ver_regexp.match(ver2)
-
-    # checking that the versions are valid
-    invalid = False
-    invalid_rc = 0
-    if not match1:
-        invalid = True
-    elif not match1.groups():
-        invalid = True
-    elif not match2:
-        invalid_rc = 1
-        invalid = True
-    elif not match2.groups():
-        invalid_rc = 1
-        invalid = True
-    if invalid:
-        return invalid_rc
+    parsed1 = _parse_version(ver1)
+    if parsed1 is None:
+        return 0
+    parsed2 = _parse_version(ver2)
+    if parsed2 is None:
+        return 1
+
+    first1, vlist1, letter1, suffixes1, rev1 = parsed1
+    first2, vlist2, letter2, suffixes2, rev2 = parsed2
 
     # building lists of the version parts before the suffix
     # first part is simple
-    list1 = [int(match1.group(2))]
-    list2 = [int(match2.group(2))]
+    list1 = [first1]
+    list2 = [first2]
 
     # this part would greatly benefit from a fixed-length version pattern
-    if len(match1.group(3)) or len(match2.group(3)):
-        vlist1 = match1.group(3)[1:].split(".")
-        vlist2 = match2.group(3)[1:].split(".")
+    if vlist1 or vlist2:
         for i in range(0, max(len(vlist1), len(vlist2))):
             # Implcit .0 is given a value of -1, so that 1.0.0 > 1.0, since it
             # would be ambiguous if two versions that aren't literally equal
@@ -563,10 +613,10 @@ def compare_versions(ver1, ver2):
                 list2.append(float("0."+vlist2[i]))
 
     # and now the final letter
-    if len(match1.group(5)):
-        list1.append(ord(match1.group(5)))
-    if len(match2.group(5)):
-        list2.append(ord(match2.group(5)))
+    if letter1 is not None:
+        list1.append(letter1)
+    if letter2 is not None:
+        list2.append(letter2)
 
     for i in range(0, max(len(list1), len(list2))):
         if len(list1) <= i:
@@ -577,18 +627,15 @@ def compare_versions(ver1, ver2):
             return list1[i] - list2[i]
 
     # main version is equal, so now compare the _suffix part
-    list1 = match1.group(6).split("_")[1:]
-    list2 = match2.group(6).split("_")[1:]
-
-    for i in range(0, max(len(list1), len(list2))):
-        if len(list1) <= i:
+    for i in range(0, max(len(suffixes1), len(suffixes2))):
+        if len(suffixes1) <= i:
             s1 = ("p", "0")
         else:
-            s1 = suffix_regexp.match(list1[i]).groups()
-        if len(list2) <= i:
+            s1 = suffixes1[i]
+        if len(suffixes2) <= i:
             s2 = ("p", "0")
         else:
-            s2 = suffix_regexp.match(list2[i]).groups()
+            s2 = suffixes2[i]
         if s1[0] != s2[0]:
             return suffix_value[s1[0]] - suffix_value[s2[0]]
         if s1[1] != s2[1]:
@@ -602,18 +649,75 @@ def compare_versions(ver1, ver2):
                 r2 = int(s2[1])
             except ValueError:
                 r2 = 0
-            return r1 - r2
+            if r1 != r2:
+                return r1 - r2
 
     # the suffix part is equal to, so finally check the revision
-    if match1.group(10):
-        r1 = int(match1.group(10))
-    else:
-        r1 = 0
-    if match2.group(10):
-        r2 = int(match2.group(10))
-    else:
-        r2 = 0
-    return r1 - r2
+    return rev1 - rev2
+
+def version_key(myver):
+    """
+    Return a key that can be used to sort version strings (for example,
+    through sorted(versions, key = version_key)). Keys compare like
+    compare_versions() does, invalid versions are considered older than
+    any valid one. Results are memoized.
+
+    @param myver: version string
+    @type myver: string
+    @return: the sort key
+    @rtype: tuple
+    """
+    key = _VERSION_KEYS.get(myver)
+    if key is not None:
+        return key
+
+    parsed = _parse_version(myver)
+    if parsed is None:
+        key = ((-2,), (), 0)
+        _VERSION_KEYS.set(myver, key)
+        return key
+
+    first, vlist, letter, suffixes, rev = parsed
+
+    # Version parts starting with "0" are mapped to 0.x floats, the
+    # others to integers >= 1, this gives the same ordering as the
+    # pairwise int/float choice of compare_versions(). The missing
+    # parts are worth -1, the terminator reproduces that.
+    main = [first]
+    for part in vlist:
+        if part[0] != "0":
+            main.append(int(part))
+        else:
+            main.append(float("0." + part))
+    main.append(-1)
+    if letter is not None:
+        main.append(letter)
+
+    # Missing suffixes are worth "_p0". Suffixes are grouped into
+    # blocks made of the number of "_p0" preceding a different suffix
+    # and that suffix, the final (0,) element stands for the infinite
+    # "_p0" padding.
+    suffix_key = []
+    padding = 0
+    for suffix, number in suffixes:
+        try:
+            number = int(number)
+        except ValueError:
+            number = 0
+        value = (suffix_value[suffix], number)
+        if value == (0, 0):
+            padding += 1
+            continue
+        if value > (0, 0):
+            suffix_key.append((1, -padding, value))
+        else:
+            suffix_key.append((-1, padding, value))
+        padding = 0
+    suffix_key.append((0,))
+
+    key = (tuple(main), tuple(suffix_key), rev)
+    _VERSION_KEYS.set(myver, key)
+    return key
 
 tag_regexp = re.compile("^([A-Za-z0-9+_.-]+)?$")
 def is_valid_package_tag(tag):
@@ -694,6 +798,10 @@ def entropy_compare_versions(ver_data, ver_data2):
 
     return rc
 
+# entropy_compare_versions() is not expressible as a plain key, since
+# package tags are compared first only when both versions are tagged.
+entropy_version_key = functools.cmp_to_key(entropy_compare_versions)
+
 def get_newer_version(versions):
     """
     Return a sorted list of versions
@@ -703,7 +811,7 @@ def get_newer_version(versions):
     @return: sorted version list
     @rtype: list
     """
-    return _generic_sorter(versions, compare_versions)
+    return sorted(versions, key = version_key, reverse = True)
 
 def get_entropy_newer_version(versions):
     """
@@ -714,7 +822,7 @@ def get_entropy_newer_version(versions):
     @return: sorted list
     @rtype: list
     """
-    return _generic_sorter(versions, entropy_compare_versions)
+    return sorted(versions, key = entropy_version_key, reverse = True)
 
 sha1_re = re.compile(r"(.*)\.([a-f\d]{40})(.*)")
 def get_entropy_package_sha1(package_name):
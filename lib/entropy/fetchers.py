@@ -25,6 +25,7 @@ import subprocess
 import threading
 import contextlib
 import base64
+import collections
 import ssl
 
 from entropy.const import const_is_python3, const_file_readable
@@ -46,9 +47,334 @@ from entropy.output import TextInterface, darkblue, darkred, purple, blue, \
 
 from entropy.i18n import _, ngettext
 from entropy.misc import ParallelTask
+from entropy.core import Singleton
 from entropy.core.settings.base import SystemSettings
 
 
+class HttpConnectionPool(object):
+
+    """
+    Pool of persistent (HTTP/1.1 keep-alive) HTTP and HTTPS connections,
+    shared by all the UrlFetcher instances of the process. It also caps
+    the number of connections open at the same time against the same
+    host. Connections are checked out through get() and must be handed
+    back through put() once the response body has been fully read,
+    or through discard() otherwise.
+    """
+
+    # maximum number of connections in use at the same time per host
+    MAX_CONNECTIONS_PER_HOST = 4
+
+    def __init__(self, max_per_host = None):
+        if max_per_host is None:
+            max_per_host = HttpConnectionPool.MAX_CONNECTIONS_PER_HOST
+        self._max_per_host = max_per_host
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._slots = {}
+
+    @staticmethod
+    def _connection_key(scheme, netloc, validate_cert):
+        return scheme, netloc, validate_cert
+
+    def _host_slots(self, key):
+        with self._lock:
+            slots = self._slots.get(key)
+            if slots is None:
+                slots = threading.BoundedSemaphore(self._max_per_host)
+                self._slots[key] = slots
+            return slots
+
+    def get(self, scheme, netloc, timeout, validate_cert = True):
+        """
+        Return a (connection, reused) tuple for the given host, blocking
+        if the maximum number of connections for it has been reached.
+        "reused" is True if the connection has been used before and
+        may have been closed by the server in the meantime.
+
+        @param scheme: either "http" or "https"
+        @type scheme: string
+        @param netloc: host[:port] string
+        @type netloc: string
+        @param timeout: socket timeout, in seconds
+        @type timeout: int
+        @keyword validate_cert: validate the HTTPS server certificate
+        @type validate_cert: bool
+        @return: tuple composed by a httplib.HTTPConnection object
+            and a bool
+        @rtype: tuple
+        """
+        key = self._connection_key(scheme, netloc, validate_cert)
+        self._host_slots(key).acquire()
+
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                conn = idle.pop()
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+
+        try:
+            if scheme == "https":
+                ctx = ssl.create_default_context()
+                if not validate_cert:
+                    ctx.check_hostname = False
+                    ctx.verify_mode = ssl.CERT_NONE
+                conn = httplib.HTTPSConnection(
+                    netloc, timeout = timeout, context = ctx)
+            else:
+                conn = httplib.HTTPConnection(netloc, timeout = timeout)
+        except:
+            self._host_slots(key).release()
+            raise
+        conn._entropy_pool_key = key
+        return conn, False
+
+    def put(self, conn):
+        """
+        Hand a connection back to the pool, for later reuse.
+
+        @param conn: connection returned by get()
+        @type conn: httplib.HTTPConnection
+        """
+        key = conn._entropy_pool_key
+        with self._lock:
+            self._idle.setdefault(key, []).append(conn)
+        self._host_slots(key).release()
+
+    def discard(self, conn):
+        """
+        Close a connection returned by get(), it will not be reused.
+
+        @param conn: connection returned by get()
+        @type conn: httplib.HTTPConnection
+        """
+        try:
+            conn.close()
+        except (socket.error, httplib.HTTPException):
+            pass
+        self._host_slots(conn._entropy_pool_key).release()
+
+    def clear(self):
+        """
+        Close all the idle connections.
+        """
+        with self._lock:
+            idle_conns = []
+            for conns in self._idle.values():
+                idle_conns.extend(conns)
+            self._idle.clear()
+        for conn in idle_conns:
+            try:
+                conn.close()
+            except (socket.error, httplib.HTTPException):
+                pass
+
+_HTTP_CONNECTION_POOL = HttpConnectionPool()
+
+
+class _PooledHttpResponse(object):
+
+    """
+    File-like wrapper of a httplib.HTTPResponse object, whose connection
+    belongs to a HttpConnectionPool. The connection is handed back to the
+    pool on close() if the response body has been fully read.
+    """
+
+    def __init__(self, pool, conn, response, url):
+        self._pool = pool
+        self._conn = conn
+        self._response = response
+        self._url = url
+        self.headers = response.msg
+
+    def read(self, size):
+        return self._response.read(size)
+
+    def geturl(self):
+        return self._url
+
+    def close(self):
+        conn = self._conn
+        if conn is None:
+            return
+        self._conn = None
+        response = self._response
+        if response.isclosed() and not response.will_close:
+            self._pool.put(conn)
+        else:
+            self._pool.discard(conn)
+
+
+class MirrorStatistics(Singleton):
+
+    """
+    Per-mirror download statistics, shared by the whole process and
+    persisted through save(). Throughput, latency and failure rate of
+    every mirror (identified by its host[:port]) are tracked as
+    exponentially weighted moving averages (EWMA) of the downloads
+    completed by UrlFetcher and of the mirror benchmarks.
+    """
+
+    # weight of the newest sample
+    ALPHA = 0.3
+    # downloads shorter than this (in bytes) are not meaningful
+    MIN_SAMPLE_SIZE = 256000
+    # size (in bytes) of a typical package, used to score the mirrors
+    TYPICAL_SIZE = 2000000
+
+    def init_singleton(self):
+        self._path = os.path.join(
+            etpConst['entropyworkdir'], "mirror_statistics")
+        self._lock = threading.Lock()
+        self._stats = None
+        self._dirty = False
+
+    @staticmethod
+    def _key(url):
+        try:
+            return spliturl(url).netloc or None
+        except ValueError:
+            return None
+
+    def _load(self):
+        """
+        Load the statistics from disk, must be called with self._lock
+        acquired.
+        """
+        if self._stats is not None:
+            return self._stats
+
+        stats = {}
+        try:
+            with open(self._path, "r") as stats_f:
+                for line in stats_f.readlines():
+                    try:
+                        key, throughput, latency, failure_rate = \
+                            line.split()
+                        stats[key] = [float(throughput), float(latency),
+                                      float(failure_rate)]
+                    except ValueError:
+                        continue
+        except (IOError, OSError):
+            pass
+        self._stats = stats
+        return stats
+
+    def _update(self, url, throughput, latency, failed):
+        key = self._key(url)
+        if key is None:
+            return
+        alpha = MirrorStatistics.ALPHA
+        with self._lock:
+            stats = self._load()
+            data = stats.get(key)
+            if data is None:
+                if failed:
+                    data = [0.0, 0.0, 1.0]
+                else:
+                    data = [throughput, latency, 0.0]
+                stats[key] = data
+            elif failed:
+                data[2] = (1 - alpha) * data[2] + alpha
+            else:
+                if data[0] > 0:
+                    data[0] = (1 - alpha) * data[0] + alpha * throughput
+                    data[1] = (1 - alpha) * data[1] + alpha * latency
+                else:
+                    data[0], data[1] = throughput, latency
+                data[2] = (1 - alpha) * data[2]
+            self._dirty = True
+
+    def record(self, url, throughput, latency):
+        """
+        Record a successful download.
+
+        @param url: the download URL or mirror URL
+        @type url: string
+        @param throughput: transfer rate, in bytes/sec
+        @type throughput: float
+        @param latency: time needed to get the first byte, in seconds
+        @type latency: float
+        """
+        if throughput > 0:
+            self._update(url, float(throughput), float(latency), False)
+
+    def record_failure(self, url):
+        """
+        Record a failed (timed out, unreachable) download.
+
+        @param url: the download URL or mirror URL
+        @type url: string
+        """
+        self._update(url, 0.0, 0.0, True)
+
+    def expected_time(self, url):
+        """
+        Return the expected time (in seconds) needed to download a typical
+        package from the given mirror, or None if unknown.
+
+        @param url: the download URL or mirror URL
+        @type url: string
+        @return: expected download time or None
+        @rtype: float or None
+        """
+        key = self._key(url)
+        with self._lock:
+            data = self._load().get(key)
+        if data is None:
+            return None
+        throughput, latency, failure_rate = data
+        success_rate = max(0.05, 1.0 - failure_rate)
+        if throughput <= 0:
+            return float(MirrorStatistics.TYPICAL_SIZE) / success_rate
+        exp_time = latency + MirrorStatistics.TYPICAL_SIZE / throughput
+        return exp_time / success_rate
+
+    def sort(self, urls):
+        """
+        Return a new list containing the given mirror URLs, fastest first.
+        Mirrors without statistics are considered as good as the median
+        known one, relative order is kept among equally good mirrors.
+
+        @param urls: list of mirror URLs
+        @type urls: list
+        @return: sorted list of mirror URLs
+        @rtype: list
+        """
+        times = dict((url, self.expected_time(url)) for url in urls)
+        known = sorted(x for x in times.values() if x is not None)
+        if not known:
+            return list(urls)
+        median = known[len(known) // 2]
+        for url, exp_time in times.items():
+            if exp_time is None:
+                times[url] = median
+        return sorted(urls, key = lambda x: times[x])
+
+    def save(self):
+        """
+        Write the statistics to disk, if changed.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            tmp_path = self._path + ".tmp"
+            try:
+                with open(tmp_path, "w") as stats_f:
+                    for key, data in sorted(self._stats.items()):
+                        stats_f.write("%s %f %f %f\n" % (
+                            key, data[0], data[1], data[2]))
+                os.rename(tmp_path, self._path)
+                self._dirty = False
+            except (IOError, OSError) as err:
+                const_debug_write(
+                    __name__,
+                    "MirrorStatistics, cannot save: %s" % (err,))
+
+
 class UrlFetcher(TextInterface):
 
     """
@@ -81,7 +407,8 @@ class UrlFetcher(TextInterface):
                  timeout = None, download_context_func = None,
                  pre_download_hook = None, post_download_hook = None,
                  http_basic_user = None, http_basic_pwd = None,
-                 https_validate_cert = True):
+                 https_validate_cert = True, keep_alive = True,
+                 record_statistics = True):
         """
         Entropy URL downloader constructor.
 
@@ -128,6 +455,13 @@ class UrlFetcher(TextInterface):
             The function takes a path (the download path) and the download
             status and the download id as arguments.
         @type post_download_hook: callable
+        @keyword keep_alive: download HTTP and HTTPS URLs through the
+            persistent connections of HttpConnectionPool, unless
+            a proxy is configured
+        @type keep_alive: bool
+        @keyword record_statistics: record the outcome of the download
+            into MirrorStatistics
+        @type record_statistics: bool
         """
         self.__supported_uris = {
             'file': self._urllib_download,
@@ -175,6 +509,8 @@ class UrlFetcher(TextInterface):
         self.__http_basic_pwd = http_basic_pwd
         # SSL Context options
         self.__https_validate_cert = https_validate_cert
+        self.__keep_alive = keep_alive
+        self.__record_stats = record_statistics
 
         self._init_vars()
         self.__init_urllib()
@@ -209,6 +545,7 @@ class UrlFetcher(TextInterface):
         self.__starttime = time.time()
         self.__last_update_time = self.__starttime
         self.__last_downloadedsize = 0
+        self.__latency = None
         self.__existed_before = False
         if os.path.lexists(self.__path_to_save):
             self.__existed_before = True
@@ -391,6 +728,7 @@ class UrlFetcher(TextInterface):
             status = downloader()
             if self.__show_speed:
                 self.update()
+            self.__record_statistics(status)
 
             if self.__post_download_hook:
                 self.__post_download_hook(
@@ -398,6 +736,40 @@ class UrlFetcher(TextInterface):
 
             return status
 
+    def __record_statistics(self, status):
+        """
+        Feed MirrorStatistics with the outcome of the download.
+        """
+        if not self.__record_stats:
+            return
+        if status == UrlFetcher.TIMEOUT_FETCH_ERROR:
+            MirrorStatistics().record_failure(self.__url)
+            return
+        if self.__latency is None:
+            # not an urllib download or nothing transferred
+            return
+        if status == UrlFetcher.GENERIC_FETCH_ERROR:
+            return
+
+        transferred = self.__downloadedsize - self.__startingposition
+        if transferred < MirrorStatistics.MIN_SAMPLE_SIZE:
+            return
+        transfer_time = time.time() - self.__starttime - self.__latency
+        if transfer_time <= 0:
+            return
+        MirrorStatistics().record(
+            self.__url, transferred / transfer_time, self.__latency)
+
+    def get_latency(self):
+        """
+        Return the time (in seconds) it took to receive the first byte,
+        or None if not available.
+
+        @return: latency
+        @rtype: float or None
+        """
+        return self.__latency
+
     def _setup_rsync_args(self):
         protocol = UrlFetcher._get_url_protocol(self.__url)
         url = self.__url
@@ -606,6 +978,9 @@ class UrlFetcher(TextInterface):
             else:
                 headers = {'User-Agent': user_agent,}
 
+            if self.__keep_alive_enabled():
+                return self.__http_download(url, url_protocol, headers)
+
             req = urlmod.Request(url, headers = headers)
 
         else:
@@ -747,6 +1122,177 @@ class UrlFetcher(TextInterface):
             self.__status = UrlFetcher.GENERIC_FETCH_ERROR
             return self.__status
 
+        return self.__urllib_transfer(url, url_protocol)
+
+    def __keep_alive_enabled(self):
+        """
+        Return whether HTTP(S) downloads can go through the persistent
+        connections of HttpConnectionPool. Proxies are handled by urllib.
+        """
+        if not self.__keep_alive:
+            return False
+        proxy_data = self.__system_settings['system']['proxy']
+        if proxy_data['http'] or proxy_data['ftp']:
+            return False
+        if urlmod.getproxies():
+            return False
+        return True
+
+    def __http_download(self, url, url_protocol, headers):
+        """
+        HTTP(S) downloader using the persistent connections of
+        HttpConnectionPool. Behaves like the urllib based one.
+        """
+        pool = _HTTP_CONNECTION_POOL
+        max_redirects = 5
+        u_agent_error = False
+        restarted = False
+
+        while True:
+            url_data = spliturl(url)
+            path = url_data.path or "/"
+            if url_data.query:
+                path += "?" + url_data.query
+
+            req_headers = {}
+            if not u_agent_error:
+                req_headers.update(headers)
+            if self.__startingposition > 0:
+                req_headers['Range'] = "bytes=%d-" % (
+                    self.__startingposition,)
+
+            conn = None
+            response = None
+            try:
+                conn, reused = pool.get(
+                    url_data.scheme, url_data.netloc, self.__timeout,
+                    validate_cert = self.__https_validate_cert)
+                try:
+                    conn.request("GET", path, headers = req_headers)
+                    response = conn.getresponse()
+                except (socket.error, httplib.HTTPException):
+                    if not reused:
+                        raise
+                    # the server closed the idle connection, try again
+                    # with a new one.
+                    pool.discard(conn)
+                    conn = None
+                    conn, reused = pool.get(
+                        url_data.scheme, url_data.netloc, self.__timeout,
+                        validate_cert = self.__https_validate_cert)
+                    conn.request("GET", path, headers = req_headers)
+                    response = conn.getresponse()
+
+            except KeyboardInterrupt:
+                if conn is not None:
+                    pool.discard(conn)
+                self.__urllib_close(False)
+                raise
+            except httplib.InvalidURL:
+                # malformed url!
+                if conn is not None:
+                    pool.discard(conn)
+                self.__urllib_close(True)
+                self.__status = UrlFetcher.GENERIC_FETCH_ERROR
+                return self.__status
+            except socket.timeout:
+                if conn is not None:
+                    pool.discard(conn)
+                self.__urllib_close(True)
+                self.__status = UrlFetcher.TIMEOUT_FETCH_ERROR
+                return self.__status
+            except (socket.error, httplib.HTTPException, ValueError):
+                # connection reset by peer? bad status line?
+                if conn is not None:
+                    pool.discard(conn)
+                self.__urllib_close(True)
+                self.__status = UrlFetcher.GENERIC_FETCH_ERROR
+                return self.__status
+
+            self.__remotefile = _PooledHttpResponse(
+                pool, conn, response, url)
+            status = response.status
+
+            if status in (301, 302, 303, 307, 308):
+                location = response.getheader("location")
+                # drain the body to keep the connection
+                try:
+                    response.read()
+                except (socket.error, httplib.HTTPException):
+                    pass
+                self.__remotefile.close()
+                self.__remotefile = None
+                if self.__disallow_redirect or not location \
+                        or max_redirects == 0:
+                    self.__urllib_close(True)
+                    self.__status = UrlFetcher.GENERIC_FETCH_ERROR
+                    return self.__status
+                max_redirects -= 1
+                if const_is_python3():
+                    import urllib.parse as urlparse
+                else:
+                    import urlparse
+                url = urlparse.urljoin(url, location)
+                continue
+
+            if status == 405 and not u_agent_error:
+                # server doesn't like our user agent
+                self.__remotefile.close()
+                self.__remotefile = None
+                u_agent_error = True
+                continue
+
+            if status == 416 and not restarted:
+                # requested range not satisfiable, is the file complete?
+                content_range = response.getheader("content-range", "")
+                total = content_range.split("/")[-1]
+                self.__remotefile.close()
+                self.__remotefile = None
+                if total == str(self.__startingposition):
+                    # all fine then!
+                    self.__urllib_close(False)
+                    return self.__prepare_return()
+                # local file cannot be trusted, start from scratch
+                self.__urllib_open_local_file("wb")
+                self.__md5_checksum = hashlib.new("md5")
+                self.__startingposition = 0
+                self.__last_downloadedsize = 0
+                restarted = True
+                continue
+
+            if status >= 400:
+                self.__urllib_close(True)
+                self.__status = UrlFetcher.GENERIC_FETCH_ERROR
+                return self.__status
+
+            break
+
+        try:
+            self.__remotesize = int(response.getheader(
+                "content-length", -1))
+        except ValueError:
+            self.__remotesize = -1
+
+        if status == 206:
+            # partial content, Content-Length is what's left
+            if self.__remotesize > 0:
+                self.__remotesize += self.__startingposition
+        elif self.__startingposition > 0:
+            # range not supported, start from scratch
+            self.__urllib_open_local_file("wb")
+            self.__md5_checksum = hashlib.new("md5")
+            self.__startingposition = 0
+            self.__last_downloadedsize = 0
+
+        return self.__urllib_transfer(url, url_protocol)
+
+    def __urllib_transfer(self, url, url_protocol):
+        """
+        Transfer the data from the remote file object opened by the
+        urllib based and HTTP downloaders.
+        """
+        self.__latency = time.time() - self.__starttime
+
         if self.__remotesize > 0:
             self.__remotesize = float(int(self.__remotesize))/1000
         else:
@@ -1005,6 +1551,9 @@ class UrlFetcher(TextInterface):
 
 class MultipleUrlFetcher(TextInterface):
 
+    # default number of download worker threads
+    MAX_WORKERS = 6
+
     def __init__(self, url_path_list, checksum = True,
                  show_speed = True, resume = True,
                  abort_check_func = None, disallow_redirect = False,
@@ -1012,7 +1561,7 @@ class MultipleUrlFetcher(TextInterface):
                  download_context_func = None,
                  pre_download_hook = None, post_download_hook = None,
                  http_basic_user = None, http_basic_pwd = None,
-                 https_validate_cert = True):
+                 https_validate_cert = True, max_workers = None):
         """
         @param url_path_list: list of tuples composed by url and
             path to save, for eg. [(url,path_to_save,),...]
@@ -1056,6 +1605,9 @@ class MultipleUrlFetcher(TextInterface):
             The function takes a path (the download path) and the download
             status and the download id as arguments.
         @type post_download_hook: callable
+        @keyword max_workers: maximum number of URLs downloaded at the same
+            time, if None, MAX_WORKERS is used
+        @type max_workers: int
         """
         self._progress_data = {}
         self._url_path_list = url_path_list
@@ -1070,6 +1622,9 @@ class MultipleUrlFetcher(TextInterface):
         self.__download_context_func = download_context_func
         self.__pre_download_hook = pre_download_hook
         self.__post_download_hook = post_download_hook
+        if max_workers is None:
+            max_workers = MultipleUrlFetcher.MAX_WORKERS
+        self.__max_workers = max(1, max_workers)
 
         # important to have a declaration here
         self.__data_transfer = 0
@@ -1135,10 +1690,11 @@ class MultipleUrlFetcher(TextInterface):
         """
         self._init_vars()
 
+        workers = min(self.__max_workers, len(self._url_path_list))
         speed_limit = 0
         dsl = self.__system_settings['repositories']['transfer_limit']
-        if isinstance(dsl, int) and self._url_path_list:
-            speed_limit = dsl/len(self._url_path_list)
+        if isinstance(dsl, int) and workers:
+            speed_limit = dsl/workers
 
         class MyFetcher(self.__url_fetcher):
 
@@ -1156,6 +1712,7 @@ class MultipleUrlFetcher(TextInterface):
                 return self.__multiple_fetcher.handle_statistics(*args,
                     **kwargs)
 
+        jobs = collections.deque()
         th_id = 0
         for url, path_to_save in self._url_path_list:
             th_id += 1
@@ -1176,15 +1733,25 @@ class MultipleUrlFetcher(TextInterface):
                 https_validate_cert = self.__https_validate_cert
             )
             downloader.set_id(th_id)
-
-            def do_download(ds, dth_id, downloader):
+            jobs.append((th_id, downloader))
+
+        jobs_lock = threading.Lock()
+
+        def do_download(ds):
+            # workers pick the URLs in order, so that the
+            # ones at the top of the list complete first.
+            while not self.__stop_threads:
+                with jobs_lock:
+                    if not jobs:
+                        break
+                    dth_id, downloader = jobs.popleft()
                 ds[dth_id] = downloader.download()
 
-            t = ParallelTask(do_download, self.__download_statuses, th_id,
-                downloader)
-            t.name = "UrlFetcher{%s}" % (url,)
+        for worker_id in range(workers):
+            t = ParallelTask(do_download, self.__download_statuses)
+            t.name = "UrlFetcherWorker{%d}" % (worker_id,)
             t.daemon = True
-            self.__thread_pool[th_id] = t
+            self.__thread_pool[worker_id] = t
             t.start()
 
         self._push_progress_to_output(force = True)
@@ -1197,7 +1764,7 @@ class MultipleUrlFetcher(TextInterface):
         try:
             while True:
                 _all_joined = True
-                for th_id, th in self.__thread_pool.items():
+                for worker_id, th in self.__thread_pool.items():
                     th.join(0.3)
                     if th.is_alive():
                         # timeout then
@@ -1211,7 +1778,7 @@ class MultipleUrlFetcher(TextInterface):
         if len(self._url_path_list) != len(self.__download_statuses):
             # there has been an error (exception)
             # complete download_statuses with error info
-            for th_id, th in self.__thread_pool.items():
+            for th_id in range(1, len(self._url_path_list) + 1):
                 if th_id not in self.__download_statuses:
                     self.__download_statuses[th_id] = \
                         UrlFetcher.GENERIC_FETCH_ERROR
@@ -1426,3 +1993,535 @@ class MultipleUrlFetcher(TextInterface):
         your output devices.
         """
         return self._push_progress_to_output()
+
+
+class SegmentedUrlFetcher(TextInterface):
+
+    """
+    Entropy segmented URL fetcher. It downloads a single file from several
+    HTTP/HTTPS mirrors at the same time, splitting it into byte ranges.
+    Every mirror is served by a worker thread; once there are no more
+    segments to fetch, idle workers steal the second half of the largest
+    segment still being fetched, so that slow mirrors do not hold the
+    download back. Completed segments are recorded next to the file,
+    making the download resumable.
+    """
+
+    # size of the segments the file is split into
+    SEGMENT_SIZE = 4 * 1024 * 1024
+    # segments smaller than this are not split any further
+    MIN_STEAL_SIZE = 512 * 1024
+    # maximum number of mirrors used at the same time
+    MAX_MIRRORS = 4
+    # maximum number of HTTP redirects followed
+    MAX_REDIRECTS = 5
+    # suffix of the file containing the completed segments
+    STATE_SUFFIX = ".segments"
+
+    class _Segment(object):
+
+        """
+        Byte range [start, end) of the file, pos is the next byte to write.
+        """
+
+        def __init__(self, start, end):
+            self.start = start
+            self.pos = start
+            self.end = end
+
+    def __init__(self, urls, path_to_save, size, resume = True,
+                 abort_check_func = None, show_speed = True, timeout = None,
+                 http_basic_user = None, http_basic_pwd = None,
+                 https_validate_cert = True, max_mirrors = None):
+        """
+        Entropy segmented URL downloader constructor.
+
+        @param urls: list of HTTP/HTTPS URLs pointing to the same file,
+            in order of preference
+        @type urls: list
+        @param path_to_save: save file to path
+        @type path_to_save: string
+        @param size: file size, in bytes
+        @type size: int
+        @keyword resume: enable resume support
+        @type resume: bool
+        @keyword abort_check_func: callback used to stop download, it has to
+            raise an exception that has to be caught by provider application.
+            This exception will be considered an "abort" request.
+        @type abort_check_func: callable
+        @keyword show_speed: show download speed
+        @type show_speed: bool
+        @keyword timeout: custom request timeout value (in seconds), if None
+            the value is read from Entropy configuration files.
+        @type timeout: int
+        @keyword http_basic_user: username for HTTP Basic Authentication
+        @type http_basic_user: string
+        @keyword http_basic_pwd: password for HTTP Basic Authentication
+        @type http_basic_pwd: string
+        @keyword https_validate_cert: validate the HTTPS server certificate
+        @type https_validate_cert: bool
+        @keyword max_mirrors: maximum number of mirrors used at the same
+            time, if None, MAX_MIRRORS is used
+        @type max_mirrors: int
+        """
+        if max_mirrors is None:
+            max_mirrors = SegmentedUrlFetcher.MAX_MIRRORS
+        self._urls = list(urls)[:max(1, max_mirrors)]
+        self._path_to_save = path_to_save
+        self._size = size
+        self._resume = resume
+        self._abort_check_func = abort_check_func
+        self._show_speed = show_speed
+
+        self._system_settings = SystemSettings()
+        if timeout is None:
+            timeout = \
+                self._system_settings['repositories']['timeout']
+        self._timeout = timeout
+
+        headers = {
+            'User-Agent': "Entropy/%s (compatible; %s; %s)" % (
+                etpConst['entropyversion'], "Entropy",
+                os.path.basename(path_to_save)),
+        }
+        if http_basic_user and http_basic_pwd:
+            basic_header = base64.encodestring('%s:%s' % (
+                http_basic_user, http_basic_pwd)).replace('\n', '')
+            headers['Authorization'] = 'Basic %s' % (basic_header,)
+        self._headers = headers
+        self._https_validate_cert = https_validate_cert
+
+        self._init_vars()
+
+    def _init_vars(self):
+        self._lock = threading.Lock()
+        self._pending = []
+        self._active = []
+        self._completed = []
+        self._downloaded = 0
+        self._resumed_size = 0
+        self._stop = False
+        self._abort_exc = None
+        self._timed_out = False
+        self._data_transfer = 0
+        self._average = 0
+        self._progress_update_t = 0.0
+        self._startup_time = time.time()
+
+    @staticmethod
+    def supports_url(url):
+        """
+        Return whether the given URL can be used for segmented downloads.
+
+        @param url: download URL
+        @type url: string
+        @return: True, if the URL is supported
+        @rtype: bool
+        """
+        return UrlFetcher._get_url_protocol(url) in ("http", "https")
+
+    def _state_path(self):
+        return self._path_to_save + SegmentedUrlFetcher.STATE_SUFFIX
+
+    def _load_state(self):
+        """
+        Return the list of (start, end) byte ranges already downloaded.
+        """
+        if not self._resume:
+            return []
+        try:
+            cur_size = os.path.getsize(self._path_to_save)
+        except OSError:
+            return []
+
+        state_path = self._state_path()
+        if not os.path.isfile(state_path):
+            # a previous, sequential, download left a valid prefix.
+            return [(0, min(cur_size, self._size))]
+
+        ranges = []
+        try:
+            with open(state_path, "r") as state_f:
+                for line in state_f.readlines():
+                    start, end = line.split()
+                    start, end = int(start), int(end)
+                    if 0 <= start < end <= self._size:
+                        ranges.append((start, end))
+        except (IOError, OSError, ValueError):
+            return []
+        return ranges
+
+    def _save_state(self):
+        """
+        Record the completed byte ranges, must be called with self._lock
+        acquired.
+        """
+        state_path = self._state_path()
+        tmp_path = state_path + ".tmp"
+        try:
+            with open(tmp_path, "w") as state_f:
+                for start, end in self._completed:
+                    state_f.write("%d %d\n" % (start, end))
+            os.rename(tmp_path, state_path)
+        except (IOError, OSError) as err:
+            const_debug_write(
+                __name__,
+                "SegmentedUrlFetcher, cannot save state: %s" % (err,))
+
+    def _setup_segments(self):
+        """
+        Prepare the local file and split the missing parts of it into
+        segments.
+        """
+        completed = sorted(self._load_state())
+        mode = "r+b"
+        if not completed:
+            mode = "wb"
+        with open(self._path_to_save, mode) as local_f:
+            local_f.truncate(self._size)
+
+        self._completed = completed
+        segment_size = SegmentedUrlFetcher.SEGMENT_SIZE
+        offset = 0
+        for start, end in completed + [(self._size, self._size)]:
+            while offset < start:
+                seg_end = min(start, offset + segment_size)
+                self._pending.append(self._Segment(offset, seg_end))
+                offset = seg_end
+            offset = max(offset, end)
+            self._resumed_size += end - start
+
+        self._downloaded = self._resumed_size
+
+    def _truncate_to_prefix(self):
+        """
+        Truncate the local file to its longest downloaded prefix and drop
+        the segments state, so that sequential downloaders (UrlFetcher)
+        can resume it.
+        """
+        prefix = 0
+        with self._lock:
+            for start, end in sorted(self._completed):
+                if start > prefix:
+                    break
+                prefix = max(prefix, end)
+        try:
+            with open(self._path_to_save, "r+b") as local_f:
+                local_f.truncate(prefix)
+            os.remove(self._state_path())
+        except (IOError, OSError):
+            pass
+
+    def _next_segment(self):
+        """
+        Return the next segment to fetch, stealing the second half of the
+        largest one being fetched if there are no pending segments.
+        Return None if there is nothing left to do.
+        """
+        with self._lock:
+            if self._stop:
+                return None
+            if self._pending:
+                segment = self._pending.pop(0)
+                self._active.append(segment)
+                return segment
+
+            victim = None
+            for segment in self._active:
+                left = segment.end - segment.pos
+                if left < 2 * SegmentedUrlFetcher.MIN_STEAL_SIZE:
+                    continue
+                if victim is None or left > victim.end - victim.pos:
+                    victim = segment
+            if victim is None:
+                return None
+
+            middle = victim.pos + (victim.end - victim.pos) // 2
+            segment = self._Segment(middle, victim.end)
+            victim.end = middle
+            self._active.append(segment)
+            return segment
+
+    def _open_range(self, url, segment):
+        """
+        Send a Range request for the given segment and return the
+        connection, the response object and the (redirected) URL.
+        """
+        pool = _HTTP_CONNECTION_POOL
+        headers = self._headers.copy()
+        headers['Range'] = "bytes=%d-%d" % (segment.pos, segment.end - 1)
+
+        for _redirect in range(SegmentedUrlFetcher.MAX_REDIRECTS + 1):
+            url_data = spliturl(url)
+            path = url_data.path or "/"
+            if url_data.query:
+                path += "?" + url_data.query
+
+            conn, reused = pool.get(
+                url_data.scheme, url_data.netloc, self._timeout,
+                validate_cert = self._https_validate_cert)
+            try:
+                try:
+                    conn.request("GET", path, headers = headers)
+                    response = conn.getresponse()
+                except (socket.error, httplib.HTTPException):
+                    if not reused:
+                        raise
+                    pool.discard(conn)
+                    conn, reused = pool.get(
+                        url_data.scheme, url_data.netloc, self._timeout,
+                        validate_cert = self._https_validate_cert)
+                    conn.request("GET", path, headers = headers)
+                    response = conn.getresponse()
+            except:
+                pool.discard(conn)
+                raise
+
+            if response.status in (301, 302, 303, 307, 308):
+                location = response.getheader("location")
+                pool.discard(conn)
+                if not location:
+                    break
+                if const_is_python3():
+                    import urllib.parse as urlparse
+                else:
+                    import urlparse
+                url = urlparse.urljoin(url, location)
+                continue
+
+            return conn, response, url
+
+        raise httplib.HTTPException("too many redirects")
+
+    def _fetch_segment(self, url, segment, local_f):
+        """
+        Fetch the given segment from url. Return the URL to use for the
+        next segment (redirects are followed only once) or None if the
+        mirror failed.
+        """
+        pool = _HTTP_CONNECTION_POOL
+        conn = None
+        try:
+            conn, response, url = self._open_range(url, segment)
+            if response.status != 206:
+                # no range support or error
+                return None
+
+            completed = True
+            while True:
+                with self._lock:
+                    to_read = segment.end - segment.pos
+                    stop = self._stop
+                if stop:
+                    completed = False
+                    break
+                if to_read <= 0:
+                    break
+                if self._abort_check_func is not None:
+                    self._abort_check_func()
+
+                data = response.read(min(8192, to_read))
+                if not data:
+                    completed = False
+                    break
+
+                with self._lock:
+                    # a stealer may have shrunk the segment in the meantime
+                    data = data[:max(0, segment.end - segment.pos)]
+                    local_f.seek(segment.pos)
+                    local_f.write(data)
+                    segment.pos += len(data)
+                    self._downloaded += len(data)
+
+            if completed and response.isclosed() and \
+                    not response.will_close:
+                pool.put(conn)
+            else:
+                pool.discard(conn)
+            conn = None
+            if not completed:
+                return None
+            return url
+
+        except socket.timeout:
+            self._timed_out = True
+            return None
+        except (socket.error, httplib.HTTPException, ValueError) as err:
+            const_debug_write(
+                __name__,
+                "SegmentedUrlFetcher, %s failed: %s" % (url, repr(err),))
+            return None
+        finally:
+            if conn is not None:
+                pool.discard(conn)
+
+    def _worker(self, url):
+        """
+        Worker thread body, fetch segments from the given mirror until
+        there is nothing left or the mirror fails.
+        """
+        try:
+            with open(self._path_to_save, "r+b") as local_f:
+                while True:
+                    segment = self._next_segment()
+                    if segment is None:
+                        with self._lock:
+                            busy = self._active and not self._stop
+                        if busy:
+                            # segments being fetched may be given back
+                            # by failing mirrors.
+                            time.sleep(0.2)
+                            continue
+                        return
+
+                    next_url = self._fetch_segment(url, segment, local_f)
+                    local_f.flush()
+
+                    with self._lock:
+                        self._active.remove(segment)
+                        if segment.pos > segment.start:
+                            self._completed.append(
+                                (segment.start, segment.pos))
+                            self._save_state()
+                        if segment.pos < segment.end:
+                            # give the rest back to the other mirrors
+                            self._pending.append(
+                                self._Segment(segment.pos, segment.end))
+
+                    if next_url is None:
+                        return
+                    url = next_url
+
+        except Exception as err:
+            with self._lock:
+                if self._abort_exc is None:
+                    self._abort_exc = err
+                self._stop = True
+
+    def get_transfer_rate(self):
+        """
+        Return transfer rate, in bytes/sec.
+
+        @return: transfer rate
+        @rtype: int
+        """
+        return self._data_transfer
+
+    def get_average(self):
+        """
+        Get current download percentage.
+
+        @return: download percentage
+        @rtype: int
+        """
+        return self._average
+
+    def is_resumed(self):
+        """
+        Return whether the download has been resumed.
+
+        @return: True, if the download has been resumed
+        @rtype: bool
+        """
+        return self._resumed_size > 0
+
+    def download(self):
+        """
+        Start downloading the file given at construction time.
+
+        @return: the file md5 hash or one of UrlFetcher.GENERIC_FETCH_ERROR,
+            UrlFetcher.TIMEOUT_FETCH_ERROR
+        @rtype: string
+        """
+        self._init_vars()
+        try:
+            self._setup_segments()
+        except (IOError, OSError) as err:
+            const_debug_write(
+                __name__,
+                "SegmentedUrlFetcher, cannot setup %s: %s" % (
+                    self._path_to_save, err,))
+            return UrlFetcher.GENERIC_FETCH_ERROR
+
+        threads = []
+        for url in self._urls:
+            th = ParallelTask(self._worker, url)
+            th.name = "SegmentedUrlFetcher{%s}" % (url,)
+            th.daemon = True
+            threads.append(th)
+            th.start()
+
+        try:
+            while threads:
+                for th in threads[:]:
+                    th.join(0.3)
+                    if not th.is_alive():
+                        threads.remove(th)
+                if self._abort_check_func is not None:
+                    self._abort_check_func()
+                self.update()
+        except:
+            with self._lock:
+                self._stop = True
+            for th in threads:
+                th.join()
+            raise
+
+        if self._abort_exc is not None:
+            raise self._abort_exc
+
+        self._push_progress_to_output(force = True)
+        with self._lock:
+            missing = self._size - sum(
+                end - start for start, end in self._completed)
+        if missing > 0:
+            self._truncate_to_prefix()
+            if self._timed_out:
+                return UrlFetcher.TIMEOUT_FETCH_ERROR
+            return UrlFetcher.GENERIC_FETCH_ERROR
+
+        try:
+            os.remove(self._state_path())
+        except OSError:
+            pass
+        try:
+            return md5sum(self._path_to_save)
+        except (IOError, OSError):
+            return UrlFetcher.GENERIC_FETCH_ERROR
+
+    def _push_progress_to_output(self, force = False):
+
+        with self._lock:
+            downloaded = self._downloaded
+
+        elapsed_t = time.time() - self._startup_time
+        if elapsed_t < 0.1:
+            elapsed_t = 0.1
+        self._data_transfer = int(
+            (downloaded - self._resumed_size) / elapsed_t)
+        average = 0
+        if self._size > 0:
+            average = int(float(downloaded) / self._size * 100)
+        self._average = average
+
+        cur_t = time.time()
+        if not force and (cur_t < self._progress_update_t + 0.5):
+            return
+        self._progress_update_t = cur_t
+
+        current_txt = darkgreen(str(round(float(downloaded) / 1000, 1)))
+        current_txt += "/" + red(str(round(float(self._size) / 1000, 1)))
+        current_txt += " kB <-> %3d%%" % (average,)
+        if self._show_speed:
+            current_txt += " => %s/%s [%d %s]" % (
+                bytes_into_human(self._data_transfer), _("sec"),
+                len(self._urls), ngettext("mirror", "mirrors",
+                                          len(self._urls)),)
+        TextInterface.output(current_txt, back = True)
+
+    def update(self):
+        """
+        Main fetch progress callback. You can reimplement this to refresh
+        your output devices.
+        """
+        return self._push_progress_to_output()
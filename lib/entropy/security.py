@@ -21,6 +21,10 @@ import subprocess
 import time
 import threading
 import xml.dom.minidom
+try:
+    import xml.etree.cElementTree as ElementTree
+except ImportError:
+    import xml.etree.ElementTree as ElementTree
 
 from entropy.exceptions import EntropyException
 from entropy.const import etpConst, const_setup_perms, const_mkdtemp, \
@@ -34,6 +38,8 @@ from entropy.core.settings.base import SystemSettings
 from entropy.fetchers import UrlFetcher
 from entropy.locks import ResourceLock
 
+import entropy.dep
+import entropy.dump
 import entropy.tools
 
 
@@ -123,6 +129,88 @@ class System(object):
     class UpdateError(EntropyException):
         """Raised when security advisories couldn't be updated correctly"""
 
+    # the advisories index, see _build_index()
+    _INDEX_NAME = "advisories_index"
+    _INDEX_VERSION = 1
+
+    _OP_MAPPINGS = {
+        "le": "<=",
+        "lt": "<",
+        "eq": "=",
+        "gt": ">",
+        "ge": ">=",
+        "rge": ">=", # >=~
+        "rle": "<=", # <=~
+        "rgt": ">", # >~
+        "rlt": "<" # <~
+    }
+
+    @classmethod
+    def _get_xml_affected(cls, xmlfile):
+        """
+        Parses a Gentoo GLSA XML file extracting the affected packages
+        information only, using a streaming parser. The data returned
+        matches the first "vul_atoms" and "unaff_atoms" entries of every
+        package in the "affected" metadata returned by _get_xml_metadata().
+
+        @param xmlfile: GLSA filename
+        @type xmlfile: string
+        @return: tuple composed by the advisory identifier and a dict
+            mapping package keys to (vul_atoms, unaff_atoms) tuples, or None
+        @rtype: tuple or None
+        """
+        glsa_id = None
+        affected = {}
+        product_type = None
+        in_affected = False
+
+        with open(xmlfile, "rb") as xml_f:
+            for event, elem in ElementTree.iterparse(
+                    xml_f, events=("start", "end")):
+                tag = elem.tag
+
+                if event == "start":
+                    if tag == "glsa":
+                        glsa_id = elem.get("id")
+                    elif tag == "affected":
+                        in_affected = True
+                    continue
+
+                if tag == "product" and product_type is None:
+                    product_type = elem.get("type")
+                    if product_type != "ebuild":
+                        return None
+
+                elif tag == "package" and in_affected:
+                    name = elem.get("name")
+                    if name not in affected:
+                        vul_atoms = []
+                        unaff_atoms = []
+                        for vnode in elem:
+                            if vnode.tag == "vulnerable":
+                                atoms = vul_atoms
+                            elif vnode.tag == "unaffected":
+                                atoms = unaff_atoms
+                            else:
+                                continue
+                            atoms.append("%s%s-%s" % (
+                                cls._OP_MAPPINGS[vnode.get("range")],
+                                name, (vnode.text or "").strip()))
+                        affected[name] = (vul_atoms, unaff_atoms)
+                    elem.clear()
+
+                elif tag == "affected":
+                    in_affected = False
+                    # nothing else is needed
+                    break
+
+                elif not in_affected and tag not in ("glsa",):
+                    elem.clear()
+
+        if glsa_id is None or product_type is None:
+            return None
+        return glsa_id, affected
+
     @classmethod
     def _get_xml_metadata(cls, xmlfile):
         """
@@ -230,17 +318,7 @@ class System(object):
         except IndexError:
             xml_data['background'] = ""
 
-        op_mappings = {
-            "le": "<=",
-            "lt": "<",
-            "eq": "=",
-            "gt": ">",
-            "ge": ">=",
-            "rge": ">=", # >=~
-            "rle": "<=", # <=~
-            "rgt": ">", # >~
-            "rlt": "<" # <~
-        }
+        op_mappings = cls._OP_MAPPINGS
 
         def make_version(vnode):
             """
@@ -323,6 +401,8 @@ class System(object):
         self._entropy = entropy_client
         self.__cacher = None
         self.__settings = None
+        self.__index = None
+        self.__affected_map = None
 
         self._gpg_enabled = os.getenv("ETP_DISABLE_GPG") is None
         self._gpg_keystore_dir = os.path.join(
@@ -657,6 +737,163 @@ class System(object):
         """
         return os.path.basename(xml_path)[:-len(".xml")]
 
+    def _index_signature(self):
+        """
+        Return the signature of the advisories directory content the
+        advisories index is built from.
+        """
+        try:
+            mtime = os.path.getmtime(self._dir)
+        except OSError as err:
+            if err.errno != errno.ENOENT:
+                raise
+            mtime = None
+        return (self._INDEX_VERSION, self._dir, mtime)
+
+    def _build_index(self):
+        """
+        Build the advisories index and store it on disk, if possible.
+        The index maps every advisory identifier to its affected packages
+        ({key: (vul_atoms, unaff_atoms)}) and every package key to the
+        advisory identifiers mentioning it, so that the affected checks
+        can skip the advisories of packages that are not installed.
+
+        @return: the advisories index
+        @rtype: dict
+        """
+        signature = self._index_signature()
+        advisories = {}
+        keys = {}
+
+        for xml_name in self._xml_list():
+            xml_path = os.path.join(self._dir, xml_name)
+            try:
+                data = self._get_xml_affected(xml_path)
+            except Exception as err:
+                const_debug_write(
+                    __name__, "_build_index, %s error: %s" % (
+                        xml_path, repr(err),))
+                continue
+            if data is None:
+                continue
+
+            # use the file name as identifier, like list() does
+            _glsa_id, affected = data
+            advisory_id = self._xml_to_id(xml_name)
+            advisories[advisory_id] = affected
+            for key in affected:
+                keys.setdefault(key, []).append(advisory_id)
+
+        index = {
+            'signature': signature,
+            'advisories': advisories,
+            'keys': keys,
+        }
+        if os.access(self._cache_dir, os.W_OK):
+            entropy.dump.dumpobj(
+                self._INDEX_NAME, index, dump_dir=self._cache_dir)
+        return index
+
+    def _index(self):
+        """
+        Return the advisories index, building it if it is not available
+        or outdated.
+
+        @return: the advisories index, see _build_index()
+        @rtype: dict
+        """
+        signature = self._index_signature()
+        index = self.__index
+        if index is None or index['signature'] != signature:
+            index = entropy.dump.loadobj(
+                self._INDEX_NAME, dump_dir=self._cache_dir)
+            if index is None or index.get('signature') != signature:
+                index = self._build_index()
+            self.__index = index
+        return index
+
+    def _affected_deps(self, affected, inst_repo):
+        """
+        Return the dependencies that are currently affected given the
+        affected packages of an advisory in the advisories index format.
+
+        @param affected: {key: (vul_atoms, unaff_atoms)} mapping
+        @type affected: dict
+        @param inst_repo: the installed packages repository
+        @type inst_repo: EntropyRepositoryBase
+        @return: a set of package dependencies that have been found
+            in the installed packages repository
+        @rtype: set
+        """
+        affected_deps = set()
+        for vul_atoms, unaff_atoms in affected.values():
+            if not vul_atoms:
+                continue
+
+            unaffected = set()
+            for dep in unaff_atoms:
+                package_ids, _inst_rc = inst_repo.atomMatch(
+                    dep, multiMatch=True)
+                unaffected.update(package_ids)
+
+            for dep in vul_atoms:
+                package_id, _rc = inst_repo.atomMatch(dep)
+                if package_id != -1 and package_id not in unaffected:
+                    affected_deps.add(dep)
+
+        return affected_deps
+
+    def _affected_map(self):
+        """
+        Return a mapping between the identifiers of the advisories the
+        system is currently vulnerable to and their affected dependencies.
+        Only the advisories mentioning installed package keys are
+        evaluated. The outcome is cached, its validity depends on the
+        installed packages repository checksum.
+
+        @return: {advisory_id: set of affected dependencies} mapping
+        @rtype: dict
+        """
+        index = self._index()
+
+        inst_repo = self._entropy.installed_repository()
+        with inst_repo.direct():
+            inst_pkgs_cksum = inst_repo.checksum(
+                do_order=True, strict=False)
+
+            cache_key = (index['signature'], inst_pkgs_cksum,
+                         etpConst['systemroot'])
+            cached = self.__affected_map
+            if cached is not None and cached[0] == cache_key:
+                return cached[1]
+
+            sha = hashlib.sha1()
+            sha.update(const_convert_to_rawstring(repr(cache_key)))
+            disk_cache_key = "_advaffected_%s" % (sha.hexdigest(),)
+            affected_map = self._cacher.pop(
+                disk_cache_key, cache_dir=self._cache_dir)
+
+            if affected_map is None:
+                installed_keys = set(
+                    entropy.dep.dep_getkey(atom) for atom, _pkg_id, _br \
+                        in inst_repo.listAllPackages())
+                advisory_ids = set()
+                for key in installed_keys & set(index['keys']):
+                    advisory_ids.update(index['keys'][key])
+
+                affected_map = {}
+                for advisory_id in advisory_ids:
+                    affected_deps = self._affected_deps(
+                        index['advisories'][advisory_id], inst_repo)
+                    if affected_deps:
+                        affected_map[advisory_id] = affected_deps
+
+                self._cacher.push(disk_cache_key, affected_map,
+                    cache_dir=self._cache_dir)
+
+        self.__affected_map = (cache_key, affected_map)
+        return affected_map
+
     @systemshared
     def list(self):
         """
@@ -768,35 +1005,17 @@ class System(object):
             in the installed packages repository
         @rtype: set
         """
-        affected = set()
         inst_repo = self._entropy.installed_repository()
 
-        if not metadata['affected']:
-            return affected
+        affected = {}
+        for key, affections in metadata['affected'].items():
+            affection = affections[0]
+            affected[key] = (affection['vul_atoms'], affection['unaff_atoms'])
 
-        for key in metadata['affected']:
-
-            affection = metadata['affected'][key][0]
-
-            vul_atoms = affection['vul_atoms']
-            if not vul_atoms:
-                continue
-
-            unaffected = set()
-
-            with inst_repo.direct():
-                for dep in affection['unaff_atoms']:
-                    package_ids, _inst_rc = inst_repo.atomMatch(
-                        dep, multiMatch=True)
-                    unaffected.update(package_ids)
-
-                for dep in vul_atoms:
-                    package_id, _rc = inst_repo.atomMatch(dep)
-                    if package_id != -1 and package_id not in unaffected:
-                        affected.add(dep)
-
-        return affected
+        with inst_repo.direct():
+            return self._affected_deps(affected, inst_repo)
 
+    @systemshared
     def affected_id(self, advisory_id):
         """
         Return a list (set) of dependencies that are currently
@@ -808,10 +1027,22 @@ class System(object):
             in the installed packages repository
         @rtype: set
         """
-        metadata = self.advisory(advisory_id)
-        if metadata is None:
-            return set()
-        return self.affected(metadata)
+        return set(self._affected_map().get(advisory_id, ()))
+
+    @systemshared
+    def affected_all(self):
+        """
+        Return a list (set) of all the dependencies that are currently
+        affected by any of the available advisories.
+
+        @return: a set of package dependencies that have been found
+            in the installed packages repository
+        @rtype: set
+        """
+        deps = set()
+        for affected_deps in self._affected_map().values():
+            deps.update(affected_deps)
+        return deps
 
     @systemshared
     def vulnerabilities(self):
@@ -845,16 +1076,10 @@ class System(object):
         @return: a list (set) of applied or unapplied advisory identifiers.
         @rtype: set
         """
-        advisory_ids = set()
-
-        for advisory_id in self.list():
-            affected = self.affected_id(advisory_id)
-            if affected and not applied:
-                advisory_ids.add(advisory_id)
-            elif not affected and applied:
-                advisory_ids.add(advisory_id)
-
-        return advisory_ids
+        vulnerable_ids = set(self._affected_map())
+        if applied:
+            return set(self.list()) - vulnerable_ids
+        return vulnerable_ids
 
     @systemshared
     def available(self):
@@ -905,6 +1130,8 @@ class System(object):
                 return 1
 
             rc_lock, updated = self._fetch(workdir, force = force)
+            if rc_lock == 0:
+                self.__index = self._build_index()
 
         finally:
             if workdir is not None:
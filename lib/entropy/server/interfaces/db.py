@@ -34,6 +34,7 @@ from entropy.output import red, darkgreen, bold, brown, blue, darkred, teal, \
     purple
 from entropy.misc import FastRSS
 from entropy.cache import EntropyCacher
+from entropy.dump import dumpobj, loadobj
 from entropy.exceptions import OnlineMirrorError
 from entropy.security import Repository as RepositorySecurity
 from entropy.client.interfaces.db import InstalledPackagesRepository, \
@@ -345,6 +346,9 @@ class ServerPackagesRepositoryUpdater(object):
     inside ServerPackagesRepository class.
     """
 
+    # number of revision-to-revision repository deltas kept on mirrors
+    DELTA_RETENTION = 10
+
     def __init__(self, entropy_server, repository_id, enable_upload,
                  enable_download, force = False):
         """
@@ -612,6 +616,13 @@ class ServerPackagesRepositoryUpdater(object):
             data['~~something_new_web'] = something_new_webinstall
             critical.append(data['~~something_new_web'])
 
+            # compressed formats published by the repository, used by
+            # clients to negotiate the format to download
+            data['database_formats_file'] = os.path.join(
+                self._entropy._get_local_repository_dir(self._repository_id),
+                etpConst['etpdatabaseformatsfile'])
+            critical.append(data['database_formats_file'])
+
             if 2 not in disabled_eapis:
 
                 data['dump_path_light'] = os.path.join(
@@ -1082,6 +1093,16 @@ Name:    %s
         with codecs.open(ts_file, "w", encoding=enc) as ts_f:
             ts_f.write(current_ts)
 
+    def _update_repository_formats(self, formats_path, db_format):
+        """
+        Write the list of the compressed formats the repository is
+        published with, in order of preference.
+        """
+        enc = etpConst['conf_encoding']
+        with codecs.open(formats_path, "w", encoding=enc) as formats_f:
+            formats_f.write(db_format)
+            formats_f.write("\n")
+
     def _create_repository_pkglist(self):
         """
         Create the repository packages list file.
@@ -1390,6 +1411,145 @@ Name:    %s
                 f_out.flush()
             f_out.close()
 
+    def _create_repository_delta(self, dbconn, delta_path, from_revision,
+        to_revision, added_ids, removed_ids):
+        """
+        Create a repository delta file at delta_path, containing the
+        metadata of the added (or changed) packages and the list of the
+        removed ones, plus everything required to verify the result.
+        """
+        tmp_dir = const_mkdtemp(prefix="entropy.server._create_delta")
+        try:
+            delta_db_path = os.path.join(tmp_dir, etpConst['etpdatabasefile'])
+            delta_repo = self._entropy.open_generic_repository(
+                delta_db_path, xcache = False, indexing_override = False,
+                skip_checks = True)
+            try:
+                delta_repo.initializeRepository()
+                for package_id in sorted(added_ids):
+                    pkg_data = dbconn.getPackageData(package_id,
+                        get_content = False, content_insert_formatted = True,
+                        get_changelog = False, get_content_safety = False)
+                    delta_repo.addPackage(pkg_data,
+                        revision = pkg_data['revision'],
+                        package_id = package_id, formatted_content = True)
+
+                delta_repo.setRepositoryUpdatesDigest(self._repository_id,
+                    dbconn.retrieveRepositoryUpdatesDigest(
+                        self._repository_id))
+                delta_repo.bumpTreeUpdatesActions(
+                    dbconn.listAllTreeUpdatesActions())
+                delta_repo.insertPackageSets(dbconn.retrievePackageSets())
+                delta_repo.commit()
+            finally:
+                delta_repo.close()
+
+            delta_meta_path = os.path.join(tmp_dir,
+                etpConst['etpdatabasedeltametafile'])
+            checksum = dbconn.checksum(do_order = True, strict = False,
+                include_signatures = True)
+            enc = etpConst['conf_encoding']
+            with codecs.open(delta_meta_path, "w", encoding=enc) as f_meta:
+                f_meta.write("from %s\n" % (from_revision,))
+                f_meta.write("to %s\n" % (to_revision,))
+                f_meta.write("checksum %s\n" % (checksum,))
+                for package_id in sorted(removed_ids):
+                    f_meta.write("removed %s\n" % (package_id,))
+
+            entropy.tools.compress_files(delta_path,
+                [delta_db_path, delta_meta_path])
+        finally:
+            shutil.rmtree(tmp_dir, True)
+
+    def _update_repository_deltas(self, dbconn, upload_data):
+        """
+        Generate the delta between the previously uploaded repository
+        revision and the current one, comparing the packages digests
+        saved at the previous upload against the current ones. The last
+        DELTA_RETENTION deltas and their index file are then added to
+        upload_data.
+        """
+        repo_dir = self._entropy._get_local_repository_dir(
+            self._repository_id)
+        revision = self._entropy.local_repository_revision(
+            self._repository_id)
+        deltas_path = os.path.join(repo_dir,
+            etpConst['etpdatabasedeltasfile'])
+        state_path = os.path.join(repo_dir,
+            etpConst['etpdatabasedeltastatefile'])
+
+        digests = dbconn.listAllPackageDigests()
+        deltas = entropy.tools.read_repository_deltas(deltas_path)
+        state = loadobj(state_path, complete_path = True)
+
+        if state and state['revision'] < revision:
+            old_digests = state['digests']
+            added_ids = [x for x, y in digests.items() if \
+                             old_digests.get(x) != y]
+            removed_ids = [x for x in old_digests if x not in digests]
+
+            delta_name = "%s.%d-%d.tar.bz2" % (
+                etpConst['etpdatabasedeltafile'], state['revision'], revision)
+            delta_path = os.path.join(repo_dir, delta_name)
+            self._create_repository_delta(dbconn, delta_path,
+                state['revision'], revision, added_ids, removed_ids)
+            deltas = [x for x in deltas if x[2] != delta_name]
+            deltas.append((state['revision'], revision, delta_name,
+                           entropy.tools.md5sum(delta_path)))
+
+            self._entropy.output(
+                "[repo:%s|%s] %s: %s, %s: %d, %s: %d" % (
+                    blue(self._repository_id),
+                    darkgreen(_("upload")),
+                    darkgreen(_("created repository delta")),
+                    bold(delta_name),
+                    _("added"), len(added_ids),
+                    _("removed"), len(removed_ids),
+                ),
+                importance = 0,
+                level = "info",
+                header = darkgreen(" * ")
+            )
+
+        elif state and state['revision'] > revision:
+            # the repository went back in time, the published deltas
+            # are meaningless now.
+            deltas = []
+
+        if not state or state['revision'] != revision:
+            dumpobj(state_path, {
+                    'revision': revision,
+                    'digests': digests,
+                }, complete_path = True, ignore_exceptions = False)
+
+        # apply the retention window and drop the stale delta files
+        deltas = [x for x in deltas if x[1] <= revision and \
+                      os.path.isfile(os.path.join(repo_dir, x[2]))]
+        retained = deltas[-self.DELTA_RETENTION:]
+        retained_names = set(x[2] for x in retained)
+        delta_prefix = etpConst['etpdatabasedeltafile'] + "."
+        for delta_name in os.listdir(repo_dir):
+            if not delta_name.startswith(delta_prefix):
+                continue
+            if delta_name in retained_names:
+                continue
+            try:
+                os.remove(os.path.join(repo_dir, delta_name))
+            except (OSError, IOError) as err:
+                if err.errno != errno.ENOENT:
+                    raise
+
+        enc = etpConst['conf_encoding']
+        with codecs.open(deltas_path, "w", encoding=enc) as f_deltas:
+            for from_rev, to_rev, delta_name, delta_md5 in retained:
+                f_deltas.write("%d %d %s %s\n" % (
+                    from_rev, to_rev, delta_name, delta_md5))
+
+        for from_rev, to_rev, delta_name, delta_md5 in retained:
+            upload_data['delta_%d_%d' % (from_rev, to_rev,)] = \
+                os.path.join(repo_dir, delta_name)
+        upload_data['deltas_index'] = deltas_path
+
     def _create_upload_gpg_signatures(self, upload_data, to_sign_files):
         """
         This method creates .asc files for every path that is going to be
@@ -1487,6 +1647,8 @@ Name:    %s
 
         upload_data, critical, text_files, tmp_dirs, gpg_to_sign_files = \
             self._get_files_to_sync(cmethod, disabled_eapis = disabled_eapis)
+        self._update_repository_formats(
+            upload_data['database_formats_file'], db_format)
 
         self._entropy.output(
             "[repo:%s|%s] %s" % (
@@ -1508,6 +1670,8 @@ Name:    %s
         self._show_package_sets_messages()
 
         dbconn.commit()
+        if 2 not in disabled_eapis:
+            self._update_repository_deltas(dbconn, upload_data)
         # now we can safely copy it
 
         # backup current database to avoid re-indexing
@@ -1546,13 +1710,17 @@ Name:    %s
             eapi2_tmp_dbconn.dropChangelog()
             eapi2_tmp_dbconn.commit()
 
-            # opener = cmethod[0]
-            f_out = cmethod[0](upload_data['dump_path_light'], "wb")
+            # export to a plain file first, so that it can be
+            # compressed using multiple threads
+            temp_eapi2_dumpfile = temp_eapi2_dbfile + ".dump"
             try:
-                eapi2_tmp_dbconn.exportRepository(f_out)
+                with open(temp_eapi2_dumpfile, "wb") as f_out:
+                    eapi2_tmp_dbconn.exportRepository(f_out)
             finally:
-                f_out.close()
                 eapi2_tmp_dbconn.close()
+            entropy.tools.compress_file_threaded(temp_eapi2_dumpfile,
+                upload_data['dump_path_light'], db_format)
+            os.remove(temp_eapi2_dumpfile)
 
             os.remove(temp_eapi2_dbfile)
             self._create_file_checksum(upload_data['dump_path_light'],
@@ -1565,8 +1733,8 @@ Name:    %s
 
             # compress the database and create uncompressed
             # database checksum -- DEPRECATED
-            self._compress_file(database_path,
-                upload_data['compressed_database_path'], cmethod[0])
+            entropy.tools.compress_file_threaded(database_path,
+                upload_data['compressed_database_path'], db_format)
             self._create_file_checksum(database_path,
                 upload_data['database_path_digest'])
 
@@ -1592,8 +1760,8 @@ Name:    %s
             eapi1_tmp_dbconn.close()
 
             # compress
-            self._compress_file(temp_eapi1_dbfile,
-                upload_data['compressed_database_path_light'], cmethod[0])
+            entropy.tools.compress_file_threaded(temp_eapi1_dbfile,
+                upload_data['compressed_database_path_light'], db_format)
             # go away, we don't need you anymore
             os.remove(temp_eapi1_dbfile)
             # create compressed light database checksum
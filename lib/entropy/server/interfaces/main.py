@@ -1086,6 +1086,8 @@ class ServerSystemSettingsPlugin(SystemSettingsPlugin):
             'packages_expiration_days': etpConst['packagesexpirationdays'],
             'database_file_format': const_convert_to_unicode(
                 etpConst['etpdatabasefileformat']),
+            'package_file_format': const_convert_to_unicode(
+                etpConst['packagesfileformat']),
             'disabled_eapis': set(),
             'broken_revdeps_qa_check': True,
             'exp_based_scope': etpConst['expiration_based_scope'],
@@ -1195,6 +1197,10 @@ class ServerSystemSettingsPlugin(SystemSettingsPlugin):
             if setting in etpConst['etpdatabasesupportedcformats']:
                 data['database_file_format'] = setting
 
+        def _package_format(line, setting):
+            if setting in etpConst['etpdatabasesupportedcformats']:
+                data['package_file_format'] = setting
+
         def _syncspeedlimit(line, setting):
             try:
                 speed_limit = int(setting)
@@ -1263,6 +1269,7 @@ class ServerSystemSettingsPlugin(SystemSettingsPlugin):
             'server-basic-languages': _server_basic_lang,
             'repository': _repository_func,
             'database-format': _database_format,
+            'package-format': _package_format,
             # backward compatibility
             'sync-speed-limit': _syncspeedlimit,
             'syncspeedlimit': _syncspeedlimit,
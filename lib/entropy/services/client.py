@@ -16,6 +16,7 @@ import os
 import errno
 import json
 import threading
+import time
 import hashlib
 
 import socket
@@ -82,6 +83,103 @@ class WebServiceFactory(object):
         return self._service_class(self._entropy, repository_id)
 
 
+class WebServiceConnectionPool(object):
+    """
+    Pool of HTTP/HTTPS keep-alive connections, shared by all the WebService
+    instances and keyed by (protocol, host). Connections are handed out to
+    one caller at a time and given back to the pool once the response
+    has been fully read.
+    """
+
+    # maximum number of idle connections kept for each (protocol, host)
+    MAX_IDLE_CONNECTIONS = 4
+    # idle connections older than this (in seconds) are discarded, servers
+    # usually close them anyway
+    IDLE_TIMEOUT = 30.0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._idle = {}
+
+    def acquire(self, protocol, host, timeout):
+        """
+        Return a connection to the given host, reusing an idle one,
+        if available.
+
+        @param protocol: the request protocol ("http" or "https")
+        @type protocol: string
+        @param host: the request host (host:port)
+        @type host: string
+        @param timeout: socket timeout
+        @type timeout: float
+        @return: tuple composed by the connection object and a boolean
+            telling whether the connection has been reused
+        @rtype: tuple
+        """
+        key = (protocol, host)
+        expired = []
+        connection = None
+        with self._lock:
+            idle = self._idle.get(key, [])
+            now = time.time()
+            while idle:
+                conn, last_used = idle.pop()
+                if now - last_used < self.IDLE_TIMEOUT:
+                    connection = conn
+                    break
+                expired.append(conn)
+
+        for conn in expired:
+            conn.close()
+
+        if connection is not None:
+            connection.timeout = timeout
+            try:
+                connection.sock.settimeout(timeout)
+            except (AttributeError, socket.error):
+                # closed, a new socket will be opened by the next request
+                connection.close()
+                return connection, False
+            return connection, True
+
+        if protocol == "https":
+            connection = httplib.HTTPSConnection(host, timeout = timeout)
+        else:
+            connection = httplib.HTTPConnection(host, timeout = timeout)
+        return connection, False
+
+    def release(self, key, connection):
+        """
+        Give a connection back to the pool. The last response received
+        through it must have been fully read.
+
+        @param key: the (protocol, host) tuple passed to acquire()
+        @type key: tuple
+        @param connection: the connection object
+        @type connection: httplib.HTTPConnection
+        """
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.MAX_IDLE_CONNECTIONS:
+                idle.append((connection, time.time()))
+                connection = None
+
+        if connection is not None:
+            connection.close()
+
+    def clear(self):
+        """
+        Close all the idle connections.
+        """
+        with self._lock:
+            idle = self._idle.copy()
+            self._idle.clear()
+
+        for connections in idle.values():
+            for conn, _last_used in connections:
+                conn.close()
+
+
 class WebService(object):
     """
     This is the Entropy Repository Web Services that proxies requests over
@@ -145,6 +243,9 @@ class WebService(object):
     WEB_SERVICE_NOT_FOUND_CODE = 404
     WEB_SERVICE_RESPONSE_ERROR_CODE = 503
 
+    # keep-alive connections shared by all the WebService instances
+    _connection_pool = WebServiceConnectionPool()
+
 
     class WebServiceException(EntropyException):
         """
@@ -506,136 +607,91 @@ class WebService(object):
             "WebService _generic_post_handler, calling: %s at %s -- %s,"
             " tx_callback: %s, timeout: %s" % (self._request_host, request_path,
                 params, self._transfer_callback, timeout,))
-        connection = None
-        try:
-            if self._request_protocol == "http":
-                connection = httplib.HTTPConnection(self._request_host,
-                    timeout = timeout)
-            elif self._request_protocol == "https":
-                connection = httplib.HTTPSConnection(self._request_host,
-                    timeout = timeout)
-            else:
-                raise WebService.RequestError("invalid request protocol",
-                    method = function_name)
+        if self._request_protocol not in WebService.SUPPORTED_URL_SCHEMAS:
+            raise WebService.RequestError("invalid request protocol",
+                method = function_name)
 
-            headers = {
-                "Accept": "text/plain",
-                "User-Agent": self._generate_user_agent(function_name),
-            }
+        headers = {
+            "Accept": "text/plain",
+            "User-Agent": self._generate_user_agent(function_name),
+        }
 
-            if file_params is None:
-                file_params = {}
-            # autodetect file parameters in params
-            for k in list(params.keys()):
-                if isinstance(params[k], (tuple, list)) \
-                    and (len(params[k]) == 2):
-                    f_name, f_obj = params[k]
-                    if isinstance(f_obj, file):
-                        file_params[k] = params[k]
-                        del params[k]
-                elif const_isunicode(params[k]):
-                    # convert to raw string
-                    params[k] = const_convert_to_rawstring(params[k],
-                        from_enctype = "utf-8")
-                elif not const_isstring(params[k]):
-                    # invalid ?
-                    if params[k] is None:
-                        # will be converted to ""
-                        continue
-                    int_types = const_get_int()
-                    supported_types = (float, list, tuple) + int_types
-                    if not isinstance(params[k], supported_types):
+        if file_params is None:
+            file_params = {}
+        # autodetect file parameters in params
+        for k in list(params.keys()):
+            if isinstance(params[k], (tuple, list)) \
+                and (len(params[k]) == 2):
+                f_name, f_obj = params[k]
+                if isinstance(f_obj, file):
+                    file_params[k] = params[k]
+                    del params[k]
+            elif const_isunicode(params[k]):
+                # convert to raw string
+                params[k] = const_convert_to_rawstring(params[k],
+                    from_enctype = "utf-8")
+            elif not const_isstring(params[k]):
+                # invalid ?
+                if params[k] is None:
+                    # will be converted to ""
+                    continue
+                int_types = const_get_int()
+                supported_types = (float, list, tuple) + int_types
+                if not isinstance(params[k], supported_types):
+                    raise WebService.UnsupportedParameters(
+                        "%s is unsupported type %s" % (k, type(params[k])))
+                list_types = (list, tuple)
+                if isinstance(params[k], list_types):
+                    # not supporting nested lists
+                    non_str = [x for x in params[k] if not \
+                        const_isstring(x)]
+                    if non_str:
                         raise WebService.UnsupportedParameters(
-                            "%s is unsupported type %s" % (k, type(params[k])))
-                    list_types = (list, tuple)
-                    if isinstance(params[k], list_types):
-                        # not supporting nested lists
-                        non_str = [x for x in params[k] if not \
-                            const_isstring(x)]
-                        if non_str:
-                            raise WebService.UnsupportedParameters(
-                                "%s is unsupported type %s" % (k,
-                                    type(params[k])))
-
-            body = None
-            if not file_params:
-                headers["Content-Type"] = "application/x-www-form-urlencoded"
-                encoded_params = urllib_parse.urlencode(params)
-                data_size = len(encoded_params)
-                if self._transfer_callback is not None:
-                    self._transfer_callback(0, data_size, False)
-
-                if data_size < 65536:
-                    try:
-                        connection.request("POST", request_path, encoded_params,
-                            headers)
-                    except socket.error as err:
-                        raise WebService.RequestError(err,
-                            method = function_name)
-                else:
-                    try:
-                        connection.request("POST", request_path, None, headers)
-                    except socket.error as err:
-                        raise WebService.RequestError(err,
-                            method = function_name)
-                    sio = StringIO(encoded_params)
-                    data_size = len(encoded_params)
-                    while True:
-                        chunk = sio.read(65535)
-                        if not chunk:
-                            break
-                        try:
-                            connection.send(chunk)
-                        except socket.error as err:
-                            raise WebService.RequestError(err,
-                                method = function_name)
-                        if self._transfer_callback is not None:
-                            self._transfer_callback(sio.tell(),
-                                data_size, False)
-                # for both ways, send a signal through the callback
-                if self._transfer_callback is not None:
-                    self._transfer_callback(data_size, data_size, False)
-
-            else:
-                headers["Content-Type"] = "multipart/form-data; boundary=" + \
-                    multipart_boundary
-                body_file, body_fpath = self._encode_multipart_form(params,
-                    file_params, multipart_boundary)
+                            "%s is unsupported type %s" % (k,
+                                type(params[k])))
+
+        body_file = None
+        body_fpath = None
+        if not file_params:
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+            body_file = StringIO(urllib_parse.urlencode(params))
+            body_file.seek(0, os.SEEK_END)
+        else:
+            headers["Content-Type"] = "multipart/form-data; boundary=" + \
+                multipart_boundary
+            body_file, body_fpath = self._encode_multipart_form(params,
+                file_params, multipart_boundary)
+        data_size = body_file.tell()
+        headers["Content-Length"] = str(data_size)
+
+        pool = WebService._connection_pool
+        pool_key = (self._request_protocol, self._request_host)
+        connection = None
+        try:
+            # a pooled connection might have been closed by the server
+            # in the meantime, in this case, retry with a new one.
+            while True:
+                connection, reused = pool.acquire(
+                    self._request_protocol, self._request_host, timeout)
                 try:
-                    data_size = body_file.tell()
-                    headers["Content-Length"] = str(data_size)
                     body_file.seek(0)
-                    if self._transfer_callback is not None:
-                        self._transfer_callback(0, data_size, False)
-
-                    try:
-                        connection.request("POST", request_path, None, headers)
-                    except socket.error as err:
-                        raise WebService.RequestError(err,
-                            method = function_name)
-                    while True:
-                        chunk = body_file.read(65535)
-                        if not chunk:
-                            break
-                        try:
-                            connection.send(chunk)
-                        except socket.error as err:
-                            raise WebService.RequestError(err,
-                                method = function_name)
-                        if self._transfer_callback is not None:
-                            self._transfer_callback(body_file.tell(),
-                                data_size, False)
-                    if self._transfer_callback is not None:
-                        self._transfer_callback(data_size, data_size, False)
-                finally:
-                    body_file.close()
-                    os.remove(body_fpath)
+                    self._send_request(connection, request_path, headers,
+                                       body_file, data_size)
+                    response = connection.getresponse()
+                except (socket.error, httplib.HTTPException) as err:
+                    connection.close()
+                    connection = None
+                    # requests are not idempotent, retry only if the
+                    # server did not get them.
+                    if reused and self._is_stale_connection_error(err):
+                        const_debug_write(__name__,
+                            "WebService._generic_post_handler, "
+                            "stale connection: %s" % (repr(err),))
+                        continue
+                    raise WebService.RequestError(err,
+                        method = function_name)
+                break
 
-            try:
-                response = connection.getresponse()
-            except socket.error as err:
-                raise WebService.RequestError(err,
-                    method = function_name)
             const_debug_write(__name__, "WebService.%s(%s), "
                 "response header: %s" % (
                     function_name, params, response.getheaders(),))
@@ -644,19 +700,19 @@ class WebService(object):
                 total_length = int(total_length)
             except ValueError:
                 total_length = -1
-            outcome = const_convert_to_rawstring("")
+            chunks = []
             current_len = 0
             if self._transfer_callback is not None:
                 self._transfer_callback(current_len, total_length, True)
             while True:
                 try:
                     chunk = response.read(65536)
-                except socket.error as err:
+                except (socket.error, httplib.HTTPException) as err:
                     raise WebService.RequestError(err,
                         method = function_name)
                 if not chunk:
                     break
-                outcome += chunk
+                chunks.append(chunk)
                 current_len += len(chunk)
                 if self._transfer_callback is not None:
                     self._transfer_callback(current_len, total_length, True)
@@ -664,18 +720,80 @@ class WebService(object):
             if self._transfer_callback is not None:
                 self._transfer_callback(total_length, total_length, True)
 
+            if not response.will_close:
+                # response fully read, the connection can be reused
+                pool.release(pool_key, connection)
+                connection = None
+
+            outcome = const_convert_to_rawstring("").join(chunks)
+            del chunks
             if const_is_python3():
                 outcome = const_convert_to_unicode(outcome)
             if not outcome:
                 return None, response
             return outcome, response
 
-        except httplib.HTTPException as err:
-            raise WebService.RequestError(err,
-                method = function_name)
         finally:
             if connection is not None:
                 connection.close()
+            body_file.close()
+            if body_fpath is not None:
+                os.remove(body_fpath)
+
+    @staticmethod
+    def _is_stale_connection_error(err):
+        """
+        Return whether the given error, raised while sending a request
+        and reading its response status, means that the reused connection
+        had been closed by the server before the request was written.
+        Timeouts are not among them, the server may have got the request.
+        """
+        if isinstance(err, socket.timeout):
+            return False
+        if isinstance(err, httplib.BadStatusLine):
+            # the server closed the idle connection without replying
+            return True
+        if isinstance(err, socket.error):
+            return err.errno in (errno.ECONNRESET, errno.EPIPE,
+                                 errno.ECONNABORTED)
+        return False
+
+    def _send_request(self, connection, request_path, headers, body_file,
+                      data_size):
+        """
+        Send a POST request through the given connection, the request body
+        is read from body_file, in chunks.
+
+        @param connection: the HTTP connection
+        @type connection: httplib.HTTPConnection
+        @param request_path: the request path
+        @type request_path: string
+        @param headers: the request headers
+        @type headers: dict
+        @param body_file: the request body file object
+        @type body_file: file
+        @param data_size: the request body size
+        @type data_size: int
+        """
+        if self._transfer_callback is not None:
+            self._transfer_callback(0, data_size, False)
+
+        if data_size < 65536:
+            connection.request("POST", request_path, body_file.read(),
+                headers)
+        else:
+            connection.request("POST", request_path, None, headers)
+            while True:
+                chunk = body_file.read(65535)
+                if not chunk:
+                    break
+                connection.send(chunk)
+                if self._transfer_callback is not None:
+                    self._transfer_callback(body_file.tell(),
+                        data_size, False)
+
+        if self._transfer_callback is not None:
+            self._transfer_callback(data_size, data_size, False)
 
     def _setup_credentials(self, request_params):
         """
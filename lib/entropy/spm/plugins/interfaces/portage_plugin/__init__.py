@@ -30,7 +30,7 @@ from entropy.const import etpConst, const_get_stringtype, \
     const_setup_perms, const_setup_file, const_is_python3, \
     const_debug_enabled, const_mkdtemp, const_mkstemp, \
     const_file_readable, const_dir_readable
-from entropy.exceptions import FileNotFound, InvalidDependString, \
+from entropy.exceptions import InvalidDependString, \
     InvalidAtom, EntropyException
 from entropy.output import darkred, darkgreen, brown, darkblue, teal, \
     purple, red, bold, blue, getcolor, decolorize, is_mute, is_interactive
@@ -577,6 +577,10 @@ class PortagePlugin(SpmPlugin):
 
     ENV_DIRS = set(["/etc/env.d"])
 
+    # environment variables read by extract_package_metadata()
+    _ENV_METADATA_VARS = ("ENTROPY_RDEPEND", "ENTROPY_PDEPEND",
+        "ENTROPY_DEPEND", "SRC_URI", "ETYPE")
+
     if "/usr/lib/gentoolkit/pym" not in sys.path:
         sys.path.append("/usr/lib/gentoolkit/pym")
 
@@ -1060,10 +1064,13 @@ class PortagePlugin(SpmPlugin):
             return matches[-1]
         return ''
 
-    def generate_package(self, package, file_save_dir, builtin_debug = False):
+    def generate_package(self, package, file_save_dir, builtin_debug = False,
+        compression = None):
         """
         Reimplemented from SpmPlugin class.
         """
+        if compression is None:
+            compression = etpConst['packagesfileformat']
         pkgcat, pkgname = package.split("/", 1)
         file_save_name = file_save_dir + os.path.sep + pkgcat + ":" + \
             pkgname
@@ -1092,7 +1099,8 @@ class PortagePlugin(SpmPlugin):
             os.close(tmp_fd)
             tmp_fd = None
             # cannot use fdopen with tarfile
-            tar = tarfile.open(tmp_file, mode = "w:bz2")
+            tar = entropy.tools.open_tarball(tmp_file, mode = "w",
+                compressor = compression)
             debug_tar = None
             debug_tmp_file = None
             debug_file_save_path = None
@@ -1327,34 +1335,57 @@ class PortagePlugin(SpmPlugin):
         if defaults:
             return defaults[0]
 
-    def __source_env_get_var(self, env_file, env_var):
+    def __source_env_get_vars(self, env_file, env_vars):
+        """
+        Source the given ebuild environment file once and return the
+        values of all the given environment variables.
+
+        @param env_file: path to the uncompressed environment file
+        @type env_file: string
+        @param env_vars: list of environment variable names
+        @type env_vars: list
+        @return: dict of environment variable name -> value
+        @rtype: dict
+        @raise IOError: if the environment file cannot be sourced
+        """
         current_mod = sys.modules[__name__].__file__
         dirname = os.path.dirname(current_mod)
         exec_path = os.path.join(dirname, "env_sourcer.sh")
-        args = [exec_path, env_file, env_var]
+        env_vars = list(env_vars)
+        args = [exec_path, env_file] + env_vars
         tmp_fd, tmp_path = None, None
         tmp_err_fd, tmp_err_path = None, None
         raw_enc = etpConst['conf_raw_encoding']
 
         try:
             tmp_fd, tmp_path = const_mkstemp(
-                prefix="entropy.spm.__source_env_get_var")
+                prefix="entropy.spm.__source_env_get_vars")
             tmp_err_fd, tmp_err_path = const_mkstemp(
-                prefix="entropy.spm.__source_env_get_var_err")
+                prefix="entropy.spm.__source_env_get_vars_err")
 
             sts = subprocess.call(args, stdout = tmp_fd, stderr = tmp_err_fd)
             if sts != 0:
                 raise IOError("cannot source %s and get %s" % (
-                        env_file, env_var,))
+                        env_file, ", ".join(env_vars),))
 
             # this way buffers are flushed out
             os.close(tmp_fd)
             tmp_fd = None
             with codecs.open(tmp_path, "r", encoding = raw_enc) as tmp_r:
-                # cut down to 1M... anything longer is just insane
-                output = tmp_r.read(1024000).rstrip()
+                output = tmp_r.read()
 
-            return const_convert_to_unicode(output, enctype = raw_enc)
+            # each value is terminated by a NUL byte
+            values = output.split("\0")
+            if len(values) != len(env_vars) + 1:
+                raise IOError("cannot source %s and get %s" % (
+                        env_file, ", ".join(env_vars),))
+
+            env_data = {}
+            for env_var, value in zip(env_vars, values):
+                # cut down to 1M... anything longer is just insane
+                env_data[env_var] = const_convert_to_unicode(
+                    value[:1024000].rstrip(), enctype = raw_enc)
+            return env_data
 
         finally:
             for fd in (tmp_fd, tmp_err_fd):
@@ -1399,11 +1430,13 @@ class PortagePlugin(SpmPlugin):
         system_settings = SystemSettings()
 
         # fill package name and version
-        data['digest'] = entropy.tools.md5sum(package_file)
+        digests = entropy.tools.multi_digest(package_file,
+            ("md5", "sha1", "sha256", "sha512"))
+        data['digest'] = digests['md5']
         data['signatures'] = {
-            'sha1': entropy.tools.sha1(package_file),
-            'sha256': entropy.tools.sha256(package_file),
-            'sha512': entropy.tools.sha512(package_file),
+            'sha1': digests['sha1'],
+            'sha256': digests['sha256'],
+            'sha512': digests['sha512'],
             'gpg': None, # GPG signature will be filled later on, if enabled
         }
         data['datecreation'] = str(os.path.getmtime(package_file))
@@ -1436,6 +1469,25 @@ class PortagePlugin(SpmPlugin):
         data['branch'] = system_settings['repositories']['branch']
 
         portage_entries = self._extract_pkg_metadata_generate_extraction_dict()
+
+        # source the environment file only once, fetching all the
+        # variables that may be needed below.
+        env_cache = {}
+        if uncompressed_env_file is not None:
+            env_vars = set(PortagePlugin._ENV_METADATA_VARS)
+            env_vars.update(x['env'] for x in portage_entries.values() \
+                                if x.get('env') is not None)
+            env_cache.update(self.__source_env_get_vars(
+                    uncompressed_env_file, sorted(env_vars)))
+
+        def get_env_var(env_var):
+            value = env_cache.get(env_var)
+            if value is None:
+                value = self.__source_env_get_vars(
+                    uncompressed_env_file, [env_var])[env_var]
+                env_cache[env_var] = value
+            return value
+
         enc = etpConst['conf_encoding']
         for item in portage_entries:
 
@@ -1452,8 +1504,7 @@ class PortagePlugin(SpmPlugin):
                     env_var = portage_entries[item].get('env')
                     if env_var is None:
                         raise
-                    value = self.__source_env_get_var(
-                        uncompressed_env_file, env_var)
+                    value = get_env_var(env_var)
             data[item] = value
 
         # EAPI5 support
@@ -1478,8 +1529,7 @@ class PortagePlugin(SpmPlugin):
         ]
         if uncompressed_env_file is not None:
             for e_dep, dkey in e_dep_lst:
-                e_xdepend = self.__source_env_get_var(
-                    uncompressed_env_file, e_dep)
+                e_xdepend = get_env_var(e_dep)
                 if e_xdepend:
                     data[dkey] += " "
                     data[dkey] += e_xdepend
@@ -1488,11 +1538,8 @@ class PortagePlugin(SpmPlugin):
             data['spm_repository'] = None
 
         if not data['sources'] and (uncompressed_env_file is not None):
-            # when extracting fake metadata, env_bz2 can be unavailable
-            uncompressed_env_file = entropy.tools.unpack_bzip2(env_bz2)
             # unfortunately upstream dropped SRC_URI file support
-            data['sources'] = self.__source_env_get_var(
-                uncompressed_env_file, "SRC_URI")
+            data['sources'] = get_env_var("SRC_URI")
 
         # workout pf
         pf_atom = os.path.join(data['category'], data['pf'])
@@ -1606,8 +1653,7 @@ class PortagePlugin(SpmPlugin):
             # ETYPE is a typical environment variable used by kernel
             # sources and binaries (and firmwares).
             # If it's set, it means that this is a kernel ebuild.
-            etype = self.__source_env_get_var(
-                uncompressed_env_file, "ETYPE")
+            etype = get_env_var("ETYPE")
             if not etype:
                 kern_dep_key = self._add_kernel_dependency_to_pkg(data, pkg_dir)
 
@@ -4593,16 +4639,19 @@ class PortagePlugin(SpmPlugin):
                 return False
             return stat.S_ISREG(st.st_mode)
 
+        pkg_files = [(os.path.join(pkg_dir, k.lstrip("/")), k) for k, v in \
+            content_data.items() if v == "obj"]
+        pkg_files = [(real_path, repo_path) for real_path, repo_path in \
+            pkg_files if is_reg(real_path)]
+        digests = entropy.tools.multi_digest_files(
+            [real_path for real_path, _repo_path in pkg_files], ("sha256",))
+
         def gen_meta(real_path, repo_path):
             return {
-                'sha256': entropy.tools.sha256(real_path),
+                'sha256': digests[real_path]['sha256'],
                 'mtime': os.path.getmtime(real_path),
             }
 
-        pkg_files = [(os.path.join(pkg_dir, k.lstrip("/")), k) for k, v in \
-            content_data.items() if v == "obj"]
-        pkg_files = [(real_path, repo_path) for real_path, repo_path in \
-            pkg_files if is_reg(real_path)]
         return dict((repo_path, gen_meta(real_path, repo_path)) \
             for real_path, repo_path in pkg_files)
 
@@ -4683,7 +4732,7 @@ class PortagePlugin(SpmPlugin):
         Generate NEEDED.ELF.2 metadata by scraping the package
         content directly. For: needed_libs metadata.
         """
-        needed_libs = set()
+        elf_objs = {}
         for obj, ftype in content.items():
 
             if ftype != "obj":
@@ -4699,20 +4748,25 @@ class PortagePlugin(SpmPlugin):
             try:
                 if not entropy.tools.is_elf_file(unpack_obj):
                     continue
-                elf_class = entropy.tools.read_elf_class(unpack_obj)
             except IOError as err:
                 self.__output.output("%s: %s => %s" % (
                     _("IOError while reading"), unpack_obj, repr(err),),
                     level = "warning")
                 continue
 
-            meta = entropy.tools.read_elf_metadata(unpack_obj)
+            elf_objs[unpack_obj] = obj
+
+        needed_libs = set()
+        elf_metas = entropy.tools.read_elf_metadata_batch(elf_objs)
+        for unpack_obj, meta in elf_metas.items():
             if meta is None:
                 continue
 
+            obj = elf_objs[unpack_obj]
             for soname in meta['needed']:
                 needed_libs.add((
-                    obj, meta['soname'], soname, elf_class, meta['runpath']))
+                    obj, meta['soname'], soname, meta['class'],
+                    meta['runpath']))
 
         return frozenset(needed_libs)
 
@@ -4766,7 +4820,7 @@ class PortagePlugin(SpmPlugin):
         # NOTE: this does not take into account changes to environment
         # caused by the installation of the package, if this metadata
         # is read off a non-installed one.
-        provided_libs = set()
+        elf_objs = {}
         for obj, ftype in content.items():
 
             if ftype not in ("obj", "sym"):
@@ -4792,16 +4846,18 @@ class PortagePlugin(SpmPlugin):
                     level = "warning")
                 continue
 
-            try:
-                elf_meta = entropy.tools.read_elf_metadata(unpack_obj)
-            except FileNotFound:
-                continue
+            elf_objs[unpack_obj] = obj
 
+        provided_libs = set()
+        elf_metas = entropy.tools.read_elf_metadata_batch(elf_objs)
+        for unpack_obj, elf_meta in elf_metas.items():
             if elf_meta is None:
                 continue
 
             if elf_meta['soname']:  # no soname == no shared library
-                provided_libs.add((elf_meta['soname'], obj, elf_meta['class'],))
+                provided_libs.add(
+                    (elf_meta['soname'], elf_objs[unpack_obj],
+                     elf_meta['class'],))
 
         return provided_libs
 
@@ -1,5 +1,13 @@
 #!/bin/bash
 # /bin/sh won't work
 
-. ${1} || exit 1
-eval echo \${${2}}
+# usage: env_sourcer.sh <environment file> <variable> [<variable> ...]
+# the value of each variable is printed, in order, followed by a
+# NUL byte, so that the whole environment is sourced only once.
+
+. "${1}" || exit 1
+shift
+for _entropy_env_var in "$@"; do
+	eval echo \${${_entropy_env_var}}
+	printf '\0'
+done
@@ -412,7 +412,8 @@ class SpmPlugin(Singleton):
         """
         raise NotImplementedError()
 
-    def generate_package(self, package, file_save_path, builtin_debug = False):
+    def generate_package(self, package, file_save_path, builtin_debug = False,
+        compression = None):
         """
         Generate package tarball files for given package, from running system.
         All the information is recomposed from system.
@@ -426,6 +427,10 @@ class SpmPlugin(Singleton):
             file. If False, another package file is generated and appended to
             the return list.
         @type builtin_debug: bool
+        @keyword compression: package payload compression format, one of
+            etpConst['etpdatabasesupportedcformats']. If None,
+            etpConst['packagesfileformat'] is used.
+        @type compression: string
         @return: list of package file paths, the first is the main one, the
             second in list, if available, is the debug package. All these
             extra package files must end with etpConst['packagesextraext']
@@ -33,12 +33,30 @@ import bz2
 import mmap
 import codecs
 import struct
+import threading
+import zlib
+from multiprocessing.pool import ThreadPool
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+try:
+    # Python 3.14+
+    from compression import zstd as _zstd
+except ImportError:
+    try:
+        import zstandard as _zstd
+    except ImportError:
+        _zstd = None
 
 from entropy.output import print_generic
 from entropy.const import etpConst, const_kill_threads, const_islive, \
     const_isunicode, const_convert_to_unicode, const_convert_to_rawstring, \
     const_israwstring, const_secure_config_file, const_is_python3, \
-    const_mkstemp, const_file_readable
+    const_mkstemp, const_file_readable, const_get_cpus
 from entropy.exceptions import FileNotFound, InvalidAtom, DirectoryNotFound
 
 
@@ -838,6 +856,140 @@ def split_indexable_into_chunks(mystr, chunk_len):
         mylen -= my_chunk_len
     return chunks
 
+class DigestCache(object):
+    """
+    Cache of multi_digest() results, keyed by file device, inode, size
+    and mtime, for files that are verified repeatedly within the same
+    transaction. Entries are dropped once the file changes (its stat
+    key does) or when the cache grows beyond max_entries. This class is
+    thread-safe.
+    """
+
+    def __init__(self, max_entries = 1024):
+        self._max_entries = max_entries
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(st):
+        """
+        Return the cache key for the given os.stat() result.
+        """
+        return (st.st_dev, st.st_ino, st.st_size, st.st_mtime)
+
+    def get(self, key):
+        """
+        Return the cached {algorithm: hex digest} dict for key, or None.
+        """
+        with self._lock:
+            digests = self._cache.get(key)
+            if digests is not None:
+                return digests.copy()
+
+    def set(self, key, digests):
+        """
+        Merge the given {algorithm: hex digest} dict into the cache entry
+        of key.
+        """
+        with self._lock:
+            if key not in self._cache and \
+                    len(self._cache) >= self._max_entries:
+                self._cache.clear()
+            self._cache.setdefault(key, {}).update(digests)
+
+    def clear(self):
+        """
+        Clear the cache.
+        """
+        with self._lock:
+            self._cache.clear()
+
+def multi_digest(filepath, algorithms, cache = None):
+    """
+    Calculate the hashes of the file at filepath for all the given
+    hashlib algorithms (for instance "md5", "sha1", "sha256", "sha512")
+    reading the file only once.
+
+    @param filepath: path to file
+    @type filepath: string
+    @param algorithms: list of hashlib algorithm names
+    @type algorithms: iterable
+    @keyword cache: a DigestCache object used to avoid hashing
+        unchanged files again
+    @type cache: DigestCache
+    @return: dict composed by algorithm name as key and hex digest as value
+    @rtype: dict
+    @raise ValueError: if an algorithm is not supported by hashlib
+    """
+    algorithms = set(algorithms)
+    digests = {}
+    cache_key = None
+    if cache is not None:
+        cache_key = DigestCache.key(os.stat(filepath))
+        cached = cache.get(cache_key)
+        if cached is not None:
+            digests.update((x, y) for x, y in cached.items() \
+                               if x in algorithms)
+            algorithms -= set(digests)
+            if not algorithms:
+                return digests
+
+    hashes = [(x, hashlib.new(x)) for x in sorted(algorithms)]
+    with open(filepath, "rb") as readfile:
+        if cache is not None:
+            # the file may have changed after the cache lookup
+            cache_key = DigestCache.key(os.fstat(readfile.fileno()))
+        block = readfile.read(_READ_SIZE)
+        while block:
+            for _alg, m in hashes:
+                m.update(block)
+            block = readfile.read(_READ_SIZE)
+
+    new_digests = dict((x, m.hexdigest()) for x, m in hashes)
+    if cache is not None:
+        cache.set(cache_key, new_digests)
+    digests.update(new_digests)
+    return digests
+
+def multi_digest_files(filepaths, algorithms, threads = None, cache = None):
+    """
+    Parallel version of multi_digest() for hashing many files using
+    a pool of threads (hashlib releases the GIL while hashing).
+
+    @param filepaths: list of paths to files
+    @type filepaths: list
+    @param algorithms: list of hashlib algorithm names
+    @type algorithms: iterable
+    @keyword threads: amount of hashing threads, by default the
+        number of available CPUs
+    @type threads: int
+    @keyword cache: a DigestCache object
+    @type cache: DigestCache
+    @return: dict composed by file path as key and multi_digest()
+        output as value
+    @rtype: dict
+    @raise IOError: if a file cannot be read
+    @raise OSError: if a file cannot be accessed
+    """
+    filepaths = list(filepaths)
+    algorithms = list(algorithms)
+    if threads is None:
+        threads = const_get_cpus()
+    threads = max(1, min(threads, len(filepaths)))
+
+    def _digest(filepath):
+        return multi_digest(filepath, algorithms, cache = cache)
+
+    if threads < 2:
+        return dict((x, _digest(x)) for x in filepaths)
+
+    pool = ThreadPool(threads)
+    try:
+        return dict(zip(filepaths, pool.map(_digest, filepaths)))
+    finally:
+        pool.close()
+        pool.join()
+
 def md5sum(filepath):
     """
     Calculate md5 hash of given file at path.
@@ -847,13 +999,7 @@ def md5sum(filepath):
     @return: md5 hex digest
     @rtype: string
     """
-    m = hashlib.md5()
-    with open(filepath, "rb") as readfile:
-        block = readfile.read(_READ_SIZE)
-        while block:
-            m.update(block)
-            block = readfile.read(_READ_SIZE)
-    return m.hexdigest()
+    return multi_digest(filepath, ("md5",))["md5"]
 
 def sha512(filepath):
     """
@@ -864,13 +1010,7 @@ def sha512(filepath):
     @return: SHA512 hex digest
     @rtype: string
     """
-    m = hashlib.sha512()
-    with open(filepath, "rb") as readfile:
-        block = readfile.read(_READ_SIZE)
-        while block:
-            m.update(block)
-            block = readfile.read(_READ_SIZE)
-    return m.hexdigest()
+    return multi_digest(filepath, ("sha512",))["sha512"]
 
 def sha256(filepath):
     """
@@ -881,13 +1021,7 @@ def sha256(filepath):
     @return: SHA256 hex digest
     @rtype: string
     """
-    m = hashlib.sha256()
-    with open(filepath, "rb") as readfile:
-        block = readfile.read(_READ_SIZE)
-        while block:
-            m.update(block)
-            block = readfile.read(_READ_SIZE)
-    return m.hexdigest()
+    return multi_digest(filepath, ("sha256",))["sha256"]
 
 def sha1(filepath):
     """
@@ -898,13 +1032,7 @@ def sha1(filepath):
     @return: SHA1 hex digest
     @rtype: string
     """
-    m = hashlib.sha1()
-    with open(filepath, "rb") as readfile:
-        block = readfile.read(_READ_SIZE)
-        while block:
-            m.update(block)
-            block = readfile.read(_READ_SIZE)
-    return m.hexdigest()
+    return multi_digest(filepath, ("sha1",))["sha1"]
 
 def md5sum_directory(directory):
     """
@@ -1009,11 +1137,277 @@ def compress_file(file_path, destination_path, opener, compress_level = None):
             if f_out is not None:
                 f_out.close()
 
+# compressed file magic numbers, see get_compression_format()
+_COMPRESSION_MAGICS = (
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"\x28\xb5\x2f\xfd", "zst"),
+    (b"BZh", "bz2"),
+    (b"\x1f\x8b", "gz"),
+)
+
+def get_compression_format(file_path):
+    """
+    Return the compression format of the file at file_path, looking at its
+    magic number. Returned values match the keys of
+    etpConst['etpdatabasecompressclasses'] ("bz2", "gz", "xz", "zst").
+
+    @param file_path: path to file
+    @type file_path: string
+    @return: the compression format or None, if unknown
+    @rtype: string or None
+    """
+    with open(file_path, "rb") as f_in:
+        header = f_in.read(6)
+    for magic, compressor in _COMPRESSION_MAGICS:
+        if header.startswith(magic):
+            return compressor
+    return None
+
+def _xz_compress_block(data, compress_level):
+    if compress_level is None:
+        compress_level = 6
+    return lzma.compress(data, format = lzma.FORMAT_XZ,
+        preset = compress_level)
+
+def _gzip_compress_block(data, compress_level):
+    if compress_level is None:
+        compress_level = 9
+    # wbits = 16 + MAX_WBITS makes zlib emit a gzip member
+    compressor = zlib.compressobj(compress_level, zlib.DEFLATED,
+        16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+# block compressors of the formats whose decompressors transparently
+# read concatenated streams, these can be compressed in parallel.
+_BLOCK_COMPRESSORS = {
+    "gz": _gzip_compress_block,
+}
+if lzma is not None:
+    _BLOCK_COMPRESSORS["xz"] = _xz_compress_block
+
+
+class _ParallelBlockWriter(object):
+    """
+    Write-only file object splitting the data into blocks that are
+    compressed independently by a pool of threads and written out, in
+    order, as concatenated compressed streams.
+    """
+
+    _BLOCK_SIZE = 8 * 1024 * 1024
+
+    def __init__(self, file_path, compress_func, compress_level, threads):
+        self.name = file_path
+        self._compress_func = compress_func
+        self._compress_level = compress_level
+        self._max_pending = threads * 2
+        self._pending = collections.deque()
+        self._buf = []
+        self._buf_len = 0
+        self._blocks = 0
+        self._written = 0
+        self._pool = ThreadPool(threads)
+        self._f = open(file_path, "wb")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _submit(self):
+        block = b"".join(self._buf)
+        self._buf = []
+        self._buf_len = 0
+        self._blocks += 1
+        self._pending.append(self._pool.apply_async(
+            self._compress_func, (block, self._compress_level)))
+        while len(self._pending) >= self._max_pending:
+            self._f.write(self._pending.popleft().get())
+
+    def write(self, data):
+        self._buf.append(data)
+        self._buf_len += len(data)
+        self._written += len(data)
+        if self._buf_len >= self._BLOCK_SIZE:
+            self._submit()
+
+    def tell(self):
+        return self._written
+
+    def flush(self):
+        self._f.flush()
+
+    def close(self):
+        if self._f is None:
+            return
+        try:
+            # an empty file must be a valid compressed stream as well
+            if self._buf or not self._blocks:
+                self._submit()
+            while self._pending:
+                self._f.write(self._pending.popleft().get())
+        finally:
+            self._pool.close()
+            self._pool.join()
+            self._f.close()
+            self._f = None
+
+def _zstd_writer(file_path, compress_level, threads):
+    if compress_level is None:
+        compress_level = 3
+    if hasattr(_zstd, "ZstdFile"):
+        # Python 3.14+ compression.zstd
+        options = {
+            _zstd.CompressionParameter.compression_level: compress_level,
+            _zstd.CompressionParameter.nb_workers: threads,
+        }
+        return _zstd.ZstdFile(file_path, "wb", options = options)
+    cctx = _zstd.ZstdCompressor(level = compress_level, threads = threads)
+    return _zstd.open(file_path, "wb", cctx = cctx)
+
+def compressed_file_writer(file_path, compressor, compress_level = None,
+    threads = None):
+    """
+    Open file_path for writing data compressed with given compressor
+    (one of etpConst['etpdatabasesupportedcformats']). xz and gz data is
+    split into blocks compressed in parallel and stored as concatenated
+    streams, while zstd uses the library worker threads. bz2 is always
+    compressed by a single thread, because Python 2.x cannot read
+    multi-stream bzip2 files back.
+
+    @param file_path: path where to save compressed data
+    @type file_path: string
+    @param compressor: compressor type
+    @type compressor: string
+    @keyword compress_level: compression level, None for the default
+    @type compress_level: int
+    @keyword threads: amount of compression threads, by default the
+        number of available CPUs
+    @type threads: int
+    @return: a write-only file object
+    @rtype: file object
+    @raise AttributeError: if compressor value is unsupported
+    """
+    cmethod = etpConst['etpdatabasecompressclasses'].get(compressor)
+    if cmethod is None:
+        raise AttributeError("unsupported compressor: %s" % (compressor,))
+    if threads is None:
+        threads = const_get_cpus()
+    threads = max(1, threads)
+
+    if compressor == "zst":
+        return _zstd_writer(file_path, compress_level, threads)
+
+    block_func = _BLOCK_COMPRESSORS.get(compressor)
+    if block_func is not None and threads > 1:
+        return _ParallelBlockWriter(file_path, block_func, compress_level,
+            threads)
+
+    opener = cmethod[0]
+    if compress_level is not None:
+        if compressor == "xz":
+            return opener(file_path, "wb", preset = compress_level)
+        return opener(file_path, "wb", compresslevel = compress_level)
+    return opener(file_path, "wb")
+
+def compress_file_threaded(file_path, destination_path, compressor,
+    compress_level = None, threads = None):
+    """
+    Compress file at file_path into destination_path using
+    compressed_file_writer(), thus spreading the work across multiple
+    threads where the compression format allows it.
+
+    @param file_path: path to compress
+    @type file_path: string
+    @param destination_path: path where to save compressed file
+    @type destination_path: string
+    @param compressor: compressor type
+    @type compressor: string
+    @keyword compress_level: compression level, None for the default
+    @type compress_level: int
+    @keyword threads: amount of compression threads
+    @type threads: int
+    @raise AttributeError: if compressor value is unsupported
+    """
+    with open(file_path, "rb") as f_in:
+        f_out = compressed_file_writer(destination_path, compressor,
+            compress_level = compress_level, threads = threads)
+        try:
+            data = f_in.read(_READ_SIZE)
+            while data:
+                f_out.write(data)
+                data = f_in.read(_READ_SIZE)
+        finally:
+            f_out.close()
+
+
+class _CompressedTarFile(tarfile.TarFile):
+    """
+    TarFile working on top of a (de)compressing file object that is
+    owned, and thus closed, by the TarFile itself.
+    """
+
+    def close(self):
+        try:
+            tarfile.TarFile.close(self)
+        finally:
+            self.fileobj.close()
+
+def open_tarball(file_path, mode = "r", compressor = None,
+    compress_level = None, threads = None):
+    """
+    Open a tarball, transparently handling the compression formats the
+    tarfile module does not natively support (xz on Python 2.x, zstd).
+    When reading, the compression format is detected automatically,
+    when writing, the data is compressed using compressed_file_writer().
+
+    @param file_path: path to tarball
+    @type file_path: string
+    @keyword mode: "r" or "w"
+    @type mode: string
+    @keyword compressor: compressor type used for writing, None or ""
+        means no compression
+    @type compressor: string
+    @keyword compress_level: compression level, None for the default
+    @type compress_level: int
+    @keyword threads: amount of compression threads
+    @type threads: int
+    @return: the tarball object
+    @rtype: tarfile.TarFile
+    @raise tarfile.ReadError: if the file cannot be read
+    @raise AttributeError: if compressor value is unsupported
+    """
+    if mode == "w":
+        if not compressor:
+            return tarfile.open(file_path, "w")
+        f_out = compressed_file_writer(file_path, compressor,
+            compress_level = compress_level, threads = threads)
+        try:
+            return _CompressedTarFile.open(file_path, "w", fileobj = f_out)
+        except:
+            f_out.close()
+            raise
+
+    compressor = get_compression_format(file_path)
+    if compressor not in ("xz", "zst"):
+        return tarfile.open(file_path, "r")
+
+    cmethod = etpConst['etpdatabasecompressclasses'].get(compressor)
+    if cmethod is None:
+        raise tarfile.ReadError(
+            "unsupported compression format: %s" % (compressor,))
+    f_in = cmethod[0](file_path, "rb")
+    try:
+        return _CompressedTarFile.open(file_path, "r:", fileobj = f_in)
+    except:
+        f_in.close()
+        raise
+
 def compress_files(dest_file, files_to_compress, compressor = "bz2"):
     """
     Compress file paths listed inside files_to_compress into dest_file using
     given compression type "compressor". Supported compression types are
-    "bz2" and "gz".
+    listed in etpConst['etpdatabasesupportedcformats'].
 
     @param dest_file: path where to save compressed file
     @type dest_file: string
@@ -1024,13 +1418,13 @@ def compress_files(dest_file, files_to_compress, compressor = "bz2"):
     @raise AttributeError: if compressor value is unsupported
     """
 
-    if compressor not in ("bz2", "gz",):
-        AttributeError("invalid compressor specified")
+    if compressor not in etpConst['etpdatabasesupportedcformats']:
+        raise AttributeError("invalid compressor specified")
 
     id_strings = {}
     tar = None
     try:
-        tar = tarfile.open(dest_file, "w:%s" % (compressor,))
+        tar = open_tarball(dest_file, "w", compressor = compressor)
         for path in files_to_compress:
             exist = os.lstat(path)
             tarinfo = tar.gettarinfo(path, os.path.basename(path))
@@ -1068,7 +1462,7 @@ def universal_uncompress(compressed_file, dest_path, catch_empty = False):
     try:
 
         try:
-            tar = tarfile.open(compressed_file, "r")
+            tar = open_tarball(compressed_file)
         except tarfile.ReadError:
             if catch_empty:
                 return True
@@ -1151,7 +1545,7 @@ def get_uncompressed_size(compressed_file):
     try:
 
         try:
-            tar = tarfile.open(compressed_file, "r")
+            tar = open_tarball(compressed_file)
         except tarfile.ReadError:
             return accounted_size
         except EOFError:
@@ -1170,6 +1564,21 @@ def get_uncompressed_size(compressed_file):
 
     return accounted_size
 
+def _unpack_compressed_file(compressed_path, suffix, opener):
+    filepath = compressed_path[:-len(suffix)]
+    fd, tmp_path = const_mkstemp(
+        prefix="unpack_%s." % (suffix[1:],),
+        dir=os.path.dirname(filepath))
+    with os.fdopen(fd, "wb") as item:
+        f_in = opener(compressed_path, "rb")
+        chunk = f_in.read(_READ_SIZE)
+        while chunk:
+            item.write(chunk)
+            chunk = f_in.read(_READ_SIZE)
+        f_in.close()
+    os.rename(tmp_path, filepath)
+    return filepath
+
 def unpack_gzip(gzipfilepath):
     """
     Unpack .gz file.
@@ -1179,18 +1588,7 @@ def unpack_gzip(gzipfilepath):
     @return: path to uncompressed file
     @rtype: string
     """
-    filepath = gzipfilepath[:-3] # remove .gz
-    fd, tmp_path = const_mkstemp(
-        prefix="unpack_gzip.", dir=os.path.dirname(filepath))
-    with os.fdopen(fd, "wb") as item:
-        filegz = gzip.GzipFile(gzipfilepath, "rb")
-        chunk = filegz.read(_READ_SIZE)
-        while chunk:
-            item.write(chunk)
-            chunk = filegz.read(_READ_SIZE)
-        filegz.close()
-    os.rename(tmp_path, filepath)
-    return filepath
+    return _unpack_compressed_file(gzipfilepath, ".gz", gzip.GzipFile)
 
 def unpack_bzip2(bzip2filepath):
     """
@@ -1201,19 +1599,33 @@ def unpack_bzip2(bzip2filepath):
     @return: path to uncompressed file
     @rtype: string
     """
-    filepath = bzip2filepath[:-4] # remove .bz2
-    fd, tmp_path = const_mkstemp(
-        prefix="unpack_bzip2.",
-        dir=os.path.dirname(filepath))
-    with os.fdopen(fd, "wb") as item:
-        filebz2 = bz2.BZ2File(bzip2filepath, "rb")
-        chunk = filebz2.read(_READ_SIZE)
-        while chunk:
-            item.write(chunk)
-            chunk = filebz2.read(_READ_SIZE)
-        filebz2.close()
-    os.rename(tmp_path, filepath)
-    return filepath
+    return _unpack_compressed_file(bzip2filepath, ".bz2", bz2.BZ2File)
+
+def unpack_xz(xzfilepath):
+    """
+    Unpack .xz file.
+
+    @param xzfilepath: path to .xz file
+    @type xzfilepath: string
+    @return: path to uncompressed file
+    @rtype: string
+    @raise KeyError: if xz support is not available
+    """
+    opener = etpConst['etpdatabasecompressclasses']["xz"][0]
+    return _unpack_compressed_file(xzfilepath, ".xz", opener)
+
+def unpack_zstd(zstdfilepath):
+    """
+    Unpack .zst file.
+
+    @param zstdfilepath: path to .zst file
+    @type zstdfilepath: string
+    @return: path to uncompressed file
+    @rtype: string
+    @raise KeyError: if zstd support is not available
+    """
+    opener = etpConst['etpdatabasecompressclasses']["zst"][0]
+    return _unpack_compressed_file(zstdfilepath, ".zst", opener)
 
 def generate_entropy_delta_file_name(pkg_name_a, pkg_name_b, hash_tag):
     """
@@ -1281,10 +1693,14 @@ def is_entropy_delta_available():
     return False
 
 def generate_entropy_delta(pkg_path_a, pkg_path_b, hash_tag,
-    pkg_compression = None):
+    pkg_compression = None, uncompressed_path_a = None,
+    uncompressed_path_b = None):
     """
     Generate Entropy package delta between pkg_path_a (from file) and
     pkg_path_b (to file).
+    Callers generating many deltas for the same packages can uncompress
+    them once and pass the uncompressed tarballs through
+    uncompressed_path_a and uncompressed_path_b.
 
     @param pkg_path_a: package path A (from file)
     @type pkg_path_a: string
@@ -1293,8 +1709,12 @@ def generate_entropy_delta(pkg_path_a, pkg_path_b, hash_tag,
     @param hash_tag: hash tag to append to Entropy package delta file name
     @type hash_tag: string
     @keyword pkg_compression: default package compression, can be "bz2" or "gz".
-        if None, "bz2" is selected.
+        if None, "bz2" is selected, if the packages are bz2 compressed.
     @type: string
+    @keyword uncompressed_path_a: path to the already uncompressed package A
+    @type uncompressed_path_a: string
+    @keyword uncompressed_path_b: path to the already uncompressed package B
+    @type uncompressed_path_b: string
     @return: path to newly created delta file, return None if error
     @rtype: string or None
     @raise KeyError: if pkg_compression is unsupported
@@ -1304,6 +1724,13 @@ def generate_entropy_delta(pkg_path_a, pkg_path_b, hash_tag,
     from entropy.spm.plugins.factory import get_default_class as get_spm_class
 
     if pkg_compression is None:
+        # packages compressed with other formats, like "xz" or "zst"
+        # (see etpConst['etpdatabasecompressclasses']), are not supported
+        for pkg_path in (pkg_path_a, pkg_path_b):
+            compressor = get_compression_format(pkg_path)
+            if compressor != _DEFAULT_PKG_COMPRESSION:
+                raise KeyError("unsupported package compression: %s" % (
+                    compressor,))
         _delta_extractor = _DELTA_DECOMPRESSION_MAP[_DEFAULT_PKG_COMPRESSION]
     else:
         _delta_extractor = _DELTA_DECOMPRESSION_MAP[pkg_compression]
@@ -1313,17 +1740,25 @@ def generate_entropy_delta(pkg_path_a, pkg_path_b, hash_tag,
 
     try:
 
-        tmp_fd_a, tmp_path_a = const_mkstemp(
-            prefix="generate_entropy_delta.",
-            dir=os.path.dirname(pkg_path_a))
-        close_fds.append(tmp_fd_a)
-        remove_paths.append(tmp_path_a)
-
-        tmp_fd_b, tmp_path_b = const_mkstemp(
-            prefix="generate_entropy_delta.",
-            dir=os.path.dirname(pkg_path_b))
-        close_fds.append(tmp_fd_b)
-        remove_paths.append(tmp_path_b)
+        if uncompressed_path_a is None:
+            tmp_fd_a, tmp_path_a = const_mkstemp(
+                prefix="generate_entropy_delta.",
+                dir=os.path.dirname(pkg_path_a))
+            close_fds.append(tmp_fd_a)
+            remove_paths.append(tmp_path_a)
+            _delta_extractor(pkg_path_a, tmp_fd_a)
+        else:
+            tmp_path_a = uncompressed_path_a
+
+        if uncompressed_path_b is None:
+            tmp_fd_b, tmp_path_b = const_mkstemp(
+                prefix="generate_entropy_delta.",
+                dir=os.path.dirname(pkg_path_b))
+            close_fds.append(tmp_fd_b)
+            remove_paths.append(tmp_path_b)
+            _delta_extractor(pkg_path_b, tmp_fd_b)
+        else:
+            tmp_path_b = uncompressed_path_b
 
         tmp_fd, tmp_path = const_mkstemp(
             prefix="entropy.tools.generate_entropy_delta")
@@ -1335,9 +1770,6 @@ def generate_entropy_delta(pkg_path_a, pkg_path_b, hash_tag,
         close_fds.append(tmp_fd_spm)
         remove_paths.append(tmp_path_spm)
 
-        _delta_extractor(pkg_path_a, tmp_fd_a)
-        _delta_extractor(pkg_path_b, tmp_fd_b)
-
         pkg_path_b_dir = os.path.dirname(pkg_path_b)
         delta_fn = generate_entropy_delta_file_name(
             os.path.basename(pkg_path_a), os.path.basename(pkg_path_b),
@@ -1362,9 +1794,11 @@ def generate_entropy_delta(pkg_path_a, pkg_path_b, hash_tag,
         get_spm_class().dump_package_metadata(pkg_path_b, tmp_path_spm)
         get_spm_class().aggregate_package_metadata(delta_file, tmp_path_spm)
 
-        # append Entropy metadata
+        # append Entropy metadata, the delta file carries the
+        # trailer only if package B has it, see apply_entropy_delta()
         dump_entropy_metadata(pkg_path_b, tmp_path)
-        aggregate_entropy_metadata(delta_file, tmp_path)
+        aggregate_entropy_metadata(delta_file, tmp_path,
+            trailer = _has_edb_trailer(pkg_path_b))
 
     finally:
         for fd in close_fds:
@@ -1473,9 +1907,11 @@ def apply_entropy_delta(pkg_path_a, delta_path, new_pkg_path_b,
         # add spm metadata
         get_spm_class().aggregate_package_metadata(
             new_pkg_path_b_tmp_compressed, tmp_spm_path)
-        # add entropy metadata
+        # add entropy metadata, packages built without the trailer
+        # (whose delta files do not have it either) must be rebuilt
+        # byte by byte.
         aggregate_entropy_metadata(new_pkg_path_b_tmp_compressed,
-            tmp_metadata_path)
+            tmp_metadata_path, trailer = _has_edb_trailer(delta_path))
         os.rename(new_pkg_path_b_tmp_compressed, new_pkg_path_b)
 
     finally:
@@ -1493,7 +1929,17 @@ def apply_entropy_delta(pkg_path_a, delta_path, new_pkg_path_b,
                 pass
 
 
-def aggregate_entropy_metadata(entropy_package_file, entropy_metadata_file):
+# Entropy metadata trailer, appended to Entropy package files after the
+# Entropy metadata. It contains a version number, the offset and length of
+# the Entropy metadata and its SHA1 checksum, followed by the magic string.
+_EDB_TRAILER_MAGIC = b"|ENTROPY:PROJECT:DB:TRAILER|"
+_EDB_TRAILER_FORMAT = ">BQQ20s"
+_EDB_TRAILER_VERSION = 1
+_EDB_TRAILER_SIZE = struct.calcsize(_EDB_TRAILER_FORMAT) + \
+    len(_EDB_TRAILER_MAGIC)
+
+def aggregate_entropy_metadata(entropy_package_file, entropy_metadata_file,
+    trailer = True):
     """
     Add Entropy metadata dump file to given Entropy package file.
 
@@ -1501,10 +1947,18 @@ def aggregate_entropy_metadata(entropy_package_file, entropy_metadata_file):
     @type entropy_package_file: string
     @param entropy_metadata_file: path to Entropy metadata file
     @type entropy_metadata_file: string
+    @keyword trailer: append the Entropy metadata trailer, set to False
+        to generate legacy Entropy package files
+    @type trailer: bool
     """
     mmap_size_th = 4096000 # 4mb threshold
+    db_tag = const_convert_to_rawstring(etpConst['databasestarttag'])
     with open(entropy_package_file, "ab") as f:
-        f.write(const_convert_to_rawstring(etpConst['databasestarttag']))
+        f.seek(0, os.SEEK_END)
+        f.write(db_tag)
+        offset = f.tell()
+        length = 0
+        checksum = hashlib.sha1()
         with open(entropy_metadata_file, "rb") as g:
             f_size = os.lstat(entropy_metadata_file).st_size
             mmap_f = None
@@ -1525,10 +1979,17 @@ def aggregate_entropy_metadata(entropy_package_file, entropy_metadata_file):
                     if not chunk:
                         break
                     f.write(chunk)
+                    checksum.update(chunk)
+                    length += len(chunk)
             finally:
                 if mmap_f is not None:
                     mmap_f.close()
 
+        if trailer:
+            f.write(struct.pack(_EDB_TRAILER_FORMAT, _EDB_TRAILER_VERSION,
+                                offset, length, checksum.digest()))
+            f.write(_EDB_TRAILER_MAGIC)
+
 def dump_entropy_metadata(entropy_package_file, entropy_metadata_file):
     """
     Dump Entropy package metadata from Entropy package file to
@@ -1555,7 +2016,7 @@ def dump_entropy_metadata(entropy_package_file, entropy_metadata_file):
                 return False
             # avoid security flaw caused by file size growing race condition
             # we conside the file size static
-            start_position = None
+            edb = None
             if f_size < mmap_size_th:
                 # use mmap
                 try:
@@ -1565,67 +2026,134 @@ def dump_entropy_metadata(entropy_package_file, entropy_metadata_file):
                 except MemoryError:
                     old_mmap = None
                 if old_mmap is not None:
-                    start_position = _locate_edb(old_mmap)
+                    edb = _locate_edb(old_mmap)
 
             if old_mmap is None:
-                start_position = _locate_edb(old)
-            if start_position is None:
+                edb = _locate_edb(old)
+            if edb is None:
                 return False
 
+            start_position, length, checksum = edb
+            sha = hashlib.sha1()
             with open(entropy_metadata_file, "wb") as db:
-                while True:
+                while length > 0:
                     if old_mmap is None:
-                        data = old.read(_READ_SIZE)
+                        data = old.read(min(_READ_SIZE, length))
                     else:
-                        data = old_mmap.read(_READ_SIZE)
+                        data = old_mmap.read(min(_READ_SIZE, length))
                     if not data:
                         break
                     db.write(data)
+                    length -= len(data)
+                    if checksum is not None:
+                        sha.update(data)
+
+            if length > 0:
+                # truncated
+                return False
+            if checksum is not None and sha.digest() != checksum:
+                return False
         finally:
             if old_mmap is not None:
                 old_mmap.close()
 
     return True
 
+def _read_edb_trailer(fileobj, file_size):
+    """
+    Read the Entropy metadata trailer, see aggregate_entropy_metadata().
+    Return a tuple composed by the Entropy metadata offset, length and
+    SHA1 checksum, or None if the trailer is not available or not valid.
+    """
+    if file_size < _EDB_TRAILER_SIZE:
+        return None
+
+    fileobj.seek(file_size - _EDB_TRAILER_SIZE)
+    data = fileobj.read(_EDB_TRAILER_SIZE)
+    if len(data) != _EDB_TRAILER_SIZE:
+        return None
+    if not data.endswith(_EDB_TRAILER_MAGIC):
+        return None
+
+    version, offset, length, checksum = struct.unpack(
+        _EDB_TRAILER_FORMAT, data[:-len(_EDB_TRAILER_MAGIC)])
+    if version != _EDB_TRAILER_VERSION:
+        return None
+    if offset + length != file_size - _EDB_TRAILER_SIZE:
+        return None
+
+    # make sure that the trailer is pointing to the Entropy metadata
+    db_tag = const_convert_to_rawstring(etpConst['databasestarttag'])
+    if offset < len(db_tag):
+        return None
+    fileobj.seek(offset - len(db_tag))
+    if fileobj.read(len(db_tag)) != db_tag:
+        return None
+
+    return offset, length, checksum
+
+def _has_edb_trailer(entropy_package_file):
+    """
+    Return whether the given Entropy package file has a valid Entropy
+    metadata trailer, see aggregate_entropy_metadata().
+    """
+    with open(entropy_package_file, "rb") as pkg_f:
+        pkg_f.seek(0, os.SEEK_END)
+        return _read_edb_trailer(pkg_f, pkg_f.tell()) is not None
+
 def _locate_edb(fileobj):
+    """
+    Locate the Entropy metadata inside the given Entropy package file
+    object (or mmap object). The file object is positioned at the beginning
+    of the Entropy metadata.
 
-    # position old to the end
+    @param fileobj: Entropy package file object
+    @type fileobj: file or mmap
+    @return: tuple composed by the start position, the length and the SHA1
+        checksum of the Entropy metadata (None for packages without
+        trailer), or None if the Entropy metadata cannot be found
+    @rtype: tuple or None
+    """
     fileobj.seek(0, os.SEEK_END)
-    # read backward until we find
     xbytes = fileobj.tell()
-    counter = xbytes - 1
 
-    db_tag = etpConst['databasestarttag']
-    # for Python 3.x
-    raw_db_tag = const_convert_to_rawstring(db_tag)
-    db_tag_len = len(db_tag)
+    trailer = _read_edb_trailer(fileobj, xbytes)
+    if trailer is not None:
+        fileobj.seek(trailer[0])
+        return trailer
+
+    # legacy packages, without trailer, search the metadata start tag
+    # backward, one large window at a time
+    raw_db_tag = const_convert_to_rawstring(etpConst['databasestarttag'])
+    db_tag_len = len(raw_db_tag)
     # NOTE: it was 30Mb, but app-doc/php-docs db size was 31MB
     # xonotic-data wants more, raise to 500Mb and forget
     give_up_threshold = 1024000 * 500 # 500Mb
-    # cannot index a bytes object in Python3, it returns int !
-    entry_point = const_convert_to_rawstring(db_tag[::-1][0])
-    max_read_len = 8
+    lower_bound = max(0, xbytes - give_up_threshold)
     start_position = None
 
-    while counter >= 0:
-        cur_threshold = abs((counter-xbytes))
-        if cur_threshold >= give_up_threshold:
-            start_position = None
-            break
-        fileobj.seek(counter-xbytes, os.SEEK_END)
-        read_bytes = fileobj.read(max_read_len)
-        read_len = len(read_bytes)
-        entry_idx = read_bytes.rfind(entry_point)
-        if entry_idx != -1:
-            rollback = (read_len - entry_idx) * -1
-            fileobj.seek(rollback, os.SEEK_CUR)
-            chunk = fileobj.read(db_tag_len)
-            if chunk == raw_db_tag:
-                start_position = fileobj.tell()
+    if isinstance(fileobj, mmap.mmap):
+        tag_position = fileobj.rfind(raw_db_tag, lower_bound, xbytes)
+        if tag_position != -1:
+            start_position = tag_position + db_tag_len
+    else:
+        window_size = _READ_SIZE * 4
+        end = xbytes
+        while end > lower_bound:
+            begin = max(lower_bound, end - window_size)
+            fileobj.seek(begin)
+            # read some more bytes, the tag could span across windows
+            window = fileobj.read(end - begin + db_tag_len - 1)
+            tag_position = window.rfind(raw_db_tag)
+            if tag_position != -1:
+                start_position = begin + tag_position + db_tag_len
                 break
-        counter -= read_len
+            end = begin
 
-    return start_position
+    if start_position is None:
+        return None
+    fileobj.seek(start_position)
+    return start_position, xbytes - start_position, None
 
 def remove_entropy_metadata(entropy_package_file, save_path):
     """
@@ -1642,8 +2170,8 @@ def remove_entropy_metadata(entropy_package_file, save_path):
     """
     with open(entropy_package_file, "rb") as old:
 
-        start_position = _locate_edb(old)
-        if not start_position:
+        edb = _locate_edb(old)
+        if edb is None:
             old.close()
             return False
 
@@ -1653,7 +2181,7 @@ def remove_entropy_metadata(entropy_package_file, save_path):
             max_read_len = 1024
             db_tag = const_convert_to_rawstring(etpConst['databasestarttag'])
             db_tag_len = len(db_tag)
-            start_position -= db_tag_len
+            start_position = edb[0] - db_tag_len
 
             while counter < start_position:
                 delta = start_position - counter
@@ -1782,6 +2310,35 @@ def get_hash_from_md5file(md5path):
             raise ValueError("invalid md5 file")
         return md5_str
 
+def read_repository_deltas(deltas_path):
+    """
+    Read the repository deltas index file, listing the available
+    revision-to-revision repository deltas, one
+    "<from revision> <to revision> <file name> <md5>" per line.
+    Invalid lines are skipped.
+
+    @param deltas_path: path to the deltas index file
+    @type deltas_path: string
+    @return: list of (from revision, to revision, file name, md5) tuples
+    @rtype: list
+    """
+    deltas = []
+    enc = etpConst['conf_encoding']
+    for line in generic_file_content_parser(deltas_path, encoding = enc):
+        items = line.split()
+        if len(items) != 4:
+            continue
+        try:
+            from_rev, to_rev = int(items[0]), int(items[1])
+        except ValueError:
+            continue
+        if not is_valid_md5(items[3]):
+            continue
+        # avoid lamerz
+        delta_name = os.path.basename(items[2])
+        deltas.append((from_rev, to_rev, delta_name, items[3]))
+    return deltas
+
 def compare_sha512(filepath, checksum):
     """
     Compare SHA512 of filepath with the one given (checksum).
@@ -2048,7 +2605,7 @@ def apply_tarball_ownership(filepath, prefix_path):
     tar = None
     try:
         try:
-            tar = tarfile.open(filepath, "r")
+            tar = open_tarball(filepath)
         except tarfile.ReadError:
             return
         except EOFError:
@@ -2135,7 +2692,7 @@ def uncompress_tarball(filepath, extract_path = None, catch_empty = False):
     try:
 
         try:
-            tar = tarfile.open(filepath, "r")
+            tar = open_tarball(filepath)
         except tarfile.ReadError:
             if catch_empty:
                 return 0
@@ -2702,47 +3259,174 @@ def resolve_dynamic_library(library, requiring_executable):
 
     return found_path
 
-def read_elf_dynamic_libraries(elf_file):
+# ELF constants used by the native ELF reader, see elf(5)
+_ELF_MAGIC = b"\x7fELF"
+_ELF_DATA_ENDIANNESS = {1: "<", 2: ">"}
+# struct formats of Elf_Ehdr (starting at e_type), Elf_Phdr,
+# Elf_Shdr and Elf_Dyn, indexed by ELF class
+_ELF_EHDR_FORMATS = {1: "HHIIIIIHHHHHH", 2: "HHIQQQIHHHHHH"}
+_ELF_PHDR_FORMATS = {1: "IIIIIIII", 2: "IIQQQQQQ"}
+_ELF_SHDR_FORMATS = {1: "IIIIIIIIII", 2: "IIQQQQIIQQ"}
+_ELF_DYN_FORMATS = {1: "iI", 2: "qQ"}
+_ELF_PT_LOAD = 1
+_ELF_PT_DYNAMIC = 2
+_ELF_SHT_DYNAMIC = 6
+_ELF_DT_NULL = 0
+_ELF_DT_NEEDED = 1
+_ELF_DT_STRTAB = 5
+_ELF_DT_STRSZ = 10
+_ELF_DT_SONAME = 14
+_ELF_DT_RPATH = 15
+_ELF_DT_RUNPATH = 29
+
+def _parse_elf_dynamic_section(data):
+    """
+    Parse the dynamic section of the ELF object contained in data.
+
+    @param data: the ELF object data (usually a mmap object)
+    @type data: buffer
+    @return: tuple composed by ELF class and the list of (d_tag, string)
+        tuples of the string based dynamic entries (NEEDED, SONAME, RPATH,
+        RUNPATH), or None if the ELF object has no dynamic section.
+    @rtype: tuple or None
+    @raise ValueError: if data is not a valid ELF object
+    @raise struct.error: if data is truncated
+    """
+    if data[:4] != _ELF_MAGIC:
+        raise ValueError("not an ELF object")
+    elf_class = struct.unpack("B", data[4:5])[0]
+    endianness = _ELF_DATA_ENDIANNESS.get(struct.unpack("B", data[5:6])[0])
+    if elf_class not in _ELF_EHDR_FORMATS or endianness is None:
+        raise ValueError("unsupported ELF object")
+
+    (_e_type, _e_machine, _e_version, _e_entry, e_phoff, e_shoff,
+     _e_flags, _e_ehsize, e_phentsize, e_phnum, e_shentsize, e_shnum,
+     _e_shstrndx) = struct.unpack_from(
+         endianness + _ELF_EHDR_FORMATS[elf_class], data, 16)
+
+    dyn_offset = None
+    dyn_size = 0
+    strtab_offset = None
+    strtab_size = 0
+
+    # look for the dynamic section first, its sh_link points to the
+    # string table. Debug objects have a SHT_NOBITS .dynamic.
+    shdr_format = endianness + _ELF_SHDR_FORMATS[elf_class]
+    if e_shoff:
+        for index in range(e_shnum):
+            shdr = struct.unpack_from(
+                shdr_format, data, e_shoff + index * e_shentsize)
+            if shdr[1] != _ELF_SHT_DYNAMIC:
+                continue
+            dyn_offset, dyn_size = shdr[4], shdr[5]
+            link = struct.unpack_from(
+                shdr_format, data, e_shoff + shdr[6] * e_shentsize)
+            strtab_offset, strtab_size = link[4], link[5]
+            break
+
+    # objects without section headers (sstrip), use the program headers
+    loads = []
+    if dyn_offset is None and e_phoff:
+        phdr_format = endianness + _ELF_PHDR_FORMATS[elf_class]
+        for index in range(e_phnum):
+            phdr = struct.unpack_from(
+                phdr_format, data, e_phoff + index * e_phentsize)
+            if elf_class == 1:
+                p_type, p_offset, p_vaddr, p_filesz = \
+                    phdr[0], phdr[1], phdr[2], phdr[4]
+            else:
+                p_type, p_offset, p_vaddr, p_filesz = \
+                    phdr[0], phdr[2], phdr[3], phdr[5]
+            if p_type == _ELF_PT_DYNAMIC:
+                dyn_offset, dyn_size = p_offset, p_filesz
+            elif p_type == _ELF_PT_LOAD:
+                loads.append((p_vaddr, p_offset, p_filesz))
+
+    if dyn_offset is None:
+        return None
+
+    dyn_format = endianness + _ELF_DYN_FORMATS[elf_class]
+    dyn_entry_size = struct.calcsize(dyn_format)
+    entries = []
+    strtab_addr = None
+    offset = dyn_offset
+    while offset + dyn_entry_size <= dyn_offset + dyn_size:
+        d_tag, d_val = struct.unpack_from(dyn_format, data, offset)
+        offset += dyn_entry_size
+        if d_tag == _ELF_DT_NULL:
+            break
+        elif d_tag in (_ELF_DT_NEEDED, _ELF_DT_SONAME,
+                       _ELF_DT_RPATH, _ELF_DT_RUNPATH):
+            entries.append((d_tag, d_val))
+        elif d_tag == _ELF_DT_STRTAB:
+            strtab_addr = d_val
+        elif d_tag == _ELF_DT_STRSZ and strtab_offset is None:
+            strtab_size = d_val
+
+    if strtab_offset is None and strtab_addr is not None:
+        # map the string table virtual address to its file offset
+        for p_vaddr, p_offset, p_filesz in loads:
+            if p_vaddr <= strtab_addr < p_vaddr + p_filesz:
+                strtab_offset = strtab_addr - p_vaddr + p_offset
+                break
+
+    strings = []
+    if strtab_offset is not None:
+        for d_tag, d_val in entries:
+            if d_val >= strtab_size:
+                raise ValueError("invalid string table index")
+            start = strtab_offset + d_val
+            end = data.find(b"\0", start, strtab_offset + strtab_size)
+            if end == -1:
+                raise ValueError("unterminated string")
+            string = data[start:end]
+            if const_is_python3():
+                string = const_convert_to_unicode(string)
+            strings.append((d_tag, string))
+
+    return elf_class, strings
+
+def _read_elf_dynamic_section(elf_file):
     """
-    Extract NEEDED metadatum from ELF file at path.
+    Read the dynamic section of the ELF file at path, without spawning
+    any external tool. See _parse_elf_dynamic_section().
 
     @param elf_file: path to ELF file
     @type elf_file: string
-    @return: list (set) of strings in NEEDED metadatum
-    @rtype: set
+    @return: see _parse_elf_dynamic_section()
+    @rtype: tuple or None
+    @raise FileNotFound: if the file cannot be read or is not a valid
+        ELF file
     """
-    proc = None
-    args = ("/usr/bin/scanelf", "-qF", "%n", elf_file)
-
-    out = None
     try:
-        proc = subprocess.Popen(args, stdout = subprocess.PIPE)
-        exit_st = proc.wait()
-        if exit_st != 0:
-            raise FileNotFound("scanelf failure")
-        out = proc.stdout.read()
-
-    except (OSError, IOError) as err:
-        if err.errno != errno.ENOENT:
-            raise
-        raise FileNotFound("/usr/bin/scanelf not found")
+        with open(elf_file, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+    except (OSError, IOError, ValueError) as err:
+        # ValueError is raised for empty files
+        raise FileNotFound("cannot read %s: %s" % (elf_file, err))
 
+    try:
+        return _parse_elf_dynamic_section(data)
+    except (ValueError, struct.error) as err:
+        raise FileNotFound("invalid ELF file %s: %s" % (elf_file, err))
     finally:
-        if proc is not None:
-            try:
-                proc.stdout.close()
-            except (OSError, IOError):
-                pass
+        data.close()
 
-    outcome = set()
-    if out is not None:
-        if const_is_python3():
-            out = const_convert_to_unicode(out)
-        for line in out.split("\n"):
-            if line:
-                libs = line.strip().split(" ", -1)[0].split(",")
-                outcome.update(libs)
-    return outcome
+def read_elf_dynamic_libraries(elf_file):
+    """
+    Extract NEEDED metadatum from ELF file at path.
+
+    @param elf_file: path to ELF file
+    @type elf_file: string
+    @return: list (set) of strings in NEEDED metadatum
+    @rtype: set
+    @raise FileNotFound: if the file is not a valid ELF file
+    """
+    dynamic = _read_elf_dynamic_section(elf_file)
+    if dynamic is None:
+        return set()
+    _elf_class, strings = dynamic
+    return set(x for tag, x in strings if tag == _ELF_DT_NEEDED)
 
 def read_elf_metadata(elf_file):
     """
@@ -2753,50 +3437,92 @@ def read_elf_metadata(elf_file):
     @return: dict with "soname", "class", "runpath" and "needed" keys. None if
         no metadata is found.
     @rtype: dict or None
+    @raise FileNotFound: if the file is not a valid ELF file
     """
-    proc = None
-    args = ("/usr/bin/scanelf", "-qF", "%M;%S;%r;%n", elf_file)
+    dynamic = _read_elf_dynamic_section(elf_file)
+    if dynamic is None:
+        # no metadata.
+        return None
 
-    out = None
-    try:
-        proc = subprocess.Popen(args, stdout = subprocess.PIPE)
-        exit_st = proc.wait()
-        if exit_st != 0:
-            raise FileNotFound("scanelf failure")
-        out = proc.stdout.read()
+    elf_class, strings = dynamic
+    soname = ""
+    rpath = None
+    runpath = None
+    needed = []
+    for tag, string in strings:
+        if tag == _ELF_DT_NEEDED:
+            needed.append(string)
+        elif tag == _ELF_DT_SONAME:
+            soname = string
+        elif tag == _ELF_DT_RPATH:
+            rpath = string
+        elif tag == _ELF_DT_RUNPATH:
+            runpath = string
+
+    # same output format of scanelf -F %r
+    if rpath is not None and runpath is not None and rpath != runpath:
+        runpath = rpath + "," + runpath
+    elif runpath is None:
+        runpath = rpath
+    if runpath is None:
+        runpath = ""
+
+    return {
+        'soname': soname,
+        'class': elf_class,
+        'runpath': runpath,
+        # like scanelf -F %n, an empty NEEDED is returned as
+        # an empty string
+        'needed': set(",".join(needed).split(",")),
+    }
 
-    except (OSError, IOError) as err:
-        if err.errno != errno.ENOENT:
-            raise
-        raise FileNotFound("/usr/bin/scanelf not found")
+def read_elf_metadata_batch(elf_files, workers = None):
+    """
+    Extract ELF metadata from many files using a pool of worker threads.
+    This is the batched version of read_elf_metadata(), that avoids
+    reading a package image one file at a time.
 
-    finally:
-        if proc is not None:
-            try:
-                proc.stdout.close()
-            except (OSError, IOError):
-                pass
+    @param elf_files: list of paths to ELF files
+    @type elf_files: list
+    @keyword workers: number of worker threads, defaults to the
+        number of CPUs
+    @type workers: int
+    @return: dict mapping every path to its read_elf_metadata() result,
+        or to None if the file is not a valid ELF file
+    @rtype: dict
+    """
+    elf_files = list(elf_files)
+    if workers is None:
+        workers = const_get_cpus()
+    workers = max(1, min(workers, len(elf_files)))
 
-    if out is not None:
-        if const_is_python3():
-            out = const_convert_to_unicode(out)
-        if not out:
-            # no metadata.
-            return None
+    metadata = {}
+    queue = collections.deque(elf_files)
 
-        for line in out.split("\n"):
-            if line:
-                data = line.strip().split(" ", -1)[0]
-                elfclass_str, soname, runpath, libs = data.split(";")
-                libs = set(libs.split(","))
-                return {
-                    'soname': soname,
-                    'class': elf_class_strtoint(elfclass_str),
-                    'runpath': runpath,
-                    'needed': libs,
-                }
-
-    raise FileNotFound("scanelf failure")
+    def _worker():
+        while True:
+            try:
+                elf_file = queue.popleft()
+            except IndexError:
+                break
+            try:
+                metadata[elf_file] = read_elf_metadata(elf_file)
+            except FileNotFound:
+                metadata[elf_file] = None
+
+    if workers < 2:
+        _worker()
+        return metadata
+
+    threads = []
+    for _index in range(workers):
+        th = threading.Thread(target = _worker)
+        th.daemon = True
+        th.start()
+        threads.append(th)
+    for th in threads:
+        th.join()
+    return metadata
 
 def read_elf_real_dynamic_libraries(elf_file):
     """
@@ -2921,41 +3647,25 @@ def read_elf_linker_paths(elf_file):
     @type elf_file: string
     @return: list of extracted built-in linker paths.
     @rtype: list
+    @raise FileNotFound: if the file is not a valid ELF file
     """
-    proc = None
-    args = ("/usr/bin/scanelf", "-qF", "%r", elf_file)
-    out = None
-
-    try:
-        proc = subprocess.Popen(args, stdout = subprocess.PIPE)
-        exit_st = proc.wait()
-        if exit_st != 0:
-            raise FileNotFound("scanelf error")
-
-        out = proc.stdout.read()
-
-    except (OSError, IOError) as err:
-        if err.errno != errno.ENOENT:
-            raise
-        raise FileNotFound("/usr/bin/scanelf not found")
-
-    finally:
-        if proc is not None:
-            proc.stdout.close()
+    dynamic = _read_elf_dynamic_section(elf_file)
+    if dynamic is None:
+        return []
 
     outcome = []
-    if out is not None:
-
-        elf_dir = os.path.dirname(elf_file)
-        if const_is_python3():
-            out = const_convert_to_unicode(out)
-        for line in out.split("\n"):
-            if line:
-                paths = line.strip().split(" ", -1)[0].split(",")
-                for path in paths:
-                    path = path.replace("$ORIGIN", elf_dir)
-                    path = path.replace("${ORIGIN}", elf_dir)
-                    outcome.append(path)
+    elf_dir = os.path.dirname(elf_file)
+    _elf_class, strings = dynamic
+    for tag, string in strings:
+        if tag not in (_ELF_DT_RPATH, _ELF_DT_RUNPATH):
+            continue
+        for path in string.split(":"):
+            if not path:
+                continue
+            path = path.replace("$ORIGIN", elf_dir)
+            path = path.replace("${ORIGIN}", elf_dir)
+            if path not in outcome:
+                outcome.append(path)
 
     return outcome
 
@@ -142,6 +142,39 @@ class EntropyClientTest(unittest.TestCase):
         finally:
             shutil.rmtree(tmp_dir, True)
 
+    def test_cacher_store(self):
+        cacher = self.Client._cacher
+        tmp_dir = const_mkdtemp()
+        try:
+            store = cacher.store(cache_dir = tmp_dir)
+            store.set("match/db/foo", "bar", "ck1", (set([1, 2]), 0))
+            self.assertEqual(store.get("match/db/foo", "bar", "ck1"),
+                (set([1, 2]), 0))
+            self.assertEqual(store.get("match/db/foo", "bar", "ck2"), None)
+            store.flush()
+            store.close()
+            self.assertEqual(store.get("match/db/foo", "bar", "ck1"),
+                (set([1, 2]), 0))
+            store.close()
+            self.assertEqual(
+                store.get_many("match/db/foo", ["bar", "foo"], "ck1"),
+                {"bar": (set([1, 2]), 0)})
+            self.assertEqual(
+                store.get_many("match/db/foo", ["bar"], "ck2"), {})
+
+            # checksum change invalidates the whole namespace
+            store.set("match/db/foo", "baz", "ck2", "baz")
+            store.flush()
+            store.close()
+            self.assertEqual(store.get("match/db/foo", "bar", "ck1"), None)
+            self.assertEqual(store.get("match/db/foo", "baz", "ck2"), "baz")
+
+            EntropyCacher.clear_cache_item("match/db", cache_dir = tmp_dir)
+            self.assertEqual(store.get("match/db/foo", "baz", "ck2"), None)
+        finally:
+            cacher.store(cache_dir = tmp_dir).close()
+            shutil.rmtree(tmp_dir, True)
+
     def test_clear_cache(self):
         current_dir = self.Client._cacher.current_directory()
         test_file = os.path.join(current_dir, "asdasd")
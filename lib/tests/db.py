@@ -3,6 +3,7 @@ import sys
 sys.path.insert(0, '.')
 sys.path.insert(0, '../')
 import unittest
+import bz2
 import os
 import time
 import threading
@@ -373,6 +374,53 @@ class EntropyRepositoryTest(unittest.TestCase):
         if not started:
             cacher.stop()
 
+    def test_db_incremental_checksum(self):
+        test_pkg = _misc.get_test_package()
+        data = self.Spm.extract_package_metadata(test_pkg)
+
+        checksum = self.test_db.checksum()
+        idpackage = self.test_db.addPackage(data)
+        self.assertNotEqual(checksum, self.test_db.checksum())
+        self.assertEqual(self.test_db.checksum(),
+            "%040x" % (self.test_db._computePackagesDigest(),))
+
+        checksum = self.test_db.checksum()
+        self.test_db.setSlot(idpackage, "99")
+        self.assertNotEqual(checksum, self.test_db.checksum())
+        self.test_db.insertDependencies(idpackage, ["app-foo/foo"])
+        self.assertEqual(self.test_db.checksum(),
+            "%040x" % (self.test_db._computePackagesDigest(),))
+
+        # legacy checksum is still available
+        self.assertNotEqual(self.test_db.checksum(),
+            self.test_db.checksum(incremental = False))
+
+        self.test_db.removePackage(idpackage)
+        self.assertEqual(self.test_db.checksum(), "%040x" % (0,))
+
+    def test_db_package_digests(self):
+        test_pkg = _misc.get_test_package()
+        data = self.Spm.extract_package_metadata(test_pkg)
+        test_pkg2 = _misc.get_test_package2()
+        data2 = self.Spm.extract_package_metadata(test_pkg2)
+
+        self.assertEqual(self.test_db.listAllPackageDigests(), {})
+        idpackage = self.test_db.addPackage(data)
+        idpackage2 = self.test_db.addPackage(data2)
+        digests = self.test_db.listAllPackageDigests()
+        self.assertEqual(sorted(digests.keys()),
+            sorted([idpackage, idpackage2]))
+
+        # only the modified package digest must change
+        self.test_db.setSlot(idpackage, "99")
+        new_digests = self.test_db.listAllPackageDigests()
+        self.assertNotEqual(digests[idpackage], new_digests[idpackage])
+        self.assertEqual(digests[idpackage2], new_digests[idpackage2])
+
+        self.test_db.removePackage(idpackage2)
+        self.assertEqual(list(self.test_db.listAllPackageDigests().keys()),
+            [idpackage])
+
     def test_db_insert_compare_match(self):
 
         # insert/compare
@@ -713,6 +761,51 @@ class EntropyRepositoryTest(unittest.TestCase):
         self.assertEqual(len(cur_cache), 0) # nothing left
         os.remove(_tmp_data['path'])
 
+    def test_db_atom_match_many(self):
+
+        test_pkg = _misc.get_test_package()
+        data = self.Spm.extract_package_metadata(test_pkg)
+        self.test_db.addPackage(data)
+        test_pkg2 = _misc.get_test_entropy_package_tag()
+        data2 = self.Spm.extract_package_metadata(test_pkg2)
+        self.test_db.addPackage(data2)
+
+        atoms = ["slib", "foo/bar"]
+        for atom, pkg_id, branch in self.test_db.listAllPackages():
+            pkg_key = entropy.dep.dep_getkey(atom)
+            atoms += [atom, pkg_key, "~" + atom, ">=" + atom, "<" + atom,
+                      pkg_key + ":" + self.test_db.retrieveSlot(pkg_id)]
+        atoms += ["foo/bar;%s?" % (atoms[-1],), atoms[2]]
+
+        for kwargs in ({}, {'multiMatch': True}, {'extendedResults': True},
+                       {'multiMatch': True, 'extendedResults': True}):
+            expected = [self.test_db.atomMatch(x, **kwargs) for x in atoms]
+            self.assertEqual(expected,
+                self.test_db.atomMatchMany(atoms, **kwargs))
+
+    def test_db_mask_filter_bitmap(self):
+
+        test_pkg = _misc.get_test_package()
+        data = self.Spm.extract_package_metadata(test_pkg)
+        pkg_id = self.test_db.addPackage(data)
+        test_pkg2 = _misc.get_test_entropy_package_tag()
+        data2 = self.Spm.extract_package_metadata(test_pkg2)
+        pkg_id2 = self.test_db.addPackage(data2)
+
+        masking_validation = self.Client.ClientSettings(
+            )['masking_validation']['cache']
+        bitmap = self.test_db._mask_filter_evaluate_all()
+        self.assertTrue(len(bitmap) > max(pkg_id, pkg_id2))
+        self.assertEqual(0, bitmap[0])
+
+        for package_id in (pkg_id, pkg_id2):
+            masking_validation.clear()
+            match, reason = self.test_db._maskFilter(package_id, False)
+            if match == -1:
+                self.assertEqual(-(reason + 1), bitmap[package_id])
+            else:
+                self.assertEqual(reason + 1, bitmap[package_id])
+
     def test_db_reverse_deps(self):
 
         test_pkg = _misc.get_test_package()
@@ -752,6 +845,126 @@ class EntropyRepositoryTest(unittest.TestCase):
         pkg_data = self.test_db.retrieveUnusedPackageIds()
         self.assertEqual(pkg_data, tuple())
 
+    def test_db_reverse_deps_index(self):
+
+        self.assertTrue(self.test_db._isReverseDependenciesIndexed())
+
+        test_pkg = _misc.get_test_package()
+        data = self.Spm.extract_package_metadata(test_pkg)
+        test_pkg2 = _misc.get_test_package2()
+        data2 = self.Spm.extract_package_metadata(test_pkg2)
+        data['pkg_dependencies'] += ((
+                _misc.get_test_package_atom2(),
+                etpConst['dependency_type_ids']['rdepend_id']),)
+
+        # the index must be updated when the dependency gets added
+        # before the package it matches
+        idpackage = self.test_db.addPackage(data)
+        self.assertEqual(
+            self.test_db.retrieveUnusedPackageIds(), tuple())
+        idpackage2 = self.test_db.addPackage(data2)
+        self.assertEqual(
+            self.test_db.retrieveReverseDependencies(idpackage2),
+            frozenset([idpackage]))
+        self.assertEqual(
+            self.test_db.retrieveUnusedPackageIds(), (idpackage,))
+
+        # the dependency no longer matches
+        self.test_db.setSlot(idpackage2, "999")
+        dep = _misc.get_test_package_atom2()
+        iddep = self.test_db.searchDependency(dep)
+        self.test_db.setDependency(iddep, dep + ":999")
+        self.assertEqual(
+            self.test_db.retrieveReverseDependencies(idpackage2),
+            frozenset([idpackage]))
+        self.test_db.setName(idpackage2, "foo")
+        self.assertEqual(
+            self.test_db.retrieveReverseDependencies(idpackage2),
+            frozenset())
+
+        # and the index matches a full rebuild
+        def dump():
+            cur = self.test_db._cursor().execute("""
+            SELECT * FROM reversedependencies ORDER BY iddependency
+            """)
+            return list(cur)
+        indexed = dump()
+        self.test_db._buildReverseDependenciesIndex()
+        self.assertEqual(indexed, dump())
+
+        self.test_db.removePackage(idpackage2)
+        self.assertEqual(dump(), [])
+
+    def test_db_reverse_deps_index_wildcard(self):
+
+        test_pkg = _misc.get_test_package()
+        data = self.Spm.extract_package_metadata(test_pkg)
+        test_pkg2 = _misc.get_test_package2()
+        data2 = self.Spm.extract_package_metadata(test_pkg2)
+        name2 = _misc.get_test_package_name2()
+        wildcard_dep = entropy.dep.dep_getkey(
+            _misc.get_test_package_atom2())[:-2] + "*"
+        data['pkg_dependencies'] += ((
+                wildcard_dep,
+                etpConst['dependency_type_ids']['rdepend_id']),)
+
+        idpackage = self.test_db.addPackage(data)
+        iddep = self.test_db.searchDependency(wildcard_dep)
+        cur = self.test_db._cursor().execute("""
+        SELECT name FROM dependencieskeys WHERE iddependency = ?
+        """, (iddep,))
+        self.assertEqual(list(cur), [(name2[:-2] + "*",)])
+
+        # the package is matched only by the wildcard dependency, which
+        # must be matched again
+        indexed = []
+        index_dependencies = self.test_db._indexDependencies
+        def _index_dependencies(dependencies):
+            indexed.extend(dependencies)
+            return index_dependencies(dependencies)
+        self.test_db._indexDependencies = _index_dependencies
+        try:
+            self.test_db.addPackage(data2)
+        finally:
+            del self.test_db._indexDependencies
+        self.assertTrue((iddep, wildcard_dep) in indexed)
+
+        def dump():
+            cur = self.test_db._cursor().execute("""
+            SELECT * FROM reversedependencies ORDER BY iddependency
+            """)
+            return list(cur)
+        current = dump()
+        self.test_db._buildReverseDependenciesIndex()
+        self.assertEqual(current, dump())
+
+    def test_db_reverse_deps_index_build(self):
+
+        # GenericRepository does not use the index when masking is enabled
+        self.test_db.enable_mask_filter = False
+
+        test_pkg = _misc.get_test_package()
+        data = self.Spm.extract_package_metadata(test_pkg)
+        idpackage = self.test_db.addPackage(data)
+
+        self.test_db._cursor().execute("""
+        DELETE FROM settings WHERE setting_name = ?
+        """, (self.test_db._REVERSE_DEPENDENCIES_INDEX_SETTING,))
+        self.assertFalse(self.test_db._isReverseDependenciesIndexed())
+
+        # readers must not build the index
+        self.assertEqual(
+            self.test_db.retrieveReverseDependencies(idpackage),
+            frozenset())
+        self.assertEqual(self.test_db.retrieveUnusedPackageIds(), tuple())
+        self.assertFalse(self.test_db._isReverseDependenciesIndexed())
+
+        self.test_db.createAllIndexes()
+        self.assertTrue(self.test_db._isReverseDependenciesIndexed())
+        self.assertEqual(
+            self.test_db.retrieveReverseDependencies(idpackage),
+            frozenset())
+
     def test_similar(self):
         test_pkg = _misc.get_test_package()
         data = self.Spm.extract_package_metadata(test_pkg)
@@ -849,6 +1062,38 @@ class EntropyRepositoryTest(unittest.TestCase):
         out = self.test_db.searchName(_misc.get_test_package_name())
         self.assertEqual(out, frozenset([('sys-libs/zlib-1.2.3-r1', 1)]))
 
+    def test_search_ranked(self):
+        test_pkg = _misc.get_test_package()
+        data = self.Spm.extract_package_metadata(test_pkg)
+        idpackage = self.test_db.addPackage(data)
+        name = _misc.get_test_package_name()
+
+        # without the full-text search index
+        out = [x for x, rank in self.test_db.searchRanked(name)]
+        self.assertEqual(out, [idpackage])
+        out = [x for x, rank in self.test_db.searchRanked(name[:3])]
+        self.assertEqual(out, [idpackage])
+        self.assertEqual(self.test_db.searchRanked("foobarbaz"), [])
+
+        self.test_db.createAllIndexes()
+        if self.test_db._searchIndexSupported():
+            self.assertTrue(self.test_db._isSearchIndexed())
+
+        out = [x for x, rank in self.test_db.searchRanked(name)]
+        self.assertEqual(out, [idpackage])
+        out = [x for x, rank in self.test_db.searchRanked(name[:3])]
+        self.assertEqual(out, [idpackage])
+        out = [x for x, rank in self.test_db.searchRanked(
+                    name + " foobarbaz")]
+        self.assertEqual(out, [])
+
+        # the index must follow package removals and additions
+        self.test_db.removePackage(idpackage)
+        self.assertEqual(self.test_db.searchRanked(name), [])
+        idpackage = self.test_db.addPackage(data)
+        out = [x for x, rank in self.test_db.searchRanked(name)]
+        self.assertEqual(out, [idpackage])
+
     def test_db_indexes(self):
         self.test_db.createAllIndexes()
 
@@ -899,6 +1144,77 @@ class EntropyRepositoryTest(unittest.TestCase):
         os.remove(buf_file)
         os.remove(new_db_path)
 
+    def test_db_import_compressed_dump(self):
+        test_pkg = _misc.get_test_entropy_package_tag()
+        data = self.Spm.extract_package_metadata(test_pkg)
+        idpackage = self.test_db.addPackage(data)
+        db_data = self.test_db.getPackageData(idpackage)
+        self.test_db.commit()
+
+        set_mute(True)
+
+        # export straight into a bzip2 compressed file
+        fd, buf_file = const_mkstemp()
+        os.close(fd)
+        buf = bz2.BZ2File(buf_file, "wb")
+        self.test_db.exportRepository(buf)
+        buf.close()
+
+        # and import it back without unpacking it first
+        fd, new_db_path = const_mkstemp()
+        os.close(fd)
+        dump_f = bz2.BZ2File(buf_file, "rb")
+        try:
+            rc = self.test_db.importRepository(dump_f, new_db_path)
+        finally:
+            dump_f.close()
+        set_mute(False)
+        self.assertEqual(rc, 0)
+
+        new_db = self.Client.open_generic_repository(new_db_path)
+        new_db_data = new_db.getPackageData(idpackage)
+        new_db.close()
+        self.assertEqual(new_db_data, db_data)
+        self.assertFalse(
+            os.path.lexists(new_db_path + ".import_repository"))
+        os.remove(buf_file)
+        os.remove(new_db_path)
+
+    def test_db_import_corrupted_dump(self):
+        test_pkg = _misc.get_test_entropy_package_tag()
+        data = self.Spm.extract_package_metadata(test_pkg)
+        self.test_db.addPackage(data)
+        self.test_db.commit()
+
+        fd, new_db_path = const_mkstemp()
+        os.close(fd)
+        cclasses = etpConst['etpdatabasecompressclasses']
+        for compressor in etpConst['etpdatabasesupportedcformats']:
+            opener = cclasses[compressor][0]
+
+            fd, buf_file = const_mkstemp()
+            os.close(fd)
+            buf = opener(buf_file, "wb")
+            self.test_db.exportRepository(buf)
+            buf.close()
+
+            # corrupt the compressed data
+            with open(buf_file, "r+b") as buf_f:
+                buf_f.seek(os.path.getsize(buf_file) // 2)
+                buf_f.write(const_convert_to_rawstring("\0" * 64))
+
+            set_mute(True)
+            dump_f = opener(buf_file, "rb")
+            try:
+                rc = self.test_db.importRepository(dump_f, new_db_path)
+            finally:
+                dump_f.close()
+                set_mute(False)
+            self.assertEqual(rc, 1)
+            os.remove(buf_file)
+
+        os.remove(new_db_path)
+
     def test_use_defaults(self):
         test_pkg = _misc.get_test_package()
         data = self.Spm.extract_package_metadata(test_pkg)
@@ -4,7 +4,8 @@ import os
 sys.path.insert(0, '.')
 sys.path.insert(0, '../')
 import unittest
-from entropy.const import const_convert_to_rawstring, const_convert_to_unicode
+from entropy.const import const_convert_to_rawstring, const_convert_to_unicode, \
+    const_cmp
 from entropy.output import print_generic
 import tests._misc as _misc
 import tempfile
@@ -120,6 +121,16 @@ class DepTest(unittest.TestCase):
         self.assertEqual(et.compare_versions(ver_b[0], ver_b[1]), ver_b[2])
         self.assertEqual(et.compare_versions(ver_c[0], ver_c[1]), ver_c[2])
 
+    def test_version_key(self):
+        vers = ["1.0", "1.0.0", "1.0a", "1.0_alpha1", "1.0_p1", "1.0-r1",
+            "1.02", "1.1", "1.0_alpha_p1", "1.0_p0_alpha1"]
+        for ver_a in vers:
+            for ver_b in vers:
+                cmp_rc = et.compare_versions(ver_a, ver_b)
+                key_rc = const_cmp(et.version_key(ver_a),
+                    et.version_key(ver_b))
+                self.assertEqual((cmp_rc > 0) - (cmp_rc < 0), key_rc)
+
     def test_get_newer_version(self):
         vers = ["1.0", "3.4", "0.5", "999", "9999", "10.0"]
         out_vers = ['9999', '999', '10.0', '3.4', '1.0', '0.5']
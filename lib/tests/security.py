@@ -86,6 +86,31 @@ class SecurityTest(unittest.TestCase):
         self.assertEqual(s_rc, 0)
         self.assertEqual(self._system.available(), True)
 
+    def test_security_advisories_index(self):
+        set_mute(True)
+        s_rc = self._system.update()
+        set_mute(False)
+        self.assertEqual(s_rc, 0)
+
+        index = self._system._index()
+        self.assertTrue(index['advisories'])
+        for advisory_id in self._system.list()[:50]:
+            metadata = self._system._get_xml_metadata(
+                self._system._id_to_xml(advisory_id))
+            if metadata is None:
+                self.assertTrue(advisory_id not in index['advisories'])
+                continue
+
+            affected = dict(
+                (k, (v[0]['vul_atoms'], v[0]['unaff_atoms'])) \
+                    for k, v in metadata['affected'].items())
+            self.assertEqual(index['advisories'][advisory_id], affected)
+            for key in affected:
+                self.assertTrue(advisory_id in index['keys'][key])
+
+        # the on-disk index must be reused
+        self.assertEqual(self._system._index(), index)
+
     def test_gpg_handling(self):
 
         # available keys should be empty
@@ -6,12 +6,15 @@ import unittest
 import os
 import shutil
 from entropy.server.interfaces import Server
-from entropy.const import etpConst, initconfig_entropy_constants, etpSys
+from entropy.const import etpConst, initconfig_entropy_constants, etpSys, \
+    const_mkdtemp
 from entropy.core.settings.base import SystemSettings
 from entropy.db import EntropyRepository
 from entropy.db.cache import EntropyRepositoryCacher, \
     EntropyRepositoryCachePolicies
 from entropy.exceptions import RepositoryError
+from entropy.server.interfaces.db import ServerPackagesRepositoryUpdater
+from entropy.client.interfaces.db import AvailablePackagesRepositoryUpdater
 import entropy.tools
 import tests._misc as _misc
 
@@ -169,6 +172,229 @@ class EntropyRepositoryTest(unittest.TestCase):
         self.assertEqual(False, const_key in etpConst)
         self.assertEqual(None, etpConst.get(const_key))
 
+    def _setup_repository_deltas(self):
+        """
+        Make the server publish repository deltas into a temporary mirror
+        directory and register a client repository syncing from it.
+        """
+        tmp_dir = const_mkdtemp(prefix="tests.server.deltas")
+        self.addCleanup(shutil.rmtree, tmp_dir, True)
+        mirror_dir = os.path.join(tmp_dir, "mirror")
+        client_dir = os.path.join(tmp_dir, "client")
+        os.makedirs(mirror_dir)
+        os.makedirs(client_dir)
+
+        revision = [0]
+        self.Server._get_local_repository_dir = \
+            lambda repository_id, branch = None: mirror_dir
+        self.Server.local_repository_revision = \
+            lambda repository_id: revision[0]
+        self.addCleanup(delattr, self.Server, "_get_local_repository_dir")
+        self.addCleanup(delattr, self.Server, "local_repository_revision")
+
+        repo = self.Server.open_generic_repository(
+            os.path.join(tmp_dir, etpConst['etpdatabasefile']))
+        repo.initializeRepository()
+        self.addCleanup(repo.close)
+        updater = ServerPackagesRepositoryUpdater(
+            self.Server, self.default_repo, False, False)
+
+        client_repository_id = "deltas_test"
+        avail_data = self.Server.Settings()['repositories']['available']
+        avail_data[client_repository_id] = {
+            'dbpath': client_dir,
+            'notice_board': os.path.join(mirror_dir,
+                etpConst['rss-notice-board']),
+        }
+        self.addCleanup(avail_data.pop, client_repository_id)
+        client_updater = AvailablePackagesRepositoryUpdater(
+            self.Server, client_repository_id, False, False)
+        client_db = os.path.join(client_dir, etpConst['etpdatabasefile'])
+
+        def publish(new_revision):
+            revision[0] = new_revision
+            repo.commit()
+            upload_data = {}
+            updater._update_repository_deltas(repo, upload_data)
+            return upload_data
+
+        def checkout(client_revision):
+            repo.commit()
+            shutil.copy2(repo._db, client_db)
+            with open(os.path.join(client_dir,
+                    etpConst['etpdatabaserevisionfile']), "w") as rev_f:
+                rev_f.write("%d\n" % (client_revision,))
+
+        def sync(remote_revision):
+            return client_updater._delta_database_sync(
+                "file://" + mirror_dir, remote_revision)
+
+        return {
+            'repo': repo,
+            'updater': updater,
+            'mirror_dir': mirror_dir,
+            'client_db': client_db,
+            'publish': publish,
+            'checkout': checkout,
+            'sync': sync,
+        }
+
+    def _read_repository_delta(self, delta_path):
+        """
+        Return the metadata and the package identifiers stored inside
+        the given repository delta.
+        """
+        tmp_dir = const_mkdtemp(prefix="tests.server.deltas")
+        try:
+            self.assertTrue(
+                entropy.tools.universal_uncompress(delta_path, tmp_dir))
+            meta = {'removed': []}
+            with open(os.path.join(tmp_dir,
+                    etpConst['etpdatabasedeltametafile'])) as meta_f:
+                for line in meta_f.readlines():
+                    key, value = line.split()
+                    if key == "removed":
+                        meta['removed'].append(int(value))
+                    else:
+                        meta[key] = value
+            delta_repo = self.Server.open_generic_repository(
+                os.path.join(tmp_dir, etpConst['etpdatabasefile']),
+                read_only = True)
+            try:
+                package_ids = delta_repo.listAllPackageIds()
+            finally:
+                delta_repo.close()
+        finally:
+            shutil.rmtree(tmp_dir, True)
+        return meta, package_ids
+
+    def test_repository_deltas(self):
+        env = self._setup_repository_deltas()
+        repo = env['repo']
+        spm = self.Server.Spm()
+        data = spm.extract_package_metadata(_misc.get_test_package())
+        data2 = spm.extract_package_metadata(_misc.get_test_package2())
+
+        idpackage = repo.addPackage(data)
+        upload_data = env['publish'](1)
+        deltas_path = upload_data['deltas_index']
+        # nothing to compare against yet
+        self.assertEqual(entropy.tools.read_repository_deltas(deltas_path),
+            [])
+
+        idpackage2 = repo.addPackage(data2)
+        repo.setSlot(idpackage, "99")
+        upload_data = env['publish'](2)
+        deltas = entropy.tools.read_repository_deltas(deltas_path)
+        self.assertEqual([x[:2] for x in deltas], [(1, 2)])
+        meta, package_ids = self._read_repository_delta(
+            upload_data['delta_1_2'])
+        self.assertEqual((meta['from'], meta['to']), ("1", "2"))
+        self.assertEqual(meta['removed'], [])
+        self.assertEqual(meta['checksum'], repo.checksum(do_order = True,
+            strict = False, include_signatures = True))
+        self.assertEqual(package_ids, frozenset([idpackage, idpackage2]))
+
+        repo.removePackage(idpackage)
+        upload_data = env['publish'](3)
+        meta, package_ids = self._read_repository_delta(
+            upload_data['delta_2_3'])
+        self.assertEqual(meta['removed'], [idpackage])
+        self.assertEqual(package_ids, frozenset())
+
+        # only the last DELTA_RETENTION deltas are kept
+        env['updater'].DELTA_RETENTION = 2
+        repo.setSlot(idpackage2, "98")
+        env['publish'](4)
+        repo.setSlot(idpackage2, "97")
+        upload_data = env['publish'](5)
+        deltas = entropy.tools.read_repository_deltas(deltas_path)
+        self.assertEqual([x[:2] for x in deltas], [(3, 4), (4, 5)])
+        self.assertEqual(sorted(upload_data.keys()),
+            ['delta_3_4', 'delta_4_5', 'deltas_index'])
+        delta_prefix = etpConst['etpdatabasedeltafile'] + "."
+        self.assertEqual(
+            sorted(x for x in os.listdir(env['mirror_dir']) if \
+                       x.startswith(delta_prefix)),
+            sorted(x[2] for x in deltas))
+
+    def test_repository_deltas_apply(self):
+        env = self._setup_repository_deltas()
+        repo = env['repo']
+        spm = self.Server.Spm()
+        data = spm.extract_package_metadata(_misc.get_test_package())
+        data2 = spm.extract_package_metadata(_misc.get_test_package2())
+
+        idpackage = repo.addPackage(data)
+        env['publish'](1)
+        env['checkout'](1)
+        idpackage2 = repo.addPackage(data2)
+        repo.setSlot(idpackage, "99")
+        env['publish'](2)
+        repo.removePackage(idpackage)
+        env['publish'](3)
+
+        self.assertTrue(env['sync'](3))
+        client_repo = self.Server.open_generic_repository(env['client_db'],
+            read_only = True)
+        try:
+            self.assertEqual(client_repo.listAllPackageIds(),
+                frozenset([idpackage2]))
+            self.assertEqual(
+                client_repo.checksum(do_order = True, strict = False,
+                    include_signatures = True),
+                repo.checksum(do_order = True, strict = False,
+                    include_signatures = True))
+        finally:
+            client_repo.close()
+
+    def test_repository_deltas_fallback(self):
+        env = self._setup_repository_deltas()
+        repo = env['repo']
+        spm = self.Server.Spm()
+        data = spm.extract_package_metadata(_misc.get_test_package())
+        data2 = spm.extract_package_metadata(_misc.get_test_package2())
+
+        idpackage = repo.addPackage(data)
+        env['publish'](1)
+        env['checkout'](1)
+        repo.addPackage(data2)
+        env['publish'](2)
+        repo.removePackage(idpackage)
+        upload_data = env['publish'](3)
+
+        deltas_path = upload_data['deltas_index']
+        deltas = entropy.tools.read_repository_deltas(deltas_path)
+        client_db = env['client_db']
+        client_md5 = entropy.tools.md5sum(client_db)
+
+        def write_deltas(deltas):
+            with open(deltas_path, "w") as deltas_f:
+                for delta in deltas:
+                    deltas_f.write("%d %d %s %s\n" % delta)
+
+        def assert_fallback(remote_revision):
+            self.assertFalse(env['sync'](remote_revision))
+            self.assertEqual(entropy.tools.md5sum(client_db), client_md5)
+            self.assertFalse(os.path.lexists(client_db + ".delta"))
+
+        # missing chain
+        assert_fallback(4)
+
+        # bad md5
+        write_deltas([(1, 2, deltas[0][2], "0" * 32), deltas[1]])
+        assert_fallback(3)
+
+        # delta metadata not matching the index
+        from_rev, to_rev, delta_name, delta_md5 = deltas[1]
+        write_deltas([(1, 2, delta_name, delta_md5), deltas[1]])
+        assert_fallback(3)
+
+        # broken chain
+        write_deltas(deltas)
+        os.remove(os.path.join(env['mirror_dir'], delta_name))
+        assert_fallback(3)
+
 if __name__ == '__main__':
     unittest.main()
     raise SystemExit(0)
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Measure equo and eit startup times for commands that should not
+load the command modules and the heavy parts of the Entropy
+framework: the help output, shell completion and the version command.
+
+Usage: python bench_command_startup.py [equo|eit]
+"""
+import sys
+import os
+import subprocess
+import time
+
+ROUNDS = 10
+
+_base_dir = os.path.dirname(os.path.abspath(__file__))
+_src_dir = os.path.dirname(os.path.dirname(os.path.dirname(_base_dir)))
+
+TOOLS = {
+    'equo': (os.path.join(_src_dir, "client"), "equo.py", [
+        ["help"],
+        ["--bashcomp", "equo"],
+        ["--bashcomp", "equo", "up"],
+        ["version"],
+    ]),
+    'eit': (os.path.join(_src_dir, "server"), "eit.py", [
+        ["help"],
+        ["--bashcomp", "eit"],
+        ["--bashcomp", "eit", "co"],
+    ]),
+}
+
+
+def bench(cwd, script, args):
+    timings = []
+    with open(os.devnull, "w") as null:
+        for _round in range(ROUNDS):
+            t1 = time.time()
+            subprocess.call(
+                [sys.executable, script] + args,
+                cwd = cwd, stdout = null, stderr = null)
+            timings.append(time.time() - t1)
+
+    sys.stdout.write("%-30s avg: %8.4fs, best: %8.4fs (%d rounds)\n" % (
+        " ".join([script] + args), sum(timings) / len(timings),
+        min(timings), ROUNDS))
+
+
+def main(argv):
+    tools = argv
+    if not tools:
+        tools = sorted(TOOLS.keys())
+    for tool in tools:
+        cwd, script, args_list = TOOLS[tool]
+        for args in args_list:
+            bench(cwd, script, args)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
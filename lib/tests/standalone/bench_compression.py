@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Compare compression and decompression throughput, and compression
+ratio, of every compression format supported by Entropy (see
+etpConst['etpdatabasesupportedcformats']) using a single thread and
+all the available CPUs.
+
+Usage: python bench_compression.py [<file> ...]
+
+Compressed files, like Entropy packages, are uncompressed first and
+their payload is used. Without arguments, the test suite packages
+are used.
+"""
+import sys
+import os
+import glob
+import time
+sys.path.insert(0, '../')
+sys.path.insert(0, '../../')
+
+from entropy.const import etpConst, const_mkstemp, const_get_cpus
+import entropy.tools
+
+ROUNDS = 3
+
+
+def load_payload(path):
+    compressor = entropy.tools.get_compression_format(path)
+    cmethod = etpConst['etpdatabasecompressclasses'].get(compressor)
+    if cmethod is None:
+        with open(path, "rb") as f_in:
+            return f_in.read()
+    f_in = cmethod[0](path, "rb")
+    try:
+        return f_in.read()
+    finally:
+        f_in.close()
+
+
+def bench(src_path, compressor, threads):
+    fd, dst_path = const_mkstemp(prefix = "bench_compression")
+    os.close(fd)
+    opener = etpConst['etpdatabasecompressclasses'][compressor][0]
+    comp_timings = []
+    decomp_timings = []
+    try:
+        for _round in range(ROUNDS):
+            t1 = time.time()
+            entropy.tools.compress_file_threaded(src_path, dst_path,
+                compressor, threads = threads)
+            comp_timings.append(time.time() - t1)
+
+            t1 = time.time()
+            f_in = opener(dst_path, "rb")
+            try:
+                while f_in.read(1024000):
+                    pass
+            finally:
+                f_in.close()
+            decomp_timings.append(time.time() - t1)
+
+        return min(comp_timings), min(decomp_timings), \
+            os.path.getsize(dst_path)
+    finally:
+        os.remove(dst_path)
+
+
+def main(argv):
+    paths = argv
+    if not paths:
+        paths = sorted(glob.glob("../packages/*.tbz2"))
+
+    fd, src_path = const_mkstemp(prefix = "bench_compression")
+    os.close(fd)
+    size = 0
+    try:
+        with open(src_path, "wb") as f_out:
+            for path in paths:
+                payload = load_payload(path)
+                size += len(payload)
+                f_out.write(payload)
+
+        mb_size = float(size) / (1024 * 1024)
+        sys.stdout.write("%d files, %.2f MiB of payload, %d CPUs\n" % (
+            len(paths), mb_size, const_get_cpus()))
+
+        thread_counts = sorted(set([1, const_get_cpus()]))
+        for compressor in etpConst['etpdatabasesupportedcformats']:
+            for threads in thread_counts:
+                comp_t, decomp_t, comp_size = bench(
+                    src_path, compressor, threads)
+                sys.stdout.write(
+                    "%-4s %2d thread(s) compress: %8.2f MiB/s, "
+                    "decompress: %8.2f MiB/s, ratio: %5.3f\n" % (
+                        compressor, threads,
+                        mb_size / max(comp_t, 0.000001),
+                        mb_size / max(decomp_t, 0.000001),
+                        float(comp_size) / max(size, 1)))
+    finally:
+        os.remove(src_path)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
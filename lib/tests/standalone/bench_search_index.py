@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Compare EntropyRepository.searchRanked() times with and without the
+full-text search index, on a synthetic repository.
+
+Usage: python bench_search_index.py [<number of packages>]
+"""
+import sys
+import time
+sys.path.insert(0, '../')
+sys.path.insert(0, '../../')
+
+from entropy.db import EntropyRepository
+
+PACKAGES = 20000
+ROUNDS = 10
+KEYWORDS = ("pkg1", "pkg12345", "library", "tools python", "foobarbaz")
+
+WORDS = ("library", "tools", "bindings", "daemon", "python", "graphical",
+         "server", "client", "utilities", "compression", "network")
+
+
+def populate(repo, packages):
+    cur = repo._cursor()
+    for package_id in range(1, packages + 1):
+        category = "cat-%d" % (package_id % 150,)
+        name = "pkg%d" % (package_id,)
+        cur.execute("""
+        INSERT INTO baseinfo (idpackage, atom, category, name, version,
+            versiontag, revision, branch, slot, license, etpapi, trigger)
+        VALUES (?, ?, ?, ?, '1.0', '', 0, '5', '0', 'GPL-2', 3, 0)
+        """, (package_id, "%s/%s-1.0" % (category, name), category, name))
+        description = " ".join(
+            WORDS[(package_id * x) % len(WORDS)] for x in range(1, 6))
+        cur.execute("""
+        INSERT INTO extrainfo (idpackage, description, homepage, download,
+            size, chost, cflags, cxxflags, digest, datecreation)
+        VALUES (?, ?, '', '', 0, '', '', '', '', '0')
+        """, (package_id, description))
+    repo.commit()
+
+
+def bench(repo, label):
+    for keyword in KEYWORDS:
+        timings = []
+        for _round in range(ROUNDS):
+            t1 = time.time()
+            results = repo.searchRanked(keyword, limit = 50)
+            timings.append(time.time() - t1)
+        sys.stdout.write(
+            "%-6s %-14s avg: %8.4fs, best: %8.4fs (%d results)\n" % (
+                label, keyword, sum(timings) / len(timings),
+                min(timings), len(results)))
+
+
+def main(argv):
+    packages = PACKAGES
+    if argv:
+        packages = int(argv[0])
+
+    repo = EntropyRepository(
+        readOnly = False, dbFile = ":memory:", name = "bench",
+        temporary = True, skipChecks = True)
+    repo.initializeRepository()
+    populate(repo, packages)
+
+    bench(repo, "like")
+    if not repo._searchIndexSupported():
+        sys.stdout.write("full-text search index not supported\n")
+        repo.close()
+        return 1
+
+    t1 = time.time()
+    repo.createAllIndexes()
+    sys.stdout.write("indexes built in %.4fs\n" % (time.time() - t1,))
+    bench(repo, "fts")
+    repo.close()
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Compare SystemSettings setup times (instantiation, clear() and access to
+the package masking metadata) when the configuration files have to be
+parsed (cold, no parsed settings snapshot) and when the parsed settings
+snapshot is valid (warm).
+
+Usage: python bench_settings_snapshot.py [<configuration directory>]
+
+Without arguments, a synthetic configuration directory is generated,
+with large package.mask, package.unmask, package.keywords files and
+*.d directories.
+"""
+import sys
+import os
+import shutil
+import tempfile
+import time
+sys.path.insert(0, '../')
+sys.path.insert(0, '../../')
+
+from entropy.const import etpConst
+
+ENTRIES = 5000
+D_FILES = 20
+ROUNDS = 10
+
+SETTINGS = ('mask', 'unmask', 'keywords', 'license_mask', 'license_accept',
+            'system_mask', 'system_package_sets', 'system_dirs',
+            'system_dirs_mask', 'extra_ldpaths')
+
+
+def generate_configuration(conf_dir):
+    packages_dir = os.path.join(conf_dir, "packages")
+    os.makedirs(os.path.join(packages_dir, "sets"))
+
+    def _write(path, lines):
+        with open(path, "w") as conf_f:
+            conf_f.write("# generated by bench_settings_snapshot\n")
+            for line in lines:
+                conf_f.write(line + "\n")
+
+    atoms = ["cat-%d/pkg%d ## comment" % (x % 150, x) for x in range(ENTRIES)]
+    _write(os.path.join(packages_dir, "package.mask"), atoms)
+    _write(os.path.join(packages_dir, "package.unmask"), atoms)
+    _write(os.path.join(packages_dir, "package.keywords"),
+           ["~amd64 cat-%d/pkg%d" % (x % 150, x) for x in range(ENTRIES)])
+    _write(os.path.join(packages_dir, "license.mask"),
+           ["LICENSE-%d" % (x,) for x in range(ENTRIES // 10)])
+    _write(os.path.join(packages_dir, "system.mask"), atoms[:ENTRIES // 10])
+
+    for rel_dir in ("package.mask.d", "package.unmask.d", "system.mask.d"):
+        d_dir = os.path.join(packages_dir, rel_dir)
+        os.mkdir(d_dir)
+        for idx in range(D_FILES):
+            _write(os.path.join(d_dir, "conf-%02d" % (idx,)),
+                   atoms[idx::D_FILES])
+
+    for idx in range(D_FILES):
+        _write(os.path.join(packages_dir, "sets", "set%d" % (idx,)),
+               [x.split()[0] for x in atoms[idx::D_FILES]])
+
+    _write(os.path.join(conf_dir, "fsdirs.conf"),
+           ["/usr/dir%d" % (x,) for x in range(ENTRIES // 10)])
+    _write(os.path.join(conf_dir, "fsdirsmask.conf"),
+           ["/usr/dir%d/mask" % (x,) for x in range(ENTRIES // 10)])
+    _write(os.path.join(conf_dir, "fsldpaths.conf"),
+           ["/usr/lib%d" % (x,) for x in range(ENTRIES // 100)])
+
+
+def run(settings):
+    settings.clear()
+    for setting_id in SETTINGS:
+        settings[setting_id]
+
+
+def bench(settings, label, snapshot_path, cold):
+    timings = []
+    for _round in range(ROUNDS):
+        if cold:
+            try:
+                os.remove(snapshot_path)
+            except OSError:
+                pass
+        t1 = time.time()
+        run(settings)
+        timings.append(time.time() - t1)
+
+    sys.stdout.write("%-10s avg: %8.4fs, best: %8.4fs (%d rounds)\n" % (
+        label, sum(timings) / len(timings), min(timings), ROUNDS))
+
+
+def main(argv):
+    tmp_dir = tempfile.mkdtemp(prefix = "bench_settings_snapshot")
+    try:
+        if argv:
+            conf_dir = argv[0]
+        else:
+            conf_dir = os.path.join(tmp_dir, "conf")
+            sys.stdout.write("generating configuration into %s\n" % (
+                conf_dir,))
+            generate_configuration(conf_dir)
+
+        etpConst['confdir'] = conf_dir
+        etpConst['dumpstoragedir'] = os.path.join(tmp_dir, "caches")
+        os.mkdir(etpConst['dumpstoragedir'])
+
+        from entropy.core.settings.base import SystemSettings
+        settings = SystemSettings()
+        snapshot_path = os.path.join(
+            etpConst['dumpstoragedir'],
+            SystemSettings.SNAPSHOT_NAME + etpConst['cachedumpext'])
+
+        bench(settings, "cold", snapshot_path, True)
+        bench(settings, "warm", snapshot_path, False)
+        settings.destroy()
+    finally:
+        shutil.rmtree(tmp_dir, True)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Compare the cost of sorting package versions through the memoized
+version_key() sort keys against the former cmp-based bubble sort
+running compare_versions().
+
+Usage: python bench_version_compare.py <repository file>
+
+All the versions of the given repository are sorted at once, then
+grouped by package key and sorted, like atomMatch() does.
+"""
+import sys
+import time
+sys.path.insert(0, '../')
+sys.path.insert(0, '../../')
+
+from entropy.db import EntropyRepository
+import entropy.dep
+
+ROUNDS = 3
+
+
+def bubble_sort(inputlist, cmp_func):
+    # the sorter used before version_key() was introduced
+    inputs = inputlist[:]
+    max_idx = len(inputs)
+    while True:
+        changed = False
+        for idx in range(max_idx - 1):
+            str_a = inputs[idx]
+            str_b = inputs[idx + 1]
+            if cmp_func(str_a, str_b) < 0:
+                inputs[idx] = str_b
+                inputs[idx + 1] = str_a
+                changed = True
+        if not changed:
+            break
+    return inputs
+
+
+def bench(label, func, groups):
+    timings = []
+    for _round in range(ROUNDS):
+        t1 = time.time()
+        for versions in groups:
+            func(versions)
+        timings.append(time.time() - t1)
+    sys.stdout.write("%-30s first: %8.3fs, best: %8.3fs\n" % (
+        label, timings[0], min(timings)))
+
+
+def main(argv):
+    if not argv:
+        sys.stderr.write("usage: %s <repository file>\n" % (sys.argv[0],))
+        return 1
+
+    repo = EntropyRepository(readOnly = True, dbFile = argv[0],
+        name = "bench", xcache = False, skipChecks = True)
+    groups = {}
+    versions = []
+    try:
+        for package_id in repo.listAllPackageIds():
+            key, _slot = repo.retrieveKeySlot(package_id)
+            version = repo.retrieveVersion(package_id)
+            groups.setdefault(key, []).append(version)
+            versions.append(version)
+    finally:
+        repo.close()
+    groups = list(groups.values())
+    sys.stdout.write("%d versions, %d package keys\n" % (
+        len(versions), len(groups),))
+
+    sort_key = lambda x: sorted(x, key = entropy.dep.version_key,
+                                reverse = True)
+    bench("compare_versions, per key",
+          lambda x: bubble_sort(x, entropy.dep.compare_versions), groups)
+    bench("version_key, per key", sort_key, groups)
+    bench("version_key, all versions", sort_key, [versions])
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -5,8 +5,9 @@ sys.path.insert(0, '.')
 sys.path.insert(0, '../')
 import unittest
 from entropy.const import const_convert_to_rawstring, \
-    const_convert_to_unicode, const_mkstemp, const_mkdtemp
+    const_convert_to_unicode, const_mkstemp, const_mkdtemp, etpConst
 import entropy.tools as et
+from entropy.exceptions import FileNotFound
 from entropy.client.interfaces import Client
 from entropy.output import print_generic, set_mute
 import tests._misc as _misc
@@ -63,6 +64,54 @@ class ToolsTest(unittest.TestCase):
 
         os.remove(tmp_path)
 
+    def test_aggregate_entropy_metadata(self):
+
+        fd, pkg_path = const_mkstemp()
+        os.close(fd)
+        fd, edb_path = const_mkstemp()
+        os.close(fd)
+        fd, tmp_path = const_mkstemp()
+        os.close(fd)
+
+        try:
+            self.assertTrue(et.remove_entropy_metadata(self.test_pkg, pkg_path))
+            self.assertTrue(et.dump_entropy_metadata(self.test_pkg, edb_path))
+            orig_pkg_md5 = et.md5sum(pkg_path)
+
+            et.aggregate_entropy_metadata(pkg_path, edb_path)
+            self.assertTrue(et.is_entropy_package_file(pkg_path))
+            with open(pkg_path, "rb") as pkg_f:
+                self.assertNotEqual(
+                    et._read_edb_trailer(pkg_f, os.path.getsize(pkg_path)),
+                    None)
+
+            # the trailer must not end up in the dumped metadata
+            self.assertTrue(et.dump_entropy_metadata(pkg_path, tmp_path))
+            self.assertEqual(et.md5sum(edb_path), et.md5sum(tmp_path))
+            self.assertTrue(et.remove_entropy_metadata(pkg_path, tmp_path))
+            self.assertEqual(orig_pkg_md5, et.md5sum(tmp_path))
+
+            # corrupt the metadata, the checksum must not match
+            with open(pkg_path, "r+b") as pkg_f:
+                pkg_f.seek(-(et._EDB_TRAILER_SIZE + 1), os.SEEK_END)
+                byte = pkg_f.read(1)
+                pkg_f.seek(-1, os.SEEK_CUR)
+                pkg_f.write(const_convert_to_rawstring(
+                    "a" if byte != const_convert_to_rawstring("a") else "b"))
+            self.assertFalse(et.dump_entropy_metadata(pkg_path, tmp_path))
+
+            # legacy packages, without trailer
+            self.assertTrue(et.remove_entropy_metadata(self.test_pkg, pkg_path))
+            et.aggregate_entropy_metadata(pkg_path, edb_path, trailer = False)
+            self.assertFalse(et._has_edb_trailer(pkg_path))
+            self.assertEqual(et.md5sum(self.test_pkg), et.md5sum(pkg_path))
+            self.assertTrue(et.dump_entropy_metadata(pkg_path, tmp_path))
+            self.assertEqual(et.md5sum(edb_path), et.md5sum(tmp_path))
+        finally:
+            os.remove(pkg_path)
+            os.remove(edb_path)
+            os.remove(tmp_path)
+
     def test_tb(self):
         # traceback test
         tb = None
@@ -210,6 +259,43 @@ class ToolsTest(unittest.TestCase):
         os.close(fd)
         os.remove(tmp_path)
 
+    def test_multi_digest(self):
+
+        fd, tmp_path = const_mkstemp()
+
+        os.write(fd, const_convert_to_rawstring("this is the life"))
+        os.fsync(fd)
+        os.close(fd)
+
+        cache = et.DigestCache()
+        digests = et.multi_digest(tmp_path, ("md5", "sha1", "sha256"),
+            cache = cache)
+        self.assertEqual(digests['md5'], et.md5sum(tmp_path))
+        self.assertEqual(digests['sha1'],
+            "105de2055ac81db7b02a27623b7e73932788df95")
+        self.assertEqual(digests['sha256'],
+            "ccb134af19d748c9c845b26a1e3a29e6ea356d1f1e0ad47d57b83f38c5492988")
+
+        # cached digests are returned while the file is unchanged
+        self.assertEqual(et.multi_digest(tmp_path, ("sha1",), cache = cache),
+            {'sha1': digests['sha1']})
+
+        # a modified file invalidates the cached digests
+        with open(tmp_path, "ab") as tmp_f:
+            tmp_f.write(const_convert_to_rawstring("!"))
+        self.assertNotEqual(
+            et.multi_digest(tmp_path, ("sha1",), cache = cache)['sha1'],
+            digests['sha1'])
+
+        fd, tmp_path2 = const_mkstemp()
+        os.close(fd)
+        outcome = et.multi_digest_files([tmp_path, tmp_path2], ("sha256",))
+        self.assertEqual(outcome[tmp_path]['sha256'], et.sha256(tmp_path))
+        self.assertEqual(outcome[tmp_path2]['sha256'], et.sha256(tmp_path2))
+
+        os.remove(tmp_path)
+        os.remove(tmp_path2)
+
     def test_md5sum_directory(self):
         tmp_dir = const_mkdtemp()
         f = open(os.path.join(tmp_dir, "foo"), "w")
@@ -282,6 +368,51 @@ class ToolsTest(unittest.TestCase):
         os.remove(tmp_path)
         os.remove(new_path)
 
+    def test_compress_file_threaded(self):
+        fd, tmp_path = const_mkstemp()
+        data = const_convert_to_rawstring("this is the life\n" * 100000)
+        os.write(fd, data)
+        os.close(fd)
+
+        formats = etpConst['etpdatabasesupportedcformats']
+        for compressor in formats:
+            cmethod = etpConst['etpdatabasecompressclasses'][compressor]
+            new_path = tmp_path + "." + compressor
+            for threads in (1, 4):
+                et.compress_file_threaded(tmp_path, new_path, compressor,
+                    threads = threads)
+                self.assertEqual(et.get_compression_format(new_path),
+                    compressor)
+                comp_f = cmethod[0](new_path, "rb")
+                try:
+                    self.assertEqual(comp_f.read(), data)
+                finally:
+                    comp_f.close()
+            os.remove(new_path)
+
+        os.remove(tmp_path)
+
+    def test_compress_files(self):
+        tmp_dir = const_mkdtemp()
+        file_path = os.path.join(tmp_dir, "foo")
+        with open(file_path, "wb") as f_out:
+            f_out.write(const_convert_to_rawstring("ciao ciao ciao"))
+
+        for compressor in etpConst['etpdatabasesupportedcformats']:
+            tar_path = os.path.join(tmp_dir, "foo.tar." + compressor)
+            et.compress_files(tar_path, [file_path], compressor = compressor)
+            self.assertEqual(et.get_compression_format(tar_path), compressor)
+
+            tar = et.open_tarball(tar_path)
+            try:
+                self.assertEqual(tar.getnames(), ["foo"])
+                self.assertEqual(tar.extractfile("foo").read(),
+                    const_convert_to_rawstring("ciao ciao ciao"))
+            finally:
+                tar.close()
+
+        shutil.rmtree(tmp_dir, True)
+
     def test_remove_entropy_metadata2(self):
         fd, tmp_path = const_mkstemp()
         os.close(fd)
@@ -446,6 +577,40 @@ class ToolsTest(unittest.TestCase):
         finally:
             os.remove(tmp_path)
 
+    def test_entropy_delta_legacy(self):
+        # pkg_path_b is a legacy package, without the Entropy metadata
+        # trailer, while pkg_path_c is the same package with the trailer
+        pkg_path_a = _misc.get_test_entropy_package()
+        pkg_path_b = _misc.get_test_entropy_package2()
+        self.assertFalse(et._has_edb_trailer(pkg_path_b))
+
+        tmp_dir = const_mkdtemp()
+        try:
+            edb_path = os.path.join(tmp_dir, "edb")
+            pkg_path_c = os.path.join(tmp_dir, os.path.basename(pkg_path_b))
+            self.assertTrue(et.remove_entropy_metadata(pkg_path_b, pkg_path_c))
+            self.assertTrue(et.dump_entropy_metadata(pkg_path_b, edb_path))
+            et.aggregate_entropy_metadata(pkg_path_c, edb_path)
+            self.assertTrue(et._has_edb_trailer(pkg_path_c))
+
+            for target_path in (pkg_path_b, pkg_path_c):
+                hash_tag = et.md5sum(pkg_path_a) + et.md5sum(target_path)
+                delta_path = et.generate_entropy_delta(pkg_path_a,
+                    target_path, hash_tag, pkg_compression = "bz2")
+                self.assertNotEqual(None, delta_path) # missing bsdiff?
+
+                new_pkg_path = os.path.join(tmp_dir, "new_pkg")
+                try:
+                    et.apply_entropy_delta(pkg_path_a, delta_path,
+                        new_pkg_path)
+                finally:
+                    os.remove(delta_path)
+                self.assertEqual(et.md5sum(target_path),
+                    et.md5sum(new_pkg_path))
+                os.remove(new_pkg_path)
+        finally:
+            shutil.rmtree(tmp_dir, True)
+
     def test_read_elf_class(self):
         elf_obj = _misc.get_dl_so_amd()
         elf_class = 2
@@ -544,6 +709,28 @@ class ToolsTest(unittest.TestCase):
         metadata = et.read_elf_linker_paths(elf_obj)
         self.assertEqual(metadata, known_meta)
 
+    def test_read_elf_metadata(self):
+        elf_obj = _misc.get_dl_so_amd_2()
+        known_meta = {
+            'soname': 'libkdb5.so.4',
+            'class': 2,
+            'runpath': '/usr/lib64',
+            'needed': set(['libcom_err.so.2', 'libkrb5.so.3',
+                'libkrb5support.so.0', 'libgssrpc.so.4', 'libk5crypto.so.3',
+                'libc.so.6']),
+        }
+        metadata = et.read_elf_metadata(elf_obj)
+        self.assertEqual(metadata, known_meta)
+
+        elf_obj2 = _misc.get_dl_so_amd()
+        not_elf_obj = _misc.get_random_file()
+        metadata = et.read_elf_metadata_batch(
+            [elf_obj, elf_obj2, not_elf_obj], workers = 2)
+        self.assertEqual(metadata[elf_obj], known_meta)
+        self.assertEqual(metadata[elf_obj2], et.read_elf_metadata(elf_obj2))
+        self.assertEqual(metadata[not_elf_obj], None)
+        self.assertRaises(FileNotFound, et.read_elf_metadata, not_elf_obj)
+
     def test_xml_from_dict_extended(self):
         data = {
             "foo": 1,
@@ -230,11 +230,20 @@ class ApplicationsViewController(GObject.Object):
                     multi_repo=True, mask_filter=False)
                 matches.extend(pkg_matches)
 
-                # atom searching (name and desc)
-                search_matches = self._entropy.atom_search(
+                # ranked full-text searching (name and desc)
+                search_matches = self._entropy.search_packages(
+                    text,
+                    repositories = self._entropy.repositories(),
+                    useflags = False)
+
+                # atom searching (name and desc), after the ranked
+                # results, which only match word prefixes
+                atom_matches = self._entropy.atom_search(
                     text,
                     repositories = self._entropy.repositories(),
                     description = True)
+                search_matches.extend(
+                    [x for x in atom_matches if x not in search_matches])
 
                 matches.extend([x for x in search_matches \
                                     if x not in matches])
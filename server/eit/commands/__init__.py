@@ -8,24 +8,170 @@
 
     B{Entropy Infrastructure Toolkit}.
 
+    Static manifest of the available commands. Command modules are
+    imported only when the command is dispatched, so that the help
+    output and shell completion do not pay for them. When adding
+    a command, add it here too. Command modules not listed here,
+    like the ones shipped by third parties, are loaded on demand
+    by load_unlisted_commands().
+
 """
 import os
 import sys
 
-_cur_file = sys.modules[__name__].__file__
-_cur_dir = os.path.dirname(_cur_file)
-_excluded_mods = ["descriptor"]
-for py_file in os.listdir(_cur_dir):
-    if not py_file.endswith(".py"):
-        continue
-    if py_file.startswith("_"):
-        continue
-    # strip .py
-    _mod = "eit.commands." + py_file[:-3]
-    if _mod in _excluded_mods:
-        continue
-    try:
-        __import__(_mod)
-    except ValueError:
-        # garbage
-        continue
+from entropy.i18n import _
+
+from eit.commands.descriptor import EitCommandDescriptor, \
+    EitLazyCommandDescriptor
+
+_COMMANDS = [
+    EitLazyCommandDescriptor(
+        "eit.commands.add", "EitAdd", "add",
+        _("commit to repository the provided packages")),
+    EitLazyCommandDescriptor(
+        "eit.commands.branch", "EitBranch", "branch",
+        _("manage repository branches")),
+    EitLazyCommandDescriptor(
+        "eit.commands.bump", "EitBump", "bump",
+        _("bump repository revision, force push")),
+    EitLazyCommandDescriptor(
+        "eit.commands.checkout", "EitCheckout", "checkout",
+        _("switch from a repository to another"),
+        aliases = ["co"]),
+    EitLazyCommandDescriptor(
+        "eit.commands.cleanup", "EitCleanup", "cleanup",
+        _("clean expired packages from a repository"),
+        aliases = ["cn", "clean"]),
+    EitLazyCommandDescriptor(
+        "eit.commands.cleanup", "EitVacuum", "vacuum",
+        _("clean expired packages from a repository")),
+    EitLazyCommandDescriptor(
+        "eit.commands.commit", "EitCommit", "commit",
+        _("commit changes to repository"),
+        aliases = ["ci"]),
+    EitLazyCommandDescriptor(
+        "eit.commands.cp", "EitCp", "cp",
+        _("copy packages from a repository to another")),
+    EitLazyCommandDescriptor(
+        "eit.commands.deps", "EitDeps", "deps",
+        _("edit dependencies for packages in repository")),
+    EitLazyCommandDescriptor(
+        "eit.commands.files", "EitFiles", "files",
+        _("show files owned by packages"),
+        aliases = ["f"]),
+    EitLazyCommandDescriptor(
+        "eit.commands.graph", "EitGraph", "graph",
+        _("show dependency graph for packages")),
+    EitLazyCommandDescriptor(
+        "eit.commands.help", "EitHelp", "help",
+        _("this help"),
+        aliases = ["-h", "--help"], catch_all = True),
+    EitLazyCommandDescriptor(
+        "eit.commands.init", "EitInit", "init",
+        _("initialize repository (erasing all its content)")),
+    EitLazyCommandDescriptor(
+        "eit.commands.inject", "EitInject", "inject",
+        _("inject package files into repository"),
+        aliases = ["fit"]),
+    EitLazyCommandDescriptor(
+        "eit.commands.key", "EitKey", "key",
+        _("manage repository GPG keys")),
+    EitLazyCommandDescriptor(
+        "eit.commands.list", "EitList", "list",
+        _("show repository content (packages)")),
+    EitLazyCommandDescriptor(
+        "eit.commands.lock", "EitLock", "lock",
+        _("lock repository")),
+    EitLazyCommandDescriptor(
+        "eit.commands.lock", "EitUnlock", "unlock",
+        _("unlock repository")),
+    EitLazyCommandDescriptor(
+        "eit.commands.log", "EitLog", "log",
+        _("show log for repository")),
+    EitLazyCommandDescriptor(
+        "eit.commands.match", "EitMatch", "match",
+        _("match packages in repositories")),
+    EitLazyCommandDescriptor(
+        "eit.commands.merge", "EitMerge", "merge",
+        _("merge packages on other branches into current")),
+    EitLazyCommandDescriptor(
+        "eit.commands.mv", "EitMv", "mv",
+        _("move packages from a repository to another")),
+    EitLazyCommandDescriptor(
+        "eit.commands.notice", "EitNotice", "notice",
+        _("manage repository notice-board")),
+    EitLazyCommandDescriptor(
+        "eit.commands.own", "EitOwn", "own",
+        _("search packages owning paths")),
+    EitLazyCommandDescriptor(
+        "eit.commands.pkgmove", "EitPkgmove", "pkgmove",
+        _("edit automatic package moves for repository")),
+    EitLazyCommandDescriptor(
+        "eit.commands.pull", "EitPull", "pull",
+        _("pull repository packages and metadata")),
+    EitLazyCommandDescriptor(
+        "eit.commands.push", "EitPush", "push",
+        _("push repository packages and metadata"),
+        aliases = ["sync"]),
+    EitLazyCommandDescriptor(
+        "eit.commands.query", "EitQuery", "query",
+        _("miscellaneous package metadata queries"),
+        aliases = ["q"]),
+    EitLazyCommandDescriptor(
+        "eit.commands.remote", "EitRemote", "remote",
+        _("manage repositories")),
+    EitLazyCommandDescriptor(
+        "eit.commands.remove", "EitRemove", "remove",
+        _("remove packages from repository"),
+        aliases = ["rm"]),
+    EitLazyCommandDescriptor(
+        "eit.commands.repack", "EitRepack", "repack",
+        _("rebuild packages in repository"),
+        aliases = ["rp"]),
+    EitLazyCommandDescriptor(
+        "eit.commands.repo", "EitRepo", "repo",
+        _("manage repositories")),
+    EitLazyCommandDescriptor(
+        "eit.commands.reset", "EitReset", "reset",
+        _("reset repository to remote status")),
+    EitLazyCommandDescriptor(
+        "eit.commands.revgraph", "EitRevgraph", "revgraph",
+        _("show reverse dependency graph for packages")),
+    EitLazyCommandDescriptor(
+        "eit.commands.search", "EitSearch", "search",
+        _("search packages in repositories")),
+    EitLazyCommandDescriptor(
+        "eit.commands.status", "EitStatus", "status",
+        _("show repository status"),
+        aliases = ["st"]),
+    EitLazyCommandDescriptor(
+        "eit.commands.test", "EitTest", "test",
+        _("run QA tests")),
+]
+
+for _descriptor in _COMMANDS:
+    EitCommandDescriptor.register(_descriptor)
+
+
+def load_unlisted_commands():
+    """
+    Import the command modules that are not in the static manifest,
+    so that they register their EitCommandDescriptor objects.
+    """
+    listed_mods = set([x.get_module() for x in _COMMANDS])
+    excluded_mods = ["eit.commands.command", "eit.commands.descriptor"]
+    cur_dir = os.path.dirname(sys.modules[__name__].__file__)
+    for py_file in sorted(os.listdir(cur_dir)):
+        if not py_file.endswith(".py"):
+            continue
+        if py_file.startswith("_"):
+            continue
+        # strip .py
+        mod = "eit.commands." + py_file[:-3]
+        if mod in listed_mods or mod in excluded_mods:
+            continue
+        try:
+            __import__(mod)
+        except ValueError:
+            # garbage
+            continue
@@ -16,8 +16,6 @@ from entropy.i18n import _
 from entropy.locks import EntropyResourcesLock
 from entropy.output import darkgreen, print_error, print_generic
 from entropy.exceptions import PermissionDenied
-from entropy.server.interfaces import Server
-from entropy.server.interfaces.db import ServerRepositoryStatus
 from entropy.core.settings.base import SystemSettings
 
 import entropy.tools
@@ -181,6 +179,7 @@ class EitCommand(object):
         Return the Entropy Server object.
         This method is not thread safe.
         """
+        from entropy.server.interfaces import Server
         return Server(*args, **kwargs)
 
     @classmethod
@@ -189,6 +188,7 @@ class EitCommand(object):
         Return the Entropy Server class object.
         This method is not thread safe.
         """
+        from entropy.server.interfaces import Server
         return Server
 
     def _call_exclusive(self, func, repo):
@@ -232,6 +232,8 @@ class EitCommand(object):
             # We cannot do this inside the API because we don't
             # know the lifecycle of EntropyRepository objects there.
             server.close_repositories()
+            from entropy.server.interfaces.db import \
+                ServerRepositoryStatus
             ServerRepositoryStatus().reset()
 
             return func(server)
@@ -284,6 +286,8 @@ class EitCommand(object):
             # We cannot do this inside the API because we don't
             # know the lifecycle of EntropyRepository objects there.
             server.close_repositories()
+            from entropy.server.interfaces.db import \
+                ServerRepositoryStatus
             ServerRepositoryStatus().reset()
 
             return func(server)
@@ -186,6 +186,9 @@ If you would like to selectively add certain packages, please see
 
         generated_packages = collections.deque()
         store_dir = entropy_server._get_local_store_directory(repository_id)
+        srv_set = self._settings()[
+            entropy_server.SYSTEM_SETTINGS_PLG_ID]['server']
+        package_format = srv_set['package_file_format']
 
         if not os.path.isdir(store_dir):
             try:
@@ -206,7 +209,7 @@ If you would like to selectively add certain packages, please see
 
             try:
                 pkg_list = entropy_server.Spm().generate_package(spm_name,
-                    store_dir)
+                    store_dir, compression = package_format)
                 generated_packages.append(pkg_list)
             except OSError:
                 entropy.tools.print_traceback()
@@ -10,6 +10,8 @@
     Eit Command descriptor class.
 
 """
+import sys
+
 
 class EitCommandDescriptor(object):
     """
@@ -23,11 +25,18 @@ class EitCommandDescriptor(object):
     @staticmethod
     def register(descriptor):
         """
-        Register an EitCommandDescriptor object
+        Register an EitCommandDescriptor object. A previously registered
+        object with the same name (for instance, the EitLazyCommandDescriptor
+        used before the command module is imported) is replaced.
         """
-        EitCommandDescriptor.EIT_COMMANDS.append(descriptor)
-        EitCommandDescriptor.EIT_COMMANDS_MAP[descriptor.get_name()] = \
-            descriptor
+        name = descriptor.get_name()
+        old_descriptor = EitCommandDescriptor.EIT_COMMANDS_MAP.get(name)
+        if old_descriptor is not None:
+            idx = EitCommandDescriptor.EIT_COMMANDS.index(old_descriptor)
+            EitCommandDescriptor.EIT_COMMANDS[idx] = descriptor
+        else:
+            EitCommandDescriptor.EIT_COMMANDS.append(descriptor)
+        EitCommandDescriptor.EIT_COMMANDS_MAP[name] = descriptor
 
     @staticmethod
     def obtain():
@@ -71,3 +80,80 @@ class EitCommandDescriptor(object):
         Get EitCommand description
         """
         return self._description
+
+    def get_aliases(self):
+        """
+        Get EitCommand aliases
+        """
+        return self._klass.ALIASES
+
+    def is_catch_all(self):
+        """
+        Return whether EitCommand is the catch-all command
+        """
+        return self._klass.CATCH_ALL
+
+
+class EitLazyCommandDescriptor(EitCommandDescriptor):
+    """
+    EitCommandDescriptor object whose EitCommand class is imported only
+    when get_class() is called. The command name, aliases and flags
+    are provided by the static command manifest, so that the help
+    output and shell completion do not import the command modules.
+    Once imported, the command module registers its own
+    EitCommandDescriptor object, replacing this one.
+    """
+
+    def __init__(self, module, class_name, name, description,
+                 aliases = None, catch_all = False):
+        """
+        Object constructor.
+
+        @param module: name of the module containing the EitCommand class
+        @type module: string
+        @param class_name: name of the EitCommand class
+        @type class_name: string
+        @param name: EitCommand name (its NAME attribute)
+        @type name: string
+        @param description: EitCommand description
+        @type description: string
+        @keyword aliases: value of the EitCommand ALIASES attribute
+        @type aliases: list
+        @keyword catch_all: value of the EitCommand CATCH_ALL attribute
+        @type catch_all: bool
+        """
+        EitCommandDescriptor.__init__(self, None, name, description)
+        self._module = module
+        self._class_name = class_name
+        if aliases is None:
+            aliases = []
+        self._aliases = aliases
+        self._catch_all = catch_all
+
+    def get_module(self):
+        """
+        Get the name of the module containing the EitCommand class
+        """
+        return self._module
+
+    def get_class(self):
+        """
+        Overridden from EitCommandDescriptor
+        """
+        if self._klass is None:
+            __import__(self._module)
+            self._klass = getattr(
+                sys.modules[self._module], self._class_name)
+        return self._klass
+
+    def get_aliases(self):
+        """
+        Overridden from EitCommandDescriptor
+        """
+        return self._aliases
+
+    def is_catch_all(self):
+        """
+        Overridden from EitCommandDescriptor
+        """
+        return self._catch_all
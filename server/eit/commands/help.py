@@ -48,7 +48,7 @@ class EitHelp(EitCommand):
                 # do not add self
                 continue
             outcome.append(name)
-            aliases = descriptor.get_class().ALIASES
+            aliases = descriptor.get_aliases()
             outcome.extend(aliases)
 
         def _startswith(string):
@@ -70,7 +70,7 @@ class EitHelp(EitCommand):
         descriptors.sort(key = lambda x: x.get_name())
         group = parser.add_argument_group("command", "available commands")
         for descriptor in descriptors:
-            aliases = descriptor.get_class().ALIASES
+            aliases = descriptor.get_aliases()
             aliases_str = ", ".join([teal(x) for x in aliases])
             if aliases_str:
                 aliases_str = " [%s]" % (aliases_str,)
@@ -19,6 +19,7 @@ from entropy.output import print_error
 import entropy.tools
 
 from entropy.exceptions import OnlineMirrorError
+from eit.commands import load_unlisted_commands
 from eit.commands.descriptor import EitCommandDescriptor
 
 
@@ -49,16 +50,20 @@ def main():
 
     install_exception_handler()
 
-    descriptors = EitCommandDescriptor.obtain()
-    args_map = {}
-    catch_all = None
-    for descriptor in descriptors:
-        klass = descriptor.get_class()
-        if klass.CATCH_ALL:
-            catch_all = klass
-        args_map[klass.NAME] = klass
-        for alias in klass.ALIASES:
-            args_map[alias] = klass
+    # command classes are loaded only when dispatched,
+    # see the eit.commands package
+    def _build_args_map():
+        args_map = {}
+        catch_all = None
+        for descriptor in EitCommandDescriptor.obtain():
+            if descriptor.is_catch_all():
+                catch_all = descriptor
+            args_map[descriptor.get_name()] = descriptor
+            for alias in descriptor.get_aliases():
+                args_map[alias] = descriptor
+        return args_map, catch_all
+
+    args_map, catch_all = _build_args_map()
 
     args = sys.argv[1:]
     # convert args to unicode, to avoid passing
@@ -88,11 +93,18 @@ def main():
         last_arg = args[-1]
         cmd = args[0]
         args = args[1:]
-    cmd_class = args_map.get(cmd)
-
-    if cmd_class is None:
-        cmd_class = catch_all
-
+    cmd_descriptor = args_map.get(cmd)
+    if cmd_descriptor is None or cmd_descriptor.is_catch_all():
+        # the command (or the help output) may need the commands
+        # not listed in the static manifest
+        load_unlisted_commands()
+        args_map, catch_all = _build_args_map()
+        cmd_descriptor = args_map.get(cmd)
+
+    if cmd_descriptor is None:
+        cmd_descriptor = catch_all
+
+    cmd_class = cmd_descriptor.get_class()
     cmd_obj = cmd_class(args)
     if is_bashcomp:
         try:
@@ -104,9 +116,9 @@ def main():
     # non-root users not allowed
     allowed = True
     if os.getuid() != 0 and \
-            cmd_class is not catch_all:
+            cmd_descriptor is not catch_all:
         if not cmd_class.ALLOW_UNPRIVILEGED:
-            cmd_class = catch_all
+            cmd_class = catch_all.get_class()
             allowed = False
 
     func, func_args = cmd_obj.parse()